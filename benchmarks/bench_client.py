@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks of ZMON client hot paths: entity helpers, URL construction, JSON encoding and a round-trip of every
+:class:`zmon_cli.client.Zmon` method through the in-process stand-in transport (no sockets, no latency), so results
+show client-side cost only.
+
+Results are compared with a stored baseline, which is best recorded on the same machine before a change::
+
+    $ python benchmarks/bench_client.py --update-baseline     # on master
+    $ python benchmarks/bench_client.py                       # on your branch, compares with baseline
+
+    $ python benchmarks/bench_client.py -k entity_id --save results.json
+"""
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+from collections import OrderedDict
+
+import click
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zmon_cli import __version__  # noqa: E402
+from zmon_cli.client import JSONDateEncoder, Zmon, compare_entities, get_valid_entity_id  # noqa: E402
+from zmon_cli.standin import STANDIN_URL, Standin, StandinAdapter, generate_dataset  # noqa: E402
+
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+DEFAULT_MIN_TIME = 0.2
+DEFAULT_REPEAT = 5
+
+# Slowdown reported as regression, relative to baseline
+DEFAULT_MAX_REGRESSION = 0.25
+
+DATE = datetime.datetime(2017, 3, 6, 16, 40, 0)
+
+ENTITY = {
+    'id': 'my-app-1-[aws:123456789012:eu-central-1]',
+    'type': 'instance',
+    'application_id': 'my-app',
+    'team': 'zmon',
+    'created': DATE,
+    'last_modified': 1234,
+    'tags': ['a', 'b', 'c'],
+    'data': {'ip': '10.0.0.1', 'ports': {'http': 8080, 'management': 7979}, 'labels': {'version': 'v1'}},
+}
+
+ENTITY_IDS = [
+    'my-app-1-[staging_1:v1]@1.2.3',
+    'my-app-1-(((staging:v1)))/#api/metrics%=^&$#',
+    'MY APP 1 / metrics',
+    'my-app-1-i-0123456789abcdef[aws:123456789012:eu-central-1]',
+]
+
+
+def client_cases():
+    """Return (name, function) of client helper benchmarks."""
+    other = dict(ENTITY, last_modified=5678, data=dict(ENTITY['data']))
+    changed = dict(ENTITY, team='other')
+
+    zmon = Zmon('https://zmon.example.org', token='123')
+
+    return [
+        ('compare_entities/equal', lambda: compare_entities(ENTITY, other)),
+        ('compare_entities/different', lambda: compare_entities(ENTITY, changed)),
+        ('get_valid_entity_id', lambda: [get_valid_entity_id(e) for e in ENTITY_IDS]),
+        ('is_valid_entity_id', lambda: [Zmon.is_valid_entity_id(e) for e in ENTITY_IDS]),
+        ('endpoint/parts', lambda: zmon.endpoint('status', 'alert', 123, 'all-entities')),
+        ('endpoint/no_trailing_slash', lambda: zmon.endpoint('entities', ENTITY['id'], trailing_slash=False)),
+        ('endpoint/base_url', lambda: zmon.endpoint('#/check-definitions/view/', 1, base_url=zmon.base_url)),
+        ('JSONDateEncoder/entity', lambda: json.dumps(ENTITY, cls=JSONDateEncoder)),
+    ]
+
+
+def roundtrip_cases():
+    """Return (name, function) of round-trips of all client methods through the stand-in transport."""
+    dataset = generate_dataset(entities=1000, checks=50, alerts=100, dashboards=10, teams=5, seed=1)
+    standin = Standin(dataset)
+
+    zmon = Zmon(STANDIN_URL, token='123')
+    zmon.session.mount(STANDIN_URL, StandinAdapter(standin))
+
+    entity_id = next(iter(dataset.entities))
+    check = dict(next(iter(dataset.checks.values())))
+    alert = dict(next(iter(dataset.alerts.values())))
+    dashboard = dict(next(iter(dataset.dashboards.values())))
+    grafana = next(iter(dataset.grafana_dashboards.values()))
+    group = next(iter(dataset.groups))
+    entity = {'id': 'bench-entity', 'type': 'bench', 'team': 'zmon', 'data': {'created': DATE}}
+    new_alert = {'name': 'bench', 'check_definition_id': check['id'], 'last_modified_by': 'bench'}
+    downtime = {'entities': [entity_id], 'comment': 'bench', 'start_time': 1, 'end_time': 2}
+
+    def create_delete_alert():
+        zmon.delete_alert_definition(zmon.create_alert_definition(dict(new_alert))['id'])
+
+    def add_delete_entity():
+        zmon.add_entity(entity)
+        zmon.delete_entity(entity['id'])
+
+    def switch_members():
+        zmon.switch_active_user(group, 'jane')
+        zmon.add_member(group, 'jane')
+        zmon.remove_member(group, 'jane')
+        zmon.add_phone('jane', '123')
+        zmon.remove_phone('jane', '123')
+        zmon.set_name('jane', 'Jane')
+
+    return [
+        ('Zmon.status', zmon.status),
+        ('Zmon.get_entities', zmon.get_entities),
+        ('Zmon.get_entities/query', lambda: zmon.get_entities(query={'type': 'host'})),
+        ('Zmon.get_entity', lambda: zmon.get_entity(entity_id)),
+        ('Zmon.add_entity+delete_entity', add_delete_entity),
+        ('Zmon.get_dashboard', lambda: zmon.get_dashboard(dashboard['id'])),
+        ('Zmon.get_dashboards', zmon.get_dashboards),
+        ('Zmon.update_dashboard', lambda: zmon.update_dashboard(dashboard)),
+        ('Zmon.get_check_definition', lambda: zmon.get_check_definition(check['id'])),
+        ('Zmon.get_check_definitions', zmon.get_check_definitions),
+        ('Zmon.update_check_definition', lambda: zmon.update_check_definition(check)),
+        ('Zmon.get_alert_definition', lambda: zmon.get_alert_definition(alert['id'])),
+        ('Zmon.get_alert_definitions', zmon.get_alert_definitions),
+        ('Zmon.update_alert_definition', lambda: zmon.update_alert_definition(alert)),
+        ('Zmon.create_alert_definition+delete_alert_definition', create_delete_alert),
+        ('Zmon.get_alert_data', lambda: zmon.get_alert_data(alert['id'])),
+        ('Zmon.search', lambda: zmon.search('api', limit=10, teams=['team-zmon'])),
+        ('Zmon.list_onetime_tokens', zmon.list_onetime_tokens),
+        ('Zmon.get_onetime_token', zmon.get_onetime_token),
+        ('Zmon.get_grafana_dashboard', lambda: zmon.get_grafana_dashboard(grafana['dashboard']['id'])),
+        ('Zmon.update_grafana_dashboard', lambda: zmon.update_grafana_dashboard(grafana)),
+        ('Zmon.create_downtime', lambda: zmon.create_downtime(downtime)),
+        ('Zmon.get_groups', zmon.get_groups),
+        ('Zmon.groups+members+phones', switch_members),
+    ]
+
+
+def measure(fn, min_time=DEFAULT_MIN_TIME, repeat=DEFAULT_REPEAT):
+    """
+    Time a function, calibrating the number of calls per sample to run at least ``min_time`` seconds.
+
+    :return: Dict with ``calls`` per sample and ``min``, ``median`` time per call in microseconds.
+    :rtype: dict
+    """
+    fn()  # warm up caches
+
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 10 ** 7:
+            break
+        number = max(number * 2, int(number * min_time / elapsed * 1.2) if elapsed else number * 10)
+
+    samples = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+
+    return {'calls': number, 'min': round(min(samples) * 1e6, 3), 'median': round(statistics.median(samples) * 1e6, 3)}
+
+
+def run(cases, min_time=DEFAULT_MIN_TIME, repeat=DEFAULT_REPEAT, callback=None):
+    results = OrderedDict()
+    for name, fn in cases:
+        results[name] = measure(fn, min_time=min_time, repeat=repeat)
+        if callback:
+            callback(name, results[name])
+    return results
+
+
+def compare(results, baseline, max_regression=DEFAULT_MAX_REGRESSION):
+    """
+    Compare results with baseline by minimum time per call.
+
+    :return: Dict of benchmark name to ratio of current to baseline time, and list of regressed benchmark names.
+    :rtype: tuple
+    """
+    ratios = OrderedDict()
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base or not base['min']:
+            continue
+        ratios[name] = result['min'] / base['min']
+        if ratios[name] > 1 + max_regression:
+            regressions.append(name)
+
+    return ratios, regressions
+
+
+def environment():
+    return OrderedDict([
+        ('client_version', __version__),
+        ('python', platform.python_version()),
+        ('implementation', platform.python_implementation()),
+        ('machine', platform.machine()),
+        ('platform', platform.platform()),
+        ('date', datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')),
+    ])
+
+
+@click.command()
+@click.option('-k', 'keyword', help='Only run benchmarks containing keyword.')
+@click.option('--min-time', type=float, default=DEFAULT_MIN_TIME,
+              help='Minimum seconds per sample. Default is {}'.format(DEFAULT_MIN_TIME))
+@click.option('--repeat', type=click.IntRange(1), default=DEFAULT_REPEAT,
+              help='Number of samples. Default is {}'.format(DEFAULT_REPEAT))
+@click.option('--baseline', 'baseline_file', default=BASELINE,
+              help='Baseline file. Default is benchmarks/baseline.json')
+@click.option('--update-baseline', is_flag=True, help='Store results as new baseline.')
+@click.option('--save', 'save_file', help='Write results as JSON to file.')
+@click.option('--max-regression', type=float, default=DEFAULT_MAX_REGRESSION,
+              help='Exit with 1 if a benchmark is slower than baseline by fraction. Default is {}'.format(
+                  DEFAULT_MAX_REGRESSION))
+def main(keyword, min_time, repeat, baseline_file, update_baseline, save_file, max_regression):
+    """Run ZMON client micro-benchmarks and compare with baseline"""
+    cases = [c for c in client_cases() + roundtrip_cases() if not keyword or keyword in c[0]]
+    if not cases:
+        raise click.UsageError('No benchmark matches "{}"'.format(keyword))
+
+    baseline = {}
+    if os.path.exists(baseline_file) and not update_baseline:
+        with open(baseline_file) as fd:
+            baseline = json.load(fd)['results']
+
+    width = max(len(name) for name, _ in cases)
+    click.echo('{:<{w}} {:>10} {:>12} {:>12} {:>9}'.format(
+        'benchmark', 'calls', 'min us', 'median us', 'baseline', w=width))
+
+    def report(name, result):
+        base = baseline.get(name)
+        change = '{:+.1%}'.format(result['min'] / base['min'] - 1) if base and base['min'] else ''
+        click.echo('{:<{w}} {calls:>10} {min:>12.3f} {median:>12.3f} {:>9}'.format(name, change, w=width, **result))
+
+    results = run(cases, min_time=min_time, repeat=repeat, callback=report)
+
+    data = OrderedDict([('environment', environment()), ('results', results)])
+
+    if save_file:
+        with open(save_file, 'w') as fd:
+            json.dump(data, fd, indent=2)
+
+    if update_baseline:
+        # Keep results of benchmarks which did not run
+        if os.path.exists(baseline_file):
+            with open(baseline_file) as fd:
+                stored = json.load(fd)['results']
+            stored.update(results)
+            data['results'] = OrderedDict(sorted(stored.items()))
+        with open(baseline_file, 'w') as fd:
+            json.dump(data, fd, indent=2)
+            fd.write('\n')
+        click.echo('Baseline written to {}'.format(baseline_file))
+        return
+
+    _, regressions = compare(results, baseline, max_regression=max_regression)
+    if regressions:
+        click.echo('Slower than baseline by more than {:.0%}: {}'.format(max_regression, ', '.join(regressions)),
+                   err=True)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
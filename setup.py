@@ -54,7 +54,7 @@ CLASSIFIERS = [
     'Topic :: System :: Networking :: Monitoring'
 ]
 
-CONSOLE_SCRIPTS = ['zmon = zmon_cli.main:main']
+CONSOLE_SCRIPTS = ['zmon = zmon_cli.frontend:main', 'zmon-complete = zmon_cli.completion:main']
 
 
 class PyTest(TestCommand):
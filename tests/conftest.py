@@ -1,5 +1,13 @@
+import json
+import threading
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
 import pytest
 
+from zmon_cli.standin import StandinServer
+
 
 @pytest.fixture(params=[
     (
@@ -37,3 +45,71 @@ import pytest
 ])
 def fx_ids(request):
     return request.param
+
+
+@pytest.fixture(autouse=True)
+def fx_cache_dir(monkeypatch, tmpdir):
+    cache_dir = str(tmpdir.join('cache'))
+    monkeypatch.setattr('zmon_cli.config.DEFAULT_CACHE_DIR', cache_dir)
+    return cache_dir
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.headers.get('Authorization') == 'Bearer expired':
+            status = 401
+        else:
+            status = 404 if 'missing' in self.path else 200
+        body = json.dumps({'path': self.path, 'headers': dict(self.headers)}).encode()
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+@pytest.fixture
+def fx_server():
+    """
+    Local HTTP server echoing path and headers of GET requests as JSON, 404 for paths containing "missing" and 401 for
+    the token "expired".
+    """
+    httpd = Server(('localhost', 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever)
+    thread.start()
+
+    yield 'http://localhost:{}'.format(httpd.server_address[1])
+
+    httpd.shutdown()
+    httpd.server_close()
+    thread.join()
+
+
+@pytest.fixture
+def fx_standin_server():
+    """Factory starting a :class:`zmon_cli.standin.StandinServer` for a stand-in, stopped after the test."""
+    servers = []
+
+    def start(standin):
+        server = StandinServer(('localhost', 0), standin)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        servers.append((server, thread))
+        return server
+
+    yield start
+
+    for server, thread in servers:
+        server.shutdown()
+        server.server_close()
+        thread.join()
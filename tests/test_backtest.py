@@ -0,0 +1,69 @@
+import pytest
+
+from zmon_cli.backtest import BacktestError, backtest, compile_condition, get_parameters, replay, sweep
+
+
+SERIES = {
+    'entity-1': ([0, 60, 120, 180, 240], [50, 150, 90, 120, 130]),
+    'entity-2': ([0, 60, 120, 180, 240], [10, 20, 30, 40, 50]),
+}
+
+
+@pytest.mark.parametrize('condition,params,expected', [
+    ('>100', {}, [False, True, False, True, True]),
+    ('value >= 90', {}, [False, True, True, True, True]),
+    ('< threshold', {'threshold': 100}, [True, False, True, False, False]),
+    ('< threshold', {'threshold': '100'}, [True, False, True, False, False]),
+    ('>100 and value < threshold', {'threshold': 140}, [False, False, False, True, True]),
+    ('abs(value - 100) < 15', {}, [False, False, True, False, False]),
+])
+def test_compile_condition(condition, params, expected):
+    assert compile_condition(condition, params)(SERIES['entity-1'][1]) == expected
+
+
+@pytest.mark.parametrize('condition', ['>', '> unknown_param', 'value >>> 1'])
+def test_compile_condition_invalid(condition):
+    with pytest.raises(BacktestError):
+        compile_condition(condition)([1])
+
+
+def test_compile_condition_invalid_parameter():
+    with pytest.raises(BacktestError):
+        compile_condition('> threshold', {'threshold': 'abc'})([1])
+
+
+def test_get_parameters():
+    params = get_parameters({'parameters': {'a': {'value': '10', 'type': 'int'}, 'b': 'text', 'c': [1]}})
+
+    assert params == {'a': 10, 'b': 'text', 'c': [1]}
+    assert get_parameters({}) == {}
+
+
+def test_replay():
+    assert replay([], []) == {'samples': 0, 'fired': 0, 'flaps': 0, 'alerting_seconds': 0}
+
+    result = replay([0, 60, 120, 180, 240], [True, False, True, True, False])
+    assert result == {'samples': 5, 'fired': 2, 'flaps': 3, 'alerting_seconds': 180}
+
+
+def test_backtest():
+    result = backtest(SERIES, '>100')
+
+    assert result['entities']['entity-1'] == {'samples': 5, 'fired': 2, 'flaps': 3, 'alerting_seconds': 120}
+    assert result['entities']['entity-2'] == {'samples': 5, 'fired': 0, 'flaps': 0, 'alerting_seconds': 0}
+    assert result['total'] == {
+        'samples': 10, 'fired': 2, 'flaps': 3, 'alerting_seconds': 120, 'entities_alerting': 1
+    }
+
+
+def test_sweep():
+    results = sweep(SERIES, ['>threshold', '<threshold'], {'threshold': 100}, {'threshold': [25, 100, 200]})
+
+    assert [(r['condition'], r['parameters']['threshold']) for r in results] == [
+        ('>threshold', 25), ('>threshold', 100), ('>threshold', 200),
+        ('<threshold', 25), ('<threshold', 100), ('<threshold', 200),
+    ]
+
+    assert [r['total']['entities_alerting'] for r in results[:3]] == [2, 1, 0]
+
+    assert len(sweep(SERIES, ['>100'], {}, {})) == 1
@@ -0,0 +1,53 @@
+import sys
+
+import pytest
+
+from zmon_cli.batch import BatchError, parse_batch, run_batch
+
+
+def test_parse_batch_lines():
+    groups = parse_batch('status\n\n# comment\nentities get a &\nentities get "b c" &\nzmon check get 1\n')
+
+    assert [[s['argv'] for s in g] for g in groups] == [
+        [['status']],
+        [['entities', 'get', 'a'], ['entities', 'get', 'b c']],
+        [['check', 'get', '1']],
+    ]
+    assert [s['step'] for g in groups for s in g] == [1, 2, 3, 4]
+
+
+def test_parse_batch_yaml():
+    groups = parse_batch('- status\n- name: checks\n  parallel:\n  - check get 1\n  - command: [check, get, 2]\n')
+
+    assert len(groups) == 2
+    assert groups[1][0]['name'] == 'check get 1'
+    assert groups[1][1]['argv'] == ['check', 'get', '2']
+
+
+@pytest.mark.parametrize('text', ['', '# nothing\n', 'status "unbalanced', '- name: x\n', '- parallel: []\n'])
+def test_parse_batch_invalid(text):
+    with pytest.raises(BatchError):
+        parse_batch(text)
+
+
+def test_run_batch_captures_parallel_output():
+    def execute(argv):
+        for i in range(100):
+            print(argv[0])
+        sys.stderr.write('err {}\n'.format(argv[0]))
+        return 0 if argv[0] != 'fail' else 1
+
+    groups = parse_batch('a &\nb &\nc &\nfail\nd\n')
+
+    callbacks = []
+    results = run_batch(groups, execute, jobs=3, callback=callbacks.append)
+
+    for result, name in zip(results[:3], 'abc'):
+        assert result['stdout'] == '{}\n'.format(name) * 100
+        assert result['stderr'] == 'err {}\n'.format(name)
+
+    assert [r['exit_code'] for r in results] == [0, 0, 0, 1, None]
+    assert len(callbacks) == 4
+
+    results = run_batch(groups, execute, keep_going=True)
+    assert [r['exit_code'] for r in results] == [0, 0, 0, 1, 0]
@@ -0,0 +1,170 @@
+import json
+import time
+
+import pytest
+import yaml
+
+from click.testing import CliRunner
+
+from zmon_cli.bench import BenchError, BenchState, cleanup, parse_mix, prepare, run_bench, summarize
+from zmon_cli.client import Zmon
+from zmon_cli.cmds.command import cli
+from zmon_cli.concurrency import RateLimiter, bulk_apply, set_pool_size
+from zmon_cli.standin import STANDIN_URL, Standin, StandinAdapter, generate_dataset
+
+
+@pytest.fixture
+def fx_standin():
+    return Standin(generate_dataset(entities=100, checks=10, alerts=10, dashboards=2, teams=2))
+
+
+@pytest.fixture
+def fx_zmon(fx_standin):
+    zmon = Zmon(STANDIN_URL, token='123')
+    zmon.session.mount(STANDIN_URL, StandinAdapter(fx_standin))
+    return zmon
+
+
+def test_parse_mix():
+    assert list(parse_mix('entity=2,alert-data').items()) == [('entity', 2.0), ('alert-data', 1.0)]
+
+    for mix in ('unknown', 'entity=x', 'entity=-1', 'entity=0', ''):
+        with pytest.raises(BenchError):
+            parse_mix(mix)
+
+
+def test_run_bench(fx_zmon, fx_standin):
+    mix = parse_mix('add-entity=1,alert-data=1,entity=1,search=1')
+    state = BenchState()
+    prepare(fx_zmon, mix, state)
+
+    assert len(state.alert_ids) == 10 and len(state.entity_ids) == 100
+
+    result = run_bench(fx_zmon, mix, concurrency=3, duration=None, requests_limit=40, seed=1, state=state)
+
+    assert result['total']['count'] == 40
+    assert result['total']['errors'] == 0
+    assert set(result['operations']) == set(mix)
+    assert result['operations']['alert-data']['endpoint'] == 'GET status/alert/{id}/all-entities'
+    assert sum(op['count'] for op in result['operations'].values()) == 40
+
+    created = result['operations']['add-entity']['count']
+    assert len(fx_standin.dataset.entities) == 100 + created
+
+    assert cleanup(fx_zmon, state) == created
+    assert len(fx_standin.dataset.entities) == 100
+
+    json.dumps(result)
+
+
+def test_run_bench_errors(fx_zmon, fx_standin):
+    fx_standin.error_rate = 1
+
+    result = run_bench(fx_zmon, parse_mix('status'), concurrency=2, duration=None, requests_limit=5)
+
+    assert result['total']['errors'] == 5
+    assert result['operations']['status']['error_codes'] == {'503': 5}
+
+
+def test_run_bench_rate(fx_zmon):
+    result = run_bench(fx_zmon, parse_mix('status'), concurrency=2, rate=100, duration=0.2)
+
+    assert 15 <= result['total']['count'] <= 21
+    assert result['rate'] == 100
+
+
+def test_prepare_missing_ids(fx_zmon, fx_standin):
+    fx_standin.dataset.dashboards.clear()
+
+    with pytest.raises(BenchError):
+        prepare(fx_zmon, parse_mix('dashboard'), BenchState())
+
+
+def test_summarize():
+    samples = [('entity', 0, 0.010, None), ('entity', 0.1, 0.030, '503'), ('status', 0.2, 0.020, 'ConnectionError')]
+
+    result = summarize(samples, 2)
+
+    assert result['total']['count'] == 3
+    assert result['total']['throughput'] == 1.5
+    assert result['total']['p50'] == 20
+    assert result['total']['max'] == 30
+    assert result['total']['error_codes'] == {'503': 1, 'ConnectionError': 1}
+    assert result['operations']['entity']['errors'] == 1
+
+
+def test_rate_limiter():
+    now = [0]
+    slept = []
+
+    def sleep(seconds):
+        slept.append(seconds)
+        now[0] += seconds
+
+    limiter = RateLimiter(10, clock=lambda: now[0], sleep=sleep)
+    assert [limiter.acquire() for _ in range(3)] == [0, 0.1, 0.2]
+
+    # missed slots are skipped
+    now[0] = 1
+    assert limiter.acquire() == 1
+
+    limiter = RateLimiter(10, catch_up=True, clock=lambda: now[0], sleep=sleep)
+    limiter.acquire()
+    now[0] = 2
+    assert limiter.acquire() == pytest.approx(1.1)
+
+    with pytest.raises(ValueError):
+        RateLimiter(0)
+
+
+def test_bulk_apply():
+    done = []
+
+    results = bulk_apply(lambda x: 10 // x, [1, 0, 5], concurrency=2, callback=done.append)
+
+    assert [(r.item, r.result) for r in results] == [(1, 10), (0, None), (5, 2)]
+    assert isinstance(results[1].error, ZeroDivisionError)
+    assert sorted(r.item for r in done) == [0, 1, 5]
+
+    called = []
+    results = bulk_apply(called.append, [1, 2], dry_run=True)
+    assert called == [] and [r.error for r in results] == [None, None]
+
+    started = time.perf_counter()
+    bulk_apply(called.append, range(5), concurrency=5, rate=50)
+    assert time.perf_counter() - started >= 0.07
+    assert sorted(called) == [0, 1, 2, 3, 4]
+
+    assert bulk_apply(called.append, []) == []
+
+
+def test_set_pool_size():
+    zmon = Zmon('https://zmon.example.org', token='123')
+    set_pool_size(zmon.session, 20)
+
+    assert zmon.session.get_adapter('https://zmon.example.org')._pool_maxsize == 20
+
+
+def test_cli_bench(fx_standin, fx_standin_server):
+    server = fx_standin_server(fx_standin)
+
+    runner = CliRunner()
+
+    with runner.isolated_filesystem():
+        with open('test.yaml', 'w') as fd:
+            yaml.dump({'url': server.url, 'token': '123'}, fd)
+
+        result = runner.invoke(cli, ['-c', 'test.yaml', 'bench', '--requests', '10', '--mix', 'add-entity',
+                                     '-o', 'json'], catch_exceptions=False)
+
+        data = json.loads(result.output)
+        assert data['total']['count'] == 10
+        assert data['cleaned_up'] == 10
+
+        result = runner.invoke(cli, ['-c', 'test.yaml', 'bench', '--requests', '5', '--mix', 'status'],
+                               catch_exceptions=False)
+        assert '5 requests' in result.output
+        assert 'GET status' in result.output
+
+        result = runner.invoke(cli, ['-c', 'test.yaml', 'bench', '--mix', 'x'])
+        assert result.exit_code == 2
@@ -0,0 +1,43 @@
+import json
+import os
+
+from importlib.machinery import SourceFileLoader
+
+import pytest
+
+
+BENCHMARKS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks')
+
+
+@pytest.fixture(scope='module')
+def fx_bench():
+    return SourceFileLoader('bench_client', os.path.join(BENCHMARKS, 'bench_client.py')).load_module()
+
+
+def test_benchmark_cases(fx_bench):
+    cases = fx_bench.client_cases() + fx_bench.roundtrip_cases()
+
+    assert len({name for name, _ in cases}) == len(cases)
+
+    for name, fn in cases:
+        fn()
+
+
+def test_benchmark_measure_compare(fx_bench):
+    results = fx_bench.run([('noop', lambda: None)], min_time=0.001, repeat=2)
+
+    assert results['noop']['calls'] >= 1
+    assert results['noop']['min'] <= results['noop']['median']
+
+    ratios, regressions = fx_bench.compare({'a': {'min': 2.0}, 'b': {'min': 1.0}, 'c': {'min': 1.0}},
+                                           {'a': {'min': 1.0}, 'b': {'min': 1.0}})
+    assert ratios == {'a': 2.0, 'b': 1.0}
+    assert regressions == ['a']
+
+
+def test_benchmark_baseline(fx_bench):
+    with open(fx_bench.BASELINE) as fd:
+        baseline = json.load(fd)
+
+    names = {name for name, _ in fx_bench.client_cases() + fx_bench.roundtrip_cases()}
+    assert names == set(baseline['results'])
@@ -0,0 +1,75 @@
+import json
+
+import pytest
+import yaml
+
+from click.testing import CliRunner
+
+from zmon_cli.capacity import forecast, observed_rate
+from zmon_cli.cmds.command import cli
+from zmon_cli.standin import Standin, generate_dataset
+
+
+ENTITIES = [{'id': 'i-{}'.format(i), 'type': 'instance', 'team': 'a' if i % 2 else 'b'} for i in range(100)] + [
+    {'id': 'GLOBAL', 'type': 'GLOBAL'}]
+
+CHECKS = [
+    {'id': 1, 'name': 'Instances', 'owning_team': 'a', 'interval': 10, 'entities': [{'type': 'instance'}]},
+    {'id': 2, 'name': 'Team b', 'owning_team': 'b', 'interval': 60, 'entities': [{'type': 'instance', 'team': 'b'}]},
+    {'id': 3, 'name': 'Global', 'owning_team': 'b', 'interval': None, 'entities': [{'type': 'GLOBAL'}]},
+    {'id': 4, 'name': 'Nothing', 'owning_team': 'c', 'interval': 5, 'entities': [{'type': 'host'}]},
+]
+
+
+def test_forecast():
+    result = forecast(CHECKS, ENTITIES, top=2)
+
+    assert result['checks'] == 4
+    assert result['entities'] == 101
+    assert result['idle_checks'] == 1
+    assert result['invocations_per_second'] == pytest.approx(10 + 50 / 60 + 1 / 60)
+
+    assert [(c['id'], c['entities']) for c in result['top']] == [(1, 100), (2, 50)]
+    assert result['top'][0]['share'] == pytest.approx(10 / result['invocations_per_second'])
+
+    assert [(t['team'], t['checks'], t['entities']) for t in result['teams']] == [('a', 1, 100), ('b', 2, 51)]
+
+    assert forecast([], [])['invocations_per_second'] == 0
+
+
+def test_observed_rate():
+    before = {'workers': [{'name': 'w1', 'check_invocations': 100}, {'name': 'w2', 'check_invocations': 500},
+                          {'name': 'w3', 'check_invocations': 10}]}
+    after = {'workers': [{'name': 'w1', 'check_invocations': 150}, {'name': 'w2', 'check_invocations': 20},
+                         {'name': 'w4', 'check_invocations': 10}]}
+
+    # w2 restarted, w4 new
+    assert observed_rate(before, after, 10) == 5
+    assert observed_rate(before, after, 0) == 0
+
+
+def test_cli_capacity(fx_standin_server, tmpdir):
+    server = fx_standin_server(Standin(generate_dataset(entities=200, checks=20, alerts=10)))
+
+    config = tmpdir.join('config.yaml')
+    config.write(yaml.dump({'url': server.url, 'token': '123'}))
+
+    runner = CliRunner()
+
+    result = runner.invoke(cli, ['-c', str(config), 'capacity', '--observe', '1', '-o', 'json'],
+                           catch_exceptions=False)
+    data = json.loads(result.output)
+
+    assert data['checks'] == 20 and data['entities'] == 200
+    # stand-in workers run at forecast rate
+    assert data['observed']['ratio'] == pytest.approx(1, rel=0.5)
+
+    entities = tmpdir.join('entities.json')
+    entities.write(json.dumps(ENTITIES))
+
+    result = runner.invoke(cli, ['-c', str(config), 'capacity', '--observe', '0', '--entities-file', str(entities),
+                                 '--top', '3'], catch_exceptions=False)
+
+    assert 'on 101 entities' in result.output
+    assert 'Top checks:' in result.output
+    assert 'Observed' not in result.output
@@ -0,0 +1,67 @@
+import json
+
+from unittest.mock import MagicMock
+
+import yaml
+
+from click.testing import CliRunner
+
+from zmon_cli.check_duplicates import command_hash, find_duplicates
+from zmon_cli.cmds.command import cli
+
+
+CHECKS = [
+    {'id': 1, 'name': 'Health', 'owning_team': 'a', 'interval': 60, 'entities': [{'type': 'instance'}],
+     'command': "http('http://localhost/health', timeout=5).json()"},
+    {'id': 2, 'name': 'Health copy', 'owning_team': 'b', 'interval': 30, 'entities': [{'type': 'instance'}],
+     'command': '# copied\nhttp(\n    "http://localhost/health",\n    timeout=5,\n).json()\n'},
+    {'id': 3, 'name': 'Metrics', 'owning_team': 'a', 'interval': 60, 'entities': [{'type': 'host'}],
+     'command': "r = http('http://localhost/metrics', timeout=10).json()\nr['count']"},
+    {'id': 4, 'name': 'Other metrics', 'owning_team': 'c', 'interval': 60, 'entities': [{'type': 'instance'}],
+     'command': "data = http('http://localhost/stats', timeout=3).json()\ndata['total']"},
+    {'id': 5, 'name': 'Unique', 'owning_team': 'c', 'interval': 60, 'entities': [{'type': 'instance'}],
+     'command': "ping()"},
+    {'id': 6, 'name': 'Invalid', 'owning_team': 'c', 'interval': 60, 'entities': [], 'command': "ping("},
+]
+
+
+def test_command_hash():
+    assert command_hash("x = 'a'  # comment") == command_hash('x = "a"')
+    assert command_hash('x = 1') != command_hash('x = 2')
+    assert command_hash('x = 1\nx', canonical=True) == command_hash('y = 2\ny', canonical=True)
+    assert command_hash('x = 1', canonical=True) != command_hash('x = "1"', canonical=True)
+    assert command_hash('x = None', canonical=True) != command_hash('x = True', canonical=True)
+    assert command_hash('http(1)', canonical=True) != command_hash('ping(1)', canonical=True)
+
+
+def test_find_duplicates():
+    groups = find_duplicates(CHECKS)
+
+    assert [(g['kind'], [c['id'] for c in g['checks']], g['variants'], g['entity_filters']) for g in groups] == [
+        ('identical', [1, 2], 1, 1),
+        ('similar', [3, 4], 2, 2),
+    ]
+    assert 'command' not in groups[0]['checks'][0]
+
+    groups = find_duplicates(CHECKS, similar=False)
+    assert [[c['id'] for c in g['checks']] for g in groups] == [[1, 2]]
+
+
+def test_cli_duplicates(monkeypatch):
+    get = MagicMock()
+    get.return_value = [dict(c) for c in CHECKS]
+    monkeypatch.setattr('zmon_cli.client.Zmon.get_check_definitions', get)
+
+    runner = CliRunner()
+
+    with runner.isolated_filesystem():
+        with open('test.yaml', 'w') as fd:
+            yaml.dump({'url': 'foo', 'token': '123'}, fd)
+
+        result = runner.invoke(cli, ['-c', 'test.yaml', 'check', 'duplicates'], catch_exceptions=False)
+        assert 'identical' in result.output
+        assert '4 checks in 2 groups, 2 of them in groups with same entity filters' in result.output
+
+        result = runner.invoke(cli, ['-c', 'test.yaml', 'check', 'duplicates', '-t', 'b', '-o', 'json'],
+                               catch_exceptions=False)
+        assert len(json.loads(result.output)) == 1
@@ -0,0 +1,63 @@
+import pytest
+
+from zmon_cli.check_lint import lint_check_command
+from zmon_cli.client import Zmon, ZmonError
+
+
+def rules(src, interval=None):
+    return [(f.line, f.rule) for f in lint_check_command(src, interval=interval)]
+
+
+def test_lint_clean():
+    src = '\n'.join([
+        'data = http("http://example.org/health", timeout=5).json()',
+        'result = {}',
+        'for k, v in data.items():',
+        '    result[k] = v["status"]',
+        'result',
+    ])
+
+    assert lint_check_command(src, interval=60) == []
+
+
+def test_lint_timeout():
+    assert rules('http("http://example.org").json()') == [(1, 'missing-timeout')]
+    assert rules('http("http://example.org", **options).json()') == []
+    assert rules('requests.http("http://example.org")') == []
+
+
+def test_lint_loops():
+    assert rules('while True:\n    pass') == [(1, 'unbounded-loop')]
+    assert rules('while 1:\n    for x in y:\n        break') == [(1, 'unbounded-loop')]
+    assert rules('while True:\n    if x:\n        break') == [(1, 'while-loop')]
+    assert rules('def f(r):\n    while True:\n        x = r.next()\n        if x: return x') == [(2, 'while-loop')]
+    assert rules('while True:\n    for x in y:\n        raise ValueError(x)') == [(1, 'while-loop')]
+    assert rules('while True:\n    f = lambda: (yield)\n    def g():\n        return 1') == [(1, 'unbounded-loop')]
+    assert rules('while {[1]}:\n    pass') == [(1, 'while-loop')]
+    assert rules('for i in itertools.count():\n    x += i') == [(1, 'unbounded-loop')]
+    assert rules('for i in count():\n    break') == []
+    assert rules('time.sleep(1)') == [(1, 'sleep')]
+
+
+def test_lint_remote_calls():
+    src = '[redis().get(k) for k in keys]'
+    assert rules(src) == [(1, 'remote-call-in-loop')]
+
+    src = '\n'.join('v{} = sql().execute("SELECT {}").result()'.format(i, i) for i in range(5))
+    assert rules(src) == [(4, 'remote-calls')]
+
+    findings = lint_check_command('tcp(host, 80)', interval=30)
+    assert [(f.severity, f.rule) for f in findings] == [('warning', 'short-interval')]
+
+    findings = lint_check_command('tcp(host, 80)', interval=10)
+    assert [(f.severity, f.rule) for f in findings] == [('error', 'short-interval')]
+
+    assert rules('entity["id"]', interval=10) == []
+
+
+def test_validate_check_command_lint():
+    assert Zmon.validate_check_command('x = 1') is None
+    assert Zmon.validate_check_command('ping()', lint=True, interval=5)[0].rule == 'short-interval'
+
+    with pytest.raises(ZmonError):
+        Zmon.validate_check_command('x = (', lint=True)
@@ -0,0 +1,145 @@
+import json
+
+from click.testing import CliRunner
+
+from zmon_cli import check_validation
+from zmon_cli.check_validation import ValidationCache, find_check_files, validate_check_yaml, validate_files
+from zmon_cli.cmds.command import cli
+
+
+VALID = b'name: Check\ncommand: |\n  # comment\n  http("http://example.org", timeout=5).code()\ninterval: 60\n'
+
+INVALID = b'name: Check\n\ncommand: |\n  x = 1\n  if x\n    return 1\ninterval: 60\n'
+
+
+def test_validate_check_yaml():
+    assert validate_check_yaml(VALID) == []
+    assert validate_check_yaml(INVALID) == [(5, 'error', 'syntax', "Invalid check command: expected ':'")]
+
+    assert validate_check_yaml(b'name: Check\ncommand: "x = (1"\n')[0].line == 2
+
+    # folded and plain scalars do not keep their lines, findings are reported where the command starts
+    assert validate_check_yaml(b'name: Check\ncommand: >\n  a = 1\n\n  b = = 2\n') == [
+        (2, 'error', 'syntax', 'Invalid check command: invalid syntax (line 2 of command)')]
+    assert validate_check_yaml(b'name: Check\ncommand:\n  a = 1\n\n  b = = 2\n')[0].line == 3
+    assert validate_check_yaml(b'name: Check\n') == [(1, 'error', 'definition', 'Missing "command"')]
+    assert validate_check_yaml(b'- 1\n') == [(1, 'error', 'definition', 'Not a check definition')]
+    assert validate_check_yaml(b'name: Check\ncommand:\n  x: 1\n')[0][:2] == (3, 'error')
+
+    errors = validate_check_yaml(b'name: Check\ncommand: [\n')
+    assert errors[0].line == 3 and errors[0].rule == 'yaml'
+
+
+def test_validate_check_yaml_lint():
+    assert validate_check_yaml(VALID, lint=True) == []
+
+    content = b'name: Check\ninterval: 10\ncommand: |\n  x = 1\n  while True:\n    http("http://example.org")\n'
+
+    assert [(f.line, f.severity, f.rule) for f in validate_check_yaml(content, lint=True)] == [
+        (5, 'error', 'unbounded-loop'),
+        (6, 'error', 'short-interval'),
+        (6, 'warning', 'remote-call-in-loop'),
+        (6, 'warning', 'missing-timeout'),
+    ]
+
+
+def test_find_check_files(tmpdir):
+    tmpdir.join('a.yaml').write(VALID)
+    tmpdir.mkdir('sub').join('b.yml').write(VALID)
+    tmpdir.join('README.md').write('')
+    tmpdir.mkdir('.git').join('c.yaml').write(VALID)
+
+    assert find_check_files([str(tmpdir)]) == [str(tmpdir.join('a.yaml')), str(tmpdir.join('sub', 'b.yml'))]
+
+
+def test_validate_files(tmpdir, monkeypatch):
+    paths = []
+    for i in range(6):
+        path = tmpdir.join('check-{}.yaml'.format(i))
+        path.write_binary(INVALID if i == 3 else VALID.replace(b'Check', 'Check {}'.format(i).encode()))
+        paths.append(str(path))
+
+    cache = ValidationCache(str(tmpdir.join('cache', 'validation.json')))
+
+    # validate in worker processes
+    monkeypatch.setattr(check_validation, 'MIN_POOL_FILES', 2)
+    result = validate_files(paths, jobs=2, cache=cache)
+
+    assert result['files'] == 6
+    assert result['cached'] == 0
+    assert result['findings'] == [{'file': paths[3], 'line': 5, 'severity': 'error', 'rule': 'syntax',
+                                   'message': "Invalid check command: expected ':'"}]
+
+    cache.save()
+
+    tmpdir.join('check-0.yaml').write_binary(INVALID)
+
+    cache = ValidationCache(str(tmpdir.join('cache', 'validation.json')))
+    result = validate_files(paths, jobs=1, cache=cache)
+
+    # same content as check-3
+    assert result['cached'] == 6
+    assert [f['file'] for f in result['findings']] == [paths[0], paths[3]]
+
+    result = validate_files(paths + [str(tmpdir.join('missing.yaml'))], jobs=1)
+    assert result['cached'] == 0
+    assert result['findings'][-1]['message'] == 'Can not read file: No such file or directory'
+
+    # lint results are cached separately
+    result = validate_files(paths, jobs=1, cache=cache, lint=True)
+    assert result['cached'] == 0
+    assert [f['rule'] for f in result['findings']] == ['syntax', 'syntax']
+
+
+def test_validation_cache_size(tmpdir):
+    path = str(tmpdir.join('validation.json'))
+
+    cache = ValidationCache(path, max_entries=2)
+    cache.set('a', [])
+    cache.set('b', [[1, 'error']])
+    cache.set('c', [])
+    assert cache.get('a') == []
+    cache.save()
+
+    cache = ValidationCache(path)
+    assert len(cache) == 2
+    assert cache.get('b') is None
+    assert cache.get('c') == []
+
+
+def test_cli_validate(tmpdir):
+    checks = tmpdir.mkdir('checks')
+    checks.join('valid.yaml').write_binary(VALID)
+
+    config = tmpdir.join('config.yaml')
+    config.write('url: https://zmon.example.org\ntoken: 123\ncache_dir: {}\n'.format(tmpdir.join('cache')))
+
+    runner = CliRunner()
+
+    result = runner.invoke(cli, ['-c', str(config), 'check-definitions', 'validate', str(checks)],
+                           catch_exceptions=False)
+    assert result.exit_code == 0
+    assert '1 files validated (0 unchanged), 0 invalid' in result.output
+
+    checks.join('invalid.yaml').write_binary(INVALID)
+
+    result = runner.invoke(cli, ['-c', str(config), 'check-definitions', 'validate', str(checks)],
+                           catch_exceptions=False)
+    assert result.exit_code == 1
+    assert '{}:5: error [syntax] Invalid check command'.format(checks.join('invalid.yaml')) in result.output
+    assert '2 files validated (1 unchanged), 1 invalid, 1 errors' in result.output
+
+    checks.join('invalid.yaml').write_binary(b'name: Check\ninterval: 30\ncommand: http("http://example.org")\n')
+
+    result = runner.invoke(cli, ['-c', str(config), 'check-definitions', 'validate', '--lint', str(checks)],
+                           catch_exceptions=False)
+    assert result.exit_code == 0
+    assert '2 files validated (0 unchanged), 0 invalid, 2 warnings' in result.output
+
+    result = runner.invoke(cli, ['-c', str(config), 'check-definitions', 'validate', '--lint', '--fail-on', 'warning',
+                                 str(checks)], catch_exceptions=False)
+    assert result.exit_code == 1
+
+    result = runner.invoke(cli, ['-c', str(config), 'check-definitions', 'validate', '--no-cache', '-o', 'json',
+                                 str(checks)], catch_exceptions=False)
+    assert json.loads(result.output)['cached'] == 0
@@ -1,3 +1,7 @@
+import os
+import json
+import click
+import pytest
 import yaml
 from unittest.mock import MagicMock
 from click.testing import CliRunner
@@ -5,6 +9,10 @@ from click.testing import CliRunner
 
 from zmon_cli.main import cli
 from zmon_cli.client import Zmon
+from zmon_cli.cmds.command import parse_duration
+from zmon_cli.cmds.command import session_cache, get_client as get_client_cmd
+from zmon_cli.completion import complete
+from zmon_cli.history import HistoryStore
 
 
 def get_client(config):
@@ -60,6 +68,7 @@ def test_status_zign(monkeypatch):
     monkeypatch.setattr('zmon_cli.client.Zmon.status', get)
     monkeypatch.setattr('zmon_cli.cmds.command.get_client', get_client)
     monkeypatch.setattr('zign.api.get_token', get_token)
+    monkeypatch.setattr('zign.api.get_existing_token', lambda name: None)
 
     runner = CliRunner()
 
@@ -210,6 +219,39 @@ def test_update_check_definition(monkeypatch):
         assert '/check-definitions/view/7' in result.output
 
 
+def test_update_check_definition_lint(monkeypatch):
+    monkeypatch.setattr('zmon_cli.config.DEFAULT_CONFIG_FILE', 'test.yaml')
+
+    post = MagicMock()
+    post.return_value = {'id': 7}
+    monkeypatch.setattr('zmon_cli.client.Zmon.update_check_definition', post)
+
+    runner = CliRunner()
+
+    with runner.isolated_filesystem():
+        with open('test.yaml', 'w') as fd:
+            yaml.dump({'url': 'foo', 'token': '123'}, fd)
+
+        with open('check.yaml', 'w') as fd:
+            yaml.safe_dump({'owning_team': 'myteam', 'command': 'http("/").json()', 'interval': 60}, fd)
+
+        result = runner.invoke(cli, ['-c', 'test.yaml', 'check', 'update', '--lint', 'check.yaml'],
+                               catch_exceptions=False)
+
+        assert 'Line 1: warning [missing-timeout]' in result.output
+        assert '/check-definitions/view/7' in result.output
+
+        with open('check.yaml', 'w') as fd:
+            yaml.safe_dump({'owning_team': 'myteam', 'command': 'http("/").json()', 'interval': 5}, fd)
+
+        result = runner.invoke(cli, ['-c', 'test.yaml', 'check', 'update', '--lint', 'check.yaml'],
+                               catch_exceptions=False)
+
+        assert result.exit_code == 1
+        assert 'not updating' in result.output
+        assert post.call_count == 1
+
+
 def test_get_check_definition(monkeypatch):
     get = MagicMock()
     get.return_value = {
@@ -332,3 +374,332 @@ def test_search(monkeypatch):
             cli, ['-c', 'test.yaml', 'search', 'eagle'], catch_exceptions=False)
 
         assert 'eagle' in result.output
+
+
+def test_data(monkeypatch):
+    get = MagicMock()
+    get.return_value = [
+        {'entity': 'entity-1', 'results': [{'ts': 100, 'value': 12}]},
+        {'entity': 'entity-2', 'results': [{'ts': 100, 'value': 34}]},
+    ]
+
+    monkeypatch.setattr('zmon_cli.client.Zmon.get_alert_data', get)
+
+    runner = CliRunner()
+
+    with runner.isolated_filesystem():
+        with open('test.yaml', 'w') as fd:
+            yaml.dump({'url': 'foo', 'token': '123'}, fd)
+
+        result = runner.invoke(cli, ['-c', 'test.yaml', 'data', '1', 'entity-2'], catch_exceptions=False)
+
+        assert 'entity-2: 34' in result.output
+        assert 'entity-1' not in result.output
+
+        result = runner.invoke(cli, ['-c', 'test.yaml', 'data', 'get', '1'], catch_exceptions=False)
+
+        assert 'entity-1: 12' in result.output
+        assert 'entity-2: 34' in result.output
+
+        # options before the alert ID
+        result = runner.invoke(cli, ['-c', 'test.yaml', 'data', '-o', 'json', '1', 'entity-1'], catch_exceptions=False)
+
+        assert json.loads(result.output) == {'entity-1': 12}
+
+        result = runner.invoke(cli, ['-c', 'test.yaml', 'data', '--pretty', '1'], catch_exceptions=False)
+
+        assert result.exit_code == 0
+        assert 'entity-2: 34' in result.output
+
+        result = runner.invoke(cli, ['-c', 'test.yaml', 'data', '--help'], catch_exceptions=False)
+
+        assert 'record' in result.output
+
+
+def test_parse_duration():
+    assert parse_duration(None, None, '90') == 90
+    assert parse_duration(None, None, '1.5m') == 90
+    assert parse_duration(None, None, '7d') == 7 * 86400
+    assert parse_duration(None, None, None) is None
+
+    for invalid in ('abc', '5x', 'inf', '1e400s'):
+        with pytest.raises(click.BadParameter):
+            parse_duration(None, None, invalid)
+
+
+def test_data_record_history(monkeypatch):
+    get = MagicMock()
+    get.side_effect = [
+        [{'entity': 'entity-1', 'results': [{'ts': 100, 'value': 12}]}],
+        [{'entity': 'entity-1', 'results': [{'ts': 130, 'value': 20}]}],
+    ]
+
+    monkeypatch.setattr('zmon_cli.client.Zmon.get_alert_data', get)
+
+    runner = CliRunner()
+
+    with runner.isolated_filesystem():
+        with open('test.yaml', 'w') as fd:
+            yaml.dump({'url': 'foo', 'token': '123'}, fd)
+
+        result = runner.invoke(
+            cli, ['-c', 'test.yaml', 'data', 'record', '1', '-n', '2', '-i', '0', '--history-dir', 'hist'],
+            catch_exceptions=False)
+
+        assert 'Recording alert 1 data' in result.output
+        assert get.call_count == 2
+
+        result = runner.invoke(
+            cli, ['-c', 'test.yaml', 'data', 'history', '1', '--history-dir', 'hist', '-o', 'json'],
+            catch_exceptions=False)
+
+        assert json.loads(result.output) == {'entity-1': [[100.0, 12.0], [130.0, 20.0]]}
+
+        result = runner.invoke(
+            cli, ['-c', 'test.yaml', 'data', 'history', '1', '--history-dir', 'hist', '-w', '1m', '-o', 'json'],
+            catch_exceptions=False)
+
+        assert json.loads(result.output) == {'entity-1': [[60, 12.0], [120, 20.0]]}
+
+
+def test_alert_definition_backtest(monkeypatch):
+    runner = CliRunner()
+
+    with runner.isolated_filesystem():
+        with open('test.yaml', 'w') as fd:
+            yaml.dump({'url': 'foo', 'token': '123'}, fd)
+
+        with open('alert.yaml', 'w') as fd:
+            yaml.safe_dump({'id': 7, 'condition': '>threshold', 'parameters': {'threshold': {'value': 10}}}, fd)
+
+        store = HistoryStore('hist')
+        for ts, value in ((100, 5), (160, 15), (220, 25)):
+            store.record(7, [{'entity': 'entity-1', 'results': [{'ts': ts, 'value': value}]}])
+
+        result = runner.invoke(
+            cli, ['-c', 'test.yaml', 'alert', 'backtest', 'alert.yaml', '--history', 'hist', '-p', 'threshold=20',
+                  '-p', 'threshold=30'],
+            catch_exceptions=False)
+
+        assert 'threshold=20' in result.output
+        assert 'threshold=30' in result.output
+
+        result = runner.invoke(
+            cli, ['-c', 'test.yaml', 'alert', 'backtest', 'alert.yaml', '--history', 'hist', '-o', 'json'],
+            catch_exceptions=False)
+
+        data = json.loads(result.output)
+        assert data[0]['entities']['entity-1'] == {'samples': 3, 'fired': 1, 'flaps': 1, 'alerting_seconds': 60}
+
+        result = runner.invoke(
+            cli, ['-c', 'test.yaml', 'alert', 'backtest', 'alert.yaml', '--history', 'hist', '--alert-id', '8'],
+            catch_exceptions=False)
+
+        assert 'No recorded data for alert 8' in result.output
+
+
+def test_search_local(monkeypatch):
+    get_checks = MagicMock()
+    get_checks.return_value = [{'id': 1, 'name': 'Local check', 'owning_team': 'team-1'}]
+    get_alerts = MagicMock()
+    get_alerts.return_value = []
+    get_dashboards = MagicMock()
+    get_dashboards.return_value = []
+    search = MagicMock()
+    search.side_effect = [
+        {'alerts': [], 'checks': [{'id': 1, 'title': 'check', 'team': 'team-1'}], 'dashboards': [],
+         'grafana_dashboards': []},
+        {'alerts': [], 'checks': [{'id': 1, 'title': 'check', 'team': 'team-1'}], 'dashboards': [],
+         'grafana_dashboards': [{'id': 'remote-grafana', 'title': 'Remote Grafana', 'team': ''}]},
+    ]
+
+    monkeypatch.setattr('zmon_cli.client.Zmon.get_check_definitions', get_checks)
+    monkeypatch.setattr('zmon_cli.client.Zmon.get_alert_definitions', get_alerts)
+    monkeypatch.setattr('zmon_cli.client.Zmon.get_dashboards', get_dashboards)
+    monkeypatch.setattr('zmon_cli.client.Zmon.search', search)
+
+    runner = CliRunner()
+
+    with runner.isolated_filesystem():
+        with open('test.yaml', 'w') as fd:
+            yaml.dump({'url': 'https://zmon', 'token': '123'}, fd)
+
+        result = runner.invoke(cli, ['-c', 'test.yaml', 'search', '--update-index'], catch_exceptions=False)
+        assert 'Building local search index' in result.output
+
+        result = runner.invoke(cli, ['-c', 'test.yaml', 'search', '--local', 'local', '-o', 'json'],
+                               catch_exceptions=False)
+        data = json.loads(result.output)
+        assert data['checks'] == [
+            {'id': 1, 'title': 'Local check', 'team': 'team-1', 'link': 'https://zmon#/check-definitions/view/1/'}
+        ]
+        assert not search.called
+
+        # multi-team queries on ZMON are fanned out and merged, grafana dashboards end up in local index
+        result = runner.invoke(cli, ['-c', 'test.yaml', 'search', 'grafana', '-t', 't-1', '-t', 't-2', '-o', 'json'],
+                               catch_exceptions=False)
+        data = json.loads(result.output)
+        assert len(data['checks']) == 1
+        assert search.call_count == 2
+
+        result = runner.invoke(cli, ['-c', 'test.yaml', 'search', '--local', 'remote', '-o', 'json'],
+                               catch_exceptions=False)
+        assert json.loads(result.output)['grafana_dashboards'][0]['id'] == 'remote-grafana'
+
+
+def test_completion_update(monkeypatch, fx_cache_dir):
+    get_checks = MagicMock()
+    get_checks.return_value = [{'id': 1, 'name': 'check-1'}]
+    get_alerts = MagicMock()
+    get_alerts.return_value = [{'id': 2, 'name': 'alert-2'}]
+    get_dashboards = MagicMock()
+    get_dashboards.return_value = [{'id': 3, 'name': 'dash-3'}]
+    get_entities = MagicMock()
+    get_entities.return_value = [{'id': 'entity-4', 'type': 'host'}]
+
+    monkeypatch.setattr('zmon_cli.client.Zmon.get_check_definitions', get_checks)
+    monkeypatch.setattr('zmon_cli.client.Zmon.get_alert_definitions', get_alerts)
+    monkeypatch.setattr('zmon_cli.client.Zmon.get_dashboards', get_dashboards)
+    monkeypatch.setattr('zmon_cli.client.Zmon.get_entities', get_entities)
+
+    runner = CliRunner()
+
+    with runner.isolated_filesystem():
+        with open('test.yaml', 'w') as fd:
+            yaml.dump({'url': 'foo', 'token': '123'}, fd)
+
+        result = runner.invoke(cli, ['-c', 'test.yaml', 'completion', 'update'], catch_exceptions=False)
+
+        assert 'ZMON_COMPLETION_DIR' in result.output
+
+    index_dir = os.path.join(fx_cache_dir, 'completion')
+
+    assert complete(['zmon', 'alert', 'get', ''], 3, index_dir=index_dir) == ['2']
+    assert complete(['zmon', 'dashboard', 'get', ''], 3, index_dir=index_dir) == ['3']
+    assert complete(['zmon', 'entities', 'delete', 'e'], 3, index_dir=index_dir) == ['entity-4']
+
+
+def test_session_cache(monkeypatch):
+    get_config_data = MagicMock()
+    get_config_data.return_value = {'url': 'https://zmon', 'token': '123'}
+    monkeypatch.setattr('zmon_cli.cmds.command.get_config_data', get_config_data)
+
+    session_cache.enable(cache_ttl=10)
+
+    try:
+        with CliRunner().isolated_filesystem():
+            with open('test.yaml', 'w') as fd:
+                yaml.dump({'url': 'foo', 'token': '123'}, fd)
+
+            session_cache.get_config('test.yaml')
+            config = session_cache.get_config('test.yaml')
+            assert get_config_data.call_count == 1
+
+            client = get_client_cmd(config)
+            assert get_client_cmd(config) is client
+            assert client.session.ttl == 10
+
+            other = get_client_cmd(dict(config, token='456'))
+            assert other is not client
+
+            # least recently used clients are dropped
+            monkeypatch.setattr(session_cache, 'max_clients', 2)
+            get_client_cmd(config)
+            get_client_cmd(dict(config, token='789'))
+            assert get_client_cmd(config) is client
+            assert get_client_cmd(dict(config, token='456')) is not other
+            assert len(session_cache._clients) == 2
+    finally:
+        session_cache.disable()
+
+    assert get_client_cmd(config) is not get_client_cmd(config)
+
+
+def test_batch(monkeypatch):
+    def get_check_definition(client, check_id):
+        if check_id == 3:
+            raise RuntimeError('boom')
+        return {'id': int(check_id), 'name': 'Test {}'.format(check_id), 'command': 'http().json()'}
+
+    monkeypatch.setattr('zmon_cli.client.Zmon.get_check_definition', get_check_definition)
+
+    runner = CliRunner()
+
+    with runner.isolated_filesystem():
+        with open('test.yaml', 'w') as fd:
+            yaml.dump({'url': 'foo', 'token': 123}, fd)
+
+        with open('batch.txt', 'w') as fd:
+            fd.write('# checks\nzmon check get 1\ncheck get 2 &\ncheck get 3 &\ncheck get 4\n')
+
+        result = runner.invoke(cli, ['-c', 'test.yaml', 'batch', 'batch.txt', '-o', 'json'], catch_exceptions=False)
+
+        assert result.exit_code == 1
+
+        steps = json.loads(result.output)
+        assert [s['exit_code'] for s in steps] == [0, 0, 1, None]
+        assert 'name: Test 1' in steps[0]['stdout']
+        assert 'name: Test 2' in steps[1]['stdout']
+        assert 'boom' in steps[2]['stderr']
+
+        yaml_batch = '- check get 1\n- name: two checks\n  parallel:\n  - check get 2\n  - command: [check, get, "4"]\n'
+
+        result = runner.invoke(cli, ['-c', 'test.yaml', 'batch', '-'], input=yaml_batch, catch_exceptions=False)
+
+        assert result.exit_code == 0
+        assert '[3] check get 4 ... OK' in result.output
+        assert 'name: Test 4' in result.output
+
+        result = runner.invoke(cli, ['-c', 'test.yaml', 'batch', '-'], input='daemon stop\n', catch_exceptions=False)
+
+        assert result.exit_code == 2
+        assert 'can not run in batch' in result.output
+
+    assert not session_cache.enabled
+
+
+def test_shell(monkeypatch):
+    request = MagicMock()
+    request.return_value.ok = True
+    request.return_value.text = '{}'
+    request.return_value.json.return_value = {'workers': [{'name': 'foo', 'check_invocations': 12377}]}
+
+    monkeypatch.setattr('requests.Session.request', request)
+
+    runner = CliRunner()
+
+    with runner.isolated_filesystem():
+        with open('test.yaml', 'w') as fd:
+            yaml.dump({'url': 'https://zmon', 'token': 123}, fd)
+
+        commands = 'status\nzmon status\n\nclear-cache\nstatus -o json\nshell\nstatus "\nexit\nstatus\n'
+        result = runner.invoke(cli, ['-c', 'test.yaml', 'shell'], input=commands, catch_exceptions=False)
+
+        assert result.exit_code == 0
+        assert result.output.count('12377') == 3
+        assert 'Already in ZMON shell' in result.output
+        assert 'Invalid command' in result.output
+
+    # cached until clear-cache, command after exit is never run
+    assert request.call_count == 2
+    assert not session_cache.enabled
+
+
+def test_profile_options(monkeypatch, tmpdir):
+    get = MagicMock()
+    get.return_value = {'workers': [{'name': 'foo', 'check_invocations': 12377, 'last_execution_time': 1}]}
+    monkeypatch.setattr('zmon_cli.client.Zmon.status', get)
+
+    runner = CliRunner()
+
+    with runner.isolated_filesystem():
+        with open('test.yaml', 'w') as fd:
+            yaml.dump({'url': 'foo', 'token': 123}, fd)
+
+        result = runner.invoke(cli, ['-c', 'test.yaml', '--profile', 'zmon.prof', '--trace-malloc', '--profile-limit',
+                                     '3', 'status'], catch_exceptions=False)
+
+        assert '12377' in result.output
+        assert 'CPU profile written to zmon.prof' in result.output
+        assert 'Memory: peak' in result.output
+        assert os.path.exists('zmon.prof')
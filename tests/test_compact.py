@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from zmon_cli.client import Zmon
+from zmon_cli.compact import CompactEntities, CompactEntity
+from zmon_cli.entity_index import EntityIndex
+from zmon_cli.standin import Standin, generate_dataset
+
+
+ENTITIES = [
+    {'id': 'a', 'type': 'host', 'team': 't1', 'data': {'ports': [80, 443]}},
+    {'id': 'b', 'type': 'host', 'team': 't1', 'data': {'ports': []}},
+    {'id': 'c', 'type': 'db', 'team': 't2', 'shards': 3, 'active': True, 'owner': None},
+    {'id': 'd', 'type': 'host', 'team': 't2', 'data': {}, 'labels': ['x']},
+]
+
+
+def test_compact_entities():
+    entities = CompactEntities(iter(ENTITIES))
+
+    assert len(entities) == 4
+    assert entities.layouts == 3
+    assert list(entities) == ENTITIES
+    assert entities.to_list() == ENTITIES
+    assert json.dumps(entities.to_list()) == json.dumps(ENTITIES)
+
+    entity = entities[0]
+    assert isinstance(entity, CompactEntity)
+    assert entity['data'] == {'ports': [80, 443]}
+    assert entity.get('labels') is None
+    assert 'team' in entity and 'labels' not in entity
+    assert list(entity.items())[:2] == [('id', 'a'), ('type', 'host')]
+    assert dict(entity) == ENTITIES[0]
+    assert repr(entity) == repr(ENTITIES[0])
+
+    # values are decoded on access, modifying them does not change the entity
+    entity['data']['ports'].append(8080)
+    assert entities[0]['data'] == {'ports': [80, 443]}
+
+    with pytest.raises(TypeError):
+        entity['team'] = 't3'
+
+    assert entities[-1]['labels'] == ['x']
+    assert [e['id'] for e in entities[1:3]] == ['b', 'c']
+    assert entities[2]['owner'] is None and entities[2]['active'] is True
+
+    with pytest.raises(IndexError):
+        entities[4]
+
+    # shared keys and repeated strings, decoded separately
+    decoded = CompactEntities(json.loads(json.dumps(e)) for e in ENTITIES)
+    assert decoded[0]._layout is decoded[1]._layout
+    assert decoded[0]['team'] is decoded[1]['team']
+
+    assert [e['id'] for e in EntityIndex(entities).resolve(EntityIndex(entities).match({'type': 'host'}))] == \
+        ['a', 'b', 'd']
+
+
+def test_compact_entities_pool_limit():
+    entities = CompactEntities(({'id': 'entity-{}'.format(i), 'type': 'host'} for i in range(100)),
+                               max_pooled_values=10)
+
+    assert [e['id'] for e in entities[98:]] == ['entity-98', 'entity-99']
+    assert len({id(e['type']) for e in entities}) == 1
+
+
+def test_get_entities_compact(fx_standin_server):
+    server = fx_standin_server(Standin(generate_dataset(entities=100, seed=5)))
+
+    zmon = Zmon(server.url, token='123')
+
+    entities = zmon.get_entities(compact=True)
+    assert isinstance(entities, CompactEntities)
+    assert entities.to_list() == zmon.get_entities()
+
+    hosts = zmon.get_entities(query={'type': 'host'}, compact=True)
+    assert hosts and all(e['type'] == 'host' for e in hosts)
@@ -0,0 +1,75 @@
+import pytest
+
+from zmon_cli.cmds import cli
+from zmon_cli.cmds.command import CONTEXT_SETTINGS
+from zmon_cli.completion import build_command_index, complete, lookup_ids, main, write_index
+
+
+@pytest.fixture
+def index_dir(tmpdir):
+    path = str(tmpdir.join('completion'))
+
+    write_index(path, commands=build_command_index(cli, CONTEXT_SETTINGS['help_option_names']), ids={
+        'checks': [(1, 'Check one'), (12, 'Check twelve'), (2, 'Check two')],
+        'entities': [('host-[a:b]', 'host'), ('host-b', 'host'), ('app-1', 'app')],
+    })
+
+    return path
+
+
+@pytest.mark.parametrize('words,expected', [
+    (['zmon', ''], None),
+    (['zmon', 'check-'], ['check-definitions']),
+    (['zmon', 'check', 'g'], ['get']),
+    (['zmon', 'check-definitions', 'get', '1'], ['1', '12']),
+    (['zmon', '-v', 'check-definitions', 'get', ''], ['1', '12', '2']),
+    (['zmon', 'check-definitions', 'get', '-'], ['--help', '--output', '--pretty', '-h', '-o']),
+    (['zmon', 'check-definitions', 'get', '-o', 'j'], ['json']),
+    (['zmon', 'check-definitions', 'get', '-o', 'json', '2'], ['2']),
+    (['zmon', 'entities', 'get', 'host-'], ['host-[a:b]', 'host-b']),
+    (['zmon', 'downtimes', 'create', 'app-1', 'h'], ['host-[a:b]', 'host-b']),
+    (['zmon', 'downtimes', 'create', '-d', '10', 'a'], ['app-1']),
+    (['zmon', 'alert-definitions', 'get', ''], []),
+    (['zmon', 'grafana', 'get', ''], []),
+    (['zmon', 'unknown', 'get', ''], []),
+])
+def test_complete(index_dir, words, expected):
+    candidates = complete(words, len(words) - 1, index_dir=index_dir)
+
+    if expected is None:
+        assert 'check-definitions' in candidates
+        assert 'entities' in candidates
+    else:
+        assert candidates == expected
+
+
+def test_complete_no_index(tmpdir):
+    assert complete(['zmon', ''], 1, index_dir=str(tmpdir)) == []
+
+
+def test_lookup_ids(tmpdir):
+    write_index(str(tmpdir), ids={'many': [('id-{:05d}'.format(i), 'name {}'.format(i)) for i in range(10000)]})
+    path = str(tmpdir.join('many.ids'))
+
+    assert lookup_ids(path, 'id-0999') == [('id-0999{}'.format(i), 'name 999{}'.format(i)) for i in range(10)]
+    assert lookup_ids(path, 'id-09999') == [('id-09999', 'name 9999')]
+    assert lookup_ids(path, 'id-1') == []
+    assert len(lookup_ids(path, '', limit=5)) == 5
+    assert lookup_ids(str(tmpdir.join('missing.ids')), '') == []
+
+
+def test_main(index_dir, monkeypatch, capsys):
+    monkeypatch.setenv('ZMON_COMPLETION_DIR', index_dir)
+
+    assert main(['--describe', '3', 'zmon', 'check', 'get', '1']) == 0
+    assert capsys.readouterr().out.splitlines() == ['1:Check one', '12:Check twelve']
+
+    assert main([]) == 2
+
+
+def test_complete_preloaded_commands(tmpdir):
+    commands = build_command_index(cli, CONTEXT_SETTINGS['help_option_names'])
+
+    # no index on disk, subcommands are still completed
+    assert complete(['zmon', 'sh'], 1, index_dir=str(tmpdir), commands=commands) == ['shell']
+    assert complete(['zmon', 'check', 'get', ''], 3, index_dir=str(tmpdir), commands=commands) == []
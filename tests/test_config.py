@@ -0,0 +1,54 @@
+import json
+import logging
+import sys
+
+import zmon_cli.config
+
+from zmon_cli.config import JSONLogFormatter, configure_logging
+
+
+def test_json_log_formatter():
+    record = logging.makeLogRecord({
+        'name': 'zmon_cli.client', 'levelname': 'DEBUG', 'msg': 'GET %s %s', 'args': ('/status', 200),
+        'duration_ms': 12.5,
+    })
+
+    data = json.loads(JSONLogFormatter().format(record))
+
+    assert data['message'] == 'GET /status 200'
+    assert data['logger'] == 'zmon_cli.client'
+    assert data['duration_ms'] == 12.5
+    assert 'args' not in data
+
+    try:
+        raise ValueError('failed')
+    except ValueError:
+        record = logging.makeLogRecord({'msg': 'error', 'exc_info': sys.exc_info()})
+
+    assert 'ValueError: failed' in json.loads(JSONLogFormatter().format(record))['exception']
+
+
+def test_configure_logging_exception(monkeypatch, tmpdir):
+    log_file = str(tmpdir.join('zmon.log'))
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+
+    monkeypatch.setattr('zmon_cli.config._log_listener', None)
+    monkeypatch.setattr('atexit.register', lambda func: None)
+
+    configure_logging(logging.INFO, log_format='json', log_file=log_file)
+
+    try:
+        raise ValueError('failed')
+    except ValueError:
+        logging.getLogger('zmon_cli.test').exception('Request %s failed', 1)
+
+    zmon_cli.config._log_listener.stop()
+    root.handlers[:] = handlers
+    root.setLevel(level)
+
+    with open(log_file) as fd:
+        data = json.loads(fd.read())
+
+    assert data['message'] == 'Request 1 failed'
+    assert 'ValueError: failed' in data['exception']
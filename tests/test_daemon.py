@@ -0,0 +1,94 @@
+import threading
+
+import click
+import pytest
+
+from zmon_cli import daemon
+
+
+@click.group()
+def cli():
+    pass
+
+
+@cli.command()
+@click.argument('name')
+def hello(name):
+    click.echo('Hello {}'.format(name))
+    click.echo('warning', err=True)
+
+
+@cli.command()
+def fail():
+    raise click.ClickException('failed')
+
+
+@pytest.fixture
+def socket_path(tmpdir, monkeypatch):
+    path = str(tmpdir.join('daemon.sock'))
+    monkeypatch.setenv('ZMON_DAEMON_SOCKET', path)
+
+    server = daemon.Daemon(path, idle_timeout=10)
+    thread = threading.Thread(target=server.run, args=(cli,))
+    thread.start()
+
+    for _ in range(100):
+        if daemon.should_forward(['hello']):
+            break
+        thread.join(0.01)
+
+    yield path
+
+    list(daemon.request({'command': 'stop'}))
+    thread.join()
+
+
+def test_forward(socket_path, capsys):
+    assert daemon.forward(['hello', 'zmon']) == 0
+
+    out, err = capsys.readouterr()
+    assert out == 'Hello zmon\n'
+    assert err == 'warning\n'
+
+    assert daemon.forward(['fail']) == 1
+    assert 'failed' in capsys.readouterr().err
+
+    assert daemon.forward(['unknown']) == 2
+
+    status = next(daemon.request({'command': 'status'}))['status']
+    assert status['served'] == 3
+
+
+def test_forward_not_running(tmpdir, monkeypatch):
+    path = str(tmpdir.join('daemon.sock'))
+    monkeypatch.setenv('ZMON_DAEMON_SOCKET', path)
+
+    assert daemon.should_forward(['hello']) is False
+
+    # stale socket file
+    tmpdir.join('daemon.sock').write('')
+    assert daemon.should_forward(['hello']) is True
+    assert daemon.forward(['hello']) is None
+
+
+def test_should_forward_local_commands(monkeypatch, tmpdir):
+    tmpdir.join('daemon.sock').write('')
+    monkeypatch.setenv('ZMON_DAEMON_SOCKET', str(tmpdir.join('daemon.sock')))
+
+    assert daemon.should_forward(['configure']) is False
+    assert daemon.should_forward(['-c', 'x.yaml', 'check', 'init', 'x.yaml']) is False
+    assert daemon.should_forward(['--trace', 'shell', 'dashboard', 'i', 'x.yaml']) is False
+    assert daemon.should_forward(['entities', 'push', '-']) is False
+
+    assert daemon.should_forward(['search', 'init']) is True
+    assert daemon.should_forward(['-c', 'shell', 'dashboard', 'get', '1']) is True
+    assert daemon.should_forward(['check', 'get', 'init']) is True
+
+    assert daemon.should_forward(['check', 'orphans', '--delete']) is False
+    assert daemon.should_forward(['check', 'orphans', '--delete', '--yes']) is True
+    assert daemon.should_forward(['check', 'orphans', '--delete', '--dry-run']) is True
+    assert daemon.should_forward(['entities', 'stale', '--older-than', '7d', '--purge']) is False
+    assert daemon.should_forward(['entities', 'stale', '--older-than', '7d', '--purge', '-y']) is True
+
+    monkeypatch.setenv('ZMON_NO_DAEMON', '1')
+    assert daemon.should_forward(['entities']) is False
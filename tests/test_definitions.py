@@ -0,0 +1,70 @@
+import pytest
+import yaml
+
+from click.testing import CliRunner
+
+from zmon_cli.cmds.command import cli
+from zmon_cli.definitions import find_orphans, join_alerts
+from zmon_cli.standin import Standin, generate_dataset
+
+
+CHECKS = [{'id': 3, 'name': 'c'}, {'id': 1, 'name': 'a'}, {'id': 2, 'name': 'b'}]
+
+ALERTS = [
+    {'id': 12, 'check_definition_id': 1},
+    {'id': 10, 'check_definition_id': 1},
+    {'id': 11, 'check_definition_id': 3},
+    {'id': 13, 'check_definition_id': 4},
+]
+
+
+@pytest.fixture
+def fx_standin():
+    return Standin(generate_dataset(entities=50, checks=40, alerts=30, seed=2))
+
+
+def test_join_alerts():
+    joined, dangling = join_alerts(CHECKS, ALERTS)
+
+    assert [(c['id'], [a['id'] for a in alerts]) for c, alerts in joined] == [(1, [10, 12]), (2, []), (3, [11])]
+    assert [a['id'] for a in dangling] == [13]
+
+    assert [c['id'] for c in find_orphans(CHECKS, ALERTS)] == [2]
+    assert find_orphans([], ALERTS) == []
+
+
+def test_cli_orphans(fx_standin, fx_standin_server, tmpdir):
+    server = fx_standin_server(fx_standin)
+
+    config = tmpdir.join('config.yaml')
+    config.write(yaml.dump({'url': server.url, 'token': '123'}))
+
+    checks = fx_standin.dataset.checks
+    orphans = sorted(set(checks) - {a['check_definition_id'] for a in fx_standin.dataset.alerts.values()})
+    assert orphans
+
+    runner = CliRunner()
+
+    result = runner.invoke(cli, ['-c', str(config), 'check', 'alerts', '-o', 'json'], catch_exceptions=False)
+    assert 'dangling_alerts' in result.output
+
+    result = runner.invoke(cli, ['-c', str(config), 'check', 'orphans', '-o', 'json'], catch_exceptions=False)
+    assert [c['id'] for c in yaml.safe_load(result.output)] == orphans
+
+    result = runner.invoke(cli, ['-c', str(config), 'check', 'orphans', '--delete', '--dry-run'],
+                           catch_exceptions=False)
+    assert '{} orphan check definitions would be deleted'.format(len(orphans)) in result.output
+    assert len(checks) == 40
+
+    # not confirmed
+    result = runner.invoke(cli, ['-c', str(config), 'check', 'orphans', '--delete'], input='n\n')
+    assert result.exit_code == 1
+    assert len(checks) == 40
+
+    result = runner.invoke(cli, ['-c', str(config), 'check', 'orphans', '--delete', '--yes', '--concurrency', '3'],
+                           catch_exceptions=False)
+    assert 'Deleted {0} of {0} orphan check definitions'.format(len(orphans)) in result.output
+    assert len(checks) == 40 - len(orphans)
+
+    result = runner.invoke(cli, ['-c', str(config), 'check', 'orphans', '--delete'], catch_exceptions=False)
+    assert 'No orphan check definitions' in result.output
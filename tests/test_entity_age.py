@@ -0,0 +1,121 @@
+import time
+
+import pytest
+import yaml
+
+from click.testing import CliRunner
+
+from zmon_cli.client import Zmon, iter_json_array
+from zmon_cli.cmds.command import cli
+from zmon_cli.entity_age import DAY, find_stale, parse_last_modified
+from zmon_cli.standin import Standin, generate_dataset
+
+
+@pytest.fixture
+def fx_standin():
+    return Standin(generate_dataset(entities=200, seed=3))
+
+
+def test_iter_json_array():
+    doc = '[{"id": "ä", "n": [1, 2]} , 123,"x,]",\n{}, 1.5, -2e-3, true]'.encode('utf-8')
+    expected = [{'id': 'ä', 'n': [1, 2]}, 123, 'x,]', {}, 1.5, -2e-3, True]
+
+    for size in range(1, len(doc) + 1):
+        chunks = [doc[i:i + size] for i in range(0, len(doc), size)]
+        assert list(iter_json_array(chunks)) == expected
+
+    assert list(iter_json_array([b' [ ] '])) == []
+
+    for invalid in (b'', b'[{"id": 1}', b'{"id": 1}', b'[{"id": }]', b'[1 2]', b'[1,,2]', b'[,1]', b'[1,]', b'[1]x',
+                    b'[1.]'):
+        with pytest.raises(ValueError):
+            list(iter_json_array([invalid]))
+        with pytest.raises(ValueError):
+            list(iter_json_array([invalid[i:i + 1] for i in range(len(invalid))]))
+
+
+def test_parse_last_modified():
+    assert parse_last_modified('2017-05-12 10:45:11.592') == pytest.approx(1494585911.592)
+    assert parse_last_modified('2017-05-12T10:45:11') == 1494585911
+
+    for invalid in (None, '', 12, '2017-05-12'):
+        assert parse_last_modified(invalid) is None
+
+
+def test_find_stale():
+    entities = [
+        {'id': 'a', 'type': 'host', 'last_modified': '1970-01-01 00:00:00.000'},
+        {'id': 'b', 'type': 'host', 'last_modified': '1970-01-09 12:00:00.000'},
+        {'id': 'c', 'type': 'host', 'last_modified': '1970-01-10 12:00:00.000'},
+        {'id': 'd', 'type': 'instance', 'last_modified': '1970-01-02 00:00:00.000'},
+        {'id': 'e', 'type': 'instance'},
+        {'id': 'f', 'type': 'GLOBAL'},
+    ]
+
+    result = find_stale(iter(entities), 7 * DAY, types=['host', 'instance'], now=10 * DAY)
+
+    assert result['entities'] == 5
+    assert result['stale'] == 2
+    assert [e['id'] for e in result['stale_entities']] == ['a', 'd']
+    assert result['stale_entities'][0]['age'] == 10 * DAY
+
+    host, instance = result['types']
+    assert (host['type'], host['entities'], host['stale'], host['unknown']) == ('host', 3, 1, 0)
+    assert list(host['histogram'].values()) == [1, 1, 1, 0, 0, 0]
+    assert (instance['type'], instance['entities'], instance['stale'], instance['unknown']) == ('instance', 2, 1, 1)
+
+
+def test_iter_entities(fx_standin, fx_standin_server):
+    zmon = Zmon(fx_standin_server(fx_standin).url, token='123')
+
+    entities = list(zmon.iter_entities(chunk_size=100))
+    assert entities == zmon.get_entities()
+    assert len(entities) == 200
+
+    hosts = list(zmon.iter_entities(query={'type': 'host'}))
+    assert hosts and all(e['type'] == 'host' for e in hosts)
+
+
+def test_cli_stale(fx_standin, fx_standin_server, tmpdir):
+    server = fx_standin_server(fx_standin)
+
+    config = tmpdir.join('config.yaml')
+    config.write(yaml.dump({'url': server.url, 'token': '123'}))
+
+    now = time.time()
+    stale = sorted(e['id'] for e in fx_standin.dataset.entities.values()
+                   if e['type'] in ('host', 'instance') and now - parse_last_modified(e['last_modified']) >= 10 * DAY)
+    assert stale
+
+    runner = CliRunner()
+
+    result = runner.invoke(cli, ['-c', str(config), 'entities', 'stale', '--older-than', '10d', '-t', 'host',
+                                 '-t', 'instance', '-o', 'json'], catch_exceptions=False)
+    data = yaml.safe_load(result.output)
+    assert sorted(e['id'] for e in data['stale_entities']) == stale
+    assert [t['type'] for t in data['types']] == ['host', 'instance']
+
+    result = runner.invoke(cli, ['-c', str(config), 'entities', 'stale', '--older-than', '10d'],
+                           catch_exceptions=False)
+    assert 'Entities by age of last modification' in result.output
+
+    for invalid in ('0', '-1d'):
+        result = runner.invoke(cli, ['-c', str(config), 'entities', 'stale', '--older-than', invalid, '--purge', '-y'])
+        assert result.exit_code == 2
+        assert 'Duration must be positive' in result.output
+    assert len(fx_standin.dataset.entities) == 200
+
+    result = runner.invoke(cli, ['-c', str(config), 'entities', 'stale', '--older-than', '10d', '-t', 'host',
+                                 '-t', 'instance', '--purge', '--dry-run'], catch_exceptions=False)
+    assert '{} stale entities would be deleted'.format(len(stale)) in result.output
+    assert len(fx_standin.dataset.entities) == 200
+
+    result = runner.invoke(cli, ['-c', str(config), 'entities', 'stale', '--older-than', '10d', '-t', 'host',
+                                 '-t', 'instance', '--purge', '--yes', '--rate', '1000'], catch_exceptions=False)
+    assert 'Deleted {0} of {0} stale entities'.format(len(stale)) in result.output
+    assert len(fx_standin.dataset.entities) == 200 - len(stale)
+    assert not set(stale) & set(fx_standin.dataset.entities)
+
+    result = runner.invoke(cli, ['-c', str(config), 'entities', 'stale', '--older-than', '10d', '-t', 'host',
+                                 '-t', 'instance', '--purge'], catch_exceptions=False)
+    assert 'No stale entities' in result.output
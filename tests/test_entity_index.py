@@ -0,0 +1,133 @@
+import json
+
+from unittest.mock import MagicMock
+
+import yaml
+
+from click.testing import CliRunner
+
+from zmon_cli.cmds.command import cli
+from zmon_cli.entity_index import EntityIndex, find_monitors, match_filter, match_filters
+from zmon_cli.standin import generate_dataset
+
+
+ENTITIES = [
+    {'id': 'app-1', 'type': 'instance', 'application_id': 'app', 'team': 'a', 'tags': ['live', 'eu'],
+     'labels': {'version': 'v1', 'env': 'live'}},
+    {'id': 'app-2', 'type': 'instance', 'application_id': 'app', 'team': 'a', 'tags': ['test'],
+     'labels': {'version': 'v2', 'env': 'test'}},
+    {'id': 'db-1', 'type': 'database', 'application_id': 'app', 'team': 'b', 'port': 5432},
+    {'id': 'GLOBAL', 'type': 'GLOBAL'},
+]
+
+CHECKS = [
+    {'id': 1, 'name': 'Instances', 'entities': [{'type': 'instance'}], 'interval': 60, 'owning_team': 'a'},
+    {'id': 2, 'name': 'App', 'entities': [{'application_id': 'app'}], 'entities_exclude': [{'tags': 'test'}],
+     'interval': 60, 'owning_team': 'a'},
+    {'id': 3, 'name': 'Global', 'entities': [{'type': 'GLOBAL'}], 'interval': 60, 'owning_team': 'b'},
+    {'id': 4, 'name': 'None', 'entities': [], 'interval': 60, 'owning_team': 'b'},
+]
+
+ALERTS = [
+    {'id': 10, 'name': 'All', 'check_definition_id': 1, 'team': 'a', 'entities': []},
+    {'id': 11, 'name': 'Live', 'check_definition_id': 1, 'team': 'a', 'entities': [{'labels': {'env': 'live'}}]},
+    {'id': 12, 'name': 'Not v1', 'check_definition_id': 2, 'team': 'a',
+     'entities_exclude': [{'labels': {'version': 'v1'}}]},
+    {'id': 13, 'name': 'Global', 'check_definition_id': 3, 'team': 'b'},
+]
+
+
+def ids(index, positions):
+    return [e['id'] for e in index.resolve(positions)]
+
+
+def test_match_filter():
+    assert match_filter(ENTITIES[0], {})
+    assert match_filter(ENTITIES[0], {'type': 'instance', 'tags': 'eu'})
+    assert match_filter(ENTITIES[0], {'labels': {'env': 'live'}})
+    assert not match_filter(ENTITIES[0], {'labels': {'env': 'test'}})
+    assert not match_filter(ENTITIES[0], {'port': 5432})
+    assert match_filters(ENTITIES[2], [{'type': 'instance'}, {'port': 5432}])
+    assert not match_filters(ENTITIES[2], [])
+
+
+def test_check_coverage():
+    index = EntityIndex(ENTITIES)
+
+    assert ids(index, index.check_coverage(CHECKS[0])) == ['app-1', 'app-2']
+    assert ids(index, index.check_coverage(CHECKS[1])) == ['app-1', 'db-1']
+    assert ids(index, index.check_coverage(CHECKS[2])) == ['GLOBAL']
+    assert ids(index, index.check_coverage(CHECKS[3])) == []
+
+    assert ids(index, index.match({'labels': {'version': 'v2'}, 'type': 'instance'})) == ['app-2']
+    assert ids(index, index.match({'type': 'unknown'})) == []
+
+
+def test_alert_coverage():
+    index = EntityIndex(ENTITIES)
+    checks = {c['id']: c for c in CHECKS}
+
+    assert [ids(index, index.alert_coverage(a, checks[a['check_definition_id']])) for a in ALERTS] == [
+        ['app-1', 'app-2'], ['app-1'], ['db-1'], ['GLOBAL']]
+
+
+def test_index_matches_scan():
+    dataset = generate_dataset(entities=2000, checks=100, alerts=150, seed=5)
+    entities = list(dataset.entities.values())
+    index = EntityIndex(entities)
+
+    for check in dataset.checks.values():
+        expected = [e['id'] for e in entities if match_filters(e, check['entities'], check.get('entities_exclude'))]
+        assert ids(index, index.check_coverage(check)) == sorted(expected)
+
+    for alert in dataset.alerts.values():
+        check = dataset.checks[alert['check_definition_id']]
+        coverage = set(ids(index, index.alert_coverage(alert, check)))
+
+        for entity in entities:
+            checks, alerts = find_monitors(entity, [check], [alert])
+            assert (entity['id'] in coverage) == bool(alerts)
+
+    summary = index.summary(index.check_coverage(next(iter(dataset.checks.values()))))
+    assert summary['count'] == len(summary['entities']) == sum(summary['types'].values())
+
+
+def test_find_monitors():
+    checks, alerts = find_monitors(ENTITIES[0], CHECKS, ALERTS)
+
+    assert [c['id'] for c in checks] == [1, 2]
+    assert [a['id'] for a in alerts] == [10, 11]
+
+
+def test_cli_coverage_monitors(monkeypatch):
+    monkeypatch.setattr('zmon_cli.client.Zmon.get_entities', MagicMock(return_value=ENTITIES))
+    monkeypatch.setattr('zmon_cli.client.Zmon.get_entity', MagicMock(return_value=ENTITIES[1]))
+    monkeypatch.setattr('zmon_cli.client.Zmon.get_check_definition', MagicMock(side_effect=lambda i: CHECKS[i - 1]))
+    monkeypatch.setattr('zmon_cli.client.Zmon.get_check_definitions', MagicMock(return_value=CHECKS))
+    monkeypatch.setattr('zmon_cli.client.Zmon.get_alert_definition', MagicMock(return_value=ALERTS[1]))
+    monkeypatch.setattr('zmon_cli.client.Zmon.get_alert_definitions', MagicMock(return_value=ALERTS))
+
+    runner = CliRunner()
+
+    with runner.isolated_filesystem():
+        with open('test.yaml', 'w') as fd:
+            yaml.dump({'url': 'foo', 'token': '123'}, fd)
+
+        result = runner.invoke(cli, ['-c', 'test.yaml', 'check', 'coverage', '1'], catch_exceptions=False)
+        assert 'Check definition 1 "Instances" covers 2 entities: 2 instance' in result.output
+        assert 'app-2' in result.output
+
+        result = runner.invoke(cli, ['-c', 'test.yaml', 'alert', 'coverage', '11', '-o', 'json'],
+                               catch_exceptions=False)
+        data = json.loads(result.output)
+        assert data['count'] == 1 and data['check_definition_id'] == 1
+        assert data['entities'] == [{'id': 'app-1', 'type': 'instance', 'team': 'a'}]
+
+        result = runner.invoke(cli, ['-c', 'test.yaml', 'entities', 'monitors', 'app-2', '-o', 'json'],
+                               catch_exceptions=False)
+        data = json.loads(result.output)
+        assert [c['id'] for c in data['checks']] == [1]
+        assert [a['id'] for a in data['alerts']] == [10]
+
+        result = runner.invoke(cli, ['-c', 'test.yaml', 'entities', 'monitors', 'app-2'], catch_exceptions=False)
+        assert 'Alert definitions:' in result.output
@@ -0,0 +1,91 @@
+import yaml
+
+from click.testing import CliRunner
+
+from zmon_cli.cmds.command import cli
+from zmon_cli.entity_age import DAY
+from zmon_cli.entity_stats import DistinctCounter, HyperLogLog, entity_stats, value_key
+from zmon_cli.standin import Standin, generate_dataset
+
+
+def test_value_key():
+    keys = [value_key(v) for v in ('1', 1, 1.0, True, None, 'null', [1], {'a': 1, 'b': 2})]
+    assert len(set(keys)) == len(keys)
+    assert value_key({'a': 1, 'b': 2}) == value_key({'b': 2, 'a': 1})
+
+
+def test_hyperloglog():
+    for n in (0, 1, 100, 20000, 200000):
+        hll = HyperLogLog(precision=12)
+        hll.update('value-{}'.format(i) for i in range(n))
+        hll.update('value-{}'.format(i) for i in range(n // 2))
+
+        # standard error is about 1.6% at this precision
+        assert abs(hll.count() - n) <= max(n * 0.06, 1)
+
+    assert len(HyperLogLog(precision=12).registers) == 4096
+
+
+def test_distinct_counter():
+    counter = DistinctCounter(limit=100, precision=12)
+    counter.update(str(i) for i in range(50))
+    counter.add('1')
+    assert counter.exact and counter.count() == 50
+
+    counter.update(str(i) for i in range(5000))
+    assert not counter.exact
+    assert abs(counter.count() - 5000) < 300
+
+
+def test_entity_stats():
+    entities = [
+        {'id': 'a', 'type': 'host', 'team': 't1', 'last_modified': '1970-01-10 23:30:00.000'},
+        {'id': 'b', 'type': 'host', 'team': 't1', 'last_modified': '1970-01-10 00:00:00.000'},
+        {'id': 'c', 'type': 'host', 'team': 't2', 'last_modified': '1970-01-01 00:00:00.000', 'tags': ['x']},
+        {'id': 'd', 'type': 'db', 'team': 't1', 'tags': ['x']},
+        {'id': 'e', 'type': 'db'},
+    ]
+
+    stats = entity_stats(iter(entities), by=['type', 'team'], now=10 * DAY)
+
+    assert stats['entities'] == 5
+    assert [(list(g['group'].values()), g['entities'], list(g['modified'].values())) for g in stats['groups']] == [
+        (['host', 't1'], 2, [1, 1, 2]),
+        (['db', None], 1, [0, 0, 0]),
+        (['db', 't1'], 1, [0, 0, 0]),
+        (['host', 't2'], 1, [0, 0, 0]),
+    ]
+    assert stats['groups'][0]['share'] == 0.4
+    assert list(stats['modified'].values()) == [1, 1, 2]
+    assert [(k['key'], k['entities'], k['distinct'], k['exact']) for k in stats['keys']] == [
+        ('id', 5, 5, True), ('last_modified', 3, 3, True), ('tags', 2, 1, True), ('team', 4, 2, True),
+        ('type', 5, 2, True)]
+
+    stats = entity_stats(entities, by=['id'], max_groups=2)
+    assert [g['group']['id'] for g in stats['groups']] == ['a', 'b']
+    assert stats['other']['entities'] == 3
+
+
+def test_cli_stats(fx_standin_server, tmpdir):
+    standin = Standin(generate_dataset(entities=300, seed=4))
+    server = fx_standin_server(standin)
+
+    config = tmpdir.join('config.yaml')
+    config.write(yaml.dump({'url': server.url, 'token': '123'}))
+
+    entities = list(standin.dataset.entities.values())
+    teams = {e['team'] for e in entities if e['type'] == 'host'}
+
+    runner = CliRunner()
+
+    result = runner.invoke(cli, ['-c', str(config), 'entities', 'stats', '--by', 'type, team', '-o', 'json'],
+                           catch_exceptions=False)
+    stats = yaml.safe_load(result.output)
+    assert stats['by'] == ['type', 'team']
+    assert stats['entities'] == 300
+    assert sum(g['entities'] for g in stats['groups']) == 300
+
+    result = runner.invoke(cli, ['-c', str(config), 'entities', 'stats', '-b', 'team', '-t', 'host'],
+                           catch_exceptions=False)
+    assert 'Modified 1d' in result.output
+    assert all(team in result.output for team in teams)
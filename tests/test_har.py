@@ -0,0 +1,137 @@
+import json
+
+import pytest
+import requests
+import yaml
+
+from click.testing import CliRunner
+
+from zmon_cli.client import Zmon
+from zmon_cli.cmds.command import cli
+from zmon_cli.har import REDACTED, HarError, HarRecorder, ReplayAdapter, load_har
+from zmon_cli.standin import Standin, generate_dataset
+from zmon_cli.timings import TimingCollector
+
+
+@pytest.fixture
+def fx_standin_url(fx_standin_server):
+    return fx_standin_server(Standin(generate_dataset(entities=20, checks=3, alerts=3))).url
+
+
+def record(url, path):
+    collector = TimingCollector()
+    recorder = HarRecorder(collector=collector)
+    zmon = Zmon(url, token='secret', collector=recorder)
+
+    results = [zmon.get_entities(), zmon.get_check_definitions()]
+    zmon.add_entity({'id': 'e-1', 'type': 'local'})
+    results.append(zmon.get_entity('e-1'))
+
+    with pytest.raises(requests.HTTPError):
+        zmon.get_check_definition(1000)
+
+    zmon.session.close()
+    recorder.save(path)
+
+    assert len(collector.records) == len(recorder.records) == 5
+
+    return results
+
+
+def test_record(fx_standin_url, tmpdir):
+    path = str(tmpdir.join('zmon.har'))
+    record(fx_standin_url, path)
+
+    har = load_har(path)
+    entries = har['log']['entries']
+
+    assert har['log']['version'] == '1.2'
+    assert [e['request']['method'] for e in entries] == ['GET', 'GET', 'PUT', 'GET', 'GET']
+
+    headers = {h['name']: h['value'] for h in entries[0]['request']['headers']}
+    assert headers['Authorization'] == REDACTED
+    assert 'secret' not in json.dumps(har)
+
+    assert json.loads(entries[2]['request']['postData']['text']) == {'id': 'e-1', 'type': 'local'}
+    assert len(json.loads(entries[0]['response']['content']['text'])) == 20
+
+    timings = entries[0]['timings']
+    assert timings['connect'] >= 0 and timings['wait'] > 0
+    assert entries[0]['time'] >= timings['wait']
+    assert entries[1]['timings']['connect'] == -1  # keep-alive connection
+
+
+def test_replay(fx_standin_url, tmpdir, monkeypatch):
+    path = str(tmpdir.join('zmon.har'))
+    recorded = record(fx_standin_url, path)
+
+    collector = TimingCollector()
+    zmon = Zmon(fx_standin_url, token='123', transport=ReplayAdapter(load_har(path), latency='zero',
+                                                                     collector=collector))
+
+    assert zmon.get_entities() == recorded[0]
+    assert zmon.get_check_definitions() == recorded[1]
+    zmon.add_entity({'id': 'e-1', 'type': 'local'})
+    assert zmon.get_entity('e-1') == recorded[2]
+
+    # responses are repeated
+    assert zmon.get_entities() == recorded[0]
+
+    with pytest.raises(requests.HTTPError):
+        zmon.get_check_definition(1000)
+
+    with pytest.raises(HarError):
+        zmon.status()
+
+    assert [r['status'] for r in collector.records] == [200, 200, 200, 200, 200, 200, None]
+    assert collector.records[-1]['error'] == 'HarError'
+
+    slept = []
+    monkeypatch.setattr('time.sleep', slept.append)
+
+    zmon = Zmon(fx_standin_url, token='123', transport=ReplayAdapter(load_har(path)))
+    zmon.get_entities()
+
+    assert slept == [load_har(path)['log']['entries'][0]['time'] / 1000]
+
+
+def test_replay_error():
+    har = {'log': {'entries': [{
+        'request': {'method': 'GET', 'url': 'https://zmon/api/v1/status/'},
+        'response': {'status': 0, 'statusText': '', 'headers': [], 'content': {}, '_error': 'ConnectTimeout'},
+        'time': 0,
+    }]}}
+
+    zmon = Zmon('https://zmon', token='123', transport=ReplayAdapter(har))
+
+    with pytest.raises(requests.ConnectionError):
+        zmon.status()
+
+
+def test_load_har_invalid(tmpdir):
+    path = tmpdir.join('invalid.har')
+    path.write('{"entries": []}')
+
+    with pytest.raises(HarError):
+        load_har(str(path))
+
+
+def test_cli_record_replay(fx_server):
+    runner = CliRunner()
+
+    with runner.isolated_filesystem():
+        with open('test.yaml', 'w') as fd:
+            yaml.dump({'url': fx_server, 'token': '123'}, fd)
+
+        result = runner.invoke(cli, ['-c', 'test.yaml', '--record', 'status.har', 'status', '-o', 'json'],
+                               catch_exceptions=False)
+        status = json.loads(result.output)
+
+        assert len(load_har('status.har')['log']['entries']) == 1
+
+        result = runner.invoke(cli, ['-c', 'test.yaml', '--replay', 'status.har', '--replay-latency', 'zero',
+                                     'status', '-o', 'json'], catch_exceptions=False)
+        assert json.loads(result.output) == status
+
+        result = runner.invoke(cli, ['-c', 'test.yaml', '--record', 'a.har', '--replay', 'status.har', 'status'])
+        assert result.exit_code == 2
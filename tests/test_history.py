@@ -0,0 +1,71 @@
+import pytest
+
+from zmon_cli.history import HistoryStore, HistoryError, RingBuffer, aggregate
+
+
+def test_ring_buffer_wraps(tmpdir):
+    ring = RingBuffer(str(tmpdir.join('1.ring')), capacity=3)
+
+    for ts in range(1, 6):
+        assert ring.append(ts, ts * 10) is True
+
+    # stale samples are ignored
+    assert ring.append(5, 100) is False
+
+    assert len(ring) == 3
+    assert ring.read() == ([3.0, 4.0, 5.0], [30.0, 40.0, 50.0])
+    assert ring.read(since=4) == ([4.0, 5.0], [40.0, 50.0])
+    assert ring.read(until=3.5) == ([3.0], [30.0])
+
+    # capacity is taken from existing file
+    assert RingBuffer(ring.path, capacity=100).capacity == 3
+
+
+def test_ring_buffer_invalid(tmpdir):
+    path = tmpdir.join('invalid.ring')
+    path.write(b'x' * 64, mode='wb')
+
+    with pytest.raises(HistoryError):
+        RingBuffer(str(path))
+
+
+def test_history_store_record(tmpdir):
+    store = HistoryStore(str(tmpdir.join('history')), capacity=10)
+
+    data = [
+        {'entity': 'e-1', 'results': [{'ts': 100, 'value': 1}]},
+        {'entity': 'e-2', 'results': [{'ts': 100, 'value': {'count': 7, 'name': 'x'}}]},
+        {'entity': 'e-3', 'results': [{'ts': 100, 'value': 'not-a-number'}]},
+        {'entity': 'e-4', 'results': []},
+    ]
+
+    assert store.record(1, data) == 1
+    assert store.record(1, data, field='count') == 1
+
+    data[0]['results'][0].update(ts=160, value=3)
+    assert store.record(1, data) == 1
+
+    assert store.alerts() == ['1']
+    assert store.entities(1) == ['e-1', 'e-2']
+
+    series = store.series(1)
+    assert series['e-1'] == ([100.0, 160.0], [1.0, 3.0])
+    assert series['e-2'] == ([100.0], [7.0])
+
+    assert list(store.series(1, entity_ids=['e-2'])) == ['e-2']
+    assert store.series(1, since=150) == {'e-1': ([160.0], [3.0]), 'e-2': ([], [])}
+
+
+@pytest.mark.parametrize('func,window,expected', [
+    ('avg', 60, [(0, 1.5), (60, 5.0)]),
+    ('count', 60, [(0, 2), (60, 1)]),
+    ('last', None, [(10, 5)]),
+    ('sum', None, [(10, 8)]),
+])
+def test_aggregate(func, window, expected):
+    assert aggregate([10, 50, 70], [1, 2, 5], window=window, func=func) == expected
+
+
+def test_aggregate_invalid():
+    with pytest.raises(HistoryError):
+        aggregate([1], [1], func='median')
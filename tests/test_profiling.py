@@ -0,0 +1,39 @@
+import io
+import pstats
+
+from zmon_cli.profiling import CPUProfile, MemoryTrace
+
+
+def work():
+    return [str(i) * 10 for i in range(20000)]
+
+
+def test_cpu_profile(tmpdir):
+    path = str(tmpdir.join('zmon.prof'))
+    stream = io.StringIO()
+
+    profile = CPUProfile(path, limit=5)
+    profile.start()
+    work()
+    profile.stop(stream)
+
+    out = stream.getvalue()
+    assert 'CPU profile written to {}'.format(path) in out
+    assert 'Time by module:' in out
+    assert 'test_profiling.py' in out
+
+    assert pstats.Stats(path).total_calls > 0
+
+
+def test_memory_trace():
+    stream = io.StringIO()
+
+    trace = MemoryTrace(limit=3)
+    trace.start()
+    data = work()
+    trace.stop(stream)
+
+    out = stream.getvalue()
+    assert 'Memory: peak' in out
+    assert 'test_profiling.py:8' in out
+    assert len(data) == 20000
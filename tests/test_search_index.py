@@ -0,0 +1,88 @@
+from unittest.mock import MagicMock
+
+from zmon_cli.search_index import SearchIndex, build_index
+
+
+CHECKS = [
+    {'id': 1, 'name': 'Kubernetes node health', 'owning_team': 'ZMON', 'description': 'Node status',
+     'command': "http('http://node/health', timeout=5).code()"},
+    {'id': 2, 'name': 'Disk usage', 'owning_team': 'Storage', 'description': None, 'command': 'disk()'},
+]
+
+ALERTS = [
+    {'id': 10, 'name': 'Node is unhealthy', 'team': 'ZMON', 'responsible_team': 'ZMON', 'condition': '!=200'},
+]
+
+DASHBOARDS = [
+    {'id': 5, 'name': 'ZMON overview', 'alert_teams': ['ZMON', 'Storage'], 'tags': ['kubernetes']},
+]
+
+
+def get_index():
+    client = MagicMock()
+    client.get_check_definitions.return_value = CHECKS
+    client.get_alert_definitions.return_value = ALERTS
+    client.get_dashboards.return_value = DASHBOARDS
+
+    return build_index(client)
+
+
+def test_search_index():
+    index = get_index()
+
+    assert len(index) == 4
+
+    result = index.search('node')
+    assert [c['id'] for c in result['checks']] == [1]
+    assert [a['id'] for a in result['alerts']] == [10]
+    assert result['dashboards'] == []
+    assert result['grafana_dashboards'] == []
+
+    # command text, description and tags are searchable
+    assert [c['id'] for c in index.search('timeout')['checks']] == [1]
+    assert [d['id'] for d in index.search('kubernetes')['dashboards']] == [5]
+
+    # all words have to match, short words match by prefix
+    assert index.search('node disk')['checks'] == []
+    assert [c['id'] for c in index.search('di us')['checks']] == [2]
+
+    assert index.search('nothing-like-this') == {'checks': [], 'alerts': [], 'dashboards': [], 'grafana_dashboards': []}
+
+
+def test_search_index_teams_limit():
+    index = get_index()
+
+    result = index.search('zmon', teams=['storage'])
+    assert [d['id'] for d in result['dashboards']] == [5]
+    assert result['checks'] == []
+
+    index.add('checks', [{'id': 3, 'name': 'Node 3', 'owning_team': 'ZMON'}])
+    assert len(index.search('node', limit=1)['checks']) == 1
+    assert len(index.search('node')['checks']) == 2
+
+
+def test_search_index_save_load(tmpdir):
+    path = str(tmpdir.join('index', 'search.pickle'))
+
+    assert SearchIndex.load(path) is None
+
+    index = get_index()
+    index.save(path)
+
+    loaded = SearchIndex.load(path)
+    assert loaded.search('disk') == index.search('disk')
+
+    with open(path, 'r+b') as fd:
+        data = fd.read()
+        fd.seek(0)
+        fd.truncate()
+        fd.write(data[:len(data) // 2])
+    assert SearchIndex.load(path) is None
+
+    tmpdir.join('index', 'search.pickle').write('no pickle')
+    assert SearchIndex.load(path) is None
+    index.save(path)
+
+    assert loaded.add('grafana_dashboards', [{'id': 'graf-1', 'title': 'Disk latency', 'team': ''}]) == 1
+    assert loaded.add('grafana_dashboards', [{'id': 'graf-1', 'title': 'Disk latency', 'team': ''}]) == 0
+    assert [g['id'] for g in loaded.search('disk')['grafana_dashboards']] == ['graf-1']
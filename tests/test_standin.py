@@ -0,0 +1,177 @@
+import json
+
+import pytest
+import requests
+
+from zmon_cli.client import Zmon
+from zmon_cli.cmds.entity import entity_last_modified
+from zmon_cli.standin import STANDIN_URL, Dataset, Standin, StandinAdapter, generate_dataset
+
+
+@pytest.fixture
+def fx_standin():
+    return Standin(generate_dataset(entities=200, checks=20, alerts=30, dashboards=4, teams=3, seed=1, now=1500000000))
+
+
+@pytest.fixture
+def fx_zmon(fx_standin):
+    zmon = Zmon(STANDIN_URL, token='123')
+    zmon.session.mount(STANDIN_URL, StandinAdapter(fx_standin))
+    return zmon
+
+
+def test_generate_dataset():
+    dataset = generate_dataset(entities=300, checks=30, alerts=40, teams=4, seed=3, now=1500000000)
+
+    assert dataset.to_dict() == generate_dataset(entities=300, checks=30, alerts=40, teams=4, seed=3,
+                                                 now=1500000000).to_dict()
+
+    assert len(dataset.entities) == 300
+    assert {e['type'] for e in dataset.entities.values()} == {'instance', 'kube_pod', 'host', 'database'}
+    assert all(Zmon.is_valid_entity_id(e) for e in dataset.entities)
+    assert {e['team'] for e in dataset.entities.values()} <= {g for g in dataset.groups}
+    assert all(0 < entity_last_modified(e) <= 1500000000 for e in dataset.entities.values())
+
+    # all alerts refer to existing checks, some checks have no alert
+    alerted = {a['check_definition_id'] for a in dataset.alerts.values()}
+    assert alerted < set(dataset.checks)
+
+    for check in dataset.checks.values():
+        Zmon.validate_check_command(check['command'])
+
+
+def test_dataset_save_load(tmpdir):
+    dataset = generate_dataset(entities=20, checks=3, alerts=3, dashboards=2)
+
+    path = str(tmpdir.join('dataset.json'))
+    with open(path, 'w') as fd:
+        dataset.save(fd)
+    with open(path) as fd:
+        loaded = Dataset.load(fd)
+
+    assert loaded.to_dict() == dataset.to_dict()
+
+
+def test_standin_entities(fx_zmon, fx_standin):
+    entities = fx_zmon.get_entities()
+    assert len(entities) == 200
+
+    instances = fx_zmon.get_entities(query={'type': 'instance'})
+    assert instances and all(e['type'] == 'instance' for e in instances)
+
+    entity = fx_zmon.get_entity(instances[0]['id'])
+    assert entity == instances[0]
+
+    fx_zmon.add_entity({'id': 'my-entity[1]', 'type': 'local', 'team': 'zmon'})
+    assert fx_zmon.get_entity('my-entity[1]')['team'] == 'zmon'
+    assert len(fx_zmon.get_entities()) == 201
+
+    assert fx_zmon.delete_entity('my-entity[1]') is True
+    assert fx_zmon.delete_entity('my-entity[1]') is False
+
+    with pytest.raises(requests.HTTPError):
+        fx_zmon.get_entity('my-entity[1]')
+
+
+def test_standin_checks_alerts(fx_zmon):
+    checks = fx_zmon.get_check_definitions()
+    assert len(checks) == 20
+
+    check = fx_zmon.get_check_definition(checks[0]['id'])
+    assert check['command'] == checks[0]['command']
+
+    with pytest.raises(requests.HTTPError):
+        fx_zmon.get_check_definition(1000)
+
+    new = fx_zmon.update_check_definition({'name': 'new', 'owning_team': 'zmon', 'command': 'True'})
+    assert new['id'] == 21 and new['status'] == 'ACTIVE'
+
+    alert = fx_zmon.create_alert_definition({'name': 'a', 'last_modified_by': 'x', 'check_definition_id': new['id']})
+    assert fx_zmon.get_alert_definition(alert['id'])['name'] == 'a'
+
+    alert['name'] = 'b'
+    assert fx_zmon.update_alert_definition(alert)['name'] == 'b'
+    assert len(fx_zmon.get_alert_definitions()) == 31
+
+    assert fx_zmon.delete_alert_definition(alert['id'])['name'] == 'b'
+    fx_zmon.delete_check_definition(new['id'])
+
+    with pytest.raises(requests.HTTPError):
+        fx_zmon.get_alert_definition(alert['id'])
+
+
+def test_standin_alert_data(fx_zmon, fx_standin):
+    for alert in fx_zmon.get_alert_definitions():
+        data = fx_zmon.get_alert_data(alert['id'])
+        if data:
+            break
+
+    assert data
+    assert all(d['entity'] in fx_standin.dataset.entities for d in data)
+    assert all(isinstance(d['results'][0]['value'], int) for d in data)
+
+
+def test_standin_misc(fx_zmon):
+    assert fx_zmon.status()['check_invocations'] > 0
+
+    dashboards = fx_zmon.get_dashboards()
+    assert fx_zmon.get_dashboard(dashboards[0]['id'])['name'] == dashboards[0]['name']
+    assert fx_zmon.update_dashboard({'name': 'new'}) == 5
+
+    found = fx_zmon.search('alert', limit=3)
+    assert len(found['alerts']) == 3 and found['checks'] == []
+
+    token = fx_zmon.get_onetime_token()
+    assert token in [t['token'] for t in fx_zmon.list_onetime_tokens()]
+
+    grafana = {'dashboard': {'id': 'g-1', 'title': 'Grafana'}}
+    fx_zmon.update_grafana_dashboard(grafana)
+    assert fx_zmon.get_grafana_dashboard('g-1') == grafana
+
+    downtime = fx_zmon.create_downtime({'entities': ['e-1'], 'start_time': 1, 'end_time': 2})
+    assert downtime['id']
+
+    group = fx_zmon.get_groups()[0]['name']
+    assert fx_zmon.switch_active_user(group, 'jane') is True
+    assert fx_zmon.add_member(group, 'jane') is True
+    assert fx_zmon.remove_member(group, 'jane') is True
+    assert fx_zmon.add_phone('jane', '123') is True
+
+
+def test_standin_status(fx_standin):
+    entities = fx_standin.handle('GET', '/api/v1/entities/')
+    assert json.loads(fx_standin.handle('GET', '/api/v1/status/', query={'x': '1'})[2].decode())['workers']
+
+    rate = fx_standin._invocation_rate
+    assert rate is not None
+
+    fx_standin.handle('GET', '/api/v1/status/')
+    assert fx_standin._invocation_rate is rate
+    assert fx_standin.handle('GET', '/api/v1/entities/') is entities
+
+
+def test_standin_errors():
+    standin = Standin(Dataset(), error_rate=1, error_status=500)
+
+    status, _, body = standin.handle('GET', '/api/v1/status/')
+    assert status == 500 and json.loads(body.decode())['message'] == 'Injected error'
+    assert standin.errors == standin.requests == 1
+
+    standin.error_rate = 0
+    assert standin.handle('GET', '/unknown')[0] == 404
+    assert standin.handle('PATCH', '/api/v1/entities/')[0] == 405
+    assert standin.handle('PUT', '/api/v1/entities/', body=b'{')[0] == 400
+    assert standin.handle('GET', '/api/v1/quick-search/', query={'query': 'x', 'limit': 'abc'})[0] == 400
+
+
+def test_standin_server(fx_standin, fx_standin_server):
+    server = fx_standin_server(fx_standin)
+
+    zmon = Zmon(server.url, token='123')
+
+    assert len(zmon.get_entities(query=[{'type': 'host'}, {'type': 'database'}])) > 0
+
+    dashboard_id = zmon.update_dashboard({'name': 'new'})
+    assert zmon.get_dashboard(dashboard_id)['name'] == 'new'
+
+    zmon.session.close()
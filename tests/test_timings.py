@@ -0,0 +1,71 @@
+import pytest
+import yaml
+
+from click.testing import CliRunner
+
+from zmon_cli.client import Zmon
+from zmon_cli.main import cli
+from zmon_cli.timings import TimingCollector, get_endpoint
+
+
+def test_get_endpoint():
+    assert get_endpoint('PUT', 'https://zmon/api/v1/check-definitions') == 'PUT /api/v1/check-definitions'
+    assert get_endpoint('GET', 'https://zmon/api/v1/status/alert/12/all-entities') == \
+        'GET /api/v1/status/alert/{id}/all-entities'
+
+
+def test_timing_collector(fx_server):
+    collector = TimingCollector()
+    zmon = Zmon(fx_server, token='123', collector=collector)
+
+    zmon.get_check_definition(1)
+    zmon.get_check_definition(2)
+    assert zmon.session.get(zmon.endpoint('missing')).status_code == 404
+
+    first, second, missing = collector.records
+
+    assert first['endpoint'] == 'GET /api/v1/check-definitions/{id}/'
+    assert first['status'] == 200
+    assert first['bytes'] > 0
+    assert {'dns', 'connect', 'server', 'download', 'decode'} <= set(first['phases'])
+
+    # connection is reused
+    assert 'connect' not in second['phases']
+    assert missing['status'] == 404
+
+    stats = collector.endpoints()
+    assert stats['GET /api/v1/check-definitions/{id}/']['count'] == 2
+    assert stats['GET /api/v1/check-definitions/{id}/']['p99'] >= stats['GET /api/v1/check-definitions/{id}/']['p50']
+    assert stats['GET /api/v1/missing/']['errors'] == 1
+
+    collector.clear()
+    assert collector.endpoints() == {}
+
+    zmon.session.close()
+
+
+def test_timing_collector_connection_error():
+    collector = TimingCollector()
+    zmon = Zmon('http://localhost:1', token='123', collector=collector)
+
+    with pytest.raises(Exception):
+        zmon.status()
+
+    assert collector.records[0]['error'] == 'ConnectionError'
+
+
+def test_cli_timings(fx_server):
+    runner = CliRunner()
+
+    with runner.isolated_filesystem():
+        with open('test.yaml', 'w') as fd:
+            yaml.dump({'url': fx_server, 'token': '123'}, fd)
+
+        result = runner.invoke(cli, ['-c', 'test.yaml', '--timings', 'status'], catch_exceptions=False)
+
+        assert 'GET /api/v1/status' in result.output
+        assert '1 requests' in result.output
+
+        result = runner.invoke(cli, ['-c', 'test.yaml', 'status'], catch_exceptions=False)
+
+        assert 'requests' not in result.output
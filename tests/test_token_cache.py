@@ -0,0 +1,123 @@
+import base64
+import json
+import os
+import stat
+import threading
+import time
+
+import pytest
+import requests
+
+from unittest.mock import MagicMock
+
+from zmon_cli.cmds.command import get_client
+from zmon_cli.config import TOKEN_CACHE_FILE, get_cache_dir, validate_config
+from zmon_cli.token_cache import DEFAULT_LIFETIME, TokenCache, get_token_expiry
+
+
+def jwt(exp):
+    payload = base64.urlsafe_b64encode(json.dumps({'exp': exp}).encode()).decode().rstrip('=')
+    return 'eyJhbGciOiJub25lIn0.{}.sig'.format(payload)
+
+
+def test_get_token_expiry():
+    assert get_token_expiry(jwt(1234), now=0) == 1234
+    assert get_token_expiry('a.b.c', default_lifetime=10, now=5) == 15
+    assert get_token_expiry(jwt('x'), default_lifetime=10, now=5) == 15
+
+    # lifetime stored by zign
+    assert get_token_expiry({'access_token': jwt(1234), 'creation_time': 100, 'expires_in': 60}) == 160
+    assert get_token_expiry({'access_token': 'opaque'}, now=5) == 5 + DEFAULT_LIFETIME
+
+
+def test_token_cache(tmpdir):
+    path = str(tmpdir.join('cache', 'tokens.json'))
+    cache = TokenCache(path, refresh_before=60)
+
+    fetch = MagicMock(return_value=jwt(int(time.time()) + 3600))
+
+    token = cache.get('zmon', fetch)
+    assert cache.get('zmon', fetch) == token
+    assert TokenCache(path).get('zmon', fetch) == token
+    assert fetch.call_count == 1
+
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+    # token expiring soon is refreshed
+    cache = TokenCache(path, refresh_before=7200)
+    fetch.return_value = jwt(int(time.time()) + 7200 * 2)
+    assert cache.get('zmon', fetch) == fetch.return_value
+    assert fetch.call_count == 2
+
+    cache.clear('zmon')
+    assert cache.get('zmon', fetch) == fetch.return_value
+    assert fetch.call_count == 3
+
+
+def test_token_cache_refresh_failure(tmpdir):
+    cache = TokenCache(str(tmpdir.join('tokens.json')), refresh_before=120)
+
+    valid = jwt(int(time.time()) + 60)
+    assert cache.get('zmon', lambda: valid) == valid
+
+    fetch = MagicMock(side_effect=RuntimeError('token service down'))
+
+    # still valid token is used if refresh fails
+    assert cache.get('zmon', fetch) == valid
+    assert fetch.call_count == 1
+
+    cache.clear()
+    with pytest.raises(RuntimeError):
+        cache.get('zmon', fetch)
+
+
+def test_token_cache_concurrent(tmpdir):
+    path = str(tmpdir.join('tokens.json'))
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.05)
+        return 'token-{}'.format(len(calls))
+
+    tokens = []
+    threads = [threading.Thread(target=lambda: tokens.append(TokenCache(path).get('zmon', fetch))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert tokens == ['token-1'] * 8
+
+
+def test_token_cache_zign_token(tmpdir):
+    cache = TokenCache(str(tmpdir.join('tokens.json')), refresh_before=60)
+
+    now = time.time()
+    fetch = MagicMock(return_value={'access_token': 'opaque', 'creation_time': now - 3560, 'expires_in': 3600})
+
+    assert cache.get('zmon', fetch) == 'opaque'
+    # zign's token expires within refresh_before, so it is fetched again
+    assert cache.get('zmon', fetch) == 'opaque'
+    assert fetch.call_count == 2
+
+
+def test_refresh_token_on_unauthorized(monkeypatch, fx_server):
+    get_token = MagicMock(side_effect=['expired', 'fresh'])
+    monkeypatch.setattr('zign.api.get_token', get_token)
+    monkeypatch.setattr('zign.api.get_existing_token', lambda name: None)
+
+    config = validate_config({'url': fx_server})
+    assert config['token'] == 'expired'
+
+    status = get_client(config, cached=False).status()
+
+    assert status['headers']['Authorization'] == 'Bearer fresh'
+    assert get_token.call_count == 2
+    assert config['token'] == 'fresh'
+    assert TokenCache(get_cache_dir(config, TOKEN_CACHE_FILE)).get('zmon', get_token) == 'fresh'
+
+    # tokens which are not cached are not refreshed
+    with pytest.raises(requests.HTTPError):
+        get_client({'url': fx_server, 'token': 'expired'}, cached=False).status()
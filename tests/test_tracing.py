@@ -0,0 +1,143 @@
+import json
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import yaml
+
+from click.testing import CliRunner
+
+from zmon_cli.client import Zmon
+from zmon_cli.main import cli
+from zmon_cli.tracing import FLOW_ID_HEADER, Tracer, get_tracer, set_flow_id, set_tracer, stage
+
+
+def test_tracer(fx_server, tmpdir):
+    tracer = Tracer(trace_id='a' * 32)
+    zmon = Zmon(fx_server, token='123', collector=tracer)
+
+    with tracer.span('sync') as root:
+        check = zmon.get_check_definition(1)
+        assert check['headers'][FLOW_ID_HEADER] == 'a' * 32
+
+        with pytest.raises(ValueError):
+            with tracer.span('failing'):
+                raise ValueError()
+
+    zmon.session.close()
+
+    by_name = {s['name']: s for s in tracer.spans}
+
+    request = by_name['GET /api/v1/check-definitions/{id}/']
+    assert request['kind'] == 'CLIENT'
+    assert request['parentId'] == root['id']
+    assert request['tags']['http.status_code'] == '200'
+    assert 'zmon.server_ms' in request['tags']
+
+    assert by_name['failing']['tags']['error'] == 'ValueError'
+    assert 'parentId' not in by_name['sync']
+    assert all(s['traceId'] == 'a' * 32 and s['duration'] > 0 for s in tracer.spans)
+
+    # timings are collected as well
+    assert len(tracer.records) == 1
+
+    path = str(tmpdir.join('spans', 'trace.jsonl'))
+    tracer.export(path)
+    tracer.export(path)
+
+    with open(path) as fd:
+        spans = [json.loads(line) for line in fd]
+
+    assert len(spans) == 2 * len(tracer.spans)
+    assert spans[0]['name'] == 'sync'
+
+
+def test_stage():
+    with stage('parse') as span:
+        assert span is None
+
+    tracer = Tracer()
+    previous = set_tracer(tracer)
+    try:
+        with tracer.span('zmon') as root:
+            with stage('validate', 'check_command'):
+                pass
+    finally:
+        set_tracer(previous)
+
+    span = tracer.spans[0]
+    assert span['name'] == 'validate check_command'
+    assert span['parentId'] == root['id']
+    assert span['tags'] == {'zmon.stage': 'validate'}
+
+
+def test_cli_trace(fx_server):
+    runner = CliRunner()
+
+    with runner.isolated_filesystem():
+        with open('test.yaml', 'w') as fd:
+            yaml.dump({'url': fx_server, 'token': '123'}, fd)
+
+        result = runner.invoke(cli, ['-c', 'test.yaml', '--trace', 'trace.jsonl', '--timings', 'check', 'get', '1'],
+                               catch_exceptions=False)
+
+        assert FLOW_ID_HEADER in result.output
+        assert '1 requests' in result.output
+
+        with open('trace.jsonl') as fd:
+            spans = [json.loads(line) for line in fd]
+
+    names = [s['name'] for s in spans]
+    assert names[0] == 'zmon check-definitions'
+    assert {'parse config', 'send get_check_definition', 'GET /api/v1/check-definitions/{id}/', 'render yaml'} <= \
+        set(names)
+    assert len({s['traceId'] for s in spans}) == 1
+
+    by_name = {s['name']: s for s in spans}
+    assert by_name['GET /api/v1/check-definitions/{id}/']['parentId'] == by_name['send get_check_definition']['id']
+
+    assert get_tracer() is None
+
+
+def test_flow_id(fx_server):
+    zmon = Zmon(fx_server, token='123', flow_id='b' * 32)
+    assert zmon.get_check_definition(1)['headers'][FLOW_ID_HEADER] == 'b' * 32
+
+    assert len(Zmon(fx_server, token='123').flow_id) == 32
+
+    runner = CliRunner()
+
+    with runner.isolated_filesystem():
+        with open('test.yaml', 'w') as fd:
+            yaml.dump({'url': fx_server, 'token': '123'}, fd)
+
+        flow_ids = []
+        for _ in range(2):
+            result = runner.invoke(cli, ['-c', 'test.yaml', 'check', 'get', '1', '-o', 'json'], catch_exceptions=False)
+            flow_ids.append(json.loads(result.output)['headers'][FLOW_ID_HEADER])
+
+    # without --trace, every invocation has its own flow ID
+    assert len(flow_ids[0]) == 32
+    assert flow_ids[0] != flow_ids[1]
+
+
+def test_flow_id_per_thread(fx_server):
+    zmon = Zmon(fx_server, token='123')
+    default = zmon.flow_id
+
+    def run(flow_id):
+        previous = set_flow_id(flow_id)
+        try:
+            barrier.wait()
+            return zmon.get_check_definition(flow_id)['headers'][FLOW_ID_HEADER]
+        finally:
+            set_flow_id(previous)
+
+    barrier = threading.Barrier(4)
+    flow_ids = ['{}'.format(i) * 32 for i in range(4)]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        assert list(executor.map(run, flow_ids)) == flow_ids
+
+    assert zmon.flow_id == default
+    assert FLOW_ID_HEADER not in zmon.session.headers
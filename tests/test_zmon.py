@@ -1,4 +1,5 @@
 import json
+import logging
 
 from datetime import datetime
 from unittest.mock import MagicMock
@@ -103,6 +104,57 @@ def test_zmon_headers(monkeypatch):
     assert zmon.session.verify is False
 
 
+def test_zmon_cached_session(monkeypatch):
+    request = MagicMock()
+    request.return_value.ok = True
+    request.return_value.json.return_value = {'status': 'success'}
+
+    monkeypatch.setattr('requests.Session.request', request)
+
+    zmon = Zmon(URL, token=TOKEN, cache_ttl=60)
+    assert isinstance(zmon.session, client.CachedSession)
+
+    assert zmon.status() == {'status': 'success'}
+    assert zmon.status() == {'status': 'success'}
+    assert request.call_count == 1
+
+    zmon.get_entities(query={'type': 'GLOBAL'})
+    zmon.get_entities(query={'type': 'other'})
+    assert request.call_count == 3
+
+    # modifications clear the cache
+    zmon.delete_entity('e-1')
+    zmon.status()
+    assert request.call_count == 5
+
+    assert not isinstance(Zmon(URL, token=TOKEN).session, client.CachedSession)
+
+
+def test_cached_session_size(monkeypatch):
+    request = MagicMock()
+    request.return_value.ok = True
+
+    monkeypatch.setattr('requests.Session.request', request)
+
+    now = [1000]
+    monkeypatch.setattr('time.time', lambda: now[0])
+
+    session = client.CachedSession(10, max_entries=3)
+
+    for i in range(5):
+        session.get(URL, params={'id': i})
+    assert len(session._cache) == 3
+    assert [json.loads(params)['id'] for _, params in session._cache] == [2, 3, 4]
+
+    session.get(URL, params={'id': 4})
+    assert request.call_count == 5
+
+    # expired responses are dropped on insert
+    now[0] += 11
+    session.get(URL, params={'id': 5})
+    assert len(session._cache) == 1
+
+
 def test_zmon_status(monkeypatch):
     get = MagicMock()
     result = {'status': 'success'}
@@ -217,6 +269,20 @@ def test_zmon_get_dashboard(monkeypatch):
     get.assert_called_with(zmon.endpoint(client.DASHBOARD, 1))
 
 
+def test_zmon_get_dashboards(monkeypatch):
+    get = MagicMock()
+    result = [{'id': 1, 'name': 'dash'}]
+    get.return_value.json.return_value = result
+
+    monkeypatch.setattr('requests.Session.get', get)
+
+    zmon = Zmon(URL, token=TOKEN)
+
+    assert zmon.get_dashboards() == result
+
+    get.assert_called_with(zmon.endpoint(client.DASHBOARD))
+
+
 @pytest.mark.parametrize('d', [{'id': 1}, {'id': ''}])
 def test_zmon_update_dashboard(monkeypatch, d):
     post = MagicMock()
@@ -783,3 +849,17 @@ def test_zmon_set_name(monkeypatch):
     zmon.add_phone('user1@something', 'user1')
 
     put.assert_called_with(zmon.endpoint(client.GROUPS, 'user1@something', client.PHONE, 'user1'))
+
+
+def test_zmon_log_response(fx_server, caplog):
+    zmon = Zmon(fx_server, token=TOKEN)
+
+    with caplog.at_level(logging.DEBUG, logger='zmon_cli.client'):
+        zmon.status()
+
+    record = [r for r in caplog.records if hasattr(r, 'duration_ms')][0]
+    assert record.http_method == 'GET'
+    assert record.http_status == 200
+    assert record.duration_ms >= 0
+
+    zmon.session.close()
@@ -1,37 +1,26 @@
 # bash completion for zmon
+#
+# Completion candidates are served by `zmon-complete` from a local index of subcommands and IDs.
+# Build or refresh the index with:
+#
+#   $ zmon completion update
 _zmon() {
-    local cur prev opts base command
+    local cur words cword
 
-    COMPREPLY=()
-    cur="${COMP_WORDS[COMP_CWORD]}"
-    prev="${COMP_WORDS[COMP_CWORD-1]}"
-    command="${COMP_WORDS[0]}"
-
-    _get_zmon_cmd() {
-        local c=$1
-        local p=$2
-        echo $(for cmd in $(${c} ${p} --help | grep -A 10 ^Commands: | grep -v ^Commands: | awk '{ print $1 }'); do echo $cmd; done; )
-    }
+    if declare -F _get_comp_words_by_ref > /dev/null; then
+        # entity IDs may contain ":", do not split words on it
+        _get_comp_words_by_ref -n : cur words cword
+    else
+        cur="${COMP_WORDS[COMP_CWORD]}"
+        words=("${COMP_WORDS[@]}")
+        cword=$COMP_CWORD
+    fi
 
-    # options that we can complete
-    opts="--config-file -v --verbose -V --version -h --help alert-definitions check-definitions entities groups help members status"
+    COMPREPLY=( $(zmon-complete "${cword}" "${words[@]}" 2> /dev/null) )
 
-    if [ $prev == $command ]; then
-        if [[ ${cur} == [a-zA-Z]* ]] || [[ ${cur} == -* ]]; then
-            COMPREPLY=( $(compgen -W "${opts}" -- ${cur}) )
-            return 0
-        fi
+    if declare -F __ltrim_colon_completions > /dev/null; then
+        __ltrim_colon_completions "${cur}"
     fi
-
-    case "${prev}" in
-        alert-definitions|check-definitions|entities|groups|members)
-            local cmd_defs=$(_get_zmon_cmd $command $prev)
-            COMPREPLY=($(compgen -W "${cmd_defs}" -- ${cur})) 
-            return 0
-            ;;
-        *)
-            ;;
-    esac
 }
 
-complete -F _zmon zmon
+complete -o default -F _zmon zmon
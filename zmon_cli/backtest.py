@@ -0,0 +1,195 @@
+"""
+Replay alert conditions over locally recorded alert data.
+
+Conditions are compiled once per scenario and evaluated over whole series with ``map``, so sweeping many candidate
+thresholds over weeks of history does not pay interpreter overhead per sample for simple comparisons.
+"""
+import itertools
+import json
+import operator
+import re
+
+
+OPERATORS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+SAFE_BUILTINS = {f.__name__: f for f in (abs, all, any, bool, float, int, len, max, min, round, sum)}
+
+simple_condition_re = re.compile(r'^\s*(?:value\s*)?(>=|<=|==|!=|>|<)\s*([A-Za-z_][A-Za-z0-9_]*|[-+.0-9eE]+)\s*$')
+leading_operator_re = re.compile(r'^\s*(>=|<=|==|!=|>|<)')
+
+
+class BacktestError(Exception):
+    """Alert backtest error."""
+
+    def __init__(self, message=''):
+        super().__init__('ZMON backtest error: {}'.format(message))
+
+
+def get_parameters(alert_definition):
+    """
+    Return alert parameters as plain ``name -> value`` dict.
+
+    >>> get_parameters({'parameters': {'a': {'value': 10, 'type': 'int'}, 'b': '"x"', 'c': 1.5}})['a']
+    10
+    """
+    params = {}
+
+    for name, param in (alert_definition.get('parameters') or {}).items():
+        value = param.get('value') if isinstance(param, dict) else param
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                pass
+        params[name] = value
+
+    return params
+
+
+def compile_condition(condition, parameters=None):
+    """
+    Compile an alert condition into a function evaluating a whole series of values.
+
+    Conditions starting with a comparison operator (e.g. ``>100``) are applied to ``value`` like ZMON does.
+
+    >>> compile_condition('>threshold', {'threshold': 2})([1, 2, 3])
+    [False, False, True]
+
+    >>> compile_condition('value % 2 == 0')([1, 2, 3])
+    [False, True, False]
+
+    :param condition: Alert condition.
+    :type condition: str
+
+    :param parameters: Alert parameters available to the condition.
+    :type parameters: dict
+
+    :return: Function accepting a list of values and returning a list of bools.
+    :rtype: callable
+    """
+    parameters = parameters or {}
+
+    match = simple_condition_re.match(condition)
+    if match:
+        op, operand = match.groups()
+        try:
+            threshold = float(parameters.get(operand, operand))
+        except (TypeError, ValueError):
+            # e.g. non-numeric parameter, evaluated like other conditions
+            threshold = None
+
+        if threshold is not None:
+            func = OPERATORS[op]
+            return lambda values: list(map(func, values, itertools.repeat(threshold)))
+
+    expression = 'value {}'.format(condition.strip()) if leading_operator_re.match(condition) else condition.strip()
+
+    namespace = {'__builtins__': SAFE_BUILTINS}
+    namespace.update(parameters)
+
+    try:
+        evaluate = eval('lambda value: bool({})'.format(expression), namespace)
+    except SyntaxError as e:
+        raise BacktestError('Invalid condition "{}": {}'.format(condition, e))
+
+    def evaluate_series(values):
+        try:
+            return list(map(evaluate, values))
+        except Exception as e:
+            raise BacktestError('Failed to evaluate condition "{}": {}'.format(condition, e))
+
+    return evaluate_series
+
+
+def replay(timestamps, states):
+    """
+    Summarize alert states of a single entity.
+
+    A sample keeps its state until the next sample, the last sample does not add alerting time.
+
+    >>> sorted(replay([0, 60, 120, 180], [False, True, True, False]).items())
+    [('alerting_seconds', 120), ('fired', 1), ('flaps', 2), ('samples', 4)]
+
+    :return: Dict with ``samples``, ``fired`` (rising edges), ``flaps`` (state changes) and ``alerting_seconds``.
+    :rtype: dict
+    """
+    if not states:
+        return {'samples': 0, 'fired': 0, 'flaps': 0, 'alerting_seconds': 0}
+
+    durations = map(operator.sub, timestamps[1:], timestamps[:-1])
+
+    return {
+        'samples': len(states),
+        'fired': sum(map(operator.lt, itertools.chain([False], states), states)),
+        'flaps': sum(map(operator.ne, states, states[1:])),
+        'alerting_seconds': sum(itertools.compress(durations, states)),
+    }
+
+
+def backtest(series, condition, parameters=None):
+    """
+    Replay an alert condition over recorded series.
+
+    :param series: Dict with entity ID as key and ``(timestamps, values)`` tuple as value. See
+                   :func:`zmon_cli.history.HistoryStore.series`.
+    :type series: dict
+
+    :param condition: Alert condition.
+    :type condition: str
+
+    :param parameters: Alert parameters.
+    :type parameters: dict
+
+    :return: Dict with ``entities`` results per entity and summed up ``total``.
+    :rtype: dict
+    """
+    evaluate = compile_condition(condition, parameters)
+
+    entities = {}
+    total = {'samples': 0, 'fired': 0, 'flaps': 0, 'alerting_seconds': 0, 'entities_alerting': 0}
+
+    for entity_id, (timestamps, values) in series.items():
+        result = replay(timestamps, evaluate(values))
+        entities[entity_id] = result
+
+        for k, v in result.items():
+            total[k] += v
+        if result['fired']:
+            total['entities_alerting'] += 1
+
+    return {'condition': condition, 'parameters': parameters or {}, 'entities': entities, 'total': total}
+
+
+def sweep(series, conditions, parameters, overrides):
+    """
+    Backtest every combination of conditions and overridden parameter values.
+
+    :param conditions: List of alert conditions.
+    :type conditions: list
+
+    :param parameters: Alert parameters.
+    :type parameters: dict
+
+    :param overrides: Dict of parameter name to list of candidate values.
+    :type overrides: dict
+
+    :return: List of backtest results. See :func:`backtest`.
+    :rtype: list
+    """
+    names = sorted(overrides)
+    results = []
+
+    for condition in conditions:
+        for values in itertools.product(*[overrides[n] for n in names]):
+            params = dict(parameters)
+            params.update(zip(names, values))
+            results.append(backtest(series, condition, params))
+
+    return results
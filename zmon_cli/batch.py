@@ -0,0 +1,255 @@
+"""
+Batch execution of zmon command lines through one process and one ZMON session.
+
+A batch is either plain text with one command line per line, or a YAML list of steps::
+
+    # plain text: consecutive lines ending with "&" run in parallel, the next line waits for them
+    entities get my-entity
+    check-definitions get 1 &
+    check-definitions get 2 &
+    alert-definitions list
+
+    # YAML
+    - entities get my-entity
+    - name: checks
+      parallel:
+        - check-definitions get 1
+        - command: [check-definitions, get, '2']
+    - alert-definitions list
+
+Steps are parsed into groups: a group of one step runs on its own, steps of a bigger group are independent of each
+other and may run concurrently.
+"""
+import io
+import shlex
+import sys
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+import yaml
+
+
+class BatchError(Exception):
+    pass
+
+
+def _split(command):
+    argv = list(map(str, command)) if isinstance(command, list) else shlex.split(str(command), comments=True)
+
+    # Allow copy & paste of full command lines
+    if argv and argv[0] == 'zmon':
+        argv = argv[1:]
+
+    return argv
+
+
+def _step(item, number):
+    if isinstance(item, dict):
+        if 'command' not in item:
+            raise BatchError('Step {}: missing "command"'.format(number))
+        argv = _split(item['command'])
+        name = item.get('name')
+    else:
+        argv = _split(item)
+        name = None
+
+    if not argv:
+        raise BatchError('Step {}: empty command'.format(number))
+
+    return {'step': number, 'name': name or ' '.join(argv), 'argv': argv}
+
+
+def _command(argv):
+    return ' '.join(shlex.quote(a) for a in argv)
+
+
+def _parse_yaml(items):
+    groups = []
+    number = 0
+
+    for item in items:
+        if isinstance(item, dict) and 'parallel' in item:
+            if not isinstance(item['parallel'], list) or not item['parallel']:
+                raise BatchError('Step {}: "parallel" has to be a non-empty list'.format(number + 1))
+            group = []
+            for sub in item['parallel']:
+                number += 1
+                group.append(_step(sub, number))
+            groups.append(group)
+        else:
+            number += 1
+            groups.append([_step(item, number)])
+
+    return groups
+
+
+def _parse_lines(text):
+    groups = []
+    background = []
+    number = 0
+
+    for line in text.splitlines():
+        argv = _split(line)
+        if not argv:
+            continue
+
+        number += 1
+
+        if argv[-1] == '&':
+            background.append(_step(argv[:-1], number))
+            continue
+
+        if background:
+            groups.append(background)
+            background = []
+
+        groups.append([_step(argv, number)])
+
+    if background:
+        groups.append(background)
+
+    return groups
+
+
+def parse_batch(text):
+    """
+    Parse batch file contents into groups of steps.
+
+    >>> [[s['argv'] for s in g] for g in parse_batch('zmon status  # first\\nentities get a &\\nentities get b &')]
+    [[['status']], [['entities', 'get', 'a'], ['entities', 'get', 'b']]]
+
+    :param text: Plain text or YAML batch.
+    :type text: str
+
+    :return: List of step groups. Steps are dicts with ``step`` number, ``name`` and ``argv``.
+    :rtype: list
+    """
+    try:
+        items = yaml.safe_load(text)
+    except yaml.YAMLError:
+        items = None
+
+    try:
+        groups = _parse_yaml(items) if isinstance(items, list) else _parse_lines(text)
+    except ValueError as e:
+        # shlex errors, e.g. unbalanced quotes
+        raise BatchError(str(e))
+
+    if not groups:
+        raise BatchError('No commands in batch')
+
+    return groups
+
+
+class ThreadLocalStream(io.TextIOBase):
+    """Text stream writing to a per-thread target, falling back to the stream it replaced.
+
+    Used as ``sys.stdout`` and ``sys.stderr`` so output of concurrent steps can be captured separately.
+    """
+
+    def __init__(self, default):
+        self._default = default
+        self._local = threading.local()
+
+    def capture(self, target):
+        self._local.target = target
+
+    def release(self):
+        self._local.target = None
+
+    @property
+    def target(self):
+        return getattr(self._local, 'target', None) or self._default
+
+    def writable(self):
+        return True
+
+    def isatty(self):
+        # Captured output is never a terminal
+        return self.target is self._default and self._default.isatty()
+
+    def write(self, s):
+        return self.target.write(s)
+
+    def flush(self):
+        self.target.flush()
+
+
+def run_batch(groups, execute, jobs=4, keep_going=False, callback=None):
+    """
+    Run step groups and return per-step results.
+
+    :param groups: Step groups as returned by :func:`parse_batch`.
+    :type groups: list
+
+    :param execute: Callable running an argv list and returning its exit code.
+    :type execute: callable
+
+    :param jobs: Maximum number of concurrently running steps of a parallel group.
+    :type jobs: int
+
+    :param keep_going: Run remaining steps after a step failed.
+    :type keep_going: bool
+
+    :param callback: Called with each step result when its group finished, in step order.
+    :type callback: callable
+
+    :return: List of step results with ``step``, ``name``, ``command``, ``exit_code``, ``duration``, ``stdout`` and
+             ``stderr``. Steps skipped after a failure have ``exit_code`` None.
+    :rtype: list
+    """
+    stdout, stderr = sys.stdout, sys.stderr
+    out, err = ThreadLocalStream(stdout), ThreadLocalStream(stderr)
+
+    def run(step):
+        captured_out, captured_err = io.StringIO(), io.StringIO()
+        out.capture(captured_out)
+        err.capture(captured_err)
+
+        start = time.perf_counter()
+        try:
+            exit_code = execute(step['argv'])
+        finally:
+            out.release()
+            err.release()
+
+        return {
+            'step': step['step'],
+            'name': step['name'],
+            'command': _command(step['argv']),
+            'exit_code': exit_code,
+            'duration': round(time.perf_counter() - start, 3),
+            'stdout': captured_out.getvalue(),
+            'stderr': captured_err.getvalue(),
+        }
+
+    results = []
+    failed = False
+
+    sys.stdout, sys.stderr = out, err
+    try:
+        with ThreadPoolExecutor(max_workers=max(jobs, 1)) as executor:
+            for group in groups:
+                if failed and not keep_going:
+                    results.extend({'step': s['step'], 'name': s['name'], 'command': _command(s['argv']),
+                                    'exit_code': None, 'duration': 0, 'stdout': '', 'stderr': ''} for s in group)
+                    continue
+
+                group_results = [run(group[0])] if len(group) == 1 else list(executor.map(run, group))
+
+                for result in group_results:
+                    failed = failed or result['exit_code'] != 0
+                    if callback:
+                        sys.stdout, sys.stderr = stdout, stderr
+                        try:
+                            callback(result)
+                        finally:
+                            sys.stdout, sys.stderr = out, err
+
+                results.extend(group_results)
+    finally:
+        sys.stdout, sys.stderr = stdout, stderr
+
+    return results
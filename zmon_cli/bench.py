@@ -0,0 +1,334 @@
+"""
+Load generator driving weighted mixes of :class:`zmon_cli.client.Zmon` operations, see ``zmon bench``.
+
+Workers run operations either back-to-back (closed loop, fixed concurrency) or at a target rate (open loop). In rate
+mode latency is measured from the scheduled start of an operation, so a controller which can not keep up shows rising
+latency instead of silently lowering the request rate.
+"""
+import bisect
+import datetime
+import random
+import threading
+import time
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from zmon_cli import __version__
+from zmon_cli.client import (ACTIVE_ALERT_DEF, ACTIVE_CHECK_DEF, ALERT_DATA, ALERT_DEF, CHECK_DEF, DASHBOARD, ENTITIES,
+                             SEARCH, STATUS)
+from zmon_cli.concurrency import RateLimiter, bulk_apply
+from zmon_cli.timings import percentile
+
+
+DEFAULT_MIX = 'add-entity=1,alert-data=1'
+
+DEFAULT_CONCURRENCY = 4
+
+DEFAULT_DURATION = 10
+
+BENCH_ENTITY_TYPE = 'zmon_bench'
+
+# Maximum number of entity IDs kept for reads
+MAX_ENTITY_IDS = 10000
+
+SEARCH_TERMS = ('api', 'health', 'latency', 'error', 'queue', 'memory', 'zmon')
+
+
+class BenchError(Exception):
+    pass
+
+
+class BenchState:
+    """IDs used by operations, collected before the run, and entities created during the run."""
+
+    def __init__(self, run_id=None):
+        self.run_id = run_id or '{:08x}'.format(random.getrandbits(32))
+        self.alert_ids = []
+        self.check_ids = []
+        self.entity_ids = []
+        self.dashboard_ids = []
+        self.created = []
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def new_entity(self):
+        with self._lock:
+            self._count += 1
+            count = self._count
+
+        return {
+            'id': 'zmon-bench-{}-{}'.format(self.run_id, count),
+            'type': BENCH_ENTITY_TYPE,
+            'team': 'zmon-bench',
+            'created_by': 'zmon-bench',
+            'data': {'run': self.run_id, 'index': count},
+        }
+
+    def add_created(self, entity_id):
+        with self._lock:
+            self.created.append(entity_id)
+
+    def pop_created(self):
+        with self._lock:
+            return self.created.pop() if self.created else None
+
+
+def _add_entity(client, state, rnd):
+    entity = state.new_entity()
+    client.add_entity(entity)
+    state.add_created(entity['id'])
+
+
+def _delete_entity(client, state, rnd):
+    # Without an entity of this run, delete a missing one to exercise the endpoint anyway
+    entity_id = state.pop_created() or 'zmon-bench-{}-missing'.format(state.run_id)
+    client.delete_entity(entity_id)
+
+
+# name -> (endpoint, IDs needed, function(client, state, rnd))
+OPERATIONS = OrderedDict([
+    ('status', ('GET ' + STATUS, None, lambda client, state, rnd: client.status())),
+    ('entities', ('GET ' + ENTITIES, None,
+                  lambda client, state, rnd: client.get_entities(query={'type': BENCH_ENTITY_TYPE}))),
+    ('entity', ('GET {}/{{id}}'.format(ENTITIES), 'entity_ids',
+                lambda client, state, rnd: client.get_entity(rnd.choice(state.entity_ids)))),
+    ('add-entity', ('PUT ' + ENTITIES, None, _add_entity)),
+    ('delete-entity', ('DELETE {}/{{id}}'.format(ENTITIES), None, _delete_entity)),
+    ('checks', ('GET ' + ACTIVE_CHECK_DEF, None, lambda client, state, rnd: client.get_check_definitions())),
+    ('check', ('GET {}/{{id}}'.format(CHECK_DEF), 'check_ids',
+               lambda client, state, rnd: client.get_check_definition(rnd.choice(state.check_ids)))),
+    ('alerts', ('GET ' + ACTIVE_ALERT_DEF, None, lambda client, state, rnd: client.get_alert_definitions())),
+    ('alert', ('GET {}/{{id}}'.format(ALERT_DEF), 'alert_ids',
+               lambda client, state, rnd: client.get_alert_definition(rnd.choice(state.alert_ids)))),
+    ('alert-data', ('GET {}/{{id}}/all-entities'.format(ALERT_DATA), 'alert_ids',
+                    lambda client, state, rnd: client.get_alert_data(rnd.choice(state.alert_ids)))),
+    ('dashboards', ('GET ' + DASHBOARD, None, lambda client, state, rnd: client.get_dashboards())),
+    ('dashboard', ('GET {}/{{id}}'.format(DASHBOARD), 'dashboard_ids',
+                   lambda client, state, rnd: client.get_dashboard(rnd.choice(state.dashboard_ids)))),
+    ('search', ('GET ' + SEARCH, None, lambda client, state, rnd: client.search(rnd.choice(SEARCH_TERMS), limit=25))),
+])
+
+
+def parse_mix(mix):
+    """
+    Parse operation mix.
+
+    >>> parse_mix('alert-data=3, add-entity')
+    OrderedDict([('alert-data', 3.0), ('add-entity', 1.0)])
+
+    :param mix: Comma separated operation names with optional weight, e.g. ``entity=3,alert-data=1``.
+    :type mix: str
+
+    :return: Dict of operation name to weight.
+    :rtype: OrderedDict
+    """
+    parsed = OrderedDict()
+
+    for item in mix.split(','):
+        name, _, weight = item.strip().partition('=')
+        if not name:
+            continue
+        if name not in OPERATIONS:
+            raise BenchError('Unknown operation "{}", use one of: {}'.format(name, ', '.join(OPERATIONS)))
+        try:
+            parsed[name] = float(weight) if weight else 1.0
+        except ValueError:
+            raise BenchError('Invalid weight of operation "{}": {}'.format(name, weight))
+        if parsed[name] < 0:
+            raise BenchError('Invalid weight of operation "{}": {}'.format(name, weight))
+
+    if not parsed or not sum(parsed.values()):
+        raise BenchError('No operations in mix')
+
+    return parsed
+
+
+def prepare(client, mix, state):
+    """Collect IDs needed by operations of the mix."""
+    needs = {OPERATIONS[name][1] for name, weight in mix.items() if weight}
+
+    if 'alert_ids' in needs:
+        state.alert_ids = [a['id'] for a in client.get_alert_definitions()]
+    if 'check_ids' in needs:
+        state.check_ids = [c['id'] for c in client.get_check_definitions()]
+    if 'entity_ids' in needs:
+        state.entity_ids = [e['id'] for e in client.get_entities()[:MAX_ENTITY_IDS]]
+    if 'dashboard_ids' in needs:
+        state.dashboard_ids = [d['id'] for d in client.get_dashboards()]
+
+    for need in needs:
+        if need and not getattr(state, need):
+            raise BenchError('No {} found for operations of the mix'.format(need.replace('_ids', 's')))
+
+
+def _stats(samples, elapsed):
+    latencies = [s[2] * 1000 for s in samples]
+    errors = {}
+    for s in samples:
+        if s[3]:
+            errors[s[3]] = errors.get(s[3], 0) + 1
+
+    stats = OrderedDict([
+        ('count', len(samples)),
+        ('errors', sum(errors.values())),
+        ('error_codes', errors),
+        ('throughput', round(len(samples) / elapsed, 3) if elapsed else 0),
+    ])
+    for p in (50, 95, 99):
+        stats['p{}'.format(p)] = round(percentile(latencies, p), 3) if latencies else None
+    stats['max'] = round(max(latencies), 3) if latencies else None
+    stats['mean'] = round(sum(latencies) / len(latencies), 3) if latencies else None
+
+    return stats
+
+
+def summarize(samples, elapsed):
+    """
+    Aggregate samples to throughput, latency percentiles (ms) and errors, in total and per operation.
+
+    :param samples: ``(operation, start, latency, error)`` tuples, times in seconds.
+    :type samples: list
+
+    :param elapsed: Measured duration in seconds.
+    :type elapsed: float
+
+    :return: ``total`` stats and ``operations`` dict of operation name to stats, including the ``endpoint``.
+    :rtype: dict
+    """
+    grouped = OrderedDict()
+    for sample in sorted(samples, key=lambda s: s[0]):
+        grouped.setdefault(sample[0], []).append(sample)
+
+    operations = OrderedDict()
+    for name, group in grouped.items():
+        operations[name] = OrderedDict([('endpoint', OPERATIONS[name][0])])
+        operations[name].update(_stats(group, elapsed))
+
+    return {'total': _stats(samples, elapsed), 'operations': operations}
+
+
+def run_bench(client, mix, concurrency=DEFAULT_CONCURRENCY, rate=None, duration=DEFAULT_DURATION, requests_limit=None,
+              warmup=0, seed=None, state=None):
+    """
+    Run a benchmark.
+
+    :param client: ZMON client, should allow ``concurrency`` connections, see
+                   :func:`zmon_cli.concurrency.set_pool_size`.
+    :type client: :class:`zmon_cli.client.Zmon`
+
+    :param mix: Operation weights as returned by :func:`parse_mix`.
+    :type mix: dict
+
+    :param concurrency: Number of workers.
+    :type concurrency: int
+
+    :param rate: Target operations per second. Default is ``None``, every worker runs operations back-to-back.
+    :type rate: float
+
+    :param duration: Stop after seconds, including warmup. ``None`` runs until ``requests_limit`` is reached.
+    :type duration: float
+
+    :param requests_limit: Stop after number of operations, including warmup.
+    :type requests_limit: int
+
+    :param warmup: Exclude operations started within the first seconds from results.
+    :type warmup: float
+
+    :param seed: Random seed of operation choice and IDs.
+    :type seed: int
+
+    :param state: Benchmark state, prepared with :func:`prepare`.
+    :type state: BenchState
+
+    :return: Benchmark result with settings, ``total`` and per operation stats, see :func:`summarize`.
+    :rtype: dict
+    """
+    if duration is None and requests_limit is None:
+        raise BenchError('Either duration or number of requests is required')
+
+    state = state or BenchState()
+
+    names = [name for name, weight in mix.items() if weight]
+    cumulative = []
+    total_weight = 0
+    for name in names:
+        total_weight += mix[name]
+        cumulative.append(total_weight)
+
+    limiter = RateLimiter(rate, catch_up=True) if rate else None
+
+    samples = []
+    issued = [0]
+    lock = threading.Lock()
+
+    started = time.perf_counter()
+    deadline = started + duration if duration is not None else float('inf')
+
+    def worker(index):
+        rnd = random.Random(None if seed is None else seed + index)
+
+        while True:
+            if requests_limit is not None:
+                with lock:
+                    if issued[0] >= requests_limit:
+                        return
+                    issued[0] += 1
+
+            scheduled = limiter.acquire() if limiter else time.perf_counter()
+            if scheduled >= deadline:
+                return
+
+            name = names[min(bisect.bisect(cumulative, rnd.random() * total_weight), len(names) - 1)]
+
+            error = None
+            try:
+                OPERATIONS[name][2](client, state, rnd)
+            except requests.HTTPError as e:
+                error = str(e.response.status_code) if e.response is not None else type(e).__name__
+            except Exception as e:
+                error = type(e).__name__
+
+            # list.append is atomic
+            samples.append((name, scheduled - started, time.perf_counter() - scheduled, error))
+
+    timestamp = datetime.datetime.utcnow()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(worker, i) for i in range(concurrency)]:
+            future.result()
+
+    finished = time.perf_counter()
+
+    measured = [s for s in samples if s[1] >= warmup]
+    elapsed = finished - started - warmup if measured else 0
+
+    result = OrderedDict([
+        ('url', client.url),
+        ('client_version', __version__),
+        ('started', timestamp.strftime('%Y-%m-%dT%H:%M:%SZ')),
+        ('duration', round(elapsed, 3)),
+        ('warmup', warmup),
+        ('concurrency', concurrency),
+        ('rate', rate),
+        ('mix', OrderedDict((name, mix[name]) for name in names)),
+    ])
+    result.update(summarize(measured, elapsed))
+
+    return result
+
+
+def cleanup(client, state, concurrency=DEFAULT_CONCURRENCY):
+    """
+    Delete entities created by the benchmark.
+
+    :return: Number of deleted entities.
+    :rtype: int
+    """
+    created, state.created = state.created, []
+
+    results = bulk_apply(client.delete_entity, created, concurrency=concurrency)
+
+    return sum(1 for r in results if r.result and r.error is None)
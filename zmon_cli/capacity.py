@@ -0,0 +1,106 @@
+"""
+Forecast of ZMON worker load, see ``zmon capacity``.
+
+Workers run every active check definition every ``interval`` seconds for each entity it covers, so the expected rate
+of check invocations is the sum of covered entities divided by interval over all checks. The forecast can be compared
+with the rate observed from the ``check_invocations`` counters of ``zmon status``.
+"""
+from zmon_cli.entity_index import EntityIndex
+
+
+# Interval assumed for checks without valid interval, in seconds
+DEFAULT_INTERVAL = 60
+
+DEFAULT_TOP = 20
+
+
+def _interval(check):
+    interval = check.get('interval')
+    return interval if isinstance(interval, (int, float)) and interval > 0 else DEFAULT_INTERVAL
+
+
+def forecast(checks, entities, top=DEFAULT_TOP):
+    """
+    Estimate check invocations per second.
+
+    >>> result = forecast([{'id': 1, 'name': 'a', 'owning_team': 't', 'interval': 10, 'entities': [{'type': 'x'}]}],
+    ...                   [{'id': 'e1', 'type': 'x'}, {'id': 'e2', 'type': 'x'}])
+    >>> result['invocations_per_second'], result['top'][0]['entities']
+    (0.2, 2)
+
+    :param checks: Active check definitions.
+    :type checks: list
+
+    :param entities: All entities, or an :class:`zmon_cli.entity_index.EntityIndex`.
+    :type entities: list
+
+    :param top: Number of checks and teams with highest rate to return.
+    :type top: int
+
+    :return: Dict with numbers of ``checks`` and ``entities``, total ``invocations_per_second``, ``idle_checks``
+             (covering no entity), ``teams`` and ``top`` checks sorted by rate, with ``share`` of total rate.
+    :rtype: dict
+    """
+    index = entities if isinstance(entities, EntityIndex) else EntityIndex(entities)
+
+    rows = []
+    teams = {}
+
+    for check in checks:
+        covered = len(index.check_coverage(check))
+        interval = _interval(check)
+        rate = covered / interval
+
+        rows.append({
+            'id': check.get('id'),
+            'name': check.get('name'),
+            'owning_team': check.get('owning_team'),
+            'interval': interval,
+            'entities': covered,
+            'invocations_per_second': rate,
+        })
+
+        team = teams.setdefault(check.get('owning_team'), {
+            'team': check.get('owning_team'), 'checks': 0, 'entities': 0, 'invocations_per_second': 0})
+        team['checks'] += 1
+        team['entities'] += covered
+        team['invocations_per_second'] += rate
+
+    total = sum(r['invocations_per_second'] for r in rows)
+
+    def ranked(items):
+        items = sorted(items, key=lambda r: (-r['invocations_per_second'], str(r.get('id', r.get('team')))))
+        for item in items:
+            item['share'] = item['invocations_per_second'] / total if total else 0
+        return items
+
+    return {
+        'checks': len(rows),
+        'entities': len(index),
+        'invocations_per_second': total,
+        'idle_checks': sum(1 for r in rows if not r['entities']),
+        'teams': ranked(teams.values())[:top],
+        'top': ranked(rows)[:top],
+    }
+
+
+def observed_rate(before, after, elapsed):
+    """
+    Return observed invocations per second between two status responses.
+
+    Counters of restarted workers are reset, so only workers with growing counters are counted.
+
+    >>> observed_rate({'workers': [{'name': 'w1', 'check_invocations': 100}]},
+    ...               {'workers': [{'name': 'w1', 'check_invocations': 160}]}, 2)
+    30.0
+    """
+    counters = {w.get('name'): w.get('check_invocations') or 0 for w in before.get('workers', [])}
+
+    count = 0
+    for worker in after.get('workers', []):
+        previous = counters.get(worker.get('name'))
+        current = worker.get('check_invocations') or 0
+        if previous is not None and current >= previous:
+            count += current - previous
+
+    return count / elapsed if elapsed > 0 else 0.0
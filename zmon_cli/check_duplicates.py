@@ -0,0 +1,135 @@
+"""
+Detection of check definitions with identical or near-identical commands.
+
+Commands are compared by a hash of their normalised AST, so comments, whitespace and quoting do not matter. Near
+duplicates differ only in literal values (URLs, thresholds, queries) and in names of their local variables.
+"""
+import ast
+import hashlib
+import json
+
+from collections import OrderedDict
+
+
+KIND_IDENTICAL = 'identical'
+KIND_SIMILAR = 'similar'
+
+# Fields of checks in duplicate groups
+CHECK_FIELDS = ('id', 'name', 'owning_team', 'interval', 'entities', 'entities_exclude')
+
+
+def _literal_type(node):
+    for attr in ('value', 'n', 's'):
+        if hasattr(node, attr):
+            return type(getattr(node, attr)).__name__
+
+
+class _Canonicalizer(ast.NodeTransformer):
+    """Replace literals by their type and local variable names by their position."""
+
+    def __init__(self, names):
+        self.names = names
+
+    def visit_Name(self, node):
+        if node.id in self.names:
+            return ast.copy_location(ast.Name(id=self.names[node.id], ctx=node.ctx), node)
+        return node
+
+    def visit_literal(self, node):
+        if _literal_type(node) in ('bool', 'NoneType'):
+            return node
+        return ast.copy_location(ast.Name(id='<{}>'.format(_literal_type(node)), ctx=ast.Load()), node)
+
+    visit_Constant = visit_Num = visit_Str = visit_Bytes = visit_literal
+
+
+def normalize_command(src, canonical=False):
+    """
+    Return normalised AST dump of a check command. Raises :class:`SyntaxError` if it is invalid.
+
+    >>> normalize_command('x = 1  # one') == normalize_command("x=1")
+    True
+    >>> normalize_command('x = 1') == normalize_command('y = 2')
+    False
+    >>> normalize_command('x = 1', canonical=True) == normalize_command('y = 2', canonical=True)
+    True
+
+    :param src: Check command python source code.
+    :type src: str
+
+    :param canonical: Replace literals and local variable names.
+    :type canonical: bool
+
+    :rtype: str
+    """
+    tree = ast.parse(src)
+
+    if canonical:
+        names = OrderedDict()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store) and node.id not in names:
+                names[node.id] = '<var{}>'.format(len(names))
+
+        tree = _Canonicalizer(names).visit(tree)
+
+    return ast.dump(tree, annotate_fields=False)
+
+
+def command_hash(src, canonical=False):
+    """Return hash of normalised check command, see :func:`normalize_command`."""
+    return hashlib.sha256(normalize_command(src, canonical=canonical).encode('utf-8')).hexdigest()[:16]
+
+
+def entities_key(check):
+    """Return canonical JSON of entity filters of a check definition."""
+    return json.dumps([check.get('entities') or [], check.get('entities_exclude') or []], sort_keys=True)
+
+
+def find_duplicates(checks, similar=True):
+    """
+    Group check definitions with identical or, if ``similar`` is set, near-identical commands.
+
+    Checks with invalid commands are skipped.
+
+    :param checks: Check definitions.
+    :type checks: list
+
+    :param similar: Group near-identical commands as well.
+    :type similar: bool
+
+    :return: Groups of at least two checks, each a dict with ``kind`` (``identical`` or ``similar``), ``hash``,
+             number of distinct command ``variants`` and ``entity_filters``, and ``checks`` with their
+             ``command_hash``. Largest identical groups come first.
+    :rtype: list
+    """
+    groups = OrderedDict()
+
+    for check in sorted(checks, key=lambda c: c['id']):
+        command = check.get('command') or ''
+        try:
+            summary = {k: check.get(k) for k in CHECK_FIELDS}
+            summary['command_hash'] = command_hash(command)
+            key = command_hash(command, canonical=True) if similar else summary['command_hash']
+        except (SyntaxError, ValueError):
+            continue
+
+        groups.setdefault(key, []).append(summary)
+
+    result = []
+    for key, group in groups.items():
+        if len(group) < 2:
+            continue
+
+        variants = len({c['command_hash'] for c in group})
+
+        result.append({
+            'kind': KIND_IDENTICAL if variants == 1 else KIND_SIMILAR,
+            'hash': key,
+            'variants': variants,
+            'entity_filters': len({entities_key(c) for c in group}),
+            'checks': group,
+        })
+
+    result.sort(key=lambda g: (g['kind'] != KIND_IDENTICAL, -len(g['checks']), g['checks'][0]['id']))
+
+    return result
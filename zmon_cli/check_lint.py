@@ -0,0 +1,175 @@
+"""
+Linter of check commands flagging patterns which are expensive for ZMON workers.
+
+Check commands run on every ``interval`` for every matched entity, so each remote call, missing timeout or loop is
+multiplied by the number of entities. Findings have a severity of ``error``, ``warning`` or ``info``.
+"""
+import ast
+
+from collections import namedtuple
+
+
+SEVERITY_ERROR = 'error'
+SEVERITY_WARNING = 'warning'
+SEVERITY_INFO = 'info'
+
+SEVERITIES = (SEVERITY_ERROR, SEVERITY_WARNING, SEVERITY_INFO)
+
+# Check command functions doing network I/O on the worker
+REMOTE_FUNCTIONS = frozenset([
+    'appdynamics', 'cassandra', 'cloudwatch', 'elasticsearch', 'eventlog', 'history', 'http', 'jmx', 'joblocks',
+    'kairosdb', 'kubernetes', 'ldap', 'memcached', 'mongodb', 'mssql', 'mysql', 'nagios', 'orasql', 'ping', 'redis',
+    's3', 'scalyr', 'snmp', 'sql', 'tcp', 'zmon',
+])
+
+# Functions taking a ``timeout`` argument, which should be set explicitly
+TIMEOUT_FUNCTIONS = frozenset(['http'])
+
+# Remote calls per check run before it is flagged
+MAX_REMOTE_CALLS = 3
+
+# Intervals in seconds below which remote I/O is flagged as error or warning
+MIN_REMOTE_INTERVAL_ERROR = 15
+MIN_REMOTE_INTERVAL_WARNING = 60
+
+LOOP_NODES = (ast.For, ast.While, ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+
+Finding = namedtuple('Finding', 'line severity rule message')
+
+
+def _call_name(node):
+    func = node.func
+    if isinstance(func, ast.Name):
+        return func.id
+    if isinstance(func, ast.Attribute):
+        return func.attr
+
+
+def _is_true(node):
+    try:
+        return bool(ast.literal_eval(node))
+    except (ValueError, TypeError, RecursionError):
+        # e.g. names, unhashable set items or deeply nested literals
+        return False
+
+
+def _has_break(body):
+    """Return True if statements exit their loop: ``return`` and ``raise``, or ``break`` outside of nested loops."""
+    stack = [(node, False) for node in body]
+    while stack:
+        node, nested = stack.pop()
+        if isinstance(node, (ast.Return, ast.Raise)) or isinstance(node, ast.Break) and not nested:
+            return True
+        if not isinstance(node, (ast.FunctionDef, ast.Lambda)):
+            nested_loop = nested or isinstance(node, (ast.For, ast.While))
+            stack.extend((child, nested_loop) for child in ast.iter_child_nodes(node))
+    return False
+
+
+class CommandLinter(ast.NodeVisitor):
+    """AST visitor collecting findings and remote calls of a check command."""
+
+    def __init__(self):
+        self.findings = []
+        self.remote_calls = []
+        self._loops = 0
+
+    def add(self, node, severity, rule, message):
+        self.findings.append(Finding(getattr(node, 'lineno', 1), severity, rule, message))
+
+    def visit_Call(self, node):
+        name = _call_name(node)
+
+        if isinstance(node.func, ast.Name) and name in REMOTE_FUNCTIONS:
+            self.remote_calls.append(node)
+
+            if self._loops:
+                self.add(node, SEVERITY_WARNING, 'remote-call-in-loop',
+                         '{}() in a loop, one remote call per iteration'.format(name))
+
+            keywords = {k.arg for k in node.keywords}
+            # **kwargs might set the timeout (keyword without name, or ``kwargs`` attribute before Python 3.5)
+            if name in TIMEOUT_FUNCTIONS and 'timeout' not in keywords and None not in keywords and \
+                    not getattr(node, 'kwargs', None):
+                self.add(node, SEVERITY_WARNING, 'missing-timeout',
+                         '{}() without timeout, slow responses block the worker'.format(name))
+
+        elif name == 'sleep':
+            self.add(node, SEVERITY_ERROR, 'sleep', 'sleep() blocks the worker')
+
+        self.generic_visit(node)
+
+    def visit_While(self, node):
+        if _is_true(node.test) and not _has_break(node.body):
+            self.add(node, SEVERITY_ERROR, 'unbounded-loop', 'Loop without exit')
+        else:
+            self.add(node, SEVERITY_INFO, 'while-loop', 'Number of iterations depends on data, prefer for loops')
+
+        self._visit_loop(node)
+
+    def visit_For(self, node):
+        iterator = node.iter
+        if isinstance(iterator, ast.Call) and _call_name(iterator) in ('count', 'cycle', 'repeat') and \
+                len(iterator.args) < 2 and not _has_break(node.body):
+            self.add(node, SEVERITY_ERROR, 'unbounded-loop', 'Loop over endless iterator without exit')
+
+        self._visit_loop(node)
+
+    def _visit_loop(self, node):
+        self._loops += 1
+        self.generic_visit(node)
+        self._loops -= 1
+
+    visit_ListComp = visit_SetComp = visit_DictComp = visit_GeneratorExp = _visit_loop
+
+
+def lint_tree(tree, interval=None):
+    """
+    Lint parsed check command.
+
+    >>> lint_tree(ast.parse('http("http://example.org").json()'), interval=10)  # doctest: +NORMALIZE_WHITESPACE
+    [Finding(line=1, severity='error', rule='short-interval', message='Remote I/O every 10s'),
+     Finding(line=1, severity='warning', rule='missing-timeout',
+             message='http() without timeout, slow responses block the worker')]
+
+    :param tree: Module returned by :func:`ast.parse`.
+    :type tree: :class:`ast.Module`
+
+    :param interval: Check interval in seconds.
+    :type interval: int
+
+    :return: Findings sorted by line and severity.
+    :rtype: list
+    """
+    linter = CommandLinter()
+    linter.visit(tree)
+
+    findings = linter.findings
+    remote = linter.remote_calls
+
+    if len(remote) > MAX_REMOTE_CALLS:
+        findings.append(Finding(remote[MAX_REMOTE_CALLS].lineno, SEVERITY_WARNING, 'remote-calls',
+                                '{} remote calls per run, at most {} recommended'.format(
+                                    len(remote), MAX_REMOTE_CALLS)))
+
+    if remote and isinstance(interval, (int, float)) and interval < MIN_REMOTE_INTERVAL_WARNING:
+        severity = SEVERITY_ERROR if interval < MIN_REMOTE_INTERVAL_ERROR else SEVERITY_WARNING
+        findings.append(Finding(remote[0].lineno, severity, 'short-interval', 'Remote I/O every {}s'.format(interval)))
+
+    return sorted(findings, key=lambda f: (f.line, SEVERITIES.index(f.severity)))
+
+
+def lint_check_command(src, interval=None):
+    """
+    Lint check command source. Raises :class:`SyntaxError` if it is invalid.
+
+    :param src: Check command python source code.
+    :type src: str
+
+    :param interval: Check interval in seconds.
+    :type interval: int
+
+    :return: List of :class:`Finding`.
+    :rtype: list
+    """
+    return lint_tree(ast.parse(src), interval=interval)
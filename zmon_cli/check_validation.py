@@ -0,0 +1,263 @@
+"""
+Validation of check definition YAML files, e.g. of a repository of checks in CI. Check commands can be linted as well,
+see :mod:`zmon_cli.check_lint`.
+
+Files are validated in a process pool. Results are cached on disk by content hash, so unchanged files are not parsed
+again. Findings refer to lines of the YAML file, those of the check command to the line in its ``command`` block.
+"""
+import ast
+import functools
+import hashlib
+import json
+import os
+import platform
+import sys
+
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import yaml
+
+from zmon_cli.check_lint import SEVERITY_ERROR, Finding, lint_tree
+
+
+CACHE_VERSION = 2
+
+# Keep results of as many files in the cache
+MAX_CACHE_ENTRIES = 100000
+
+# Validate fewer files without starting a process pool
+MIN_POOL_FILES = 50
+
+CHECK_FILE_EXTENSIONS = ('.yaml', '.yml')
+
+LITERAL_SCALAR_STYLE = '|'
+
+
+def find_check_files(paths):
+    """
+    Return sorted YAML files in ``paths``, searching directories recursively.
+
+    :param paths: Files and directories.
+    :type paths: list
+
+    :rtype: list
+    """
+    files = set()
+
+    for path in paths:
+        if not os.path.isdir(path):
+            files.add(path)
+            continue
+
+        for root, dirs, names in os.walk(path):
+            dirs[:] = [d for d in dirs if not d.startswith('.')]
+            files.update(os.path.join(root, n) for n in names if n.endswith(CHECK_FILE_EXTENSIONS))
+
+    return sorted(files)
+
+
+def _value_node(node, name):
+    for key, value in node.value:
+        if isinstance(key, yaml.ScalarNode) and key.value == name:
+            return value
+
+
+def _interval(node):
+    interval = _value_node(node, 'interval')
+    try:
+        return int(interval.value)
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def validate_check_yaml(content, lint=False):
+    """
+    Validate check definition YAML and its command syntax, optionally linting the command.
+
+    >>> validate_check_yaml(b'name: x\\ncommand: |\\n  a = 1\\n  b = = 2\\n')
+    [Finding(line=4, severity='error', rule='syntax', message='Invalid check command: invalid syntax')]
+
+    :param content: File content.
+    :type content: bytes
+
+    :param lint: Add findings of :func:`zmon_cli.check_lint.lint_tree`.
+    :type lint: bool
+
+    :return: List of :class:`zmon_cli.check_lint.Finding`, lines of the YAML file start with 1.
+    :rtype: list
+    """
+    try:
+        node = yaml.compose(content, Loader=yaml.SafeLoader)
+    except yaml.YAMLError as e:
+        mark = getattr(e, 'problem_mark', None)
+        return [Finding(mark.line + 1 if mark else 1, SEVERITY_ERROR, 'yaml',
+                        'Invalid YAML: {}'.format(getattr(e, 'problem', None) or e))]
+
+    if not isinstance(node, yaml.MappingNode):
+        return [Finding(1, SEVERITY_ERROR, 'definition', 'Not a check definition')]
+
+    command = _value_node(node, 'command')
+    if command is None:
+        return [Finding(1, SEVERITY_ERROR, 'definition', 'Missing "command"')]
+
+    if not isinstance(command, yaml.ScalarNode):
+        return [Finding(command.start_mark.line + 1, SEVERITY_ERROR, 'definition', 'Check command must be a string')]
+
+    start_line = command.start_mark.line + 1
+    multi_line = '\n' in command.value.rstrip('\n')
+
+    def locate(finding):
+        if command.style == LITERAL_SCALAR_STYLE:
+            # Lines of literal block scalars are kept as they are, starting on the line after the indicator
+            return finding._replace(line=start_line + finding.line)
+        if multi_line:
+            # Folded and flow scalars join or split lines, so findings are reported where the command starts
+            message = '{} (line {} of command)'.format(finding.message, finding.line)
+            return finding._replace(line=start_line, message=message)
+        return finding._replace(line=start_line)
+
+    try:
+        tree = ast.parse(command.value)
+    except SyntaxError as e:
+        return [locate(Finding(e.lineno or 1, SEVERITY_ERROR, 'syntax', 'Invalid check command: {}'.format(e.msg)))]
+    except Exception as e:
+        return [Finding(start_line, SEVERITY_ERROR, 'syntax', 'Invalid check command: {}'.format(e))]
+
+    if not lint:
+        return []
+
+    return [locate(f) for f in lint_tree(tree, interval=_interval(node))]
+
+
+def cache_key(content, lint=False):
+    """Return cache key of file content. Results depend on the Python grammar, so its version is part of the key."""
+    digest = hashlib.sha256('{}:{}:{}:{}:'.format(CACHE_VERSION, platform.python_implementation(),
+                                                  sys.version_info[:2], lint).encode('utf-8'))
+    digest.update(content)
+    return digest.hexdigest()
+
+
+class ValidationCache:
+    """Validation results by content hash, stored in a JSON file.
+
+    Least recently used results beyond :data:`MAX_CACHE_ENTRIES` are dropped on :func:`ValidationCache.save`.
+
+    :param path: Cache file path.
+    :type path: str
+    """
+
+    def __init__(self, path, max_entries=MAX_CACHE_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._dirty = False
+
+        try:
+            with open(path) as fd:
+                data = json.load(fd, object_pairs_hook=OrderedDict)
+            if isinstance(data, dict):
+                self._entries = data
+        except (OSError, ValueError):
+            pass
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        findings = self._entries.pop(key, None)
+        if findings is not None:
+            # Keep used entries at the end, like recently added ones
+            self._entries[key] = findings
+            self._dirty = True
+            return [Finding(*f) for f in findings]
+
+    def set(self, key, findings):
+        self._entries.pop(key, None)
+        self._entries[key] = findings
+        self._dirty = True
+
+    def save(self):
+        if not self._dirty:
+            return
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+        tmp = '{}.{}.tmp'.format(self.path, os.getpid())
+        with open(tmp, 'w') as fd:
+            json.dump(self._entries, fd)
+        os.replace(tmp, self.path)
+
+        self._dirty = False
+
+
+def _read(path):
+    with open(path, 'rb') as fd:
+        return fd.read()
+
+
+def validate_files(paths, jobs=None, cache=None, lint=False):
+    """
+    Validate check definition files in parallel.
+
+    :param paths: YAML files, see :func:`find_check_files`.
+    :type paths: list
+
+    :param jobs: Number of worker processes. Default is the number of CPUs.
+    :type jobs: int
+
+    :param cache: Skip files validated before.
+    :type cache: :class:`ValidationCache`
+
+    :param lint: Lint check commands.
+    :type lint: bool
+
+    :return: Dict with number of ``files``, ``cached`` files and ``findings`` list of ``file``, ``line``,
+             ``severity``, ``rule`` and ``message``.
+    :rtype: dict
+    """
+    jobs = jobs or os.cpu_count() or 1
+
+    results = OrderedDict()
+    pending = []
+    cached = 0
+
+    for path in paths:
+        try:
+            content = _read(path)
+        except OSError as e:
+            results[path] = [Finding(1, SEVERITY_ERROR, 'file', 'Can not read file: {}'.format(e.strerror))]
+            continue
+
+        key = cache_key(content, lint=lint)
+        findings = cache.get(key) if cache is not None else None
+
+        if findings is None:
+            results[path] = None
+            pending.append((path, key, content))
+        else:
+            results[path] = findings
+            cached += 1
+
+    contents = [content for _, _, content in pending]
+    validate = functools.partial(validate_check_yaml, lint=lint)
+
+    if jobs > 1 and len(pending) >= MIN_POOL_FILES:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            validated = list(executor.map(validate, contents, chunksize=max(len(contents) // jobs // 4, 1)))
+    else:
+        validated = [validate(content) for content in contents]
+
+    for (path, key, _), findings in zip(pending, validated):
+        results[path] = findings
+        if cache is not None:
+            cache.set(key, findings)
+
+    return {
+        'files': len(results),
+        'cached': cached,
+        'findings': [dict(f._asdict(), file=path) for path, findings in results.items() for f in findings],
+    }
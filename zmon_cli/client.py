@@ -1,15 +1,23 @@
 import ast
+import codecs
 import logging
 import json
 import functools
 import re
+import threading
+import time
 
+from collections import OrderedDict
 from datetime import datetime
 from urllib.parse import urljoin, urlsplit, urlunsplit, SplitResult
 
 import requests
 
 from zmon_cli import __version__
+from zmon_cli.check_lint import lint_tree
+from zmon_cli.compact import CompactEntities
+from zmon_cli.timings import TimingAdapter
+from zmon_cli.tracing import FLOW_ID_HEADER, generate_id, get_flow_id, stage
 
 
 API_VERSION = 'v1'
@@ -38,10 +46,17 @@ DASHBOARD_VIEW_URL = '#/dashboards/views/'
 GRAFANA_DASHBOARD_URL = 'grafana/dashboard/db/'
 TOKEN_LOGIN_URL = 'tv/'
 
+# Bytes read at once from streamed responses
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Maximum number of responses cached by a session
+MAX_CACHED_RESPONSES = 1000
+
 logger = logging.getLogger(__name__)
 
 parentheses_re = re.compile('[(]+|[)]+')
 invalid_entity_id_re = re.compile('[^a-zA-Z0-9-@_.\[\]\:]+')
+json_whitespace_re = re.compile('[ \t\n\r]*')
 
 
 class JSONDateEncoder(json.JSONEncoder):
@@ -49,6 +64,85 @@ class JSONDateEncoder(json.JSONEncoder):
         return obj.isoformat() if isinstance(obj, datetime) else super().default(obj)
 
 
+def iter_json_array(chunks):
+    """
+    Decode items of a JSON array from chunks of bytes as soon as they are complete, without keeping the whole document
+    in memory.
+
+    >>> list(iter_json_array([b'[{"id": "a"}, {"i', b'd": "b"}, 1', b'2]']))
+    [{'id': 'a'}, {'id': 'b'}, 12]
+
+    :param chunks: Chunks of UTF-8 encoded JSON array, e.g. of ``Response.iter_content()``.
+    :type chunks: iterable
+
+    :return: Generator of array items. Raises :class:`ValueError` if the document is not a complete JSON array.
+    :rtype: generator
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+
+    buf = ''
+    # Expected next token: ``[``, a value or ``]`` after ``[``, a value after ``,``, ``,`` or ``]`` after a value, or
+    # only whitespace after ``]``
+    state = 'start'
+
+    chunks = iter(chunks)
+    eof = False
+
+    while not eof:
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            chunk, eof = b'', True
+
+        buf += text_decoder.decode(chunk, final=eof)
+        pos = 0
+
+        while True:
+            pos = json_whitespace_re.match(buf, pos).end()
+            if pos == len(buf):
+                break
+
+            char = buf[pos]
+
+            if state == 'start':
+                if char != '[':
+                    raise ValueError('Expected JSON array at: {!r}'.format(buf[pos:pos + 20]))
+                state = 'first'
+                pos += 1
+            elif state == 'end':
+                raise ValueError('Extra data after JSON array at: {!r}'.format(buf[pos:pos + 20]))
+            elif char == ']' and state in ('first', 'comma'):
+                state = 'end'
+                pos += 1
+            elif state == 'comma':
+                if char != ',':
+                    raise ValueError('Expected "," or "]" at: {!r}'.format(buf[pos:pos + 20]))
+                state = 'value'
+                pos += 1
+            else:
+                try:
+                    item, end = decoder.raw_decode(buf, pos)
+                except ValueError:
+                    if eof:
+                        raise
+                    break
+
+                # Numbers might continue in the next chunk, e.g. ``1`` of ``1.5`` or ``1e3``
+                if not eof and isinstance(item, (int, float)) and not isinstance(item, bool) and \
+                        (end == len(buf) or buf[end] in '.eE+-'):
+                    break
+
+                yield item
+                state = 'comma'
+                pos = end
+
+        buf = buf[pos:]
+
+    if state != 'end':
+        raise ValueError('Incomplete JSON array')
+
+
 class ZmonError(Exception):
     """ZMON client error."""
 
@@ -65,14 +159,31 @@ def logged(f):
     @functools.wraps(f)
     def wrapper(*args, **kwargs):
         try:
-            return f(*args, **kwargs)
+            with stage('send', f.__name__):
+                return f(*args, **kwargs)
         except:
-            logger.error('ZMON client failed in: {}'.format(f.__name__))
+            logger.error('ZMON client failed in: %s', f.__name__)
             raise
 
     return wrapper
 
 
+def log_response(resp, *args, **kwargs):
+    """Response hook logging request latency."""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+
+    duration = resp.elapsed.total_seconds() * 1000
+    extra = {
+        'http_method': resp.request.method,
+        'http_url': resp.request.url,
+        'http_status': resp.status_code,
+        'duration_ms': round(duration, 3),
+    }
+
+    logger.debug('%s %s %s %.1f ms', resp.request.method, resp.request.url, resp.status_code, duration, extra=extra)
+
+
 def compare_entities(e1, e2):
     try:
         e1_copy = e1.copy()
@@ -93,6 +204,85 @@ def get_valid_entity_id(e):
     return invalid_entity_id_re.sub('-', parentheses_re.sub(lambda m: '[' if '(' in m.group() else ']', e.lower()))
 
 
+class FlowIdSession(requests.Session):
+    """Requests session sending an ``X-Flow-ID`` header with every request.
+
+    :param flow_id: Flow ID. Default is the flow ID of the calling thread (see :func:`zmon_cli.tracing.get_flow_id`),
+                    or a random ID if none is set.
+    :type flow_id: str
+    """
+
+    def __init__(self, flow_id=None):
+        super().__init__()
+        self.flow_id = flow_id
+        self._default_flow_id = generate_id(16)
+
+    def get_flow_id(self):
+        return self.flow_id or get_flow_id() or self._default_flow_id
+
+    def prepare_request(self, request):
+        prepared = super().prepare_request(request)
+        prepared.headers[FLOW_ID_HEADER] = self.get_flow_id()
+        return prepared
+
+
+class CachedSession(FlowIdSession):
+    """Requests session caching successful ``GET`` responses for ``ttl`` seconds.
+
+    Any other request method (i.e. a modification) clears the whole cache. Expired responses are dropped when new ones
+    are cached, and at most ``max_entries`` responses are kept, so long running sessions do not grow.
+
+    :param ttl: Cache TTL in seconds.
+    :type ttl: int
+
+    :param max_entries: Maximum number of cached responses.
+    :type max_entries: int
+
+    :param flow_id: Flow ID, see :class:`FlowIdSession`.
+    :type flow_id: str
+    """
+
+    def __init__(self, ttl, max_entries=MAX_CACHED_RESPONSES, flow_id=None):
+        super().__init__(flow_id=flow_id)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # Ordered by expiry, all entries have the same TTL
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+    def request(self, method, url, params=None, **kwargs):
+        if method.upper() != 'GET':
+            self.clear_cache()
+            return super().request(method, url, params=params, **kwargs)
+
+        key = (url, json.dumps(params, sort_keys=True, default=str))
+        now = time.time()
+
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+
+        resp = super().request(method, url, params=params, **kwargs)
+
+        if resp.ok and not kwargs.get('stream'):
+            with self._lock:
+                self._cache.pop(key, None)
+                self._cache[key] = (now + self.ttl, resp)
+
+                while self._cache:
+                    expires, _ = next(iter(self._cache.values()))
+                    if expires > now and len(self._cache) <= self.max_entries:
+                        break
+                    self._cache.popitem(last=False)
+
+        return resp
+
+
 class Zmon:
     """ZMON client class that enables communication with ZMON backend.
 
@@ -116,10 +306,25 @@ class Zmon:
 
     :param user_agent: ZMON user agent. Default is generated by ZMON client and includes lib version.
     :type user_agent: str
+
+    :param cache_ttl: Cache successful ``GET`` responses for seconds. Default is 0 (no caching).
+    :type cache_ttl: int
+
+    :param collector: Record timings of all requests. Default is ``None``.
+    :type collector: :class:`zmon_cli.timings.TimingCollector`
+
+    :param transport: Transport adapter sending all requests, e.g. :class:`zmon_cli.har.ReplayAdapter`. It is
+                      responsible for recording timings. Default is ``None`` (HTTP).
+    :type transport: :class:`requests.adapters.BaseAdapter`
+
+    :param flow_id: Sent as ``X-Flow-ID`` header with every request. Default is the flow ID of the calling thread, see
+                    :func:`zmon_cli.tracing.get_flow_id`, or a random ID.
+    :type flow_id: str
     """
 
     def __init__(
-            self, url, token=None, username=None, password=None, timeout=10, verify=True, user_agent=ZMON_USER_AGENT):
+            self, url, token=None, username=None, password=None, timeout=10, verify=True, user_agent=ZMON_USER_AGENT,
+            cache_ttl=0, collector=None, transport=None, flow_id=None):
         """Initialize ZMON client."""
         self.timeout = timeout
 
@@ -127,9 +332,18 @@ class Zmon:
         self.base_url = urlunsplit(SplitResult(split.scheme, split.netloc, '', '', ''))
         self.url = urljoin(self.base_url, self._join_path(['api', API_VERSION, '']))
 
-        self._session = requests.Session()
+        self._session = CachedSession(cache_ttl, flow_id=flow_id) if cache_ttl else FlowIdSession(flow_id=flow_id)
+
+        if transport is not None:
+            self._session.mount('https://', transport)
+            self._session.mount('http://', transport)
+        elif collector is not None:
+            adapter = TimingAdapter(collector)
+            self._session.mount('https://', adapter)
+            self._session.mount('http://', adapter)
 
         self._session.timeout = timeout
+        self._session.hooks['response'].append(log_response)
         self.user_agent = user_agent
 
         if username and password and token is None:
@@ -149,25 +363,42 @@ class Zmon:
     def session(self):
         return self._session
 
+    @property
+    def flow_id(self):
+        return self._session.get_flow_id()
+
     @staticmethod
     def is_valid_entity_id(entity_id):
         return invalid_entity_id_re.search(entity_id) is None
 
     @staticmethod
-    def validate_check_command(src):
+    def validate_check_command(src, lint=False, interval=None):
         """
         Validates if ``check command`` is valid syntax. Raises exception in case of invalid syntax.
 
         :param src: Check command python source code.
         :type src: str
 
+        :param lint: Lint the command for patterns expensive for ZMON workers, see :mod:`zmon_cli.check_lint`.
+        :type lint: bool
+
+        :param interval: Check interval in seconds, used by the linter.
+        :type interval: int
+
+        :return: List of :class:`zmon_cli.check_lint.Finding` if ``lint`` is set, otherwise ``None``.
+        :rtype: list
+
         :raises: ZmonError
         """
         try:
-            ast.parse(src)
+            with stage('validate', 'check_command'):
+                tree = ast.parse(src)
         except Exception as e:
             raise ZmonError('Invalid check command: {}'.format(e))
 
+        if lint:
+            return lint_tree(tree, interval=interval)
+
     def _join_path(self, parts):
         return '/'.join(str(p).strip('/') for p in parts)
 
@@ -270,7 +501,7 @@ class Zmon:
 ########################################################################################################################
 
     @logged
-    def get_entities(self, query=None) -> list:
+    def get_entities(self, query=None, compact=False) -> list:
         """
         Get ZMON entities, with optional filtering.
 
@@ -278,11 +509,18 @@ class Zmon:
                       all entities of type: ``instance``.
         :type query: dict
 
+        :param compact: Return a read-only :class:`zmon_cli.compact.CompactEntities` sequence of mappings, which takes
+                        a fraction of the memory of a list of dicts. Default is ``False``.
+        :type compact: bool
+
         :return: List of entities.
         :rtype: list
         """
+        if compact:
+            return CompactEntities(self.iter_entities(query=query))
+
         query_str = json.dumps(query) if query else ''
-        logger.debug('Retrieving entities with query: {} ...'.format(query_str))
+        logger.debug('Retrieving entities with query: %s ...', query_str)
 
         params = {'query': query_str} if query else None
 
@@ -290,6 +528,31 @@ class Zmon:
 
         return self.json(resp)
 
+    @logged
+    def iter_entities(self, query=None, chunk_size=STREAM_CHUNK_SIZE):
+        """
+        Iterate ZMON entities, with optional filtering, decoding them while the response is streamed. Unlike
+        :func:`Zmon.get_entities`, memory does not grow with the number of entities.
+
+        :param query: Entity filtering query, see :func:`Zmon.get_entities`.
+        :type query: dict
+
+        :param chunk_size: Bytes read from the response at once.
+        :type chunk_size: int
+
+        :return: Generator of entities.
+        :rtype: generator
+        """
+        query_str = json.dumps(query) if query else ''
+        logger.debug('Streaming entities with query: %s ...', query_str)
+
+        params = {'query': query_str} if query else None
+
+        resp = self.session.get(self.endpoint(ENTITIES), params=params, stream=True)
+        resp.raise_for_status()
+
+        return iter_json_array(resp.iter_content(chunk_size))
+
     @logged
     def get_entity(self, entity_id: str) -> str:
         """
@@ -301,7 +564,7 @@ class Zmon:
         :return: Entity dict.
         :rtype: dict
         """
-        logger.debug('Retrieving entities with id: {} ...'.format(entity_id))
+        logger.debug('Retrieving entities with id: %s ...', entity_id)
 
         resp = self.session.get(self.endpoint(ENTITIES, entity_id, trailing_slash=False))
         return self.json(resp)
@@ -321,13 +584,14 @@ class Zmon:
         :return: Response object.
         :rtype: :class:`requests.Response`
         """
-        if 'id' not in entity or 'type' not in entity:
-            raise ZmonArgumentError('Entity "id" and "type" are required.')
+        with stage('validate', 'entity'):
+            if 'id' not in entity or 'type' not in entity:
+                raise ZmonArgumentError('Entity "id" and "type" are required.')
 
-        if not self.is_valid_entity_id(entity['id']):
-            raise ZmonArgumentError('Invalid entity ID.')
+            if not self.is_valid_entity_id(entity['id']):
+                raise ZmonArgumentError('Invalid entity ID.')
 
-        logger.debug('Adding new entity: {} ...'.format(entity['id']))
+        logger.debug('Adding new entity: %s ...', entity['id'])
 
         data = json.dumps(entity, cls=JSONDateEncoder)
         resp = self.session.put(self.endpoint(ENTITIES, trailing_slash=False), data=data)
@@ -351,7 +615,7 @@ class Zmon:
         :return: True if succeeded, False otherwise.
         :rtype: bool
         """
-        logger.debug('Removing existing entity: {} ...'.format(entity_id))
+        logger.debug('Removing existing entity: %s ...', entity_id)
 
         resp = self.session.delete(self.endpoint(ENTITIES, entity_id))
 
@@ -378,6 +642,18 @@ class Zmon:
 
         return self.json(resp)
 
+    @logged
+    def get_dashboards(self) -> list:
+        """
+        Return list of all ZMON dashboards.
+
+        :return: List of dashboards.
+        :rtype: list
+        """
+        resp = self.session.get(self.endpoint(DASHBOARD))
+
+        return self.json(resp)
+
     @logged
     def update_dashboard(self, dashboard: dict) -> dict:
         """
@@ -392,7 +668,7 @@ class Zmon:
         :rtype: dict
         """
         if 'id' in dashboard and dashboard['id']:
-            logger.debug('Updating dashboard with ID: {} ...'.format(dashboard['id']))
+            logger.debug('Updating dashboard with ID: %s ...', dashboard['id'])
 
             resp = self.session.post(self.endpoint(DASHBOARD, dashboard['id']), json=dashboard)
         else:
@@ -799,15 +1075,15 @@ class Zmon:
         resp = self.session.delete(self.endpoint(GROUPS, group_name, 'active'))
 
         if not resp.ok:
-            logger.error('Failed to de-activate group: {}'.format(group_name))
+            logger.error('Failed to de-activate group: %s', group_name)
             resp.raise_for_status()
 
-        logger.debug('Switching active user: {}'.format(user_name))
+        logger.debug('Switching active user: %s', user_name)
 
         resp = self.session.put(self.endpoint(GROUPS, group_name, 'active', user_name))
 
         if not resp.ok:
-            logger.error('Failed to switch active user {}'.format(user_name))
+            logger.error('Failed to switch active user %s', user_name)
             resp.raise_for_status()
 
         return resp.text == '1'
@@ -1,7 +1,12 @@
 from zmon_cli.cmds.command import cli
 
 from zmon_cli.cmds.alert import alert_definitions
+from zmon_cli.cmds.batch import batch
+from zmon_cli.cmds.bench import bench
+from zmon_cli.cmds.capacity import capacity
 from zmon_cli.cmds.check import check_definitions
+from zmon_cli.cmds.completion import completion
+from zmon_cli.cmds.daemon import daemon
 from zmon_cli.cmds.dashboard import dashboard
 from zmon_cli.cmds.data import data
 from zmon_cli.cmds.downtime import downtimes
@@ -9,13 +14,20 @@ from zmon_cli.cmds.entity import entities
 from zmon_cli.cmds.grafana import grafana
 from zmon_cli.cmds.group import groups, members
 from zmon_cli.cmds.search import search
+from zmon_cli.cmds.shell import shell
+from zmon_cli.cmds.standin import standin
 from zmon_cli.cmds.token import tv_tokens
 
 
 __all__ = (
     alert_definitions,
+    batch,
+    bench,
+    capacity,
     check_definitions,
     cli,
+    completion,
+    daemon,
     dashboard,
     data,
     downtimes,
@@ -24,5 +36,7 @@ __all__ = (
     groups,
     members,
     search,
+    shell,
+    standin,
     tv_tokens,
 )
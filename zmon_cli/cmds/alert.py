@@ -1,4 +1,5 @@
 import json
+import time
 
 import yaml
 
@@ -6,9 +7,14 @@ import click
 
 from clickclick import AliasedGroup, Action, ok
 
-from zmon_cli.cmds.command import cli, get_client, yaml_output_option, output_option, pretty_json
-from zmon_cli.output import dump_yaml, Output, render_alerts
+from zmon_cli.cmds.command import cli, get_client, yaml_output_option, output_option, pretty_json, parse_duration
+from zmon_cli.output import dump_yaml, Output, render_alerts, render_backtest, render_coverage
 from zmon_cli.client import ZmonArgumentError
+from zmon_cli.config import get_cache_dir
+from zmon_cli.entity_index import EntityIndex
+from zmon_cli.history import HistoryStore
+from zmon_cli.backtest import BacktestError, get_parameters, sweep
+from zmon_cli.tracing import stage
 
 
 @cli.group('alert-definitions', cls=AliasedGroup)
@@ -118,7 +124,8 @@ def create_alert_definition(obj, yaml_file):
     """Create a single alert definition"""
     client = get_client(obj.config)
 
-    alert = yaml.safe_load(yaml_file)
+    with stage('parse', 'alert_definition'):
+        alert = yaml.safe_load(yaml_file)
 
     alert['last_modified_by'] = obj.config.get('user', 'unknown')
 
@@ -135,7 +142,8 @@ def create_alert_definition(obj, yaml_file):
 @click.pass_obj
 def update_alert_definition(obj, yaml_file):
     """Update a single alert definition"""
-    alert = yaml.safe_load(yaml_file)
+    with stage('parse', 'alert_definition'):
+        alert = yaml.safe_load(yaml_file)
 
     alert['last_modified_by'] = obj.config.get('user', 'unknown')
 
@@ -166,6 +174,74 @@ def delete_alert_definition(obj, alert_id):
         client.delete_alert_definition(alert_id)
 
 
+@alert_definitions.command('backtest')
+@click.argument('yaml_file', type=click.File('rb'))
+@click.option('--history', 'history_dir', metavar='PATH',
+              help='Local alert history directory. Default is "history" in the cache directory')
+@click.option('--alert-id', help='Replay recorded data of this alert. Default is "id" of the alert definition')
+@click.option('-C', '--condition', multiple=True,
+              help='Candidate condition replacing the alert condition. Multiple conditions are supported.')
+@click.option('-p', '--param', multiple=True, metavar='NAME=VALUE',
+              help='Candidate parameter value. Multiple values per parameter are supported.')
+@click.option('-s', '--since', callback=parse_duration, help='Only replay samples newer than duration, e.g. 7d')
+@click.pass_obj
+@output_option
+@pretty_json
+def backtest_alert_definition(obj, yaml_file, history_dir, alert_id, condition, param, since, output, pretty):
+    """Replay alert condition over recorded alert data"""
+    with stage('parse', 'alert_definition'):
+        alert = yaml.safe_load(yaml_file)
+
+    alert_id = alert_id or alert.get('id')
+    if not alert_id:
+        raise click.UsageError('Alert definition has no "id", use --alert-id')
+
+    overrides = {}
+    for p in param:
+        name, sep, value = p.partition('=')
+        if not sep:
+            raise click.BadParameter('Expected NAME=VALUE, got "{}"'.format(p), param_hint='--param')
+        overrides.setdefault(name, []).append(yaml.safe_load(value))
+
+    store = HistoryStore(history_dir or get_cache_dir(obj.config, 'history'))
+
+    with Output('Replaying alert {} ...'.format(alert_id), nl=True, output=output, pretty_json=pretty,
+                printer=render_backtest) as act:
+        series = store.series(alert_id, since=time.time() - since if since else None)
+        if not series:
+            act.error('No recorded data for alert {}'.format(alert_id))
+            return
+
+        try:
+            results = sweep(series, condition or [alert['condition']], get_parameters(alert), overrides)
+            act.echo(results)
+        except BacktestError as e:
+            act.error(str(e))
+
+
+@alert_definitions.command('coverage')
+@click.argument('alert_id', type=int)
+@click.pass_obj
+@output_option
+@pretty_json
+def alert_coverage(obj, alert_id, output, pretty):
+    """List entities covered by an alert definition"""
+    client = get_client(obj.config)
+
+    with Output('Retrieving alert and check definitions and entities ...', nl=True, output=output, pretty_json=pretty,
+                printer=render_coverage) as act:
+        alert = client.get_alert_definition(alert_id)
+        check = client.get_check_definition(alert['check_definition_id'])
+        entities = client.get_entities()
+
+        with stage('compute', 'coverage'):
+            index = EntityIndex(entities)
+            coverage = index.summary(index.alert_coverage(alert, check))
+
+        act.echo(dict(coverage, definition='Alert definition {}'.format(alert_id), name=alert.get('name'),
+                      check_definition_id=check.get('id')))
+
+
 @alert_definitions.command('help')
 @click.pass_context
 def help(ctx):
@@ -0,0 +1,71 @@
+import click
+
+from zmon_cli.batch import BatchError, parse_batch, run_batch
+from zmon_cli.cmds.command import cli, get_root_options, output_option, pretty_json, run_command, session_cache
+from zmon_cli.output import Output, render_batch, render_batch_step
+
+
+# Commands which can not run as batch steps
+NON_BATCH_COMMANDS = {'batch', 'configure', 'daemon', 'shell', 'standin'}
+
+
+@cli.command()
+@click.argument('batch_file', type=click.File('r'))
+@click.option('--jobs', '-j', type=int, default=4, help='Maximum number of parallel steps. Default is 4')
+@click.option('--keep-going', '-k', is_flag=True, help='Run remaining steps after a step failed.')
+@click.option('--cache-ttl', type=int, default=60,
+              help='Cache GET responses across steps for seconds. Default is 60, 0 disables caching')
+@click.pass_context
+@output_option
+@pretty_json
+def batch(ctx, batch_file, jobs, keep_going, cache_ttl, output, pretty):
+    """
+    Run a batch of zmon commands in one session
+
+    BATCH_FILE has one command per line, or a YAML list of steps. Use "-" to read from stdin.
+
+    Consecutive lines ending with "&" (or steps of a YAML "parallel" list) are independent and run in parallel.
+
+    Example:
+
+        $ zmon batch runbook.txt
+
+        $ zmon batch steps.yaml -k -o json
+    """
+    try:
+        groups = parse_batch(batch_file.read())
+    except BatchError as e:
+        raise click.UsageError('Invalid batch file: {}'.format(e))
+
+    root = ctx.find_root()
+
+    for group in groups:
+        for step in group:
+            cmd = root.command.get_command(root, step['argv'][0])
+            if cmd is None or cmd.name in NON_BATCH_COMMANDS:
+                raise click.UsageError('Step {}: command "{}" can not run in batch'.format(
+                    step['step'], step['argv'][0]))
+
+    # Steps inherit global options of the batch invocation
+    prefix = get_root_options(ctx)
+
+    def execute(argv):
+        return run_command(root.command, prefix + argv)
+
+    callback = render_batch_step if output == 'text' else None
+
+    enabled = session_cache.enabled
+    if not enabled:
+        session_cache.enable(cache_ttl=cache_ttl)
+
+    try:
+        results = run_batch(groups, execute, jobs=jobs, keep_going=keep_going, callback=callback)
+    finally:
+        if not enabled:
+            session_cache.disable()
+
+    with Output('', output=output, pretty_json=pretty, printer=render_batch) as act:
+        act.echo(results)
+
+    if any(r['exit_code'] != 0 for r in results):
+        ctx.exit(1)
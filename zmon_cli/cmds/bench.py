@@ -0,0 +1,71 @@
+import click
+
+from zmon_cli.bench import (DEFAULT_CONCURRENCY, DEFAULT_DURATION, DEFAULT_MIX, OPERATIONS, BenchError, BenchState,
+                            cleanup, parse_mix, prepare, run_bench)
+from zmon_cli.cmds.command import cli, get_client, output_option, parse_duration, pretty_json
+from zmon_cli.concurrency import set_pool_size
+from zmon_cli.output import Output, render_bench
+
+
+def validate_mix(ctx, param, value):
+    try:
+        return parse_mix(value)
+    except BenchError as e:
+        raise click.BadParameter(str(e))
+
+
+@cli.command()
+@click.option('--mix', default=DEFAULT_MIX, callback=validate_mix,
+              help='Comma separated operations with optional weights. Default is "{}". Operations: {}'.format(
+                  DEFAULT_MIX, ', '.join(OPERATIONS)))
+@click.option('--concurrency', type=click.IntRange(1), default=DEFAULT_CONCURRENCY,
+              help='Number of concurrent workers. Default is {}'.format(DEFAULT_CONCURRENCY))
+@click.option('--rate', type=click.FloatRange(0, min_open=True),
+              help='Target operations per second. Default is to run operations back-to-back.')
+@click.option('--duration', callback=parse_duration,
+              help='Run duration, e.g. 30s or 5m. Default is {}s unless --requests is set'.format(DEFAULT_DURATION))
+@click.option('--requests', 'requests_limit', type=click.IntRange(1), help='Stop after number of operations.')
+@click.option('--warmup', callback=parse_duration, default='0', help='Exclude first seconds from results, e.g. 5s.')
+@click.option('--seed', type=int, help='Random seed of operation choice.')
+@click.option('--no-cleanup', is_flag=True, help='Keep entities created by "add-entity" operations.')
+@click.pass_obj
+@output_option
+@pretty_json
+def bench(obj, mix, concurrency, rate, duration, requests_limit, warmup, seed, no_cleanup, output, pretty):
+    """
+    Benchmark ZMON with a mix of client operations
+
+    Reports throughput, latency percentiles and errors per operation. With --rate, latency is measured from the
+    scheduled start, so it includes queueing if ZMON can not keep up.
+
+    Example:
+
+        $ zmon bench --mix add-entity=1,alert-data=4 --concurrency 16 --duration 1m -o json > controller-v1.json
+
+        $ zmon bench --mix entity --rate 200 --requests 10000
+    """
+    if duration is None and requests_limit is None:
+        duration = DEFAULT_DURATION
+
+    # Responses must not come from the session cache of daemon or shell
+    client = get_client(obj.config, cached=False)
+    set_pool_size(client.session, concurrency)
+
+    state = BenchState()
+
+    with Output('Preparing benchmark ...', output=output):
+        try:
+            prepare(client, mix, state)
+        except BenchError as e:
+            raise click.ClickException(str(e))
+
+    with Output('Running benchmark ...', output=output):
+        result = run_bench(client, mix, concurrency=concurrency, rate=rate, duration=duration,
+                           requests_limit=requests_limit, warmup=warmup, seed=seed, state=state)
+
+    if state.created and not no_cleanup:
+        with Output('Deleting {} benchmark entities ...'.format(len(state.created)), output=output):
+            result['cleaned_up'] = cleanup(client, state, concurrency=concurrency)
+
+    with Output('', output=output, pretty_json=pretty, printer=render_bench) as act:
+        act.echo(result)
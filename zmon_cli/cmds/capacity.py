@@ -0,0 +1,74 @@
+import time
+
+import click
+import yaml
+
+from zmon_cli.capacity import DEFAULT_TOP, forecast, observed_rate
+from zmon_cli.cmds.command import cli, get_client, output_option, parse_duration, pretty_json
+from zmon_cli.output import Output, render_capacity
+from zmon_cli.tracing import stage
+
+
+@cli.command()
+@click.option('--top', type=click.IntRange(1), default=DEFAULT_TOP,
+              help='Number of checks and teams to list. Default is {}'.format(DEFAULT_TOP))
+@click.option('--observe', callback=parse_duration, default='10s',
+              help='Measure invocation rate from worker counters over duration, 0 to skip. Default is 10s')
+@click.option('--entities-file', type=click.File('rb'),
+              help='Read entities from JSON or YAML file, e.g. written by "zmon entities -o json", instead of ZMON.')
+@click.pass_obj
+@output_option
+@pretty_json
+def capacity(obj, top, observe, entities_file, output, pretty):
+    """
+    Forecast ZMON worker load
+
+    Estimates check invocations per second from intervals and covered entities of all active check definitions, per
+    check, per team and in total. The forecast is compared with the rate of "check_invocations" counters of workers.
+
+    Example:
+
+        $ zmon capacity --top 10
+
+        $ zmon entities -o json > entities.json && zmon capacity --entities-file entities.json --observe 0
+    """
+    # Worker counters must not come from the session cache of daemon or shell
+    client = get_client(obj.config, cached=False)
+
+    with Output('Retrieving check definitions and entities ...', output=output):
+        if observe:
+            before = client.status()
+            started = time.monotonic()
+
+        checks = client.get_check_definitions()
+
+        if entities_file:
+            with stage('parse', 'entities'):
+                entities = yaml.safe_load(entities_file)
+        else:
+            entities = client.get_entities()
+
+    with stage('compute', 'capacity'):
+        result = forecast(checks, entities, top=top)
+
+    result['observed'] = None
+
+    if observe:
+        with Output('Observing worker counters ...', output=output):
+            remaining = observe - (time.monotonic() - started)
+            if remaining > 0:
+                time.sleep(remaining)
+
+            after = client.status()
+            elapsed = time.monotonic() - started
+
+        rate = observed_rate(before, after, elapsed)
+        result['observed'] = {
+            'invocations_per_second': rate,
+            'duration': elapsed,
+            'workers': len(after.get('workers', [])),
+            'ratio': rate / result['invocations_per_second'] if result['invocations_per_second'] else None,
+        }
+
+    with Output('', output=output, pretty_json=pretty, printer=render_capacity) as act:
+        act.echo(result)
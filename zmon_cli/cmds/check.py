@@ -1,12 +1,26 @@
+import threading
+
 import yaml
 
 import click
 
-from clickclick import AliasedGroup, Action, ok
+from clickclick import AliasedGroup, Action, action, error, info, ok, warning
 
 from zmon_cli.cmds.command import cli, get_client, yaml_output_option, pretty_json, output_option
-from zmon_cli.output import dump_yaml, Output, render_checks
-from zmon_cli.client import ZmonArgumentError
+from zmon_cli.output import (dump_yaml, Output, render_check_alerts, render_checks, render_coverage,
+                             render_duplicates, render_validation)
+from zmon_cli.check_duplicates import find_duplicates
+from zmon_cli.check_lint import SEVERITIES, SEVERITY_ERROR
+from zmon_cli.check_validation import ValidationCache, find_check_files, validate_files
+from zmon_cli.client import ZmonArgumentError, ZmonError
+from zmon_cli.concurrency import DEFAULT_CONCURRENCY, bulk_apply, set_pool_size
+from zmon_cli.config import get_cache_dir
+from zmon_cli.definitions import find_orphans, join_alerts
+from zmon_cli.entity_index import EntityIndex
+from zmon_cli.tracing import stage
+
+
+VALIDATION_CACHE_FILE = 'check-validation.json'
 
 
 @cli.group('check-definitions', cls=AliasedGroup)
@@ -100,18 +114,182 @@ def filter_check_definitions(obj, field, value, output, pretty):
         act.echo(filtered)
 
 
+@check_definitions.command('alerts')
+@click.option('--team', '-t', multiple=True, help='Only list checks of owning team.')
+@click.pass_obj
+@output_option
+@pretty_json
+def check_alerts(obj, team, output, pretty):
+    """List active check definitions with their alert definitions"""
+    client = get_client(obj.config)
+
+    with Output('Retrieving active check and alert definitions ...', nl=True, output=output, pretty_json=pretty,
+                printer=render_check_alerts) as act:
+        checks = client.get_check_definitions()
+        alerts = client.get_alert_definitions()
+
+        with stage('compute', 'join'):
+            joined, dangling = join_alerts(checks, alerts)
+
+        act.echo({
+            'checks': [{'id': check['id'], 'name': check.get('name'), 'owning_team': check.get('owning_team'),
+                        'alerts': [{k: a.get(k) for k in ('id', 'name', 'team')} for a in check_alerts]}
+                       for check, check_alerts in joined if not team or check.get('owning_team') in team],
+            'dangling_alerts': [{k: a.get(k) for k in ('id', 'name', 'team', 'check_definition_id')}
+                                for a in dangling],
+        })
+
+
+@check_definitions.command('orphans')
+@click.option('--team', '-t', multiple=True, help='Only orphan checks of owning team.')
+@click.option('--delete', is_flag=True, help='Delete orphan check definitions.')
+@click.option('--dry-run', is_flag=True, help='With --delete, only show which check definitions would be deleted.')
+@click.option('--yes', '-y', is_flag=True, help='Delete without confirmation.')
+@click.option('--concurrency', type=click.IntRange(1), default=DEFAULT_CONCURRENCY,
+              help='Number of concurrent deletions. Default is {}'.format(DEFAULT_CONCURRENCY))
+@click.option('--rate', type=click.FloatRange(0, min_open=True), help='Maximum deletions per second.')
+@click.pass_context
+@output_option
+@pretty_json
+def orphans(ctx, team, delete, dry_run, yes, concurrency, rate, output, pretty):
+    """
+    List or delete active check definitions without alert definitions
+
+    Example:
+
+        $ zmon check-definitions orphans -t my-team --delete --dry-run
+
+        $ zmon check-definitions orphans -t my-team --delete --rate 5
+    """
+    client = get_client(ctx.obj.config)
+
+    with Output('Retrieving active check and alert definitions ...', output=output):
+        checks = client.get_check_definitions()
+        alerts = client.get_alert_definitions()
+
+        with stage('compute', 'join'):
+            found = [c for c in find_orphans(checks, alerts) if not team or c.get('owning_team') in team]
+
+    if not delete:
+        for check in found:
+            check['link'] = client.check_definition_url(check)
+
+        with Output('', output=output, pretty_json=pretty, printer=render_checks) as act:
+            act.echo(found)
+        return
+
+    if not found:
+        info('No orphan check definitions')
+        return
+
+    if not dry_run and not yes:
+        click.confirm('Delete {} orphan check definitions?'.format(len(found)), abort=True)
+
+    set_pool_size(client.session, concurrency)
+
+    lock = threading.Lock()
+
+    def report(result):
+        check = result.item
+        with lock:
+            action('{} check definition {} "{}" ...'.format('Would delete' if dry_run else 'Deleting', check['id'],
+                                                            check.get('name')))
+            if result.error is not None:
+                error(' FAILED: {}'.format(result.error))
+            else:
+                ok(' SKIPPED' if dry_run else ' OK')
+
+    with stage('delete', 'check_definitions'):
+        results = bulk_apply(lambda c: client.delete_check_definition(c['id']), found, concurrency=concurrency,
+                             rate=rate, dry_run=dry_run, callback=report)
+
+    failed = sum(1 for r in results if r.error is not None)
+
+    if dry_run:
+        info('{} orphan check definitions would be deleted'.format(len(results)))
+    else:
+        info('Deleted {} of {} orphan check definitions'.format(len(results) - failed, len(results)))
+
+    if failed:
+        ctx.exit(1)
+
+
+@check_definitions.command('coverage')
+@click.argument('check_id', type=int)
+@click.pass_obj
+@output_option
+@pretty_json
+def check_coverage(obj, check_id, output, pretty):
+    """List entities covered by a check definition"""
+    client = get_client(obj.config)
+
+    with Output('Retrieving check definition and entities ...', nl=True, output=output, pretty_json=pretty,
+                printer=render_coverage) as act:
+        check = client.get_check_definition(check_id)
+        entities = client.get_entities()
+
+        with stage('compute', 'coverage'):
+            index = EntityIndex(entities)
+            coverage = index.summary(index.check_coverage(check))
+
+        act.echo(dict(coverage, definition='Check definition {}'.format(check_id), name=check.get('name')))
+
+
+@check_definitions.command('duplicates')
+@click.option('--exact', is_flag=True, help='Only group identical commands.')
+@click.option('--team', '-t', multiple=True, help='Only report groups with checks of team.')
+@click.pass_obj
+@output_option
+@pretty_json
+def duplicates(obj, exact, team, output, pretty):
+    """
+    Find active check definitions with identical or near-identical commands
+
+    Commands are compared ignoring comments, whitespace and quoting. Near-identical commands differ only in literals
+    and local variable names. Groups with the same entity filters are candidates for consolidation.
+    """
+    client = get_client(obj.config)
+
+    with Output('Retrieving active check definitions ...', nl=True, output=output, pretty_json=pretty,
+                printer=render_duplicates) as act:
+        checks = client.get_check_definitions()
+
+        with stage('compute', 'duplicates'):
+            groups = find_duplicates(checks, similar=not exact)
+
+        if team:
+            groups = [g for g in groups if any(c['owning_team'] in team for c in g['checks'])]
+
+        act.echo(groups)
+
+
 @check_definitions.command('update')
 @click.argument('yaml_file', type=click.File('rb'))
 @click.option('--skip-validation', is_flag=True, help='Skip check command syntax validation.')
+@click.option('--lint', is_flag=True, help='Lint check command, refusing to update on errors.')
 @click.pass_obj
-def update(obj, yaml_file, skip_validation):
+def update(obj, yaml_file, skip_validation, lint):
     """Update a single check definition"""
-    check = yaml.safe_load(yaml_file)
+    with stage('parse', 'check_definition'):
+        check = yaml.safe_load(yaml_file)
 
     check['last_modified_by'] = obj.get('user', 'unknown')
 
     client = get_client(obj.config)
 
+    if lint and not skip_validation:
+        try:
+            findings = client.validate_check_command(check.get('command', ''), lint=True,
+                                                     interval=check.get('interval'))
+        except ZmonError as e:
+            raise click.ClickException(str(e))
+
+        for f in findings:
+            warning('Line {}: {} [{}] {}'.format(f.line, f.severity, f.rule, f.message))
+
+        if any(f.severity == SEVERITY_ERROR for f in findings):
+            raise click.ClickException('Check command has lint errors, not updating')
+
     with Action('Updating check definition ...', nl=True) as act:
         try:
             check = client.update_check_definition(check, skip_validation=skip_validation)
@@ -120,6 +298,49 @@ def update(obj, yaml_file, skip_validation):
             act.error(str(e))
 
 
+@check_definitions.command('validate')
+@click.argument('paths', nargs=-1, required=True, type=click.Path(exists=True))
+@click.option('-j', '--jobs', type=click.IntRange(1), help='Number of worker processes. Default is number of CPUs')
+@click.option('--no-cache', is_flag=True, help='Validate all files, ignoring results of unchanged files.')
+@click.option('--lint', is_flag=True, help='Lint check commands for patterns expensive for ZMON workers.')
+@click.option('--fail-on', type=click.Choice(SEVERITIES), default=SEVERITY_ERROR,
+              help='Exit with 1 on findings of severity or higher. Default is error')
+@click.pass_context
+@output_option
+@pretty_json
+def validate(ctx, paths, jobs, no_cache, lint, fail_on, output, pretty):
+    """
+    Validate check definition YAML files
+
+    Directories are searched for YAML files recursively. Exits with 1 if any file is invalid.
+
+    With --lint, check commands are checked for http() calls without timeout, unbounded loops, many remote calls per
+    run and short intervals with remote I/O.
+
+    Example:
+
+        $ zmon check-definitions validate checks/
+
+        $ zmon check-definitions validate --lint --fail-on warning checks/
+    """
+    files = find_check_files(paths)
+
+    cache = None if no_cache else ValidationCache(get_cache_dir(ctx.obj.config, VALIDATION_CACHE_FILE))
+
+    with stage('validate', 'check_definitions'):
+        result = validate_files(files, jobs=jobs, cache=cache, lint=lint)
+
+    if cache is not None:
+        cache.save()
+
+    with Output('', output=output, pretty_json=pretty, printer=render_validation) as act:
+        act.echo(result)
+
+    failing = SEVERITIES[:SEVERITIES.index(fail_on) + 1]
+    if any(f['severity'] in failing for f in result['findings']):
+        ctx.exit(1)
+
+
 @check_definitions.command('delete')
 @click.argument('check_id', type=int)
 @click.pass_obj
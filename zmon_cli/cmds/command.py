@@ -1,6 +1,12 @@
 import click
 import logging
 import os
+import threading
+import time
+
+import requests
+
+from collections import OrderedDict
 
 from clickclick import AliasedGroup
 from easydict import EasyDict
@@ -8,11 +14,15 @@ from easydict import EasyDict
 from zmon_cli import __version__
 
 from zmon_cli.config import DEFAULT_CONFIG_FILE
-from zmon_cli.config import get_config_data, configure_logging, set_config_file
+from zmon_cli.config import get_config_data, get_zmon_token, configure_logging, set_config_file
 
-from zmon_cli.output import Output, render_status
+from zmon_cli.output import Output, log_http_exception, render_status, render_timings
 
 from zmon_cli.client import Zmon
+from zmon_cli.har import LATENCY_ORIGINAL, LATENCY_ZERO, HarError, HarRecorder, ReplayAdapter, load_har
+from zmon_cli.profiling import CPUProfile, MemoryTrace, DEFAULT_LIMIT as DEFAULT_PROFILE_LIMIT
+from zmon_cli.timings import TimingCollector
+from zmon_cli.tracing import Tracer, generate_id, get_flow_id, get_tracer, set_flow_id, set_tracer, stage
 
 
 CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help'])
@@ -26,6 +36,99 @@ yaml_output_option = click.option('-o', '--output', type=click.Choice(['text', '
 pretty_json = click.option('--pretty', is_flag=True,
                            help='Pretty print JSON output. Ignored if output format is not JSON')
 
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+DEFAULT_SESSION_CACHE_TTL = 60
+DEFAULT_SESSION_CONFIG_TTL = 300
+
+# Clients kept by the session cache, least recently used clients beyond are closed
+MAX_SESSION_CLIENTS = 16
+
+
+class SessionCache:
+    """Configs and clients kept across commands by long running processes (e.g. ``zmon daemon``).
+
+    Disabled by default: every command then parses its config file and creates a fresh client.
+    """
+
+    def __init__(self, max_clients=MAX_SESSION_CLIENTS):
+        self.enabled = False
+        self.cache_ttl = 0
+        self.config_ttl = 0
+        self.max_clients = max_clients
+        self._configs = {}
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+
+    def enable(self, cache_ttl=DEFAULT_SESSION_CACHE_TTL, config_ttl=DEFAULT_SESSION_CONFIG_TTL):
+        """
+        Keep configs and clients.
+
+        :param cache_ttl: Response cache TTL of kept clients in seconds.
+        :type cache_ttl: int
+
+        :param config_ttl: Re-read config (and token) after seconds, or earlier if the config file was modified.
+        :type config_ttl: int
+        """
+        self.enabled = True
+        self.cache_ttl = cache_ttl
+        self.config_ttl = config_ttl
+
+    def disable(self):
+        self.enabled = False
+        self._configs.clear()
+        self._clients.clear()
+
+    def clear_cache(self):
+        """Drop cached responses of kept clients, keeping their connections."""
+        with self._lock:
+            clients = list(self._clients.values())
+
+        for client in clients:
+            if hasattr(client.session, 'clear_cache'):
+                client.session.clear_cache()
+
+    def get_config(self, config_file):
+        if not self.enabled:
+            return get_config_data(config_file)
+
+        fn = os.path.expanduser(config_file)
+        mtime = os.path.getmtime(fn)
+
+        with self._lock:
+            cached = self._configs.get(fn)
+            if not cached or cached[0] != mtime or cached[1] < time.time():
+                cached = (mtime, time.time() + self.config_ttl, get_config_data(config_file))
+                self._configs[fn] = cached
+
+        return dict(cached[2])
+
+    def get_client(self, key, factory):
+        evicted = []
+
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._clients[key] = factory()
+                while len(self._clients) > self.max_clients:
+                    evicted.append(self._clients.popitem(last=False)[1])
+            else:
+                self._clients.move_to_end(key)
+
+        for old in evicted:
+            old.session.close()
+
+        return client
+
+
+session_cache = SessionCache()
+
+# Collector of request timings of the running command, see ``--timings``
+timing_collector = None
+
+# Transport adapter of the running command, see ``--replay``
+transport = None
+
 
 def print_version(ctx, param, value):
     if not value or ctx.resilient_parsing:
@@ -34,17 +137,210 @@ def print_version(ctx, param, value):
     ctx.exit()
 
 
-def get_client(config):
+def parse_duration(ctx, param, value):
+    """Click callback converting durations like ``90``, ``30s``, ``5m`` or ``7d`` into seconds."""
+    if value is None:
+        return None
+
+    unit = value[-1:].lower()
+    number = value[:-1] if unit in DURATION_UNITS else value
+
+    try:
+        return int(float(number) * DURATION_UNITS.get(unit, 1))
+    except (ValueError, OverflowError):
+        raise click.BadParameter('Invalid duration "{}", use e.g. 30s, 5m, 1h or 7d'.format(value))
+
+
+def parse_positive_duration(ctx, param, value):
+    """Click callback like :func:`parse_duration`, rejecting durations of zero or less."""
+    seconds = parse_duration(ctx, param, value)
+    if seconds is not None and seconds <= 0:
+        raise click.BadParameter('Duration must be positive, e.g. 30s, 5m, 1h or 7d')
+    return seconds
+
+
+def refresh_token_on_unauthorized(client, config):
+    """Drop the cached OAuth token and retry once with a new token, if the API rejects a request with 401."""
+    def retry(resp, **kwargs):
+        if resp.status_code != 401 or getattr(resp.request, 'token_refreshed', False):
+            return resp
+
+        config['token'] = get_zmon_token(config, refresh=True)
+        client.session.headers['Authorization'] = 'Bearer {}'.format(config['token'])
+
+        request = resp.request.copy()
+        request.headers['Authorization'] = client.session.headers['Authorization']
+        request.token_refreshed = True
+
+        # Release the connection of the rejected response
+        resp.close()
+
+        return client.session.send(request, **kwargs)
+
+    client.session.hooks['response'].append(retry)
+
+
+def get_client(config, cached=True):
     verify = config.get('verify', True)
+    refresh_token = False
 
     if 'user' in config and 'password' in config:
-        return Zmon(config['url'], username=config['user'], password=config['password'], verify=verify)
+        auth = {'username': config['user'], 'password': config['password']}
     elif os.environ.get('ZMON_TOKEN'):
-        return Zmon(config['url'], token=os.environ.get('ZMON_TOKEN'), verify=verify)
+        auth = {'token': os.environ.get('ZMON_TOKEN')}
     elif 'token' in config:
-        return Zmon(config['url'], token=config['token'], verify=verify)
+        auth = {'token': config['token']}
+        refresh_token = config.get('cached_token', False)
+    else:
+        raise RuntimeError('Failed to intitialize ZMON client. Invalid configuration!')
+
+    collector = timing_collector
+
+    def create(**kwargs):
+        # Clients send the flow ID of the command running in the calling thread, also when kept by session cache
+        client = Zmon(config['url'], verify=verify, collector=collector, transport=transport, **dict(auth, **kwargs))
+        if refresh_token:
+            refresh_token_on_unauthorized(client, config)
+        return client
+
+    if not cached or not session_cache.enabled:
+        return create()
+
+    key = (config['url'], verify, tuple(sorted(auth.items())), collector, transport)
+
+    return session_cache.get_client(key, lambda: create(cache_ttl=session_cache.cache_ttl))
+
 
-    raise RuntimeError('Failed to intitialize ZMON client. Invalid configuration!')
+def enable_timings(ctx):
+    """Record timings of all requests of the command, reporting them on stderr when the command finished."""
+    global timing_collector
+
+    # With --trace, the tracer collects timings as well
+    tracer = get_tracer()
+    collector = tracer if tracer is not None and tracer is timing_collector else TimingCollector()
+
+    previous, timing_collector = timing_collector, collector
+    started = time.perf_counter()
+
+    def report():
+        global timing_collector
+
+        collector, timing_collector = timing_collector, previous
+        render_timings(collector, time.perf_counter() - started)
+
+    ctx.call_on_close(report)
+
+
+def enable_tracing(ctx, path):
+    """Trace requests and stages of the command, appending spans to ``path`` when the command finished."""
+    global timing_collector
+
+    tracer = Tracer(trace_id=get_flow_id())
+    previous_tracer = set_tracer(tracer)
+    previous_collector, timing_collector = timing_collector, tracer
+
+    logging.getLogger(__name__).info('Trace ID: %s', tracer.trace_id)
+
+    root = tracer.start_span('zmon')
+
+    def export():
+        global timing_collector
+
+        timing_collector = previous_collector
+        set_tracer(previous_tracer)
+
+        command = ctx.command.get_command(ctx, ctx.invoked_subcommand) if ctx.invoked_subcommand else None
+        if command is not None:
+            root['name'] = 'zmon {}'.format(command.name)
+        tracer.finish_span(root)
+        tracer.export(path)
+
+    ctx.call_on_close(export)
+
+
+def enable_recording(ctx, path):
+    """Record requests and responses of the command, writing them as HAR to ``path`` when the command finished."""
+    global timing_collector
+
+    recorder = HarRecorder(collector=timing_collector)
+    previous, timing_collector = timing_collector, recorder
+
+    def save():
+        global timing_collector
+
+        timing_collector = previous
+        recorder.save(path)
+        logging.getLogger(__name__).info('Recorded %s requests to %s', len(recorder.records), path)
+
+    ctx.call_on_close(save)
+
+
+def enable_replay(ctx, path, latency):
+    """Answer requests of the command from a HAR capture."""
+    global transport
+
+    try:
+        har = load_har(path)
+    except HarError as e:
+        raise click.BadParameter(str(e), param_hint='--replay')
+
+    previous, transport = transport, ReplayAdapter(har, latency=latency, collector=timing_collector)
+
+    def restore():
+        global transport
+
+        transport = previous
+
+    ctx.call_on_close(restore)
+
+
+def get_root_options(ctx):
+    """Return global options of the running command, to be passed on to commands run in-process."""
+    params = ctx.find_root().params
+
+    options = ['--config-file', params['config_file'], '--log-format', params['log_format']]
+    if params['verbose']:
+        options.append('--verbose')
+
+    return options
+
+
+def run_command(group, argv, color=None):
+    """
+    Run a command line in-process, e.g. by ``zmon daemon`` or ``zmon batch``.
+
+    Errors are reported the way the ``zmon`` entry point reports them, output goes to current ``sys.stdout`` and
+    ``sys.stderr``.
+
+    :param group: Root click group.
+    :type group: :class:`click.Group`
+
+    :param argv: Command line arguments, without program name.
+    :type argv: list
+
+    :return: Exit code.
+    :rtype: int
+    """
+    try:
+        rv = group.main(args=argv, prog_name='zmon', standalone_mode=False, color=color)
+        return rv if isinstance(rv, int) else 0
+    except click.exceptions.Exit as e:
+        return e.exit_code
+    except click.ClickException as e:
+        e.show()
+        return e.exit_code
+    except click.Abort:
+        click.echo('Aborted!', err=True)
+        return 1
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else 1
+    except requests.HTTPError as e:
+        log_http_exception(e)
+        return 1
+    except Exception as e:
+        logging.getLogger(__name__).exception('Command failed: %s', argv)
+        click.echo('Error: {}'.format(e), err=True)
+        return 1
 
 
 ########################################################################################################################
@@ -54,19 +350,67 @@ def get_client(config):
 @click.group(cls=AliasedGroup, context_settings=CONTEXT_SETTINGS)
 @click.option('-c', '--config-file', help='Use alternative config file', default=DEFAULT_CONFIG_FILE, metavar='PATH')
 @click.option('-v', '--verbose', help='Verbose logging', is_flag=True)
+@click.option('--log-format', type=click.Choice(['text', 'json']), default='text', envvar='ZMON_LOG_FORMAT',
+              help='Log file format. JSON records of requests include latency fields')
 @click.option('-V', '--version', is_flag=True, callback=print_version, expose_value=False, is_eager=True)
+@click.option('--timings', is_flag=True, help='Print request waterfall and latency percentiles per endpoint on exit')
+@click.option('--trace', 'trace_file', metavar='PATH', envvar='ZMON_TRACE_FILE',
+              help='Append spans (Zipkin v2 JSON lines) of requests and stages to PATH')
+@click.option('--profile', 'profile_file', metavar='PATH', help='Run command under CPU profiler, writing stats to PATH')
+@click.option('--trace-malloc', is_flag=True, help='Trace memory allocations, reporting peak and top allocation sites')
+@click.option('--profile-limit', type=int, default=DEFAULT_PROFILE_LIMIT, metavar='N',
+              help='Number of entries in profile summaries. Default is {}'.format(DEFAULT_PROFILE_LIMIT))
+@click.option('--record', 'record_file', metavar='PATH',
+              help='Record requests and responses with timings to PATH (HAR), credentials are left out')
+@click.option('--replay', 'replay_file', metavar='PATH', help='Answer requests from HAR file recorded with --record')
+@click.option('--replay-latency', type=click.Choice([LATENCY_ORIGINAL, LATENCY_ZERO]), default=LATENCY_ORIGINAL,
+              help='Delay replayed responses by recorded time, or not at all. Default is original')
 @click.pass_context
-def cli(ctx, config_file, verbose):
+def cli(ctx, config_file, verbose, log_format, timings, trace_file, profile_file, trace_malloc, profile_limit,
+        record_file, replay_file, replay_latency):
     """
     ZMON command line interface
     """
-    configure_logging(logging.DEBUG if verbose else logging.INFO)
+    configure_logging(logging.DEBUG if verbose else logging.INFO, log_format=log_format)
+
+    # Sent as X-Flow-ID with every request of the command
+    previous_flow_id = set_flow_id(generate_id(16))
+    ctx.call_on_close(lambda: set_flow_id(previous_flow_id))
+    logging.getLogger(__name__).debug('Flow ID: %s', get_flow_id())
+
+    if record_file and replay_file:
+        raise click.UsageError('--record and --replay can not be used together')
+
+    if trace_file:
+        enable_tracing(ctx, trace_file)
+
+    if timings:
+        enable_timings(ctx)
+
+    # Recording and replay use the timing collector of the options above
+    if record_file:
+        enable_recording(ctx, record_file)
+
+    if replay_file:
+        enable_replay(ctx, replay_file, replay_latency)
+
+    # Profilers are started last (and stopped first), so reports of other options are not profiled
+    if trace_malloc:
+        memory_trace = MemoryTrace(profile_limit)
+        memory_trace.start()
+        ctx.call_on_close(memory_trace.stop)
+
+    if profile_file:
+        cpu_profile = CPUProfile(profile_file, profile_limit)
+        cpu_profile.start()
+        ctx.call_on_close(cpu_profile.stop)
 
     fn = os.path.expanduser(config_file)
     config = {}
 
     if os.path.exists(fn):
-        config = get_config_data(config_file)
+        with stage('parse', 'config'):
+            config = session_cache.get_config(config_file)
 
     ctx.obj = EasyDict(config=config)
 
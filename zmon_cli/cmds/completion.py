@@ -0,0 +1,49 @@
+import click
+
+from clickclick import AliasedGroup, Action, warning
+
+from zmon_cli.cmds.command import cli, get_client, CONTEXT_SETTINGS
+from zmon_cli.completion import build_command_index, get_index_dir, write_index
+from zmon_cli.config import get_cache_dir
+
+
+@cli.group('completion', cls=AliasedGroup)
+@click.pass_obj
+def completion(obj):
+    """Manage shell completion index"""
+    pass
+
+
+@completion.command('update')
+@click.option('--commands-only', is_flag=True, help='Only update subcommands and options, skip fetching IDs.')
+@click.pass_obj
+def update(obj, commands_only):
+    """Update completion index of subcommands and IDs"""
+    index_dir = get_cache_dir(obj.config, 'completion')
+
+    with Action('Updating subcommands ...'):
+        write_index(index_dir, commands=build_command_index(cli, CONTEXT_SETTINGS['help_option_names']))
+
+    if not commands_only:
+        client = get_client(obj.config)
+
+        with Action('Updating check definition IDs ...'):
+            write_index(index_dir, ids={'checks': [(c['id'], c.get('name')) for c in client.get_check_definitions()]})
+
+        with Action('Updating alert definition IDs ...'):
+            write_index(index_dir, ids={'alerts': [(a['id'], a.get('name')) for a in client.get_alert_definitions()]})
+
+        with Action('Updating dashboard IDs ...'):
+            write_index(index_dir, ids={'dashboards': [(d['id'], d.get('name')) for d in client.get_dashboards()]})
+
+        with Action('Updating entity IDs ...'):
+            write_index(index_dir, ids={'entities': [(e['id'], e.get('type')) for e in client.get_entities()]})
+
+    if index_dir != get_index_dir():
+        warning('Export ZMON_COMPLETION_DIR={} to use this index for shell completion'.format(index_dir))
+
+
+@completion.command('help')
+@click.pass_context
+def help(ctx):
+    print(ctx.parent.get_help())
@@ -0,0 +1,101 @@
+import os
+import subprocess
+import sys
+import time
+
+import click
+
+from clickclick import AliasedGroup, Action, info
+
+from zmon_cli import daemon as zmon_daemon
+from zmon_cli.cmds.command import cli, session_cache, DEFAULT_SESSION_CACHE_TTL, DEFAULT_SESSION_CONFIG_TTL
+
+
+START_TIMEOUT = 10
+
+
+def daemon_status():
+    try:
+        for response in zmon_daemon.request({'command': 'status'}):
+            return response.get('status')
+    except OSError:
+        return None
+
+
+@cli.group('daemon', cls=AliasedGroup)
+@click.pass_obj
+def daemon(obj):
+    """
+    Manage background daemon keeping clients and caches warm
+
+    While the daemon is running, zmon commands are executed by the daemon. Set ZMON_NO_DAEMON=1 to bypass it.
+    """
+    pass
+
+
+@daemon.command('start')
+@click.option('--foreground', is_flag=True, help='Run daemon in the foreground.')
+@click.option('--idle-timeout', type=int, help='Stop daemon after seconds without any command.')
+@click.option('--cache-ttl', type=int, default=DEFAULT_SESSION_CACHE_TTL,
+              help='Cache GET responses for seconds. Default is {}'.format(DEFAULT_SESSION_CACHE_TTL))
+@click.option('--config-ttl', type=int, default=DEFAULT_SESSION_CONFIG_TTL,
+              help='Re-read config files and tokens after seconds. Default is {}'.format(DEFAULT_SESSION_CONFIG_TTL))
+@click.pass_obj
+def start(obj, foreground, idle_timeout, cache_ttl, config_ttl):
+    """Start daemon"""
+    path = zmon_daemon.get_socket_path()
+
+    if foreground:
+        session_cache.enable(cache_ttl=cache_ttl, config_ttl=config_ttl)
+        try:
+            zmon_daemon.Daemon(path, idle_timeout=idle_timeout).run(cli)
+        finally:
+            session_cache.disable()
+        return
+
+    with Action('Starting ZMON daemon ...') as act:
+        if daemon_status():
+            act.warning('already running')
+            return
+
+        args = [sys.executable, '-m', 'zmon_cli', 'daemon', 'start', '--foreground', '--cache-ttl', str(cache_ttl),
+                '--config-ttl', str(config_ttl)]
+        if idle_timeout:
+            args += ['--idle-timeout', str(idle_timeout)]
+
+        subprocess.Popen(args, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                         start_new_session=True, env=dict(os.environ, ZMON_NO_DAEMON='1'))
+
+        deadline = time.time() + START_TIMEOUT
+        while not daemon_status():
+            if time.time() > deadline:
+                act.error('Daemon did not start, see /tmp/zmon-cli.log')
+                return
+            time.sleep(0.1)
+
+
+@daemon.command('stop')
+def stop():
+    """Stop daemon"""
+    with Action('Stopping ZMON daemon ...') as act:
+        try:
+            list(zmon_daemon.request({'command': 'stop'}))
+        except OSError:
+            act.warning('not running')
+
+
+@daemon.command('status')
+def status():
+    """Show daemon status"""
+    status = daemon_status()
+
+    if not status:
+        info('ZMON daemon is not running')
+    else:
+        info('ZMON daemon is running: pid={pid} uptime={uptime}s commands={served}'.format(**status))
+
+
+@daemon.command('help')
+@click.pass_context
+def help(ctx):
+    print(ctx.parent.get_help())
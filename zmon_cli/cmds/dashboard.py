@@ -6,6 +6,7 @@ from clickclick import AliasedGroup, Action, ok
 
 from zmon_cli.cmds.command import cli, get_client, yaml_output_option, pretty_json
 from zmon_cli.output import dump_yaml, Output
+from zmon_cli.tracing import stage
 
 
 @cli.group('dashboard', cls=AliasedGroup)
@@ -60,7 +61,7 @@ def dashboard_update(obj, yaml_file):
     """Create/Update a single ZMON dashboard"""
     client = get_client(obj.config)
     dashboard = {}
-    with open(yaml_file, 'rb') as f:
+    with open(yaml_file, 'rb') as f, stage('parse', 'dashboard'):
         dashboard = yaml.safe_load(f)
 
     msg = 'Creating new dashboard ...'
@@ -1,16 +1,50 @@
+import time
+
 import click
+import requests
+
+from clickclick import AliasedGroup, action, ok
+
+from zmon_cli.cmds.command import cli, get_client, yaml_output_option, pretty_json, parse_duration
+from zmon_cli.config import get_cache_dir
+from zmon_cli.history import HistoryStore, aggregate, AGGREGATES, DEFAULT_CAPACITY
+from zmon_cli.output import Output, log_http_exception
+
+
+class DataGroup(AliasedGroup):
+    """Group falling back to ``get`` to keep supporting ``zmon data <alert_id> [entity_ids]``."""
+
+    def parse_args(self, ctx, args):
+        # Options like ``-o json`` before the alert ID belong to ``get`` as well
+        if args and args[0] not in ctx.help_option_names and \
+                not any(c.startswith(args[0]) for c in self.list_commands(ctx)):
+            args.insert(0, 'get')
+
+        return super().parse_args(ctx, args)
+
+
+history_dir_option = click.option('--history-dir', metavar='PATH',
+                                  help='Local alert history directory. Default is "history" in the cache directory')
 
-from zmon_cli.cmds.command import cli, get_client, yaml_output_option, pretty_json
-from zmon_cli.output import Output
 
+def get_history_store(obj, history_dir, capacity=DEFAULT_CAPACITY):
+    return HistoryStore(history_dir or get_cache_dir(obj.config, 'history'), capacity=capacity)
 
-@cli.command()
+
+@cli.group('data', cls=DataGroup)
+@click.pass_obj
+def data(obj):
+    """Get, record and query check data for alerts"""
+    pass
+
+
+@data.command('get')
 @click.argument('alert_id')
 @click.argument('entity_ids', nargs=-1)
 @click.pass_obj
 @yaml_output_option
 @pretty_json
-def data(obj, alert_id, entity_ids, output, pretty):
+def get_data(obj, alert_id, entity_ids, output, pretty):
     """Get check data for alert and entities"""
     client = get_client(obj.config)
 
@@ -25,3 +59,73 @@ def data(obj, alert_id, entity_ids, output, pretty):
         values = {v['entity']: v['results'][0]['value'] for v in result if len(v['results'])}
 
         act.echo(values)
+
+
+@data.command('record')
+@click.argument('alert_ids', nargs=-1, required=True)
+@click.option('-i', '--interval', default='60s', callback=parse_duration, help='Polling interval. Default is 60s')
+@click.option('-n', '--count', type=int, help='Stop after number of polls. Default is to poll until interrupted')
+@click.option('--capacity', type=int, default=DEFAULT_CAPACITY,
+              help='Samples kept per entity for new entities. Default is {}'.format(DEFAULT_CAPACITY))
+@click.option('-f', '--field', help='Record this key of dict check values')
+@history_dir_option
+@click.pass_obj
+def record(obj, alert_ids, interval, count, capacity, field, history_dir):
+    """Poll alert data and record it in local history"""
+    client = get_client(obj.config)
+    store = get_history_store(obj, history_dir, capacity=capacity)
+
+    polls = 0
+    while count is None or polls < count:
+        started = time.time()
+
+        for alert_id in alert_ids:
+            action('Recording alert {} data ...'.format(alert_id))
+            try:
+                stored = store.record(alert_id, client.get_alert_data(alert_id), field=field)
+                ok(' {} samples'.format(stored))
+            except requests.HTTPError as e:
+                log_http_exception(e)
+
+        polls += 1
+        if count is None or polls < count:
+            time.sleep(max(0, interval - (time.time() - started)))
+
+
+@data.command('history')
+@click.argument('alert_id')
+@click.argument('entity_ids', nargs=-1)
+@click.option('-s', '--since', callback=parse_duration, help='Only samples newer than duration, e.g. 1h or 7d')
+@click.option('-w', '--window', callback=parse_duration, help='Aggregate in windows of duration, e.g. 5m')
+@click.option('-a', '--aggregate', 'func', type=click.Choice(AGGREGATES),
+              help='Aggregate samples. Default is "avg" if --window is used, otherwise raw samples are returned')
+@history_dir_option
+@click.pass_obj
+@yaml_output_option
+@pretty_json
+def history(obj, alert_id, entity_ids, since, window, func, history_dir, output, pretty):
+    """Query recorded alert data"""
+    store = get_history_store(obj, history_dir)
+
+    if window and not func:
+        func = 'avg'
+
+    with Output('Reading alert history ...', nl=True, output=output, pretty_json=pretty) as act:
+        series = store.series(alert_id, entity_ids=entity_ids, since=time.time() - since if since else None)
+
+        result = {}
+        for entity_id, (timestamps, values) in series.items():
+            if func:
+                samples = aggregate(timestamps, values, window=window, func=func)
+            else:
+                samples = zip(timestamps, values)
+
+            result[entity_id] = [[ts, value] for ts, value in samples]
+
+        act.echo(result)
+
+
+@data.command('help')
+@click.pass_context
+def help(ctx):
+    print(ctx.parent.get_help())
@@ -1,26 +1,36 @@
 import os
 import json
+import threading
+
 import yaml
 
 import requests
 import click
 
-from clickclick import AliasedGroup, Action, action, ok
+from clickclick import AliasedGroup, Action, action, error, info, ok
 
-from zmon_cli.cmds.command import cli, get_client, output_option, yaml_output_option, pretty_json
-from zmon_cli.output import render_entities, Output, log_http_exception
+from zmon_cli.cmds.command import (cli, get_client, output_option, parse_positive_duration, yaml_output_option,
+                                   pretty_json)
+from zmon_cli.output import (render_entities, render_entity_stats, render_monitors, render_stale, Output,
+                             log_http_exception)
 
 from zmon_cli.client import ZmonArgumentError
-
-from calendar import timegm
-from time import strptime
+from zmon_cli.concurrency import DEFAULT_CONCURRENCY, bulk_apply, set_pool_size
+from zmon_cli.entity_age import find_stale, parse_last_modified
+from zmon_cli.entity_index import find_monitors
+from zmon_cli.entity_stats import entity_stats
+from zmon_cli.tracing import stage
 
 
 def entity_last_modified(e):
-    try:
-        return timegm(strptime(e.get('last_modified'), '%Y-%m-%d %H:%M:%S.%f'))
-    except:
-        return 0
+    return parse_last_modified(e.get('last_modified')) or 0
+
+
+def stream_entities(client, types=None):
+    """Stream entities of all or some types, see :func:`zmon_cli.client.Zmon.iter_entities`."""
+    if types:
+        return (e for t in types for e in client.iter_entities(query={'type': t}))
+    return client.iter_entities()
 
 
 ########################################################################################################################
@@ -78,11 +88,12 @@ def push_entity(obj, entity):
     """Push one or more entities"""
     client = get_client(obj.config)
 
-    if (entity.endswith('.json') or entity.endswith('.yaml')) and os.path.exists(entity):
-        with open(entity, 'rb') as fd:
-            data = yaml.safe_load(fd)
-    else:
-        data = json.loads(entity)
+    with stage('parse', 'entities'):
+        if (entity.endswith('.json') or entity.endswith('.yaml')) and os.path.exists(entity):
+            with open(entity, 'rb') as fd:
+                data = yaml.safe_load(fd)
+        else:
+            data = json.loads(entity)
 
     if not isinstance(data, list):
         data = [data]
@@ -114,6 +125,129 @@ def delete_entity(obj, entity_id):
             act.error('Failed')
 
 
+@entities.command('monitors')
+@click.argument('entity_id')
+@click.pass_obj
+@output_option
+@pretty_json
+def entity_monitors(obj, entity_id, output, pretty):
+    """List check and alert definitions covering an entity"""
+    client = get_client(obj.config)
+
+    with Output('Retrieving entity, check and alert definitions ...', nl=True, output=output, pretty_json=pretty,
+                printer=render_monitors) as act:
+        entity = client.get_entity(entity_id)
+        if not entity:
+            act.error('Entity {} not found'.format(entity_id))
+            return
+
+        checks, alerts = find_monitors(entity, client.get_check_definitions(), client.get_alert_definitions())
+
+        act.echo({
+            'entity_id': entity_id,
+            'checks': [{k: c.get(k) for k in ('id', 'name', 'owning_team', 'interval')} for c in checks],
+            'alerts': [{k: a.get(k) for k in ('id', 'name', 'team', 'responsible_team', 'priority',
+                                              'check_definition_id')} for a in alerts],
+        })
+
+
+@entities.command('stale')
+@click.option('--older-than', required=True, callback=parse_positive_duration,
+              help='Minimum time since last modification, e.g. 7d.')
+@click.option('--type', '-t', 'entity_type', multiple=True, help='Only entities of type.')
+@click.option('--purge', is_flag=True, help='Delete stale entities.')
+@click.option('--dry-run', is_flag=True, help='With --purge, only show which entities would be deleted.')
+@click.option('--yes', '-y', is_flag=True, help='Delete without confirmation.')
+@click.option('--concurrency', type=click.IntRange(1), default=DEFAULT_CONCURRENCY,
+              help='Number of concurrent deletions. Default is {}'.format(DEFAULT_CONCURRENCY))
+@click.option('--rate', type=click.FloatRange(0, min_open=True), help='Maximum deletions per second.')
+@click.pass_context
+@output_option
+@pretty_json
+def stale_entities(ctx, older_than, entity_type, purge, dry_run, yes, concurrency, rate, output, pretty):
+    """
+    List or delete entities not modified for a given time
+
+    Example:
+
+        $ zmon entities stale --older-than 30d -t instance
+
+        $ zmon entities stale --older-than 30d -t instance --purge --rate 10
+    """
+    client = get_client(ctx.obj.config)
+
+    with Output('Streaming entities ...', output=output):
+        with stage('compute', 'stale'):
+            result = find_stale(stream_entities(client, entity_type), older_than, types=entity_type)
+
+    if not purge:
+        with Output('', output=output, pretty_json=pretty, printer=render_stale) as act:
+            act.echo(result)
+        return
+
+    found = result['stale_entities']
+    if not found:
+        info('No stale entities')
+        return
+
+    if not dry_run and not yes:
+        click.confirm('Delete {} stale entities?'.format(len(found)), abort=True)
+
+    set_pool_size(client.session, concurrency)
+
+    lock = threading.Lock()
+
+    def report(result):
+        with lock:
+            action('{} entity {} ...'.format('Would delete' if dry_run else 'Deleting', result.item['id']))
+            if result.error is not None:
+                error(' FAILED: {}'.format(result.error))
+            elif not dry_run and not result.result:
+                error(' FAILED')
+            else:
+                ok(' SKIPPED' if dry_run else ' OK')
+
+    with stage('delete', 'entities'):
+        results = bulk_apply(lambda e: client.delete_entity(e['id']), found, concurrency=concurrency, rate=rate,
+                             dry_run=dry_run, callback=report)
+
+    failed = sum(1 for r in results if r.error is not None or not (dry_run or r.result))
+
+    if dry_run:
+        info('{} stale entities would be deleted'.format(len(results)))
+    else:
+        info('Deleted {} of {} stale entities'.format(len(results) - failed, len(results)))
+
+    if failed:
+        ctx.exit(1)
+
+
+@entities.command('stats')
+@click.option('--by', '-b', default='type', help='Comma separated attributes to group by. Default is type')
+@click.option('--type', '-t', 'entity_type', multiple=True, help='Only entities of type.')
+@click.pass_obj
+@output_option
+@pretty_json
+def stats_entities(obj, by, entity_type, output, pretty):
+    """
+    Count entities by attributes, distinct values and recent modifications
+
+    Example:
+
+        $ zmon entities stats --by type,team
+    """
+    client = get_client(obj.config)
+
+    by = [k.strip() for k in by.split(',') if k.strip()]
+
+    with Output('Streaming entities ...', nl=True, output=output, pretty_json=pretty,
+                printer=render_entity_stats) as act:
+        with stage('compute', 'stats'):
+            stats = entity_stats(stream_entities(client, entity_type), by=by)
+
+        act.echo(stats)
+
+
 @entities.command('help')
 @click.pass_context
 def help(ctx):
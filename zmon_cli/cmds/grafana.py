@@ -7,6 +7,7 @@ from clickclick import AliasedGroup, Action, ok
 from zmon_cli.cmds.command import cli, get_client, yaml_output_option, pretty_json
 from zmon_cli.output import Output
 from zmon_cli.client import ZmonArgumentError
+from zmon_cli.tracing import stage
 
 
 @cli.group('grafana', cls=AliasedGroup)
@@ -35,7 +36,8 @@ def grafana_get(obj, dashboard_id, output, pretty):
 @click.pass_obj
 def grafana_update(obj, yaml_file):
     """Create/Update a single ZMON dashboard"""
-    dashboard = yaml.safe_load(yaml_file)
+    with stage('parse', 'grafana_dashboard'):
+        dashboard = yaml.safe_load(yaml_file)
 
     title = dashboard.get('dashboard', {}).get('title', '')
 
@@ -1,33 +1,93 @@
+import os
+
+from concurrent.futures import ThreadPoolExecutor
+
 import click
 
+from clickclick import Action
+
 from zmon_cli.cmds.command import cli, get_client, output_option, pretty_json
+from zmon_cli.config import get_cache_dir
 from zmon_cli.output import Output, render_search
+from zmon_cli.search_index import KINDS, SearchIndex, build_index
 
 from zmon_cli.client import ZmonArgumentError
 
 
+SEARCH_INDEX_FILE = 'search-index.pickle'
+
+
+def remote_search(client, search_query, limit=None, teams=None):
+    """Search on ZMON, fanning multi-team queries out concurrently and merging their results."""
+    if not teams or len(teams) == 1:
+        return client.search(search_query, limit=limit, teams=teams)
+
+    with ThreadPoolExecutor(max_workers=len(teams)) as executor:
+        results = list(executor.map(lambda t: client.search(search_query, limit=limit, teams=[t]), teams))
+
+    merged = {kind: [] for kind in KINDS}
+    for kind in KINDS:
+        seen = set()
+        for result in results:
+            for item in result.get(kind, []):
+                if item['id'] not in seen:
+                    seen.add(item['id'])
+                    merged[kind].append(item)
+
+    return merged
+
+
 @cli.command()
-@click.argument('search_query')
+@click.argument('search_query', required=False)
 @click.option('--team', '-t', multiple=True, required=False,
               help='Filter search by team. Multiple teams filtering is supported.')
-@click.option('--limit', '-l', multiple=False, required=False,
+@click.option('--limit', '-l', type=int, multiple=False, required=False,
               help='Limit number of results, default is 25')
+@click.option('--local', is_flag=True, help='Search local index instead of ZMON. Falls back to ZMON if not built.')
+@click.option('--update-index', is_flag=True, help='Build local search index from ZMON before searching.')
 @click.pass_obj
 @output_option
 @pretty_json
-def search(obj, search_query, team, limit, output, pretty):
+def search(obj, search_query, team, limit, local, update_index, output, pretty):
     """
     Search dashboards, alerts, checks and grafana dashboards.
 
     Example:
 
         $ zmon search "search query" -t team-1 -t team-2
+
+        $ zmon search --update-index
+
+        $ zmon search --local "search query"
     """
     client = get_client(obj.config)
 
+    index_path = get_cache_dir(obj.config, SEARCH_INDEX_FILE)
+
+    if update_index:
+        with Action('Building local search index ...'):
+            index = build_index(client)
+            index.save(index_path)
+
+        if not search_query:
+            return
+    elif not search_query:
+        raise click.UsageError('Missing argument "SEARCH_QUERY"')
+
+    index = SearchIndex.load(index_path) if local else None
+
     with Output('Searching ...', nl=True, output=output, pretty_json=pretty, printer=render_search) as act:
         try:
-            data = client.search(search_query, limit=limit, teams=team)
+            if index is not None:
+                data = index.search(search_query, limit=limit or 25, teams=team)
+            else:
+                data = remote_search(client, search_query, limit=limit, teams=team)
+
+                # Grafana dashboards can not be listed, so an existing local index learns them from ZMON search results.
+                if data['grafana_dashboards'] and os.path.exists(index_path):
+                    index = SearchIndex.load(index_path)
+                    if index is not None and index.add('grafana_dashboards', data['grafana_dashboards']):
+                        index.save(index_path)
 
             for check in data['checks']:
                 check['link'] = client.check_definition_url(check)
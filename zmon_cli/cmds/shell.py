@@ -0,0 +1,133 @@
+import os
+import shlex
+
+import click
+
+from clickclick import info, warning
+
+from zmon_cli.cmds.command import cli, get_root_options, run_command, session_cache, CONTEXT_SETTINGS
+from zmon_cli.completion import build_command_index, complete
+from zmon_cli.config import get_cache_dir
+
+try:
+    import readline
+except ImportError:  # pragma: no cover
+    readline = None
+
+
+DEFAULT_SHELL_CACHE_TTL = 300
+
+HISTORY_FILE = 'shell-history'
+HISTORY_LENGTH = 1000
+
+PROMPT = 'zmon> '
+
+
+class Completer:
+    """Readline completer of subcommands, options and IDs."""
+
+    def __init__(self, commands, index_dir):
+        self.commands = commands
+        self.index_dir = index_dir
+        self.candidates = []
+
+    def __call__(self, text, state):
+        if state == 0:
+            line = readline.get_line_buffer()[:readline.get_begidx()]
+            try:
+                words = ['zmon'] + shlex.split(line) + [text]
+            except ValueError:
+                words = ['zmon'] + line.split() + [text]
+
+            self.candidates = [c + ' ' for c in complete(words, len(words) - 1, index_dir=self.index_dir,
+                                                         commands=self.commands)]
+
+        return self.candidates[state] if state < len(self.candidates) else None
+
+
+def setup_readline(commands, index_dir, history_file):
+    readline.set_completer(Completer(commands, index_dir))
+    readline.set_completer_delims(' \t\n')
+    readline.parse_and_bind('tab: complete')
+    readline.set_history_length(HISTORY_LENGTH)
+
+    if os.path.exists(history_file):
+        readline.read_history_file(history_file)
+
+
+def shell_help():
+    info('Run zmon commands without "zmon" prefix, e.g. "check-definitions get 1".')
+    info('Shell commands:')
+    info('  clear-cache    Drop cached responses')
+    info('  exit, quit     Leave shell (or Ctrl-D)')
+
+
+@cli.command()
+@click.option('--cache-ttl', type=int, default=DEFAULT_SHELL_CACHE_TTL,
+              help='Cache GET responses for seconds. Default is {}, 0 disables caching'.format(DEFAULT_SHELL_CACHE_TTL))
+@click.pass_context
+def shell(ctx, cache_ttl):
+    """
+    Start interactive shell
+
+    All commands share one authenticated ZMON session. Connections and cached responses stay warm between commands.
+    TAB completes subcommands, options and IDs (see "zmon completion update").
+    """
+    root = ctx.find_root()
+    obj = ctx.obj
+
+    prefix = get_root_options(ctx)
+
+    history_file = get_cache_dir(obj.config, HISTORY_FILE)
+
+    interactive = readline is not None and click.get_text_stream('stdin').isatty()
+    if interactive:
+        commands = build_command_index(cli, CONTEXT_SETTINGS['help_option_names'])
+        setup_readline(commands, get_cache_dir(obj.config, 'completion'), history_file)
+        shell_help()
+
+    enabled = session_cache.enabled
+    if not enabled:
+        session_cache.enable(cache_ttl=cache_ttl)
+
+    try:
+        while True:
+            try:
+                line = input(PROMPT if interactive else '')
+            except KeyboardInterrupt:
+                click.echo('')
+                continue
+            except EOFError:
+                break
+
+            try:
+                argv = shlex.split(line, comments=True)
+            except ValueError as e:
+                warning('Invalid command: {}'.format(e))
+                continue
+
+            if argv and argv[0] == 'zmon':
+                argv = argv[1:]
+
+            if not argv:
+                continue
+            elif argv[0] in ('exit', 'quit'):
+                break
+            elif argv[0] == 'clear-cache':
+                session_cache.clear_cache()
+            elif argv[0] in ('?', 'help') and len(argv) == 1:
+                shell_help()
+            elif argv[0] == 'shell':
+                warning('Already in ZMON shell')
+            else:
+                try:
+                    run_command(root.command, prefix + argv)
+                except KeyboardInterrupt:
+                    click.echo('')
+    finally:
+        if not enabled:
+            session_cache.disable()
+
+        if interactive:
+            os.makedirs(os.path.dirname(history_file), exist_ok=True)
+            readline.write_history_file(history_file)
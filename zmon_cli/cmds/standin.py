@@ -0,0 +1,108 @@
+import functools
+
+import click
+
+from clickclick import Action, AliasedGroup, info
+
+from zmon_cli.cmds.command import cli
+from zmon_cli.standin import (DEFAULT_ALERTS, DEFAULT_CHECKS, DEFAULT_DASHBOARDS, DEFAULT_ENTITIES,
+                              DEFAULT_ERROR_STATUS, DEFAULT_TEAMS, Dataset, Standin, StandinServer, generate_dataset)
+
+
+def dataset_options(f):
+    @click.option('--entities', type=int, default=DEFAULT_ENTITIES,
+                  help='Number of generated entities. Default is {}'.format(DEFAULT_ENTITIES))
+    @click.option('--checks', type=int, default=DEFAULT_CHECKS,
+                  help='Number of generated check definitions. Default is {}'.format(DEFAULT_CHECKS))
+    @click.option('--alerts', type=int, default=DEFAULT_ALERTS,
+                  help='Number of generated alert definitions. Default is {}'.format(DEFAULT_ALERTS))
+    @click.option('--dashboards', type=int, default=DEFAULT_DASHBOARDS,
+                  help='Number of generated dashboards. Default is {}'.format(DEFAULT_DASHBOARDS))
+    @click.option('--teams', type=int, default=DEFAULT_TEAMS,
+                  help='Number of teams. Default is {}'.format(DEFAULT_TEAMS))
+    @click.option('--seed', type=int, default=0, help='Random seed, the same seed generates the same dataset.')
+    @functools.wraps(f)
+    def wrapper(*args, **kwargs):
+        return f(*args, **kwargs)
+
+    return wrapper
+
+
+def generate(entities, checks, alerts, dashboards, teams, seed):
+    with Action('Generating dataset ...') as act:
+        dataset = generate_dataset(entities=entities, checks=checks, alerts=alerts, dashboards=dashboards,
+                                   teams=teams, seed=seed)
+        act.ok('{} entities, {} checks, {} alerts'.format(
+            len(dataset.entities), len(dataset.checks), len(dataset.alerts)))
+
+    return dataset
+
+
+@cli.group('standin', cls=AliasedGroup)
+@click.pass_obj
+def standin(obj):
+    """Run a local stand-in ZMON API for benchmarks and tests"""
+    pass
+
+
+@standin.command('generate')
+@click.argument('dataset_file', type=click.File('w'))
+@dataset_options
+@click.pass_obj
+def standin_generate(obj, dataset_file, entities, checks, alerts, dashboards, teams, seed):
+    """Generate dataset and write it as JSON to DATASET_FILE"""
+    dataset = generate(entities, checks, alerts, dashboards, teams, seed)
+
+    with Action('Writing dataset ...'):
+        dataset.save(dataset_file)
+
+
+@standin.command('serve')
+@click.option('--dataset', 'dataset_file', type=click.File('r'), help='Serve dataset file instead of generating one.')
+@dataset_options
+@click.option('--host', default='localhost', help='Listen address. Default is localhost')
+@click.option('--port', '-p', type=int, default=8080, help='Listen port. Default is 8080')
+@click.option('--latency', type=float, default=0, help='Delay every response by milliseconds.')
+@click.option('--jitter', type=float, default=0, help='Add random delay of up to milliseconds.')
+@click.option('--error-rate', type=click.FloatRange(0, 1), default=0,
+              help='Fraction of requests failing with --error-status, between 0 and 1.')
+@click.option('--error-status', type=int, default=DEFAULT_ERROR_STATUS,
+              help='HTTP status of injected errors. Default is {}'.format(DEFAULT_ERROR_STATUS))
+@click.option('--access-log', is_flag=True, help='Log requests to stderr.')
+@click.pass_obj
+def standin_serve(obj, dataset_file, entities, checks, alerts, dashboards, teams, seed, host, port, latency, jitter,
+                  error_rate, error_status, access_log):
+    """
+    Serve stand-in ZMON API
+
+    Use the printed URL as "url" in a config file to run zmon commands against it.
+
+    Example:
+
+        $ zmon standin serve --entities 200000 --checks 5000 --alerts 10000 --latency 20 --error-rate 0.01
+    """
+    if dataset_file:
+        with Action('Loading dataset ...'):
+            dataset = Dataset.load(dataset_file)
+    else:
+        dataset = generate(entities, checks, alerts, dashboards, teams, seed)
+
+    api = Standin(dataset, latency=latency / 1000, jitter=jitter / 1000, error_rate=error_rate,
+                  error_status=error_status, seed=seed)
+
+    server = StandinServer((host, port), api, verbose=access_log)
+
+    info('Serving stand-in ZMON API on {} (Ctrl-C to stop)'.format(server.url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        info('Served {} requests, {} injected errors'.format(api.requests, api.errors))
+
+
+@standin.command('help')
+@click.pass_context
+def help(ctx):
+    print(ctx.parent.get_help())
@@ -0,0 +1,157 @@
+"""
+Compact read-only collection of entities, see :func:`zmon_cli.client.Zmon.get_entities` with ``compact=True``.
+
+A list of entity dicts repeats the same keys in every dict, and dicts reserve space for more keys than they hold.
+:class:`CompactEntities` stores entities with the same keys, e.g. of the same type, in one shared layout with a column
+of values per key:
+
+* keys are interned and stored once per layout, sparse attributes only in layouts of entities which have them
+* repeated strings like ``type``, ``team`` or ``region`` are shared
+* nested values are kept JSON encoded, and decoded when they are accessed
+
+Entities are returned as read-only mappings, which compare equal to the original dicts.
+"""
+import json
+import sys
+
+from array import array
+from collections.abc import Mapping, Sequence
+
+
+# Share strings of a key until it has as many distinct values, e.g. not for IDs
+MAX_POOLED_VALUES = 10000
+
+_encoder = json.JSONEncoder(separators=(',', ':'))
+
+
+class _Layout:
+    """Keys of entities and a column of values per key."""
+
+    __slots__ = ('keys', 'positions', 'columns', 'rows')
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.positions = {k: i for i, k in enumerate(keys)}
+        self.columns = tuple([] for _ in keys)
+        self.rows = 0
+
+
+def _decode(value):
+    # Nested values are stored as JSON encoded bytes
+    return json.loads(value.decode('utf-8')) if type(value) is bytes else value
+
+
+class CompactEntity(Mapping):
+    """Read-only view of an entity in :class:`CompactEntities`. Nested values are decoded on every access."""
+
+    __slots__ = ('_layout', '_row')
+
+    def __init__(self, layout, row):
+        self._layout = layout
+        self._row = row
+
+    def __getitem__(self, key):
+        layout = self._layout
+        return _decode(layout.columns[layout.positions[key]][self._row])
+
+    def __contains__(self, key):
+        return key in self._layout.positions
+
+    def __iter__(self):
+        return iter(self._layout.keys)
+
+    def __len__(self):
+        return len(self._layout.keys)
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+    def to_dict(self):
+        """Return entity as dict, e.g. to modify or serialize it."""
+        row = self._row
+        return {k: _decode(column[row]) for k, column in zip(self._layout.keys, self._layout.columns)}
+
+
+class CompactEntities(Sequence):
+    """Read-only sequence of entities taking a fraction of the memory of a list of dicts.
+
+    >>> entities = CompactEntities([{'id': 'a', 'type': 'host', 'tags': ['x']}, {'id': 'b', 'type': 'host'}])
+    >>> len(entities), entities[0]['tags'], entities[-1] == {'id': 'b', 'type': 'host'}
+    (2, ['x'], True)
+
+    :param entities: Entity dicts, e.g. streamed by :func:`zmon_cli.client.Zmon.iter_entities`.
+    :type entities: iterable
+
+    :param max_pooled_values: Share strings of a key up to this number of distinct values.
+    :type max_pooled_values: int
+    """
+
+    def __init__(self, entities=(), max_pooled_values=MAX_POOLED_VALUES):
+        self._layouts = []
+        self._layout_ids = {}
+
+        # Layout and row in layout of every entity
+        self._entity_layouts = array('I')
+        self._entity_rows = array('I')
+
+        # Distinct strings by key, ``None`` once a key has too many distinct values
+        pools = {}
+
+        for entity in entities:
+            keys = tuple(entity)
+
+            layout_id = self._layout_ids.get(keys)
+            if layout_id is None:
+                layout_id = self._layout_ids[keys] = len(self._layouts)
+                self._layouts.append(_Layout(tuple(sys.intern(k) for k in keys)))
+
+            layout = self._layouts[layout_id]
+
+            for key, column, value in zip(layout.keys, layout.columns, entity.values()):
+                if isinstance(value, str):
+                    pool = pools.get(key)
+                    if key not in pools:
+                        pool = pools[key] = {}
+                    if pool is not None:
+                        value = pool.setdefault(value, value)
+                        if len(pool) > max_pooled_values:
+                            pools[key] = None
+                elif isinstance(value, (dict, list)):
+                    value = _encoder.encode(value).encode('utf-8')
+
+                column.append(value)
+
+            self._entity_layouts.append(layout_id)
+            self._entity_rows.append(layout.rows)
+            layout.rows += 1
+
+    @property
+    def layouts(self):
+        """Number of distinct layouts."""
+        return len(self._layouts)
+
+    def __len__(self):
+        return len(self._entity_rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('Entity index out of range')
+
+        return CompactEntity(self._layouts[self._entity_layouts[index]], self._entity_rows[index])
+
+    def __iter__(self):
+        layouts = self._layouts
+        for layout_id, row in zip(self._entity_layouts, self._entity_rows):
+            yield CompactEntity(layouts[layout_id], row)
+
+    def __repr__(self):
+        return '<CompactEntities: {} entities, {} layouts>'.format(len(self), len(self._layouts))
+
+    def to_list(self):
+        """Return entities as list of dicts."""
+        return [entity.to_dict() for entity in self]
@@ -0,0 +1,280 @@
+"""
+Shell completion backend.
+
+Completes subcommands, options, option values and IDs from an on-disk index written by ``zmon completion update``.
+This module only depends on the standard library and never imports the command tree or talks to ZMON, so it is
+cheap enough to run on every tab press::
+
+    $ zmon-complete <cword> zmon check-definitions get 12
+
+Index layout::
+
+    <index_dir>/commands.json    # command tree with options and ID kinds of arguments
+    <index_dir>/<kind>.ids       # sorted "<id>\\t<name>" lines per ID kind, searched via mmap
+"""
+import json
+import mmap
+import os
+import sys
+
+
+DEFAULT_INDEX_DIR = '~/.cache/zmon-cli/completion'
+
+COMMANDS_FILE = 'commands.json'
+
+# Argument names completed with IDs
+ID_ARGUMENTS = {
+    'alert_id': 'alerts',
+    'alert_ids': 'alerts',
+    'check_id': 'checks',
+    'entity_id': 'entities',
+    'entity_ids': 'entities',
+}
+
+MAX_CANDIDATES = 200
+
+
+def get_index_dir():
+    return os.path.expanduser(os.environ.get('ZMON_COMPLETION_DIR') or DEFAULT_INDEX_DIR)
+
+
+########################################################################################################################
+# INDEX
+########################################################################################################################
+
+def _argument_kind(path, name):
+    if name == 'dashboard_id':
+        # Grafana dashboard IDs are not indexed
+        return 'dashboards' if path[0] == 'dashboard' else None
+    return ID_ARGUMENTS.get(name)
+
+
+def build_command_index(group, help_options=('--help',)):
+    """
+    Walk a click command tree and return a flat index keyed by space separated command path.
+
+    :param group: Root click group.
+    :type group: :class:`click.Group`
+
+    :param help_options: Help option names of all commands.
+    :type help_options: list
+
+    :return: Command index.
+    :rtype: dict
+    """
+    import click
+
+    index = {}
+
+    def walk(cmd, path):
+        options = {}
+        args = []
+        variadic = False
+
+        for param in cmd.params:
+            if isinstance(param, click.Option):
+                choices = list(param.type.choices) if isinstance(param.type, click.Choice) else []
+                for opt in param.opts + param.secondary_opts:
+                    options[opt] = None if param.is_flag or param.count else choices
+            elif isinstance(param, click.Argument) and path:
+                args.append(_argument_kind(path, param.name))
+                variadic = param.nargs == -1
+
+        for opt in help_options:
+            options[opt] = None
+
+        commands = sorted(cmd.commands) if isinstance(cmd, click.Group) else []
+
+        index[' '.join(path)] = {'commands': commands, 'options': options, 'args': args, 'variadic': variadic}
+
+        for name in commands:
+            walk(cmd.commands[name], path + [name])
+
+    walk(group, [])
+
+    return index
+
+
+def write_index(index_dir, commands=None, ids=None):
+    """
+    Write completion index.
+
+    :param index_dir: Index directory.
+    :type index_dir: str
+
+    :param commands: Command index as returned by :func:`build_command_index`.
+    :type commands: dict
+
+    :param ids: Dict of ID kind to list of ``(id, name)`` tuples.
+    :type ids: dict
+    """
+    os.makedirs(index_dir, exist_ok=True)
+
+    if commands is not None:
+        _write_atomic(os.path.join(index_dir, COMMANDS_FILE), json.dumps(commands, sort_keys=True).encode('utf-8'))
+
+    for kind, items in (ids or {}).items():
+        lines = sorted({'{}\t{}'.format(i, ' '.join(str(n or '').split())).encode('utf-8') for i, n in items})
+        _write_atomic(os.path.join(index_dir, '{}.ids'.format(kind)), b''.join(line + b'\n' for line in lines))
+
+
+def _write_atomic(path, data):
+    tmp = '{}.tmp'.format(path)
+    with open(tmp, 'wb') as fd:
+        fd.write(data)
+    os.replace(tmp, path)
+
+
+def lookup_ids(path, prefix, limit=MAX_CANDIDATES):
+    """
+    Return ``(id, name)`` tuples of IDs starting with ``prefix`` from a sorted ID file.
+
+    Binary search runs directly on the memory-mapped file, so lookup cost does not grow with the number of IDs.
+    """
+    if not os.path.exists(path) or not os.path.getsize(path):
+        return []
+
+    p = prefix.encode('utf-8')
+    matches = []
+
+    with open(path, 'rb') as fd:
+        with mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            size = len(mm)
+
+            def line_end(start):
+                end = mm.find(b'\n', start)
+                return size if end == -1 else end
+
+            lo, hi = 0, size
+            while lo < hi:
+                mid = (lo + hi) // 2
+                start = mm.rfind(b'\n', 0, mid) + 1
+                end = line_end(start)
+                if mm[start:end] < p:
+                    lo = end + 1
+                else:
+                    hi = start
+
+            while lo < size and len(matches) < limit:
+                end = line_end(lo)
+                line = mm[lo:end]
+                if not line.startswith(p):
+                    break
+                item_id, _, name = line.decode('utf-8').partition('\t')
+                matches.append((item_id, name))
+                lo = end + 1
+
+    return matches
+
+
+########################################################################################################################
+# COMPLETE
+########################################################################################################################
+
+def _resolve(node, word):
+    """Resolve (abbreviated) subcommand like :class:`clickclick.AliasedGroup`."""
+    if word in node['commands']:
+        return word
+    matches = [c for c in node['commands'] if c.startswith(word)]
+    return matches[0] if len(matches) == 1 else None
+
+
+def complete(words, cword, index_dir=None, describe=False, commands=None):
+    """
+    Return completion candidates.
+
+    :param words: Command line words, including the program name.
+    :type words: list
+
+    :param cword: Index of the word being completed.
+    :type cword: int
+
+    :param describe: Return ``id:name`` candidates for IDs (e.g. for zsh).
+    :type describe: bool
+
+    :param commands: Command index as returned by :func:`build_command_index`. Default is to read it from index.
+    :type commands: dict
+
+    :return: List of candidates.
+    :rtype: list
+    """
+    index_dir = index_dir or get_index_dir()
+
+    if commands is None:
+        try:
+            with open(os.path.join(index_dir, COMMANDS_FILE)) as fd:
+                commands = json.load(fd)
+        except (OSError, ValueError):
+            return []
+
+    cur = words[cword] if cword < len(words) else ''
+
+    path = []
+    node = commands['']
+    positional = 0
+    expects_value = None
+
+    for word in words[1:cword]:
+        if expects_value is not None:
+            expects_value = None
+        elif word.startswith('-'):
+            if '=' not in word and node['options'].get(word) is not None:
+                expects_value = word
+        elif node['commands']:
+            name = _resolve(node, word)
+            if name is None:
+                return []
+            path.append(name)
+            node = commands[' '.join(path)]
+            positional = 0
+        else:
+            positional += 1
+
+    if expects_value is not None:
+        return [c for c in node['options'][expects_value] if c.startswith(cur)]
+
+    if cur.startswith('-'):
+        return sorted(o for o in node['options'] if o.startswith(cur))
+
+    if node['commands']:
+        return [c for c in node['commands'] if c.startswith(cur)]
+
+    args = node['args']
+    if not args:
+        return []
+
+    kind = args[positional] if positional < len(args) else (args[-1] if node['variadic'] else None)
+    if kind is None:
+        return []
+
+    ids = lookup_ids(os.path.join(index_dir, '{}.ids'.format(kind)), cur)
+
+    return ['{}:{}'.format(i, n) if describe and n else i for i, n in ids]
+
+
+def main(argv=None):
+    """
+    Entry point of ``zmon-complete``.
+
+    Usage: ``zmon-complete [--describe] <cword> <words...>``
+    """
+    argv = sys.argv[1:] if argv is None else argv
+
+    describe = bool(argv) and argv[0] == '--describe'
+    if describe:
+        argv = argv[1:]
+
+    try:
+        cword = int(argv[0])
+    except (IndexError, ValueError):
+        sys.stderr.write('Usage: zmon-complete [--describe] <cword> <words...>\n')
+        return 2
+
+    for candidate in complete(argv[1:], cword, describe=describe):
+        print(candidate)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
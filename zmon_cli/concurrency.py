@@ -0,0 +1,136 @@
+"""
+Helpers for running many ZMON requests concurrently.
+"""
+import threading
+import time
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from requests.adapters import HTTPAdapter
+
+
+DEFAULT_CONCURRENCY = 8
+
+BulkResult = namedtuple('BulkResult', 'item result error')
+
+
+class RateLimiter:
+    """Thread-safe pacing of calls to ``rate`` per second.
+
+    Callers reserve slots in order and sleep until their slot. By default slots missed by slow callers are skipped, so
+    the rate is an upper bound. With ``catch_up`` the schedule is fixed: late callers get slots in the past and run
+    immediately, which keeps the average rate of an open-loop load generator.
+
+    :param rate: Calls per second.
+    :type rate: float
+
+    :param catch_up: Keep fixed schedule instead of skipping missed slots.
+    :type catch_up: bool
+    """
+
+    def __init__(self, rate, catch_up=False, clock=time.perf_counter, sleep=time.sleep):
+        if rate <= 0:
+            raise ValueError('Rate must be positive')
+
+        self.interval = 1 / rate
+        self.catch_up = catch_up
+        self._clock = clock
+        self._sleep = sleep
+        self._next = None
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Reserve next slot without waiting and return its time."""
+        with self._lock:
+            now = self._clock()
+            if self._next is None or (not self.catch_up and self._next < now):
+                self._next = now
+
+            slot = self._next
+            self._next += self.interval
+
+        return slot
+
+    def acquire(self):
+        """
+        Wait for next slot and return its time, as returned by the clock.
+
+        >>> limiter = RateLimiter(4, clock=iter([0, 0, 0.125, 0.125]).__next__, sleep=print)
+        >>> limiter.acquire(), limiter.acquire()
+        0.125
+        (0, 0.25)
+        """
+        slot = self.reserve()
+
+        delay = slot - self._clock()
+        if delay > 0:
+            self._sleep(delay)
+
+        return slot
+
+
+def set_pool_size(session, size):
+    """Allow ``size`` concurrent connections per host on all HTTP adapters of a session, so concurrent requests do not
+    open and discard extra connections."""
+    for adapter in session.adapters.values():
+        if isinstance(adapter, HTTPAdapter) and adapter._pool_maxsize < size:
+            adapter.init_poolmanager(adapter._pool_connections, size, block=adapter._pool_block)
+            adapter._pool_maxsize = size
+
+
+def bulk_apply(fn, items, concurrency=DEFAULT_CONCURRENCY, rate=None, dry_run=False, callback=None):
+    """
+    Call ``fn`` for every item concurrently, e.g. to delete many entities. Exceptions are collected, not raised.
+
+    >>> [r.result for r in bulk_apply(lambda x: x * 2, [1, 2, 3])]
+    [2, 4, 6]
+    >>> type(bulk_apply(lambda x: 1 / x, [0])[0].error).__name__
+    'ZeroDivisionError'
+
+    :param fn: Function called with one item.
+    :type fn: callable
+
+    :param items: Items.
+    :type items: list
+
+    :param concurrency: Number of concurrent calls.
+    :type concurrency: int
+
+    :param rate: Maximum calls per second. Default is no limit.
+    :type rate: float
+
+    :param dry_run: Do not call ``fn``, results are ``None``.
+    :type dry_run: bool
+
+    :param callback: Called with every :class:`BulkResult` once it is done, from worker threads.
+    :type callback: callable
+
+    :return: List of :class:`BulkResult` in order of items.
+    :rtype: list
+    """
+    limiter = RateLimiter(rate) if rate else None
+
+    def apply(item):
+        result = error = None
+
+        if not dry_run:
+            if limiter is not None:
+                limiter.acquire()
+            try:
+                result = fn(item)
+            except Exception as e:
+                error = e
+
+        done = BulkResult(item, result, error)
+        if callback is not None:
+            callback(done)
+
+        return done
+
+    items = list(items)
+    if not items:
+        return []
+
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(items))) as executor:
+        return list(executor.map(apply, items))
@@ -1,5 +1,11 @@
 import os
+import atexit
+import copy
+import json
 import logging
+import queue
+
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 import yaml
 import click
@@ -9,18 +15,122 @@ import requests
 
 from clickclick import Action, error
 
+from zmon_cli.token_cache import TokenCache
+
 
 DEFAULT_CONFIG_FILE = '~/.zmon-cli.yaml'
+DEFAULT_CACHE_DIR = '~/.cache/zmon-cli'
+
+TOKEN_CACHE_FILE = 'tokens.json'
+
+
+LOG_FILE = '/tmp/zmon-cli.log'
+LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 3
+
+# Attributes of every log record, anything else was passed as ``extra``
+LOG_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+_log_listener = None
+
+
+class JSONLogFormatter(logging.Formatter):
+    """Format log records as JSON objects, including ``extra`` fields (e.g. request latency)."""
+
+    def format(self, record):
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+
+        for key, value in vars(record).items():
+            if key not in LOG_RECORD_ATTRIBUTES:
+                data[key] = value
+
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exception'] = record.exc_text
+
+        return json.dumps(data, default=str)
+
+
+class TracebackQueueHandler(QueueHandler):
+    """Queue handler formatting the traceback of records into ``exc_text`` instead of their message.
+
+    :class:`QueueHandler` appends the traceback to the message and drops ``exc_info``, so formatters of the listener
+    could not render it separately.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+
+        record.msg = record.message = record.getMessage()
+        record.args = None
+
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _traceback_formatter.formatException(record.exc_info)
+            # Tracebacks keep frames alive and can not be pickled
+            record.exc_info = None
+
+        return record
+
+
+_traceback_formatter = logging.Formatter()
+
+
+def configure_logging(loglevel, log_format='text', log_file=LOG_FILE):
+    """
+    Configure logging to a rotating log file.
 
+    Records are handed to a background thread via a queue, so logging never blocks on file writes.
+
+    :param loglevel: Root log level.
+    :type loglevel: int
+
+    :param log_format: ``text`` or ``json``.
+    :type log_format: str
+
+    :param log_file: Log file path. Only used on first call.
+    :type log_file: str
+    """
+    global _log_listener
 
-def configure_logging(loglevel):
     # configure file logger to not clutter stdout with log lines
-    logging.basicConfig(level=loglevel, filename='/tmp/zmon-cli.log',
-                        format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    if _log_listener is None:
+        handler = RotatingFileHandler(log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, delay=True)
+        records = queue.Queue()
+
+        _log_listener = QueueListener(records, handler)
+        _log_listener.start()
+        atexit.register(_log_listener.stop)
+
+        logging.getLogger().addHandler(TracebackQueueHandler(records))
+
+    formatter = JSONLogFormatter() if log_format == 'json' else logging.Formatter(LOG_FORMAT)
+    for handler in _log_listener.handlers:
+        handler.setFormatter(formatter)
+
+    logging.getLogger().setLevel(loglevel)
     logging.getLogger('urllib3.connectionpool').setLevel(logging.WARNING)
     logging.getLogger('requests.packages.urllib3.connectionpool').setLevel(logging.WARNING)
 
 
+def get_cache_dir(config=None, *parts):
+    """
+    Return local cache directory (or a path below it), honouring ``cache_dir`` from config.
+
+    >>> get_cache_dir({'cache_dir': '/tmp/zmon'}, 'history')
+    '/tmp/zmon/history'
+    """
+    base = (config or {}).get('cache_dir') or DEFAULT_CACHE_DIR
+    return os.path.join(os.path.expanduser(base), *[str(p) for p in parts])
+
+
 def get_config_data(config_file=DEFAULT_CONFIG_FILE):
     fn = os.path.expanduser(config_file)
     data = {}
@@ -76,6 +186,38 @@ def validate_config(data):
         raise Exception('Config file improperly configured: key "url" is missing')
 
     if 'token' not in data:
-        data['token'] = zign.api.get_token('zmon', ['uid'])
+        data['token'] = get_zmon_token(data)
+        # The token can be refreshed, see :func:`get_zmon_token`
+        data['cached_token'] = True
 
     return data
+
+
+def fetch_zmon_token():
+    """Return zign's stored token with its creation time and lifetime if it is still valid, or get a new token."""
+    get_existing_token = getattr(zign.api, 'get_existing_token', None)
+
+    existing = get_existing_token('zmon') if get_existing_token else None
+    if existing and existing.get('access_token'):
+        return existing
+
+    return zign.api.get_token('zmon', ['uid'])
+
+
+def get_zmon_token(config, refresh=False):
+    """
+    Return cached OAuth token for ZMON.
+
+    :param config: Config data.
+    :type config: dict
+
+    :param refresh: Drop the cached token first, e.g. after the API rejected it.
+    :type refresh: bool
+
+    :rtype: str
+    """
+    token_cache = TokenCache(get_cache_dir(config, TOKEN_CACHE_FILE))
+    if refresh:
+        token_cache.clear('zmon')
+
+    return token_cache.get('zmon', fetch_zmon_token)
@@ -0,0 +1,300 @@
+"""
+Opt-in background daemon keeping ZMON clients, connection pools and response caches warm across invocations.
+
+The daemon listens on a local Unix socket and runs forwarded command lines in-process, one at a time. The client side
+of the protocol (:func:`forward`) only uses the standard library, so the thin ``zmon`` front-end can forward commands
+without importing the command tree.
+
+Protocol: the front-end sends one JSON line with ``argv``, ``cwd``, ``env`` and ``isatty``. The daemon streams back JSON
+lines with ``stdout`` or ``stderr`` chunks, terminated by a line with ``exit`` code.
+"""
+import contextlib
+import io
+import itertools
+import json
+import logging
+import os
+import socket
+import sys
+import time
+
+
+DEFAULT_SOCKET = '~/.cache/zmon-cli/daemon.sock'
+
+# Environment variables forwarded to the daemon
+FORWARDED_ENV = ('ZMON_TOKEN', 'USER')
+
+# Commands which prompt for input, run their own loop or worker processes are always executed in-process. Command
+# names may be abbreviated, see ``AliasedGroup``.
+LOCAL_COMMANDS = {
+    ('alert-definitions', 'init'),
+    ('check-definitions', 'init'),
+    ('check-definitions', 'validate'),
+    ('configure',),
+    ('daemon',),
+    ('dashboard', 'init'),
+    ('shell',),
+    ('standin',),
+}
+
+# Options of commands asking for confirmation, unless it is skipped. The daemon has no terminal to prompt on.
+CONFIRMED_OPTIONS = {'--delete', '--purge'}
+SKIP_CONFIRMATION_OPTIONS = {'--yes', '-y', '--dry-run'}
+
+# Global options taking a value, to find the command path without importing the command tree
+GLOBAL_VALUE_OPTIONS = {'-c', '--config-file', '--log-format', '--trace', '--profile', '--profile-limit', '--record',
+                        '--replay', '--replay-latency'}
+
+CONNECT_TIMEOUT = 0.5
+
+logger = logging.getLogger(__name__)
+
+
+def get_socket_path():
+    return os.path.expanduser(os.environ.get('ZMON_DAEMON_SOCKET') or DEFAULT_SOCKET)
+
+
+def command_path(argv, depth=2):
+    """
+    Return names of the command and subcommand of a command line, skipping global options.
+
+    >>> command_path(['-c', 'x.yaml', 'search', 'init', '-t', 'a'])
+    ('search', 'init')
+    """
+    path = []
+    args = iter(argv)
+    for arg in args:
+        if arg.startswith('-'):
+            if path:
+                break
+            if arg in GLOBAL_VALUE_OPTIONS:
+                next(args, None)
+            continue
+
+        path.append(arg)
+        if len(path) == depth:
+            break
+
+    return tuple(path)
+
+
+def is_local_command(argv):
+    """Return True if command line runs a command of :data:`LOCAL_COMMANDS`."""
+    path = command_path(argv)
+    return any(len(path) >= len(local) and all(name.startswith(arg) for name, arg in zip(local, path))
+               for local in LOCAL_COMMANDS)
+
+
+def prompts(argv):
+    """
+    Return True if command line asks for confirmation.
+
+    >>> prompts(['check', 'orphans', '--delete']), prompts(['check', 'orphans', '--delete', '-y'])
+    (True, False)
+    """
+    return bool(CONFIRMED_OPTIONS.intersection(argv)) and not SKIP_CONFIRMATION_OPTIONS.intersection(argv)
+
+
+def should_forward(argv):
+    """
+    Return True if command line can be executed by a running daemon.
+
+    >>> should_forward(['check', 'init', 'x.yaml'])
+    False
+    """
+    if os.environ.get('ZMON_NO_DAEMON') or is_local_command(argv) or prompts(argv) or '-' in argv:
+        return False
+
+    return os.path.exists(get_socket_path())
+
+
+def _send(sock, message):
+    sock.sendall(json.dumps(message).encode('utf-8') + b'\n')
+
+
+def _connect(path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(CONNECT_TIMEOUT)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        raise
+    sock.settimeout(None)
+    return sock
+
+
+def request(message, path=None):
+    """
+    Send a message to the daemon and yield response messages.
+
+    :raises: OSError if daemon is not reachable.
+    """
+    sock = _connect(path or get_socket_path())
+
+    with sock, sock.makefile('rb') as fd:
+        _send(sock, message)
+        for line in fd:
+            yield json.loads(line.decode('utf-8'))
+
+
+def forward(argv, path=None):
+    """
+    Forward a command line to the daemon, writing its output to stdout and stderr.
+
+    :return: Exit code, or ``None`` if the daemon is not reachable and command has to run in-process.
+    :rtype: int
+    """
+    streams = {'stdout': sys.stdout, 'stderr': sys.stderr}
+
+    message = {
+        'argv': argv,
+        'cwd': os.getcwd(),
+        'env': {k: os.environ[k] for k in FORWARDED_ENV if k in os.environ},
+        'isatty': sys.stdout.isatty(),
+    }
+
+    try:
+        responses = request(message, path=path)
+        first = next(responses)
+    except (OSError, StopIteration):
+        return None
+
+    for response in itertools.chain([first], responses):
+        if 'exit' in response:
+            return response['exit']
+
+        for name, stream in streams.items():
+            if name in response:
+                stream.write(response[name])
+                stream.flush()
+
+    return 1
+
+
+########################################################################################################################
+# SERVER
+########################################################################################################################
+
+class StreamWriter(io.TextIOBase):
+    """Text stream sending every write to the front-end as a ``stdout`` or ``stderr`` message."""
+
+    def __init__(self, sock, name, isatty=False):
+        self._sock = sock
+        self._name = name
+        self._isatty = isatty
+
+    def writable(self):
+        return True
+
+    def isatty(self):
+        return self._isatty
+
+    def write(self, s):
+        if not isinstance(s, str):
+            raise TypeError('write() argument must be str, not {}'.format(type(s).__name__))
+        if s:
+            _send(self._sock, {self._name: s})
+        return len(s)
+
+
+class Daemon:
+    """ZMON CLI daemon serving forwarded command lines on a Unix socket.
+
+    :param path: Unix socket path.
+    :type path: str
+
+    :param idle_timeout: Stop after seconds without any request. Default is no timeout.
+    :type idle_timeout: int
+    """
+
+    def __init__(self, path, idle_timeout=None):
+        self.path = path
+        self.idle_timeout = idle_timeout
+        self.started = time.time()
+        self.served = 0
+        self._running = False
+
+    def status(self):
+        return {'pid': os.getpid(), 'uptime': int(time.time() - self.started), 'served': self.served}
+
+    def run(self, cli):
+        """Serve requests until stopped. Commands are executed one at a time by ``cli`` click group."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o077)
+        try:
+            server.bind(self.path)
+        finally:
+            os.umask(old_umask)
+
+        server.listen(16)
+        server.settimeout(self.idle_timeout)
+
+        self._running = True
+        try:
+            while self._running:
+                try:
+                    conn, _ = server.accept()
+                except socket.timeout:
+                    logger.info('ZMON daemon idle for %s seconds, stopping', self.idle_timeout)
+                    break
+
+                with conn:
+                    conn.settimeout(None)
+                    try:
+                        self.handle(conn, cli)
+                    except OSError:
+                        logger.exception('ZMON daemon failed to serve request')
+        finally:
+            server.close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    def handle(self, conn, cli):
+        with conn.makefile('rb') as fd:
+            line = fd.readline()
+
+        try:
+            message = json.loads(line.decode('utf-8'))
+        except ValueError:
+            return
+
+        if message.get('command') == 'stop':
+            self._running = False
+            _send(conn, {'exit': 0, 'status': self.status()})
+        elif message.get('command') == 'status':
+            _send(conn, {'exit': 0, 'status': self.status()})
+        elif 'argv' in message:
+            self.served += 1
+            _send(conn, {'exit': self.execute(conn, cli, message)})
+
+    def execute(self, conn, cli, message):
+        """Run a forwarded command line in-process and return its exit code."""
+        from zmon_cli.cmds.command import run_command
+
+        isatty = message.get('isatty', False)
+        stdout = StreamWriter(conn, 'stdout', isatty=isatty)
+        stderr = StreamWriter(conn, 'stderr', isatty=isatty)
+
+        cwd = os.getcwd()
+        env = {k: os.environ.get(k) for k in FORWARDED_ENV}
+
+        try:
+            os.chdir(message.get('cwd') or cwd)
+            for k in FORWARDED_ENV:
+                os.environ.pop(k, None)
+            os.environ.update(message.get('env') or {})
+
+            with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+                return run_command(cli, message['argv'], color=isatty or None)
+        finally:
+            os.chdir(cwd)
+            for k, v in env.items():
+                if v is None:
+                    os.environ.pop(k, None)
+                else:
+                    os.environ[k] = v
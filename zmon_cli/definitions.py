@@ -0,0 +1,40 @@
+"""
+Relations between check and alert definitions, computed from the lists of all active definitions.
+
+Alerts are joined to their checks on ``check_definition_id`` with a hash join, instead of one request per alert.
+"""
+
+
+def join_alerts(checks, alerts):
+    """
+    Join alert definitions to their check definitions.
+
+    >>> joined, dangling = join_alerts([{'id': 1}, {'id': 2}], [{'id': 10, 'check_definition_id': 1},
+    ...                                                         {'id': 11, 'check_definition_id': 3}])
+    >>> [(c['id'], [a['id'] for a in a]) for c, a in joined], [a['id'] for a in dangling]
+    ([(1, [10]), (2, [])], [11])
+
+    :param checks: Check definitions.
+    :type checks: list
+
+    :param alerts: Alert definitions.
+    :type alerts: list
+
+    :return: List of (check, alerts) sorted by check ID, and list of alerts whose check is not in ``checks``.
+    :rtype: tuple
+    """
+    by_check = {}
+    for alert in sorted(alerts, key=lambda a: a['id']):
+        by_check.setdefault(alert.get('check_definition_id'), []).append(alert)
+
+    joined = [(check, by_check.pop(check['id'], [])) for check in sorted(checks, key=lambda c: c['id'])]
+
+    dangling = sorted((a for group in by_check.values() for a in group), key=lambda a: a['id'])
+
+    return joined, dangling
+
+
+def find_orphans(checks, alerts):
+    """Return check definitions not used by any alert definition, sorted by ID."""
+    joined, _ = join_alerts(checks, alerts)
+    return [check for check, check_alerts in joined if not check_alerts]
@@ -0,0 +1,151 @@
+"""
+Age of entities by their ``last_modified`` timestamp, see ``zmon entities stale``.
+
+Entities are updated by the agents pushing them, so entities which were not modified for a long time were most likely
+left behind by decommissioned agents. They are still covered by checks and keep workers busy.
+"""
+import re
+import time
+
+from calendar import timegm
+from collections import OrderedDict
+
+
+DAY = 86400
+
+# Upper bounds of age histogram buckets in seconds, older entities are in the last bucket
+AGE_BUCKETS = OrderedDict([
+    ('<1d', DAY),
+    ('1d-7d', 7 * DAY),
+    ('7d-30d', 30 * DAY),
+    ('30d-90d', 90 * DAY),
+    ('90d-1y', 365 * DAY),
+    ('>1y', None),
+])
+
+# Format of entity ``last_modified`` in UTC, e.g. ``2017-05-12 10:45:11.592``
+last_modified_re = re.compile(r'(\d{4})-(\d\d)-(\d\d)[ T](\d\d):(\d\d):(\d\d)(\.\d+)?')
+
+MAX_CACHED_DAYS = 10000
+
+_day_starts = {}
+
+
+def parse_last_modified(value):
+    """
+    Parse entity ``last_modified`` into seconds since epoch. Faster than :func:`time.strptime` on many entities.
+
+    >>> parse_last_modified('1970-01-02 00:00:01.500')
+    86401.5
+    >>> parse_last_modified('invalid') is None
+    True
+
+    :param value: Timestamp in UTC.
+    :type value: str
+
+    :return: Seconds since epoch, or ``None`` if the timestamp is missing or invalid.
+    :rtype: float
+    """
+    match = last_modified_re.match(value) if isinstance(value, str) else None
+    if not match:
+        return None
+
+    year, month, day, hour, minute, second, fraction = match.groups()
+
+    # Timestamps of many entities share the day
+    date = value[:10]
+    start = _day_starts.get(date)
+    if start is None:
+        if len(_day_starts) >= MAX_CACHED_DAYS:
+            _day_starts.clear()
+        start = _day_starts[date] = timegm((int(year), int(month), int(day), 0, 0, 0))
+
+    return start + int(hour) * 3600 + int(minute) * 60 + int(second) + (float(fraction) if fraction else 0.0)
+
+
+def age_bucket(age):
+    """
+    Return label of age histogram bucket, see :data:`AGE_BUCKETS`.
+
+    >>> age_bucket(3 * DAY)
+    '1d-7d'
+    """
+    for label, limit in AGE_BUCKETS.items():
+        if limit is None or age < limit:
+            return label
+
+
+def find_stale(entities, older_than, types=None, now=None):
+    """
+    Find entities not modified for ``older_than`` seconds, and count entities by age and type.
+
+    Only stale entities are kept, so ``entities`` can be a stream like :func:`zmon_cli.client.Zmon.iter_entities`.
+    Entities without valid ``last_modified`` are never stale.
+
+    >>> result = find_stale([{'id': 'a', 'type': 'host', 'last_modified': '1970-01-01 00:00:00.000'},
+    ...                      {'id': 'b', 'type': 'host', 'last_modified': '1970-01-10 00:00:00.000'}],
+    ...                     7 * DAY, now=10 * DAY)
+    >>> [e['id'] for e in result['stale_entities']], result['types'][0]['histogram']['7d-30d']
+    (['a'], 1)
+
+    :param entities: Entities.
+    :type entities: iterable
+
+    :param older_than: Minimum age of stale entities in seconds.
+    :type older_than: int
+
+    :param types: Only entities of these types. Default is all types.
+    :type types: list
+
+    :param now: Current time in seconds since epoch.
+    :type now: float
+
+    :return: Dict with ``older_than``, number of ``entities`` and ``stale`` entities, ``types`` sorted by type with
+             their number of ``entities``, ``stale`` entities, entities with ``unknown`` age and age ``histogram``,
+             and ``stale_entities`` with ``id``, ``type``, ``last_modified`` and ``age`` in seconds, oldest first.
+    :rtype: dict
+    """
+    now = time.time() if now is None else now
+    types = set(types) if types else None
+
+    by_type = {}
+    stale = []
+    count = 0
+
+    for entity in entities:
+        entity_type = entity.get('type')
+        if types is not None and entity_type not in types:
+            continue
+
+        count += 1
+
+        summary = by_type.get(entity_type)
+        if summary is None:
+            summary = by_type[entity_type] = {
+                'type': entity_type, 'entities': 0, 'stale': 0, 'unknown': 0,
+                'histogram': OrderedDict((label, 0) for label in AGE_BUCKETS)}
+
+        summary['entities'] += 1
+
+        modified = parse_last_modified(entity.get('last_modified'))
+        if modified is None:
+            summary['unknown'] += 1
+            continue
+
+        age = now - modified
+        summary['histogram'][age_bucket(age)] += 1
+
+        if age >= older_than:
+            summary['stale'] += 1
+            stale.append({'id': entity.get('id'), 'type': entity_type, 'last_modified': entity.get('last_modified'),
+                          'age': int(age)})
+
+    stale.sort(key=lambda e: (-e['age'], str(e['id'])))
+
+    return {
+        'older_than': older_than,
+        'entities': count,
+        'stale': len(stale),
+        'types': sorted(by_type.values(), key=lambda t: str(t['type'])),
+        'stale_entities': stale,
+    }
@@ -0,0 +1,224 @@
+"""
+In-memory index of entities for evaluating entity filters of check and alert definitions.
+
+Definitions select entities with ``entities`` and ``entities_exclude`` lists of filters. An entity matches a filter if
+all its keys match: attribute values are equal, contain the filter value if they are lists, or contain all keys of the
+filter value if both are dicts. An entity matches a definition if it matches any of its ``entities`` filters and none of
+its ``entities_exclude`` filters. Alert definitions select from entities of their check definition; alerts without
+``entities`` filters select all of them.
+
+Entities are indexed by attribute values, so filters are evaluated by intersecting postings instead of scanning all
+entities. Attributes are indexed when first used in a filter.
+"""
+# Attribute values indexed by value, others are matched by scanning
+INDEXED_TYPES = (str, int, float, bool, type(None))
+
+
+def match_value(value, query):
+    """
+    Return True if entity attribute ``value`` matches filter value ``query``.
+
+    >>> match_value(['a', 'b'], 'a'), match_value({'app': 'a', 'env': 'live'}, {'env': 'live'})
+    (True, True)
+    """
+    if value == query:
+        return True
+
+    if isinstance(value, list):
+        return any(match_value(v, query) for v in value)
+
+    if isinstance(query, dict) and isinstance(value, dict):
+        return all(k in value and match_value(value[k], q) for k, q in query.items())
+
+    return False
+
+
+def match_filter(entity, entity_filter):
+    """
+    Return True if entity matches all keys of filter.
+
+    >>> match_filter({'id': 'e-1', 'type': 'instance', 'team': 'zmon'}, {'type': 'instance', 'team': 'zmon'})
+    True
+    """
+    return all(k in entity and match_value(entity[k], v) for k, v in entity_filter.items())
+
+
+def match_filters(entity, include, exclude=None):
+    """Return True if entity matches any ``include`` filter and no ``exclude`` filter."""
+    return (any(match_filter(entity, f) for f in include or []) and
+            not any(match_filter(entity, f) for f in exclude or []))
+
+
+class EntityIndex:
+    """Index of entities by attribute values.
+
+    :param entities: Entity dicts as returned by :func:`zmon_cli.client.Zmon.get_entities`.
+    :type entities: list
+    """
+
+    def __init__(self, entities):
+        self.entities = list(entities)
+        self.positions = {e.get('id'): pos for pos, e in enumerate(self.entities)}
+        self.postings = {}  # key -> value -> set of entity positions
+        self._all = frozenset(range(len(self.entities)))
+
+    def _key_postings(self, key):
+        """Return postings of an attribute, indexing it on first use: filters use few of all attributes."""
+        postings = self.postings.get(key)
+        if postings is not None:
+            return postings
+
+        postings = self.postings[key] = {}
+        for pos, entity in enumerate(self.entities):
+            value = entity.get(key)
+            if value is None and key not in entity:
+                continue
+
+            for v in (value if isinstance(value, list) else (value,)):
+                if isinstance(v, INDEXED_TYPES):
+                    if v in postings:
+                        postings[v].add(pos)
+                    else:
+                        postings[v] = {pos}
+
+        return postings
+
+    def __len__(self):
+        return len(self.entities)
+
+    def get(self, entity_id):
+        pos = self.positions.get(entity_id)
+        return self.entities[pos] if pos is not None else None
+
+    def match(self, entity_filter):
+        """
+        Return positions of entities matching a filter.
+
+        :param entity_filter: Dict of attribute values.
+        :type entity_filter: dict
+
+        :rtype: set
+        """
+        indexed = []
+        scanned = []
+
+        for key, value in entity_filter.items():
+            if isinstance(value, INDEXED_TYPES):
+                indexed.append(self._key_postings(key).get(value, ()))
+            else:
+                scanned.append((key, value))
+
+        if indexed:
+            indexed.sort(key=len)
+            result = set(indexed[0])
+            for postings in indexed[1:]:
+                if not result:
+                    break
+                result.intersection_update(postings)
+        else:
+            result = set(self._all)
+
+        if scanned:
+            entities = self.entities
+            result = {p for p in result if match_filter(entities[p], dict(scanned))}
+
+        return result
+
+    def select(self, include, exclude=None, within=None):
+        """
+        Return positions of entities matching any ``include`` and no ``exclude`` filter.
+
+        :param include: List of filters.
+        :type include: list
+
+        :param exclude: List of filters.
+        :type exclude: list
+
+        :param within: Only select from entity positions.
+        :type within: set
+
+        :rtype: set
+        """
+        result = set()
+        for entity_filter in include or []:
+            result.update(self.match(entity_filter))
+
+        if within is not None:
+            result.intersection_update(within)
+
+        for entity_filter in exclude or []:
+            if not result:
+                break
+            result.difference_update(self.match(entity_filter))
+
+        return result
+
+    def check_coverage(self, check):
+        """Return positions of entities covered by a check definition."""
+        return self.select(check.get('entities'), check.get('entities_exclude'))
+
+    def alert_coverage(self, alert, check, check_coverage=None):
+        """
+        Return positions of entities covered by an alert definition.
+
+        :param alert: Alert definition.
+        :type alert: dict
+
+        :param check: Check definition of the alert.
+        :type check: dict
+
+        :param check_coverage: Coverage of the check, if already computed.
+        :type check_coverage: set
+
+        :rtype: set
+        """
+        covered = self.check_coverage(check) if check_coverage is None else check_coverage
+
+        if alert.get('entities'):
+            return self.select(alert['entities'], alert.get('entities_exclude'), within=covered)
+
+        return self.select([{}], alert.get('entities_exclude'), within=covered)
+
+    def resolve(self, positions):
+        """Return entities at positions, sorted by ID."""
+        return sorted((self.entities[p] for p in positions), key=lambda e: e.get('id') or '')
+
+    def summary(self, positions):
+        """
+        Return summary of entities at positions.
+
+        :return: Dict with ``count``, ``types`` (count per entity type) and ``entities`` (list of ``id``, ``type`` and
+                 ``team``).
+        :rtype: dict
+        """
+        types = {}
+        entities = []
+        for entity in self.resolve(positions):
+            types[entity.get('type')] = types.get(entity.get('type'), 0) + 1
+            entities.append({k: entity.get(k) for k in ('id', 'type', 'team')})
+
+        return {'count': len(entities), 'types': types, 'entities': entities}
+
+
+def find_monitors(entity, checks, alerts):
+    """
+    Return check and alert definitions covering an entity.
+
+    :param entity: Entity dict.
+    :type entity: dict
+
+    :param checks: Check definitions.
+    :type checks: list
+
+    :param alerts: Alert definitions.
+    :type alerts: list
+
+    :return: Tuple of covering checks and alerts.
+    :rtype: tuple
+    """
+    covering = {c['id']: c for c in checks if match_filters(entity, c.get('entities'), c.get('entities_exclude'))}
+
+    alerts = [a for a in alerts if a.get('check_definition_id') in covering and
+              match_filters(entity, a.get('entities') or [{}], a.get('entities_exclude'))]
+
+    return sorted(covering.values(), key=lambda c: c['id']), sorted(alerts, key=lambda a: a['id'])
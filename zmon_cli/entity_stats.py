@@ -0,0 +1,254 @@
+"""
+Aggregate statistics of entities in a single pass, see ``zmon entities stats``.
+
+Entities are counted by groups of attribute values, with the number of distinct values of every attribute and the
+number of entities modified recently. Memory does not grow with the number of entities: distinct values are counted
+exactly up to :data:`EXACT_DISTINCT_LIMIT`, then estimated with a HyperLogLog sketch.
+"""
+import json
+import math
+import time
+
+from collections import OrderedDict
+
+from zmon_cli.entity_age import DAY, parse_last_modified
+
+
+# HyperLogLog registers are 2 ** precision bytes, the standard error is about 1.04 / sqrt(2 ** precision)
+DEFAULT_PRECISION = 14
+
+# Count distinct values exactly up to this number
+EXACT_DISTINCT_LIMIT = 1000
+
+# Entities of further groups are counted as ``other``
+MAX_GROUPS = 10000
+
+# Attribute values of as many entities are counted at once
+BATCH_SIZE = 1000
+
+# Windows of recent modifications
+CHURN_WINDOWS = OrderedDict([
+    ('1h', 3600),
+    ('1d', DAY),
+    ('7d', 7 * DAY),
+])
+
+HASH_BITS = 64
+HASH_MASK = (1 << HASH_BITS) - 1
+
+
+def value_key(value):
+    """
+    Return string identifying an attribute value, distinguishing strings from other JSON values.
+
+    >>> value_key('1') == value_key(1)
+    False
+    """
+    if isinstance(value, str):
+        return value
+    if value is None or isinstance(value, (int, float)):
+        # Much faster than JSON, and distinguishes booleans from numbers as well
+        return '\x00' + repr(value)
+    return '\x00' + json.dumps(value, sort_keys=True, default=str)
+
+
+class HyperLogLog:
+    """Estimate the number of distinct strings.
+
+    >>> hll = HyperLogLog(precision=14)
+    >>> for i in range(10000):
+    ...     hll.add(str(i % 5000))
+    >>> abs(hll.count() - 5000) < 250
+    True
+
+    :param precision: Number of index bits, between 4 and 16.
+    :type precision: int
+    """
+
+    def __init__(self, precision=DEFAULT_PRECISION):
+        if not 4 <= precision <= 16:
+            raise ValueError('Precision must be between 4 and 16')
+
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+        self._rank_bits = HASH_BITS - precision
+        self._rank_mask = (1 << self._rank_bits) - 1
+
+    def add(self, value):
+        self.update((value,))
+
+    def update(self, values):
+        registers = self.registers
+        rank_bits = self._rank_bits
+        rank_mask = self._rank_mask
+
+        # Hashes of strings are randomized per process, but well distributed and much faster than hashlib
+        for h in map(hash, values):
+            h &= HASH_MASK
+            index = h >> rank_bits
+            # Position of the first 1 bit in the remaining bits
+            rank = rank_bits - (h & rank_mask).bit_length() + 1
+
+            if rank > registers[index]:
+                registers[index] = rank
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = m * math.log(m / zeros)
+
+        return int(round(estimate))
+
+
+class DistinctCounter:
+    """Count distinct strings exactly up to ``limit``, then estimate with :class:`HyperLogLog`.
+
+    :param limit: Maximum number of strings kept.
+    :type limit: int
+
+    :param precision: Precision of :class:`HyperLogLog`.
+    :type precision: int
+    """
+
+    def __init__(self, limit=EXACT_DISTINCT_LIMIT, precision=DEFAULT_PRECISION):
+        self.limit = limit
+        self.precision = precision
+        self._values = set()
+        self._hll = None
+
+    @property
+    def exact(self):
+        return self._hll is None
+
+    def add(self, value):
+        self.update((value,))
+
+    def update(self, values):
+        if self._hll is not None:
+            self._hll.update(values)
+            return
+
+        self._values.update(values)
+
+        if len(self._values) > self.limit:
+            self._hll = HyperLogLog(self.precision)
+            self._hll.update(self._values)
+            self._values = None
+
+    def count(self):
+        return len(self._values) if self._hll is None else self._hll.count()
+
+
+def _group_value(value):
+    return value if value is None or isinstance(value, (str, int, float, bool)) else value_key(value)
+
+
+def entity_stats(entities, by=('type',), now=None, max_groups=MAX_GROUPS, precision=DEFAULT_PRECISION):
+    """
+    Count entities by groups of attribute values, distinct values per attribute and recent modifications.
+
+    >>> stats = entity_stats([{'id': 'a', 'type': 'host'}, {'id': 'b', 'type': 'host'}, {'id': 'c', 'type': 'db'}])
+    >>> [(dict(g['group']), g['entities']) for g in stats['groups']], [(k['key'], k['distinct']) for k in stats['keys']]
+    ([({'type': 'host'}, 2), ({'type': 'db'}, 1)], [('id', 3), ('type', 2)])
+
+    :param entities: Entities, e.g. streamed by :func:`zmon_cli.client.Zmon.iter_entities`.
+    :type entities: iterable
+
+    :param by: Attributes to group by.
+    :type by: list
+
+    :param now: Current time in seconds since epoch.
+    :type now: float
+
+    :param max_groups: Maximum number of groups, entities of further groups are counted as ``other``.
+    :type max_groups: int
+
+    :param precision: Precision of distinct value estimates, see :class:`HyperLogLog`.
+    :type precision: int
+
+    :return: Dict with ``by``, number of ``entities``, ``windows`` of recent modifications, ``groups`` sorted by
+             number of entities with ``group`` values, ``entities``, ``share`` and number of entities ``modified`` in
+             each window, ``other`` entities of groups beyond ``max_groups``, total ``modified`` entities and ``keys``
+             with number of ``entities`` having the key, number of ``distinct`` values and whether it is ``exact``.
+    :rtype: dict
+    """
+    now = time.time() if now is None else now
+    by = tuple(by)
+    windows = tuple(CHURN_WINDOWS.values())
+
+    groups = {}
+    keys = {}
+    modified = [0] * len(windows)
+    other = [0, [0] * len(windows)]
+    count = 0
+
+    # Values by key of the last entities, counted in bulk
+    batch = {}
+
+    def count_values():
+        for key, values in batch.items():
+            counter = keys.get(key)
+            if counter is None:
+                counter = keys[key] = [0, DistinctCounter(precision=precision)]
+            counter[0] += len(values)
+            counter[1].update(values)
+        batch.clear()
+
+    for entity in entities:
+        count += 1
+
+        group_key = tuple(_group_value(entity.get(k)) for k in by)
+        group = groups.get(group_key)
+        if group is None:
+            if len(groups) < max_groups:
+                group = groups[group_key] = [0, [0] * len(windows)]
+            else:
+                group = other
+
+        group[0] += 1
+
+        age = now - (parse_last_modified(entity.get('last_modified')) or 0)
+        for i, window in enumerate(windows):
+            if age < window:
+                group[1][i] += 1
+                modified[i] += 1
+
+        for key, value in entity.items():
+            values = batch.get(key)
+            if values is None:
+                values = batch[key] = []
+            values.append(value if type(value) is str else value_key(value))
+
+        if count % BATCH_SIZE == 0:
+            count_values()
+
+    count_values()
+
+    def window_counts(counts):
+        return OrderedDict(zip(CHURN_WINDOWS, counts))
+
+    result_groups = [{
+        'group': OrderedDict(zip(by, group_key)),
+        'entities': n,
+        'share': n / count,
+        'modified': window_counts(group_modified),
+    } for group_key, (n, group_modified) in groups.items()]
+
+    result_groups.sort(key=lambda g: (-g['entities'], [str(v) for v in g['group'].values()]))
+
+    return {
+        'by': list(by),
+        'entities': count,
+        'windows': list(CHURN_WINDOWS),
+        'groups': result_groups,
+        'other': {'entities': other[0], 'modified': window_counts(other[1])},
+        'modified': window_counts(modified),
+        'keys': [{'key': key, 'entities': n, 'distinct': counter.count(), 'exact': counter.exact}
+                 for key, (n, counter) in sorted(keys.items())],
+    }
@@ -0,0 +1,21 @@
+"""
+Thin ``zmon`` entry point.
+
+Forwards the command line to a running ``zmon daemon`` and only imports the command tree if no daemon is reachable.
+"""
+import sys
+
+from zmon_cli import daemon
+
+
+def main():
+    argv = sys.argv[1:]
+
+    if daemon.should_forward(argv):
+        exit_code = daemon.forward(argv)
+        if exit_code is not None:
+            sys.exit(exit_code)
+
+    from zmon_cli.main import main as run_in_process
+
+    run_in_process()
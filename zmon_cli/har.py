@@ -0,0 +1,302 @@
+"""
+Record ZMON traffic as `HAR 1.2 <http://www.softwareishard.com/blog/har-12-spec/>`_ and replay it offline.
+
+:class:`HarRecorder` is a timing collector keeping every request and response with its timings::
+
+    recorder = HarRecorder()
+    zmon = Zmon('https://zmon.example.org', token='...', collector=recorder)
+    zmon.get_check_definitions()
+    recorder.save('zmon.har')
+
+:class:`ReplayAdapter` answers requests from a capture, in recorded order, with original or zero latency, so client CPU
+cost can be measured without network::
+
+    zmon = Zmon('https://zmon.example.org', token='...', transport=ReplayAdapter(load_har('zmon.har')))
+
+Credentials (``Authorization`` and cookie headers) are never written to captures.
+"""
+import collections
+import datetime
+import json
+import time
+
+from io import BytesIO
+from urllib.parse import parse_qsl, urlsplit
+
+import requests
+
+from requests.adapters import BaseAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+from zmon_cli import __version__
+from zmon_cli.timings import TimingCollector, timed_json
+
+
+HAR_VERSION = '1.2'
+
+LATENCY_ORIGINAL = 'original'
+LATENCY_ZERO = 'zero'
+
+REDACTED = 'REDACTED'
+
+SENSITIVE_HEADERS = {'authorization', 'cookie', 'set-cookie', 'proxy-authorization'}
+
+# Headers not valid for the decoded body of a replayed response
+DROPPED_RESPONSE_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding'}
+
+
+class HarError(requests.RequestException):
+    pass
+
+
+def build_response(request, status, body, headers=None, reason=None):
+    """Return a :class:`requests.Response` to ``request`` with body bytes, as returned by transport adapters."""
+    resp = Response()
+    resp.status_code = status
+    resp.reason = reason or ('OK' if status < 400 else 'Error')
+    resp.headers = CaseInsensitiveDict(headers or {})
+    resp.headers['Content-Length'] = str(len(body))
+    resp.raw = BytesIO(body)
+    resp.encoding = 'utf-8'
+    resp.url = request.url
+    resp.request = request
+
+    return resp
+
+
+def _har_headers(headers):
+    return [{'name': k, 'value': REDACTED if k.lower() in SENSITIVE_HEADERS else v} for k, v in headers.items()]
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+def _timestamp(ts):
+    return datetime.datetime.utcfromtimestamp(ts).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+def har_timings(phases):
+    """
+    Return HAR timings (ms) of timing record phases. ``connect`` includes ``ssl``, -1 means not applicable.
+
+    >>> sorted(har_timings({'server': 0.02, 'download': 0.001}).items())
+    [('blocked', -1), ('connect', -1), ('dns', -1), ('receive', 1.0), ('send', 0), ('ssl', -1), ('wait', 20.0)]
+    """
+    connected = 'connect' in phases
+
+    return {
+        'blocked': -1,
+        'dns': _ms(phases['dns']) if 'dns' in phases else -1,
+        'connect': _ms(phases['connect'] + phases.get('tls', 0)) if connected else -1,
+        'ssl': _ms(phases['tls']) if 'tls' in phases else -1,
+        'send': 0,
+        'wait': _ms(phases.get('server', 0)),
+        'receive': _ms(phases.get('download', 0)),
+    }
+
+
+class HarRecorder(TimingCollector):
+    """Timing collector recording requests and responses.
+
+    :param collector: Forward timing records to another collector, e.g. a :class:`zmon_cli.tracing.Tracer`.
+    :type collector: TimingCollector
+    """
+
+    def __init__(self, collector=None):
+        super().__init__()
+        self.collector = collector
+        self._exchanges = []
+
+    def new_record(self, request):
+        if self.collector is not None:
+            return self.collector.new_record(request)
+        return super().new_record(request)
+
+    def before_request(self, request):
+        if self.collector is not None:
+            self.collector.before_request(request)
+
+    def add_exchange(self, record, request, response):
+        super().add_exchange(record, request, response)
+
+        with self._lock:
+            self._exchanges.append((record, self._request(request), self._response(response, record)))
+
+        if self.collector is not None:
+            self.collector.add_exchange(record, request, response)
+
+    def clear(self):
+        super().clear()
+        with self._lock:
+            self._exchanges = []
+
+    @staticmethod
+    def _request(request):
+        split = urlsplit(request.url)
+        data = {
+            'method': request.method,
+            'url': request.url,
+            'httpVersion': 'HTTP/1.1',
+            'cookies': [],
+            'headers': _har_headers(request.headers),
+            'queryString': [{'name': k, 'value': v} for k, v in parse_qsl(split.query, keep_blank_values=True)],
+            'headersSize': -1,
+            'bodySize': 0,
+        }
+
+        body = request.body
+        if body:
+            text = body.decode('utf-8', 'replace') if isinstance(body, bytes) else body
+            data['bodySize'] = len(body)
+            data['postData'] = {'mimeType': request.headers.get('Content-Type', ''), 'text': text}
+
+        return data
+
+    @staticmethod
+    def _response(response, record):
+        if response is None:
+            return {'status': 0, 'statusText': '', 'httpVersion': '', 'cookies': [], 'headers': [],
+                    'content': {'size': 0, 'mimeType': ''}, 'redirectURL': '', 'headersSize': -1, 'bodySize': -1,
+                    '_error': record['error']}
+
+        content = {'size': record['bytes'], 'mimeType': response.headers.get('Content-Type', '')}
+        # Streamed responses are read here, iterating their content afterwards uses the recorded body
+        try:
+            content['text'] = response.text
+        except requests.RequestException:
+            pass
+
+        return {
+            'status': response.status_code,
+            'statusText': response.reason or '',
+            'httpVersion': 'HTTP/1.1',
+            'cookies': [],
+            'headers': _har_headers(response.headers),
+            'content': content,
+            'redirectURL': response.headers.get('Location', ''),
+            'headersSize': -1,
+            'bodySize': record['bytes'],
+        }
+
+    def to_har(self):
+        """Return recorded requests as HAR dict."""
+        with self._lock:
+            exchanges = sorted(self._exchanges, key=lambda e: e[0]['timestamp'])
+
+        entries = []
+        for record, request, response in exchanges:
+            timings = har_timings(record['phases'])
+            entries.append({
+                'startedDateTime': _timestamp(record['timestamp']),
+                'time': round(sum(v for k, v in timings.items() if k != 'ssl' and v > 0), 3),
+                'request': request,
+                'response': response,
+                'cache': {},
+                'timings': timings,
+                '_decode': _ms(record['phases'].get('decode', 0)),
+            })
+
+        return {'log': {
+            'version': HAR_VERSION,
+            'creator': {'name': 'zmon-cli', 'version': __version__},
+            'pages': [],
+            'entries': entries,
+        }}
+
+    def save(self, path):
+        with open(path, 'w') as fd:
+            json.dump(self.to_har(), fd, indent=2)
+
+
+def load_har(path):
+    """Load HAR file, raising :class:`HarError` if it is invalid."""
+    try:
+        with open(path) as fd:
+            har = json.load(fd)
+        har['log']['entries']
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        raise HarError('Invalid HAR file {}: {}'.format(path, e))
+
+    return har
+
+
+class ReplayAdapter(BaseAdapter):
+    """Transport adapter answering requests from a HAR capture.
+
+    Requests are matched by method and URL. Repeated requests get recorded responses in order, the last one is repeated
+    when all are used up. Requests missing in the capture fail with :class:`HarError`.
+
+    :param har: HAR dict, see :func:`load_har`.
+    :type har: dict
+
+    :param latency: ``original`` delays responses by recorded time, ``zero`` responds immediately.
+    :type latency: str
+
+    :param collector: Record timings of replayed requests.
+    :type collector: :class:`zmon_cli.timings.TimingCollector`
+    """
+
+    def __init__(self, har, latency=LATENCY_ORIGINAL, collector=None):
+        super().__init__()
+        self.latency = latency
+        self.collector = collector
+
+        self._responses = collections.OrderedDict()
+        for entry in har['log']['entries']:
+            key = (entry['request']['method'], entry['request']['url'])
+            self._responses.setdefault(key, collections.deque()).append(entry)
+
+    def _next_entry(self, request):
+        queue = self._responses.get((request.method, request.url))
+        if not queue:
+            raise HarError('No recorded response for {} {}'.format(request.method, request.url), request=request)
+
+        # deque operations are atomic, concurrent requests get different entries
+        return queue.popleft() if len(queue) > 1 else queue[0]
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        collector = self.collector
+        record = collector.new_record(request) if collector else None
+        resp = None
+
+        if collector:
+            collector.before_request(request)
+
+        start = time.perf_counter()
+        try:
+            entry = self._next_entry(request)
+
+            if self.latency == LATENCY_ORIGINAL and entry.get('time', 0) > 0:
+                time.sleep(entry['time'] / 1000)
+
+            recorded = entry['response']
+            if not recorded['status']:
+                raise requests.ConnectionError('Recorded error: {}'.format(recorded.get('_error')), request=request)
+
+            headers = {h['name']: h['value'] for h in recorded['headers']
+                       if h['name'].lower() not in DROPPED_RESPONSE_HEADERS}
+            body = recorded['content'].get('text', '').encode('utf-8')
+
+            resp = build_response(request, recorded['status'], body, headers=headers, reason=recorded['statusText'])
+            resp.connection = self
+
+            if record is not None:
+                record['status'] = resp.status_code
+                record['bytes'] = len(body)
+                record['phases']['server'] = time.perf_counter() - start
+                resp.json = timed_json(resp.json, record)
+
+            return resp
+        except Exception as e:
+            if record is not None:
+                record['error'] = type(e).__name__
+            raise
+        finally:
+            if record is not None:
+                record['duration'] = time.perf_counter() - start
+                collector.add_exchange(record, request, resp)
+
+    def close(self):
+        pass
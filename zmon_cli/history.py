@@ -0,0 +1,283 @@
+"""
+Local time-series store for alert data.
+
+Every recorded entity of an alert gets a fixed-size ring buffer file of ``(timestamp, value)`` doubles. Files never
+grow beyond their capacity, and reads go through ``mmap`` so querying a window does not parse or load unrelated data.
+
+Layout of a history directory::
+
+    <history_dir>/<alert_id>/index.json   # entity ID -> ring file name
+    <history_dir>/<alert_id>/<n>.ring     # ring buffer of a single entity
+"""
+import bisect
+import json
+import logging
+import mmap
+import numbers
+import os
+import struct
+import time
+
+
+DEFAULT_CAPACITY = 10080  # one week of one-minute samples
+
+RING_MAGIC = b'ZMRB'
+RING_VERSION = 1
+
+# magic, version, capacity, reserved, total number of appended samples
+HEADER = struct.Struct('<4sIIIQ')
+SAMPLE = struct.Struct('<dd')
+
+INDEX_FILE = 'index.json'
+
+AGGREGATES = ('avg', 'min', 'max', 'sum', 'count', 'last')
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryError(Exception):
+    """Local alert history error."""
+
+    def __init__(self, message=''):
+        super().__init__('ZMON history error: {}'.format(message))
+
+
+class RingBuffer:
+    """Fixed-size on-disk ring buffer of ``(timestamp, value)`` samples.
+
+    :param path: Ring buffer file path. Created if missing.
+    :type path: str
+
+    :param capacity: Number of samples kept. Ignored if the file already exists.
+    :type capacity: int
+    """
+
+    def __init__(self, path, capacity=DEFAULT_CAPACITY):
+        self.path = path
+
+        if not os.path.exists(path):
+            with open(path, 'wb') as fd:
+                fd.write(HEADER.pack(RING_MAGIC, RING_VERSION, capacity, 0, 0))
+                fd.truncate(HEADER.size + capacity * SAMPLE.size)
+
+        with open(path, 'rb') as fd:
+            magic, version, self.capacity, _, _ = HEADER.unpack(fd.read(HEADER.size))
+
+        if magic != RING_MAGIC or version != RING_VERSION:
+            raise HistoryError('Invalid ring buffer file: {}'.format(path))
+
+    def _header(self, mm):
+        return HEADER.unpack_from(mm, 0)
+
+    def __len__(self):
+        with open(self.path, 'rb') as fd:
+            total = HEADER.unpack(fd.read(HEADER.size))[4]
+        return min(total, self.capacity)
+
+    def append(self, ts, value):
+        """
+        Append a sample, overwriting the oldest one if the buffer is full.
+
+        Samples with a timestamp not newer than the last one are ignored (i.e. polling faster than the check interval).
+
+        :return: True if sample was stored.
+        :rtype: bool
+        """
+        with open(self.path, 'r+b') as fd:
+            with mmap.mmap(fd.fileno(), 0) as mm:
+                magic, version, capacity, reserved, total = self._header(mm)
+
+                if total:
+                    last_ts = SAMPLE.unpack_from(mm, HEADER.size + ((total - 1) % capacity) * SAMPLE.size)[0]
+                    if ts <= last_ts:
+                        return False
+
+                SAMPLE.pack_into(mm, HEADER.size + (total % capacity) * SAMPLE.size, ts, value)
+                HEADER.pack_into(mm, 0, magic, version, capacity, reserved, total + 1)
+
+        return True
+
+    def read(self, since=None, until=None):
+        """
+        Read samples ordered by time, optionally restricted to ``since <= ts <= until``.
+
+        :return: Tuple of timestamps list and values list.
+        :rtype: tuple
+        """
+        with open(self.path, 'rb') as fd:
+            with mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                total = self._header(mm)[4]
+                count = min(total, self.capacity)
+
+                samples = memoryview(mm)[HEADER.size:HEADER.size + count * SAMPLE.size].cast('d')
+                try:
+                    timestamps = samples[0::2].tolist()
+                    values = samples[1::2].tolist()
+                finally:
+                    samples.release()
+
+        if total > self.capacity:
+            head = total % self.capacity
+            timestamps = timestamps[head:] + timestamps[:head]
+            values = values[head:] + values[:head]
+
+        start = bisect.bisect_left(timestamps, since) if since is not None else 0
+        end = bisect.bisect_right(timestamps, until) if until is not None else len(timestamps)
+
+        return timestamps[start:end], values[start:end]
+
+
+class HistoryStore:
+    """Directory of per-alert, per-entity ring buffers.
+
+    :param path: History base directory. Created if missing.
+    :type path: str
+
+    :param capacity: Number of samples kept per entity for newly recorded entities.
+    :type capacity: int
+    """
+
+    def __init__(self, path, capacity=DEFAULT_CAPACITY):
+        self.path = path
+        self.capacity = capacity
+
+        os.makedirs(path, exist_ok=True)
+
+    def _alert_dir(self, alert_id):
+        return os.path.join(self.path, str(alert_id))
+
+    def _load_index(self, alert_id):
+        fn = os.path.join(self._alert_dir(alert_id), INDEX_FILE)
+        if not os.path.exists(fn):
+            return {}
+
+        with open(fn) as fd:
+            return json.load(fd)
+
+    def _save_index(self, alert_id, index):
+        fn = os.path.join(self._alert_dir(alert_id), INDEX_FILE)
+        tmp = '{}.tmp'.format(fn)
+
+        with open(tmp, 'w') as fd:
+            json.dump(index, fd)
+
+        os.replace(tmp, fn)
+
+    def alerts(self):
+        """Return recorded alert IDs."""
+        return sorted(d for d in os.listdir(self.path) if os.path.exists(os.path.join(self.path, d, INDEX_FILE)))
+
+    def entities(self, alert_id):
+        """Return recorded entity IDs of an alert."""
+        return sorted(self._load_index(alert_id))
+
+    def record(self, alert_id, alert_data, field=None):
+        """
+        Store alert data as returned by :func:`zmon_cli.client.Zmon.get_alert_data`.
+
+        Only numeric values are recorded. Use ``field`` to record a single key of ``dict`` values.
+
+        :param alert_id: ZMON alert ID.
+        :type alert_id: int
+
+        :param alert_data: Alert data list.
+        :type alert_data: list
+
+        :param field: Key to extract from ``dict`` values.
+        :type field: str
+
+        :return: Number of stored samples.
+        :rtype: int
+        """
+        os.makedirs(self._alert_dir(alert_id), exist_ok=True)
+
+        index = self._load_index(alert_id)
+        index_changed = False
+        stored = 0
+
+        for item in alert_data:
+            if not item.get('results'):
+                continue
+
+            result = item['results'][0]
+            value = result.get('value')
+
+            if field is not None and isinstance(value, dict):
+                value = value.get(field)
+
+            if isinstance(value, bool) or not isinstance(value, numbers.Real):
+                logger.debug('Skipping non-numeric value of entity %s in alert %s', item['entity'], alert_id)
+                continue
+
+            entity_id = item['entity']
+            if entity_id not in index:
+                index[entity_id] = '{}.ring'.format(len(index))
+                index_changed = True
+
+            ring = RingBuffer(os.path.join(self._alert_dir(alert_id), index[entity_id]), capacity=self.capacity)
+            if ring.append(float(result.get('ts') or time.time()), float(value)):
+                stored += 1
+
+        if index_changed:
+            self._save_index(alert_id, index)
+
+        return stored
+
+    def series(self, alert_id, entity_ids=None, since=None, until=None):
+        """
+        Return recorded series of an alert.
+
+        :return: Dict with entity ID as key and ``(timestamps, values)`` tuple as value.
+        :rtype: dict
+        """
+        index = self._load_index(alert_id)
+        alert_dir = self._alert_dir(alert_id)
+
+        return {
+            entity_id: RingBuffer(os.path.join(alert_dir, fn)).read(since=since, until=until)
+            for entity_id, fn in index.items() if not entity_ids or entity_id in entity_ids
+        }
+
+
+def aggregate(timestamps, values, window=None, func='avg'):
+    """
+    Aggregate a series, optionally in fixed time windows.
+
+    >>> aggregate([0, 30, 60, 90], [1, 3, 5, 7], window=60)
+    [(0, 2.0), (60, 6.0)]
+
+    >>> aggregate([0, 30, 60, 90], [1, 3, 5, 7], func='max')
+    [(0, 7)]
+
+    :param window: Window size in seconds. If ``None``, the whole series is aggregated into one value.
+    :type window: int
+
+    :param func: One of ``avg``, ``min``, ``max``, ``sum``, ``count`` and ``last``.
+    :type func: str
+
+    :return: List of ``(window_start, value)`` tuples.
+    :rtype: list
+    """
+    if func not in AGGREGATES:
+        raise HistoryError('Unknown aggregate: {}'.format(func))
+
+    if not timestamps:
+        return []
+
+    buckets = []
+    for ts, value in zip(timestamps, values):
+        start = int(ts // window * window) if window else int(timestamps[0])
+        if not buckets or buckets[-1][0] != start:
+            buckets.append((start, []))
+        buckets[-1][1].append(value)
+
+    funcs = {
+        'avg': lambda v: sum(v) / len(v),
+        'min': min,
+        'max': max,
+        'sum': sum,
+        'count': len,
+        'last': lambda v: v[-1],
+    }
+
+    return [(start, funcs[func](vals)) for start, vals in buckets]
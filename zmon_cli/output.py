@@ -1,11 +1,14 @@
 import json
 import time
 
+import click
 import yaml
 import calendar
 
 from clickclick import print_table, OutputFormat, action, secho, error, ok, info
 
+from zmon_cli.tracing import stage
+
 
 # fields to dump as literal blocks
 LITERAL_FIELDS = set(['command', 'condition', 'description'])
@@ -103,14 +106,15 @@ class Output:
         self.errors.append(msg)
 
     def echo(self, out):
-        if self.output == 'yaml':
-            print(dump_yaml(out))
-        elif self.output == 'json':
-            print(json.dumps(out, indent=self.indent))
-        elif self.printer:
-            self.printer(out, self.output)
-        else:
-            print(out)
+        with stage('render', self.output):
+            if self.output == 'yaml':
+                print(dump_yaml(out))
+            elif self.output == 'json':
+                print(json.dumps(out, indent=self.indent))
+            elif self.printer:
+                self.printer(out, self.output)
+            else:
+                print(out)
 
 
 def render_entities(entities, output):
@@ -139,6 +143,26 @@ def render_entities(entities, output):
                     rows, titles={'last_modified_time': 'Modified'})
 
 
+def render_coverage(coverage, output=None):
+    types = ', '.join('{} {}'.format(n, t) for t, n in sorted(coverage['types'].items(), key=lambda x: (-x[1], x[0])))
+
+    secho('{} "{}" covers {} entities{}'.format(
+        coverage['definition'], coverage['name'], coverage['count'], ': ' + types if types else ''), bold=True)
+
+    if coverage['entities']:
+        print_table(['id', 'type', 'team'], coverage['entities'])
+
+
+def render_monitors(monitors, output=None):
+    secho('Check definitions:', bold=True)
+    print_table(['id', 'name', 'owning_team', 'interval'], monitors['checks'])
+    secho('')
+
+    secho('Alert definitions:', bold=True)
+    print_table(['id', 'name', 'team', 'responsible_team', 'priority', 'check_definition_id'], monitors['alerts'],
+                titles={'check_definition_id': 'Check'})
+
+
 def render_status(status, output=None):
     secho('Alerts active: {}'.format(status.get('alerts_active')))
 
@@ -187,6 +211,24 @@ def render_checks(checks, output=None):
                 titles={'last_modified_time': 'Modified', 'last_modified_by': 'Modified by'}, styles=check_styles)
 
 
+def render_check_alerts(result, output=None):
+    rows = []
+    for check in result['checks']:
+        row = dict(check)
+        row['name'] = (row['name'] or '')[:60]
+        row['alert_ids'] = ' '.join(str(a['id']) for a in check['alerts'])
+        row['alerts'] = len(check['alerts'])
+        rows.append(row)
+
+    print_table(['id', 'name', 'owning_team', 'alerts', 'alert_ids'], rows, titles={'alert_ids': 'Alert IDs'},
+                styles={0: {'fg': 'yellow'}})
+
+    if result['dangling_alerts']:
+        secho('')
+        secho('Alerts of inactive or missing check definitions: {}'.format(
+            ' '.join(str(a['id']) for a in result['dangling_alerts'])), fg='yellow')
+
+
 def render_alerts(alerts, output=None):
     rows = []
 
@@ -241,3 +283,242 @@ def render_search(search, output):
     _print_table('Alerts:', search['alerts'])
     _print_table('Dashboards:', search['dashboards'])
     _print_table('Grafana Dashboards:', search['grafana_dashboards'])
+
+
+def render_backtest(results, output=None):
+    rows = []
+
+    for result in results:
+        row = dict(result['total'])
+
+        row['condition'] = result['condition']
+        row['parameters'] = ' '.join('{}={}'.format(k, v) for k, v in sorted(result['parameters'].items()))
+        row['entities'] = len(result['entities'])
+        row['alerting'] = '{:.1f}h'.format(row.pop('alerting_seconds') / 3600)
+
+        rows.append(row)
+
+    titles = {
+        'entities_alerting': 'Alerting entities',
+        'alerting': 'Alerting time',
+    }
+
+    print_table(['condition', 'parameters', 'entities', 'samples', 'entities_alerting', 'fired', 'flaps', 'alerting'],
+                rows, titles=titles)
+
+
+def render_batch_step(result):
+    status = 'SKIPPED' if result['exit_code'] is None else 'OK' if result['exit_code'] == 0 else 'FAILED'
+    info('[{}] {} ... {} ({:.3f}s)'.format(result['step'], result['name'], status, result['duration']))
+
+    click.echo(result['stdout'], nl=False)
+    click.echo(result['stderr'], nl=False, err=True)
+
+
+def render_batch(results, output=None):
+    rows = []
+    for result in results:
+        row = dict(result)
+        row['status'] = 'SKIPPED' if row['exit_code'] is None else 'OK' if row['exit_code'] == 0 else 'FAILED'
+        rows.append(row)
+
+    styles = {
+        'OK': {'fg': 'green'},
+        'FAILED': {'fg': 'red'},
+        'SKIPPED': {'fg': 'yellow'},
+    }
+
+    secho('')
+    print_table(['step', 'name', 'status', 'exit_code', 'duration'], rows, styles=styles)
+
+
+def render_bench(result, output=None):
+    total = result['total']
+
+    secho('{} requests in {:.1f}s, {:.1f} req/s, {} errors, concurrency {}{}'.format(
+        total['count'], result['duration'], total['throughput'], total['errors'], result['concurrency'],
+        ', target rate {}/s'.format(result['rate']) if result['rate'] else ''))
+
+    rows = []
+    for name, stats in list(result['operations'].items()) + [('total', dict(total, endpoint=''))]:
+        row = dict(stats, operation=name)
+        row['error_codes'] = ' '.join('{}={}'.format(k, v) for k, v in sorted(stats['error_codes'].items()))
+        for key in ('throughput', 'p50', 'p95', 'p99', 'max'):
+            row[key] = '{:.1f}'.format(stats[key]) if stats[key] is not None else ''
+        rows.append(row)
+
+    titles = {'throughput': 'req/s', 'p50': 'p50 ms', 'p95': 'p95 ms', 'p99': 'p99 ms', 'max': 'max ms',
+              'error_codes': 'Error codes'}
+
+    print_table(['operation', 'endpoint', 'count', 'throughput', 'p50', 'p95', 'p99', 'max', 'errors', 'error_codes'],
+                rows, titles=titles)
+
+
+def render_duplicates(groups, output=None):
+    rows = []
+    for i, group in enumerate(groups, 1):
+        for check in group['checks']:
+            row = dict(check, group=i, kind=group['kind'])
+            row['name'] = (row['name'] or '')[:60]
+            row['entities'] = json.dumps(check['entities'], sort_keys=True)[:60]
+            rows.append(row)
+
+    styles = {'identical': {'fg': 'red'}, 'similar': {'fg': 'yellow'}}
+
+    print_table(['group', 'kind', 'id', 'name', 'owning_team', 'interval', 'command_hash', 'entities'], rows,
+                titles={'command_hash': 'Command'}, styles=styles)
+
+    checks = sum(len(g['checks']) for g in groups)
+    same = sum(len(g['checks']) for g in groups if g['entity_filters'] == 1)
+
+    secho('')
+    secho('{} checks in {} groups, {} of them in groups with same entity filters'.format(checks, len(groups), same),
+          bold=True)
+
+
+FINDING_COLORS = {'error': 'red', 'warning': 'yellow', 'info': 'blue'}
+
+
+def render_validation(result, output=None):
+    counts = {}
+    for f in result['findings']:
+        counts[f['severity']] = counts.get(f['severity'], 0) + 1
+        secho('{}:{}: {} [{}] {}'.format(f['file'], f['line'], f['severity'], f['rule'], f['message']),
+              fg=FINDING_COLORS.get(f['severity']))
+
+    invalid = len({f['file'] for f in result['findings'] if f['severity'] == 'error'})
+    summary = ', '.join('{} {}s'.format(counts[s], s) for s in ('error', 'warning', 'info') if s in counts)
+
+    secho('{} files validated ({} unchanged), {} invalid{}'.format(
+        result['files'], result['cached'], invalid, ', ' + summary if summary else ''),
+        bold=True, fg='red' if invalid else 'green')
+
+
+def render_capacity(result, output=None):
+    secho('{} checks ({} covering no entity) on {} entities: {:.1f} check invocations/s forecast'.format(
+        result['checks'], result['idle_checks'], result['entities'], result['invocations_per_second']), bold=True)
+
+    observed = result['observed']
+    if observed:
+        ratio = ', {:.0%} of forecast'.format(observed['ratio']) if observed['ratio'] is not None else ''
+        secho('Observed {:.1f} invocations/s of {} workers over {:.0f}s{}'.format(
+            observed['invocations_per_second'], observed['workers'], observed['duration'], ratio), bold=True)
+
+    def rows(items):
+        return [dict(item, invocations_per_second='{:.2f}'.format(item['invocations_per_second']),
+                     share='{:.1%}'.format(item['share'])) for item in items]
+
+    titles = {'invocations_per_second': 'Invocations/s', 'entities': 'Entities'}
+
+    secho('')
+    info('Teams:')
+    print_table(['team', 'checks', 'entities', 'invocations_per_second', 'share'], rows(result['teams']),
+                titles=titles)
+
+    secho('')
+    info('Top checks:')
+    print_table(['id', 'name', 'owning_team', 'interval', 'entities', 'invocations_per_second', 'share'],
+                rows(result['top']), titles=titles)
+
+
+def render_stale(result, output=None):
+    secho('{} of {} entities not modified for {:.1f} days'.format(
+        result['stale'], result['entities'], result['older_than'] / 86400), bold=True)
+
+    if not result['types']:
+        return
+
+    buckets = list(result['types'][0]['histogram'])
+    rows = [dict(t['histogram'], type=t['type'], entities=t['entities'], stale=t['stale'], unknown=t['unknown'])
+            for t in result['types']]
+
+    secho('')
+    info('Entities by age of last modification:')
+    print_table(['type', 'entities', 'stale', 'unknown'] + buckets, rows, titles={b: b for b in buckets})
+
+    if result['stale_entities']:
+        now = time.time()
+        secho('')
+        info('Stale entities:')
+        print_table(['id', 'type', 'last_modified_time'],
+                    [dict(e, last_modified_time=now - e['age']) for e in result['stale_entities']],
+                    titles={'last_modified_time': 'Modified'})
+
+
+def render_entity_stats(stats, output=None):
+    secho('{} entities by {}'.format(stats['entities'], ', '.join(stats['by'])), bold=True)
+
+    columns = ['group_{}'.format(i) for i in range(len(stats['by']))]
+    titles = {c: k.title().replace('_', ' ') for c, k in zip(columns, stats['by'])}
+
+    windows = ['modified_{}'.format(w) for w in stats['windows']]
+    titles.update((c, 'Modified {}'.format(w)) for c, w in zip(windows, stats['windows']))
+
+    def row(values, entities, modified):
+        r = dict(zip(columns, values), entities=entities, share='{:.1%}'.format(entities / stats['entities']))
+        r.update((c, '{} ({:.0%})'.format(n, n / entities)) for c, n in zip(windows, modified.values()))
+        return r
+
+    rows = [row(g['group'].values(), g['entities'], g['modified']) for g in stats['groups']]
+    if stats['other']['entities']:
+        rows.append(row(['(other)'] * len(columns), stats['other']['entities'], stats['other']['modified']))
+
+    secho('')
+    print_table(columns + ['entities', 'share'] + windows, rows, titles=titles)
+
+    secho('')
+    info('Attributes:')
+    print_table(['key', 'entities', 'distinct'],
+                [dict(k, distinct=k['distinct'] if k['exact'] else '~{}'.format(k['distinct'])) for k in stats['keys']])
+
+
+TIMING_PHASE_CHARS = (('dns', 'd'), ('connect', 'c'), ('tls', 't'), ('server', 's'), ('download', 'r'),
+                      ('decode', 'j'))
+
+WATERFALL_WIDTH = 40
+
+
+def render_timings(collector, total=None):
+    """Render request waterfall and endpoint latency percentiles of a timing collector to stderr."""
+    def echo(line=''):
+        click.echo(line, err=True)
+
+    records = sorted(collector.records, key=lambda r: r['start'])
+
+    echo()
+    if not records:
+        echo('Timings: no requests')
+        return
+
+    end = max(r['start'] + r['duration'] + r['phases'].get('decode', 0) for r in records)
+    scale = WATERFALL_WIDTH / end if end else 0
+
+    echo('Timings (ms): {}'.format(' '.join('{}={}'.format(c, p) for p, c in TIMING_PHASE_CHARS)))
+    echo('{:>8} {:>8} {:>6} {:>9}  {:<{w}}  {}'.format(
+        'start', 'total', 'status', 'bytes', 'waterfall', 'request', w=WATERFALL_WIDTH))
+
+    for r in records:
+        bar = ' ' * int(r['start'] * scale)
+        for phase, char in TIMING_PHASE_CHARS:
+            bar += char * int(round(r['phases'].get(phase, 0) * scale))
+
+        status = r['status'] or r['error'] or '-'
+        echo('{:>8.1f} {:>8.1f} {:>6} {:>9}  {:<{w}}  {}'.format(
+            r['start'] * 1000, (r['duration'] + r['phases'].get('decode', 0)) * 1000, status, r['bytes'],
+            (bar or '|')[:WATERFALL_WIDTH], r['endpoint'], w=WATERFALL_WIDTH))
+
+    echo()
+    echo('{:<60} {:>5} {:>6} {:>8} {:>8} {:>8} {:>8} {:>10}'.format(
+        'endpoint', 'count', 'errors', 'p50', 'p95', 'p99', 'max', 'bytes'))
+
+    for endpoint, stats in sorted(collector.endpoints().items()):
+        echo('{:<60} {count:>5} {errors:>6} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f} {max:>8.1f} {bytes:>10}'.format(
+            endpoint, **stats))
+
+    requests_time = sum(r['duration'] + r['phases'].get('decode', 0) for r in records)
+    summary = '{} requests, {:.1f} ms in requests'.format(len(records), requests_time * 1000)
+    if total is not None:
+        summary += ', {:.1f} ms total'.format(total * 1000)
+
+    echo()
+    echo(summary)
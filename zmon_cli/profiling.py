@@ -0,0 +1,137 @@
+"""
+CPU and memory profiling of CLI commands, see ``zmon --profile`` and ``zmon --trace-malloc``.
+"""
+import cProfile
+import os
+import pstats
+import sys
+import tracemalloc
+
+
+DEFAULT_LIMIT = 20
+
+
+def get_short_path(filename):
+    """
+    Return source file path relative to its package or library directory.
+
+    >>> get_short_path('/usr/lib/python3/site-packages/clickclick/console.py')
+    'clickclick/console.py'
+    """
+    parts = os.path.normpath(filename).split(os.sep)
+
+    if 'zmon_cli' in parts:
+        return '/'.join(parts[parts.index('zmon_cli'):])
+
+    for marker in ('site-packages', 'dist-packages'):
+        if marker in parts:
+            return '/'.join(parts[parts.index(marker) + 1:])
+
+    for path in sorted(sys.path, key=len, reverse=True):
+        if path and filename.startswith(path + os.sep):
+            return os.path.relpath(filename, path)
+
+    return filename
+
+
+def get_module(filename):
+    """
+    Return module group of a source file, used to attribute cost to ZMON CLI modules and libraries.
+
+    >>> get_module('/usr/lib/python3/site-packages/zmon_cli/client.py')
+    'zmon_cli/client.py'
+    >>> get_module('/usr/lib/python3/site-packages/clickclick/console.py')
+    'clickclick'
+    >>> get_module('~')
+    '<built-in>'
+    """
+    if filename in ('~', '') or filename.startswith('<'):
+        return '<built-in>'
+
+    path = get_short_path(filename)
+    if path.startswith('zmon_cli/') or os.path.isabs(path):
+        return path
+
+    return path.split('/')[0].split('.')[0]
+
+
+class CPUProfile:
+    """Profile a command with :mod:`cProfile`.
+
+    :param path: Write stats to file, can be loaded with :class:`pstats.Stats` or e.g. snakeviz.
+    :type path: str
+
+    :param limit: Number of functions and modules in summary.
+    :type limit: int
+    """
+
+    def __init__(self, path, limit=DEFAULT_LIMIT):
+        self.path = path
+        self.limit = limit
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self, stream=None):
+        """Stop profiling, write stats file and print summary to ``stream`` (default is stderr)."""
+        self.profile.disable()
+
+        stream = stream or sys.stderr
+
+        self.profile.dump_stats(self.path)
+
+        stats = pstats.Stats(self.profile, stream=stream)
+
+        modules = {}
+        for (filename, _, _), (_, _, tottime, _, _) in stats.stats.items():
+            module = get_module(filename)
+            modules[module] = modules.get(module, 0) + tottime
+
+        total = sum(modules.values()) or 1
+
+        stream.write('\nCPU profile written to {}\n\nTime by module:\n'.format(self.path))
+        for module, seconds in sorted(modules.items(), key=lambda m: -m[1])[:self.limit]:
+            stream.write('{:>10.3f}s {:>5.1f}%  {}\n'.format(seconds, seconds * 100 / total, module))
+
+        stats.sort_stats('cumulative').print_stats(self.limit)
+
+
+class MemoryTrace:
+    """Trace memory allocations of a command with :mod:`tracemalloc`.
+
+    :param limit: Number of allocation sites in summary.
+    :type limit: int
+
+    :param frames: Number of frames stored per allocation.
+    :type frames: int
+    """
+
+    def __init__(self, limit=DEFAULT_LIMIT, frames=1):
+        self.limit = limit
+        self.frames = frames
+
+    def start(self):
+        tracemalloc.start(self.frames)
+
+    def stop(self, stream=None):
+        """Stop tracing and print peak memory and top allocation sites to ``stream`` (default is stderr)."""
+        stream = stream or sys.stderr
+
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        snapshot = snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+        ])
+
+        stream.write('\nMemory: peak {:.1f} KiB, {:.1f} KiB allocated at exit\n\nTop allocation sites:\n'.format(
+            peak / 1024, current / 1024))
+
+        for stat in snapshot.statistics('lineno')[:self.limit]:
+            frame = stat.traceback[0]
+            stream.write('{:>10.1f} KiB {:>8} blocks  {}:{}\n'.format(
+                stat.size / 1024, stat.count, get_short_path(frame.filename), frame.lineno))
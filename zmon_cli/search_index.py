@@ -0,0 +1,240 @@
+"""
+Local search index over check definitions, alert definitions, dashboards and Grafana dashboards.
+
+Documents are indexed by character trigrams of their searchable text (title, teams, description and command). Query
+words of three or more characters are matched via trigram postings, shorter words by prefix over the sorted word list.
+Results have the same shape as :func:`zmon_cli.client.Zmon.search`.
+"""
+import array
+import bisect
+import os
+import pickle
+import re
+
+
+INDEX_VERSION = 1
+
+KINDS = ('checks', 'alerts', 'dashboards', 'grafana_dashboards')
+
+word_re = re.compile(r'\w+')
+
+
+def _check_doc(check):
+    return (check.get('name'), check.get('owning_team'),
+            (check.get('owning_team'), check.get('description'), check.get('command')))
+
+
+def _alert_doc(alert):
+    return (alert.get('name'), alert.get('team'),
+            (alert.get('team'), alert.get('responsible_team'), alert.get('description'), alert.get('condition')))
+
+
+def _dashboard_doc(dashboard):
+    teams = ','.join(dashboard.get('alert_teams') or [])
+    return dashboard.get('name'), teams, (teams, ' '.join(dashboard.get('tags') or []))
+
+
+def _search_result_doc(result):
+    return result.get('title'), result.get('team'), (result.get('team'),)
+
+
+DOCUMENT_FIELDS = {
+    'checks': _check_doc,
+    'alerts': _alert_doc,
+    'dashboards': _dashboard_doc,
+    'grafana_dashboards': _search_result_doc,
+}
+
+
+def trigrams(text):
+    """
+    Return set of trigrams of all words in ``text``.
+
+    >>> sorted(trigrams('Zmon api'))
+    ['api', 'mon', 'zmo']
+    """
+    return {w[i:i + 3] for w in word_re.findall(text.lower()) for i in range(len(w) - 2)}
+
+
+class SearchIndex:
+    """Trigram search index.
+
+    Use :func:`SearchIndex.add` to index documents and :func:`SearchIndex.search` to query.
+    """
+
+    def __init__(self):
+        self.version = INDEX_VERSION
+        self.documents = []  # (kind, id, title, team, lowercase searchable text)
+        self.keys = set()  # (kind, id)
+        self.postings = {}  # trigram -> array of document positions
+        self.words = {}  # word -> array of document positions
+        self._sorted_words = None
+
+    def __len__(self):
+        return len(self.documents)
+
+    def add(self, kind, items):
+        """
+        Index items of a kind. Items already indexed are skipped.
+
+        :param kind: One of ``checks``, ``alerts``, ``dashboards`` and ``grafana_dashboards``.
+        :type kind: str
+
+        :param items: List of definition dicts as returned by the ZMON API, or search results for Grafana dashboards.
+        :type items: list
+
+        :return: Number of newly indexed items.
+        :rtype: int
+        """
+        fields = DOCUMENT_FIELDS[kind]
+        added = 0
+
+        for item in items:
+            key = (kind, item['id'])
+            if key in self.keys:
+                continue
+
+            title, team, extra = fields(item)
+            title, team = title or '', team or ''
+            text = ' '.join(str(t) for t in (title,) + extra if t).lower()
+
+            pos = len(self.documents)
+            self.documents.append((kind, item['id'], title, team, text))
+            self.keys.add(key)
+
+            for word in set(word_re.findall(text)):
+                self.words.setdefault(word, array.array('I')).append(pos)
+                for i in range(len(word) - 2):
+                    postings = self.postings.setdefault(word[i:i + 3], array.array('I'))
+                    if not postings or postings[-1] != pos:
+                        postings.append(pos)
+
+            added += 1
+
+        self._sorted_words = None
+
+        return added
+
+    def _prefix_matches(self, prefix):
+        if self._sorted_words is None:
+            self._sorted_words = sorted(self.words)
+
+        matches = set()
+        i = bisect.bisect_left(self._sorted_words, prefix)
+        while i < len(self._sorted_words) and self._sorted_words[i].startswith(prefix):
+            matches.update(self.words[self._sorted_words[i]])
+            i += 1
+
+        return matches
+
+    def _substring_matches(self, word):
+        postings = sorted((self.postings.get(t, ()) for t in trigrams(word)), key=len)
+        if not postings or not postings[0]:
+            return set()
+
+        # Intersecting the two rarest trigrams is selective enough, candidates are verified below.
+        candidates = set(postings[0])
+        if len(postings) > 1:
+            candidates.intersection_update(postings[1])
+
+        return {pos for pos in candidates if word in self.documents[pos][4]}
+
+    def search(self, q, limit=None, teams=None):
+        """
+        Search indexed documents. All query words have to match.
+
+        :param q: Search query.
+        :type q: str
+
+        :param limit: Maximum number of results per kind.
+        :type limit: int
+
+        :param teams: List of teams, results not belonging to any of them are dropped.
+        :type teams: list
+
+        :return: Search result.
+        :rtype: dict
+        """
+        words = word_re.findall(q.lower())
+
+        matches = None
+        for word in sorted(words, key=len, reverse=True):
+            found = self._substring_matches(word) if len(word) >= 3 else self._prefix_matches(word)
+            matches = found if matches is None else matches & found
+            if not matches:
+                break
+
+        result = {kind: [] for kind in KINDS}
+
+        teams = {t.lower() for t in teams} if teams else None
+
+        def score(pos):
+            title = self.documents[pos][2].lower()
+            return (-sum(3 if title.startswith(w) else 2 if w in title else 1 for w in words), title)
+
+        for pos in sorted(matches or (), key=score):
+            kind, item_id, title, team, _ = self.documents[pos]
+
+            if teams and not teams.intersection(t.strip().lower() for t in team.split(',')):
+                continue
+
+            if limit and len(result[kind]) >= limit:
+                continue
+
+            result[kind].append({'id': item_id, 'title': title, 'team': team})
+
+        return result
+
+    def save(self, path):
+        """Persist index to ``path``."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Persist sorted words, so prefix matching after load does not sort again.
+        self._sorted_words = sorted(self.words)
+
+        tmp = '{}.tmp'.format(path)
+        with open(tmp, 'wb') as fd:
+            pickle.dump(self, fd, protocol=pickle.HIGHEST_PROTOCOL)
+
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load index from ``path``.
+
+        :return: Search index, or ``None`` if missing, corrupt or built by an incompatible version.
+        :rtype: SearchIndex
+        """
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, 'rb') as fd:
+                index = pickle.load(fd)
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return None
+
+        if not isinstance(index, cls) or getattr(index, 'version', None) != INDEX_VERSION:
+            return None
+
+        return index
+
+
+def build_index(client):
+    """
+    Build a new search index from ZMON active check and alert definitions and dashboards.
+
+    :param client: ZMON client.
+    :type client: :class:`zmon_cli.client.Zmon`
+
+    :return: Search index.
+    :rtype: SearchIndex
+    """
+    index = SearchIndex()
+
+    index.add('checks', client.get_check_definitions())
+    index.add('alerts', client.get_alert_definitions())
+    index.add('dashboards', client.get_dashboards())
+
+    return index
@@ -0,0 +1,845 @@
+"""
+Local stand-in for the ZMON controller API, for benchmarks and tests without a ZMON deployment.
+
+:class:`Standin` implements the endpoints used by :class:`zmon_cli.client.Zmon` on top of an in-memory
+:class:`Dataset`, with optional latency and error injection. It is served over HTTP by :class:`StandinServer`, or
+mounted in-process with :class:`StandinAdapter`::
+
+    standin = Standin(generate_dataset(entities=200000, checks=5000, alerts=10000), latency=0.02, error_rate=0.01)
+
+    server = StandinServer(('localhost', 8080), standin)
+    server.serve_forever()
+
+    # or without sockets
+    zmon = Zmon(STANDIN_URL, token='x')
+    zmon.session.mount(STANDIN_URL, StandinAdapter(standin))
+"""
+import datetime
+import json
+import random
+import re
+import threading
+import time
+
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from requests.adapters import BaseAdapter
+
+from zmon_cli.client import (ACTIVE_ALERT_DEF, ACTIVE_CHECK_DEF, ALERT_DATA, ALERT_DEF, API_VERSION, CHECK_DEF,
+                             DASHBOARD, DOWNTIME, ENTITIES, GRAFANA, GROUPS, MEMBER, PHONE, SEARCH, STATUS, TOKENS)
+from zmon_cli.capacity import forecast
+from zmon_cli.har import build_response
+
+
+STANDIN_URL = 'http://zmon.standin'
+
+DEFAULT_ENTITIES = 1000
+DEFAULT_CHECKS = 100
+DEFAULT_ALERTS = 200
+DEFAULT_DASHBOARDS = 20
+DEFAULT_TEAMS = 20
+
+DEFAULT_ERROR_STATUS = 503
+
+SEARCH_LIMIT = 25
+
+# Maximum number of encoded read responses kept
+CACHE_SIZE = 1024
+
+ENTITY_TYPES = ('instance', 'kube_pod', 'host', 'database')
+
+REGIONS = ('eu-central-1', 'eu-west-1', 'us-east-1')
+
+INTERVALS = (15, 30, 60, 60, 60, 120, 300, 900)
+
+# Check command templates, formatted with a random application ID
+CHECK_COMMANDS = (
+    "http('http://{{}}:8080/health'.format(entity['ip']), timeout=5).code()",
+    "http('https://{app}.example.org/metrics', timeout=10).json()['requests']['count']",
+    "http('https://{app}.example.org/metrics').json()",
+    "entity['instance_type']",
+    "sql(database='{app}').execute('SELECT count(*) AS c FROM jobs WHERE failed').result()",
+    "[http(url, timeout=2).code() for url in ('https://{app}.example.org/', 'https://{app}.example.org/api')]",
+    "kairosdb().query('{app}.latency', aggregators=[{{'name': 'avg'}}])",
+    "cloudwatch().query_one({{'LoadBalancerName': '{app}'}}, 'Latency', 'Average', 'AWS/ELB')",
+    "jmx().read('java.lang:type=Memory', 'HeapMemoryUsage')",
+    "{{'up': http('https://{app}.example.org/', timeout=3).code() == 200, 'ts': time.time()}}",
+)
+
+ALERT_CONDITIONS = ('>100', '!= 200', '>0', '< 1', "['count'] > 1000", '>= 5')
+
+_id_re = r'(?P<id>\d+)'
+_name_re = r'(?P<name>[^/]+)'
+
+# Handlers of responses changing without writes
+UNCACHED_HANDLERS = {'get_status'}
+
+# Seconds workers have been running at stand-in start, see ``check_invocations`` of status
+WORKER_UPTIME = 86400
+
+# (method, path below /api/v1 without trailing slash, Standin method)
+ROUTES = (
+    ('GET', STATUS, 'get_status'),
+    ('GET', ENTITIES, 'get_entities'),
+    ('PUT', ENTITIES, 'put_entity'),
+    ('GET', ENTITIES + r'/(?P<entity_id>.+)', 'get_entity'),
+    ('DELETE', ENTITIES + r'/(?P<entity_id>.+)', 'delete_entity'),
+    ('GET', DASHBOARD, 'get_dashboards'),
+    ('POST', DASHBOARD, 'post_dashboard'),
+    ('GET', DASHBOARD + '/' + _id_re, 'get_dashboard'),
+    ('POST', DASHBOARD + '/' + _id_re, 'post_dashboard'),
+    ('GET', ACTIVE_CHECK_DEF, 'get_check_definitions'),
+    ('GET', ACTIVE_ALERT_DEF, 'get_alert_definitions'),
+    ('GET', CHECK_DEF + '/' + _id_re, 'get_check_definition'),
+    ('POST', CHECK_DEF, 'post_check_definition'),
+    ('DELETE', CHECK_DEF + '/' + _id_re, 'delete_check_definition'),
+    ('GET', ALERT_DEF + '/' + _id_re, 'get_alert_definition'),
+    ('POST', ALERT_DEF, 'post_alert_definition'),
+    ('PUT', ALERT_DEF + '/' + _id_re, 'put_alert_definition'),
+    ('DELETE', ALERT_DEF + '/' + _id_re, 'delete_alert_definition'),
+    ('GET', ALERT_DATA + '/' + _id_re + '/all-entities', 'get_alert_data'),
+    ('GET', SEARCH, 'search'),
+    ('GET', TOKENS, 'get_tokens'),
+    ('POST', TOKENS, 'post_token'),
+    ('GET', GRAFANA + '/' + _name_re, 'get_grafana_dashboard'),
+    ('POST', GRAFANA, 'post_grafana_dashboard'),
+    ('POST', DOWNTIME, 'post_downtime'),
+    ('GET', GROUPS, 'get_groups'),
+    ('DELETE', GROUPS + '/' + _name_re + '/active', 'clear_active'),
+    ('PUT', GROUPS + '/' + _name_re + r'/active/(?P<user>[^/]+)', 'set_active'),
+    ('PUT', GROUPS + '/' + _name_re + '/' + MEMBER + r'/(?P<user>[^/]+)', 'add_member'),
+    ('DELETE', GROUPS + '/' + _name_re + '/' + MEMBER + r'/(?P<user>[^/]+)', 'remove_member'),
+    ('PUT', GROUPS + '/' + _name_re + '/' + PHONE + r'/(?P<phone>[^/]+)', 'add_phone'),
+    ('DELETE', GROUPS + '/' + _name_re + '/' + PHONE + r'/(?P<phone>[^/]+)', 'remove_phone'),
+)
+
+_routes = [(method, re.compile('^{}$'.format(path)), handler) for method, path, handler in ROUTES]
+
+API_PREFIX = '/api/{}/'.format(API_VERSION)
+
+
+def contains(value, query):
+    """
+    Return True if ``value`` contains ``query``, like ZMON entity queries: dicts match if all query keys match.
+
+    >>> contains({'type': 'instance', 'labels': {'app': 'a', 'env': 'live'}}, {'labels': {'app': 'a'}})
+    True
+    >>> contains({'type': 'instance'}, [{'type': 'host'}, {'type': 'instance'}])
+    True
+    """
+    if isinstance(query, list):
+        if isinstance(value, list):
+            return all(any(contains(v, q) for v in value) for q in query)
+        return any(contains(value, q) for q in query)
+
+    if isinstance(query, dict):
+        return isinstance(value, dict) and all(k in value and contains(value[k], q) for k, q in query.items())
+
+    return value == query
+
+
+def _timestamp(ts):
+    # Format of entity ``last_modified`` returned by ZMON, milliseconds in UTC
+    return datetime.datetime.utcfromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+
+
+def _hex(rnd, size):
+    return '{:0{}x}'.format(rnd.getrandbits(size * 4), size)
+
+
+class Dataset:
+    """In-memory ZMON data: entities, check and alert definitions, dashboards, Grafana dashboards, groups, tokens and
+    downtimes. Entities are keyed by ID, all others by numeric ID or name."""
+
+    KEYS = ('entities', 'checks', 'alerts', 'dashboards', 'grafana_dashboards', 'groups', 'tokens', 'downtimes')
+
+    def __init__(self, entities=(), checks=(), alerts=(), dashboards=(), grafana_dashboards=(), groups=(), tokens=(),
+                 downtimes=()):
+        self.entities = OrderedDict((e['id'], e) for e in entities)
+        self.checks = OrderedDict((c['id'], c) for c in checks)
+        self.alerts = OrderedDict((a['id'], a) for a in alerts)
+        self.dashboards = OrderedDict((d['id'], d) for d in dashboards)
+        self.grafana_dashboards = OrderedDict((d['dashboard']['id'], d) for d in grafana_dashboards)
+        self.groups = OrderedDict((g['name'], g) for g in groups)
+        self.tokens = list(tokens)
+        self.downtimes = list(downtimes)
+
+    def to_dict(self):
+        data = {key: list(getattr(self, key).values()) for key in self.KEYS[:-2]}
+        data.update(tokens=self.tokens, downtimes=self.downtimes)
+        return data
+
+    def save(self, fd):
+        """Write dataset as JSON to a file object."""
+        json.dump(self.to_dict(), fd)
+
+    @classmethod
+    def load(cls, fd):
+        """Read dataset written by :func:`Dataset.save`."""
+        data = json.load(fd)
+        return cls(**{key: data.get(key, ()) for key in cls.KEYS})
+
+
+def _entity(rnd, entity_type, app, team, now):
+    region = rnd.choice(REGIONS)
+    account = 'aws:{}'.format(100000000000 + rnd.randrange(8))
+    modified = now - rnd.expovariate(1 / (7 * 86400))
+
+    if entity_type == 'instance':
+        entity = {
+            'id': '{}-i-{}[{}:{}]'.format(app, _hex(rnd, 8), account, region),
+            'application_id': app,
+            'application_version': '{}.{}'.format(rnd.randrange(1, 5), rnd.randrange(50)),
+            'stack_name': app,
+            'instance_type': rnd.choice(('t2.medium', 'm4.large', 'm4.xlarge', 'c4.2xlarge')),
+            'ip': '10.{}.{}.{}'.format(rnd.randrange(256), rnd.randrange(256), rnd.randrange(1, 255)),
+            'region': region,
+            'infrastructure_account': account,
+        }
+    elif entity_type == 'kube_pod':
+        entity = {
+            'id': 'pod-{}-{}-{}[{}]'.format(app, _hex(rnd, 10), _hex(rnd, 5), region),
+            'application_id': app,
+            'namespace': 'default',
+            'cluster_id': '{}:kube-{}'.format(account, region),
+            'pod_phase': rnd.choice(('Running', 'Running', 'Running', 'Pending')),
+            'labels': {'application': app, 'version': 'v{}'.format(rnd.randrange(1, 30))},
+            'containers': {app: {'image': 'registry.example.org/{}:{}'.format(app, rnd.randrange(100)),
+                                 'ready': True, 'restarts': rnd.randrange(3)}},
+        }
+    elif entity_type == 'host':
+        entity = {
+            'id': '{}-{:03d}.{}.example.org'.format(app, rnd.randrange(1000), region),
+            'host': '{}-{}'.format(app, rnd.randrange(1000)),
+            'dc': region,
+            'role': rnd.choice(('app', 'db', 'proxy', 'worker')),
+        }
+    else:
+        entity = {
+            'id': 'database-{}-{}[{}:{}]'.format(app, _hex(rnd, 6), account, region),
+            'application_id': app,
+            'database': app.replace('-', '_'),
+            'shards': {'shard{}'.format(i): '{}-{}.db.example.org:5432'.format(app, i)
+                       for i in range(rnd.randrange(1, 5))},
+        }
+
+    entity.update(type=entity_type, team=team, created_by='standin', last_modified=_timestamp(modified))
+
+    return entity
+
+
+def generate_dataset(entities=DEFAULT_ENTITIES, checks=DEFAULT_CHECKS, alerts=DEFAULT_ALERTS,
+                     dashboards=DEFAULT_DASHBOARDS, teams=DEFAULT_TEAMS, seed=0, now=None):
+    """
+    Generate a realistic dataset: entities of several types owned by teams and applications, checks on application
+    entities and alerts on checks. Some checks have no alert, some have several.
+
+    >>> dataset = generate_dataset(entities=50, checks=10, alerts=20)
+    >>> len(dataset.entities), len(dataset.checks), len(dataset.alerts)
+    (50, 10, 20)
+
+    :param seed: Random seed, the same seed generates the same dataset.
+    :type seed: int
+
+    :param now: Reference UNIX timestamp of modification times. Default is current time.
+    :type now: float
+
+    :rtype: Dataset
+    """
+    rnd = random.Random(seed)
+    now = time.time() if now is None else now
+    now_ms = int(now * 1000)
+
+    team_names = ['team-{}'.format(name) for name in (
+        'zmon', 'pay', 'shop', 'search', 'logistics', 'catalog', 'auth', 'data', 'mobile', 'platform')]
+    team_names = [team_names[i % len(team_names)] + ('' if i < len(team_names) else '-{}'.format(i))
+                  for i in range(max(teams, 1))]
+
+    # About 20 entities per application
+    apps = []
+    for i in range(max(entities // 20, 1)):
+        apps.append(('{}-{}'.format(rnd.choice(('api', 'web', 'worker', 'db', 'gateway', 'proxy')), i),
+                     rnd.choice(team_names)))
+
+    generated = []
+    seen = set()
+    while len(generated) < entities:
+        app, team = rnd.choice(apps)
+        entity = _entity(rnd, rnd.choice(ENTITY_TYPES), app, team, now)
+        if entity['id'] not in seen:
+            seen.add(entity['id'])
+            generated.append(entity)
+
+    check_defs = []
+    for i in range(1, checks + 1):
+        app, team = rnd.choice(apps)
+        entity_type = rnd.choice(ENTITY_TYPES)
+        if entity_type == 'host':
+            filters = [{'type': 'host', 'team': team}]
+        else:
+            filters = [{'type': entity_type, 'application_id': app}]
+        check_defs.append({
+            'id': i,
+            'name': '{} {} {}'.format(app, rnd.choice(('health', 'latency', 'errors', 'queue size', 'memory')), i),
+            'description': 'Generated check of {}'.format(app),
+            'owning_team': team,
+            'entities': filters,
+            'interval': rnd.choice(INTERVALS),
+            'command': rnd.choice(CHECK_COMMANDS).format(app=app),
+            'status': 'ACTIVE',
+            'technical_details': None,
+            'potential_analysis': None,
+            'potential_impact': None,
+            'potential_solution': None,
+            'source_url': None,
+            'last_modified': now_ms - rnd.randrange(90 * 86400000),
+            'last_modified_by': 'standin',
+        })
+
+    alert_defs = []
+    # Leave about 10% of checks without alerts
+    alerted = check_defs[:max(len(check_defs) * 9 // 10, 1)] if check_defs else []
+    for i in range(1, alerts + 1 if alerted else 1):
+        check = alerted[i - 1] if i <= len(alerted) else rnd.choice(alerted)
+        alert_defs.append({
+            'id': i,
+            'name': 'Alert on {}'.format(check['name']),
+            'description': None,
+            'check_definition_id': check['id'],
+            'condition': rnd.choice(ALERT_CONDITIONS),
+            'entities': [] if rnd.random() < 0.7 else [{'region': rnd.choice(REGIONS)}],
+            'entities_exclude': None,
+            'priority': rnd.choice((1, 2, 2, 3, 3, 3)),
+            'team': check['owning_team'],
+            'responsible_team': check['owning_team'],
+            'period': '',
+            'notifications': [],
+            'parameters': None,
+            'tags': [],
+            'template': False,
+            'parent_id': None,
+            'status': 'ACTIVE',
+            'last_modified': now_ms - rnd.randrange(90 * 86400000),
+            'last_modified_by': 'standin',
+        })
+
+    dashboard_defs = []
+    for i in range(1, dashboards + 1):
+        team = rnd.choice(team_names)
+        team_alerts = [a['id'] for a in alert_defs if a['team'] == team][:10]
+        dashboard_defs.append({
+            'id': i,
+            'name': '{} dashboard {}'.format(team, i),
+            'team': team,
+            'alert_teams': [team],
+            'tags': [],
+            'view_mode': 'FULL',
+            'edit_option': 'PRIVATE',
+            'shared_teams': [],
+            'widget_configuration': json.dumps([{'type': 'chart', 'options': {'alert_ids': team_alerts}}]),
+            'last_modified_by': 'standin',
+        })
+
+    grafana_defs = [{'dashboard': {'id': 'grafana-{}'.format(i), 'title': '{} overview'.format(team), 'rows': []},
+                     'team': team}
+                    for i, team in enumerate(team_names[:max(dashboards // 2, 1)], 1)]
+
+    group_defs = [{'id': team, 'name': team, 'members': ['{}@example.org'.format(team)],
+                   'active': ['{}@example.org'.format(team)], 'phones': []} for team in team_names]
+
+    tokens = [{'token': _hex(rnd, 8), 'created': now_ms - 86400000, 'bound_at': None, 'bound_expires': None,
+               'bound_ip': None}]
+
+    return Dataset(entities=generated, checks=check_defs, alerts=alert_defs, dashboards=dashboard_defs,
+                   grafana_dashboards=grafana_defs, groups=group_defs, tokens=tokens)
+
+
+class Standin:
+    """Stand-in ZMON API on top of a dataset.
+
+    :param dataset: Data served, modified by write requests. Default is a generated dataset.
+    :type dataset: Dataset
+
+    :param latency: Delay every response by seconds.
+    :type latency: float
+
+    :param jitter: Add uniformly distributed random delay of up to seconds.
+    :type jitter: float
+
+    :param error_rate: Fraction of requests failing with ``error_status``, between 0 and 1.
+    :type error_rate: float
+
+    :param error_status: HTTP status of injected errors. Default is 503.
+    :type error_status: int
+
+    :param seed: Random seed of injected latency and errors.
+    :type seed: int
+    """
+
+    def __init__(self, dataset=None, latency=0, jitter=0, error_rate=0, error_status=DEFAULT_ERROR_STATUS,
+                 seed=None):
+        self.dataset = dataset if dataset is not None else generate_dataset()
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+
+        self.requests = 0
+        self.errors = 0
+
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        # Encoded responses of read requests, dropped by every write
+        self._cache = {}
+
+        # Worker counters grow at the rate forecast from checks and entities, as if workers ran for a while
+        self._started = time.time() - WORKER_UPTIME
+        self._invocation_rate = None
+
+    def _delay(self):
+        with self._lock:
+            self.requests += 1
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+            failed = self.error_rate and self._random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+
+        if delay > 0:
+            time.sleep(delay)
+
+        return failed
+
+    def handle(self, method, path, query=None, body=None):
+        """
+        Handle a request.
+
+        >>> Standin(Dataset(checks=[{'id': 1, 'name': 'c'}])).handle('GET', '/api/v1/check-definitions/1/')
+        (200, 'application/json', b'{"id": 1, "name": "c"}')
+
+        :param method: HTTP method.
+        :type method: str
+
+        :param path: URL path, e.g. ``/api/v1/entities/``.
+        :type path: str
+
+        :param query: Query parameters.
+        :type query: dict
+
+        :param body: Request body.
+        :type body: bytes
+
+        :return: Status code, content type and body.
+        :rtype: tuple
+        """
+        if self._delay():
+            return self._error(self.error_status, 'Injected error')
+
+        path = unquote(path)
+        if not path.startswith(API_PREFIX):
+            return self._error(404, 'Not found')
+
+        resource = path[len(API_PREFIX):].rstrip('/')
+        method = method.upper()
+
+        allowed = False
+        for route_method, pattern, handler in _routes:
+            match = pattern.match(resource)
+            if not match:
+                continue
+            if route_method != method:
+                allowed = True
+                continue
+
+            try:
+                data = json.loads(body.decode('utf-8')) if body else None
+            except ValueError:
+                return self._error(400, 'Invalid JSON')
+
+            kwargs = match.groupdict()
+            if 'id' in kwargs:
+                kwargs['id'] = int(kwargs['id'])
+
+            if method == 'GET' and handler in UNCACHED_HANDLERS:
+                return getattr(self, handler)(query or {}, **kwargs)
+
+            if method == 'GET':
+                key = (resource, tuple(sorted((query or {}).items())))
+                with self._lock:
+                    cached = self._cache.get(key)
+                    if cached is None:
+                        if len(self._cache) >= CACHE_SIZE:
+                            self._cache.clear()
+                        cached = self._cache[key] = getattr(self, handler)(query or {}, **kwargs)
+                return cached
+
+            with self._lock:
+                self._cache.clear()
+                self._invocation_rate = None
+                return getattr(self, handler)(data, **kwargs)
+
+        return self._error(405 if allowed else 404, 'Method not allowed' if allowed else 'Not found')
+
+    @staticmethod
+    def _json(data, status=200):
+        return status, 'application/json', json.dumps(data).encode('utf-8')
+
+    @staticmethod
+    def _text(text, status=200):
+        return status, 'text/plain', text.encode('utf-8')
+
+    def _error(self, status, message):
+        return self._json({'message': message}, status=status)
+
+    def _next_id(self, items):
+        return max(items, default=0) + 1
+
+    def _now_ms(self):
+        return int(time.time() * 1000)
+
+    def get_status(self, query):
+        with self._lock:
+            if self._invocation_rate is None:
+                checks = [c for c in self.dataset.checks.values() if c.get('status') == 'ACTIVE']
+                self._invocation_rate = forecast(checks, self.dataset.entities.values())['invocations_per_second']
+            rate = self._invocation_rate
+
+        invocations = int(rate * (time.time() - self._started))
+        return self._json({
+            'alerts_active': len(self.dataset.alerts) // 10,
+            'check_invocations': invocations,
+            'workers': [
+                {'name': 'standin-worker', 'check_invocations': invocations, 'last_execution_time': time.time()},
+            ],
+            'queues': [{'name': 'zmon:queue:default', 'size': 0}],
+        })
+
+    # ENTITIES
+
+    def get_entities(self, query):
+        entities = self.dataset.entities.values()
+        if query.get('query'):
+            try:
+                q = json.loads(query['query'])
+            except ValueError:
+                return self._error(400, 'Invalid query')
+            entities = [e for e in entities if contains(e, q)]
+
+        return self._json(list(entities))
+
+    def get_entity(self, query, entity_id):
+        entity = self.dataset.entities.get(entity_id)
+        if entity is None:
+            return self._error(404, 'Entity not found')
+        return self._json(entity)
+
+    def put_entity(self, data):
+        if not isinstance(data, dict) or 'id' not in data or 'type' not in data:
+            return self._error(400, 'Entity "id" and "type" are required')
+
+        entity = dict(data, last_modified=_timestamp(time.time()))
+        self.dataset.entities[entity['id']] = entity
+        return self._text('')
+
+    def delete_entity(self, data, entity_id):
+        return self._text('1' if self.dataset.entities.pop(entity_id, None) else '0')
+
+    # DASHBOARDS
+
+    def get_dashboards(self, query):
+        return self._json(list(self.dataset.dashboards.values()))
+
+    def get_dashboard(self, query, id):
+        if id not in self.dataset.dashboards:
+            return self._error(404, 'Dashboard not found')
+        return self._json(self.dataset.dashboards[id])
+
+    def post_dashboard(self, data, id=None):
+        if not isinstance(data, dict):
+            return self._error(400, 'Invalid dashboard')
+
+        id = id or self._next_id(self.dataset.dashboards)
+        self.dataset.dashboards[id] = dict(data, id=id)
+        return self._json(id)
+
+    # CHECK DEFINITIONS
+
+    def get_check_definitions(self, query):
+        checks = [c for c in self.dataset.checks.values() if c.get('status') == 'ACTIVE']
+        return self._json({'check_definitions': checks, 'snapshot_id': len(self.dataset.checks)})
+
+    def get_check_definition(self, query, id):
+        # Like ZMON, unknown check definitions are an empty 200 response
+        if id not in self.dataset.checks:
+            return self._text('')
+        return self._json(self.dataset.checks[id])
+
+    def post_check_definition(self, data):
+        if not isinstance(data, dict) or 'owning_team' not in data:
+            return self._error(400, 'Check definition must have "owning_team"')
+
+        id = data.get('id')
+        if id not in self.dataset.checks:
+            id = self._next_id(self.dataset.checks)
+
+        check = dict(data, id=id, last_modified=self._now_ms())
+        check.setdefault('last_modified_by', 'standin')
+        self.dataset.checks[id] = check
+        return self._json(check)
+
+    def delete_check_definition(self, data, id):
+        if self.dataset.checks.pop(id, None) is None:
+            return self._error(404, 'Check definition not found')
+        return self._text('')
+
+    # ALERT DEFINITIONS
+
+    def get_alert_definitions(self, query):
+        alerts = [a for a in self.dataset.alerts.values() if a.get('status') == 'ACTIVE']
+        return self._json({'alert_definitions': alerts})
+
+    def get_alert_definition(self, query, id):
+        if id not in self.dataset.alerts:
+            return self._error(404, 'Alert definition not found')
+        return self._json(self.dataset.alerts[id])
+
+    def _save_alert(self, data, id):
+        if not isinstance(data, dict) or 'check_definition_id' not in data:
+            return self._error(400, 'Alert definition must have "check_definition_id"')
+        if data['check_definition_id'] not in self.dataset.checks:
+            return self._error(400, 'Check definition does not exist')
+
+        alert = dict(data, id=id, last_modified=self._now_ms())
+        self.dataset.alerts[id] = alert
+        return self._json(alert)
+
+    def post_alert_definition(self, data):
+        return self._save_alert(data, self._next_id(self.dataset.alerts))
+
+    def put_alert_definition(self, data, id):
+        if id not in self.dataset.alerts:
+            return self._error(404, 'Alert definition not found')
+        return self._save_alert(data, id)
+
+    def delete_alert_definition(self, data, id):
+        alert = self.dataset.alerts.pop(id, None)
+        if alert is None:
+            return self._error(404, 'Alert definition not found')
+        return self._json(alert)
+
+    def get_alert_data(self, query, id):
+        alert = self.dataset.alerts.get(id)
+        check = self.dataset.checks.get(alert['check_definition_id']) if alert else None
+        if check is None:
+            return self._json([])
+
+        rnd = random.Random(id)
+        now = time.time()
+        data = []
+        for entity in self.dataset.entities.values():
+            if not contains(entity, check.get('entities') or []):
+                continue
+            if alert.get('entities') and not contains(entity, alert['entities']):
+                continue
+
+            data.append({
+                'entity': entity['id'],
+                'results': [{'ts': now - rnd.randrange(60), 'value': rnd.randrange(250), 'td': rnd.random(),
+                             'captures': {}}],
+                'active_alert_ids': [id] if rnd.random() < 0.1 else [],
+            })
+
+        return self._json(data)
+
+    # SEARCH
+
+    def search(self, query):
+        q = query.get('query', '').lower()
+        try:
+            limit = int(query.get('limit') or SEARCH_LIMIT)
+        except ValueError:
+            return self._error(400, 'Invalid limit')
+        teams = set(query['teams'].split(',')) if query.get('teams') else None
+
+        def find(items, title, team):
+            found = []
+            for item in items:
+                if q in (title(item) or '').lower() and (teams is None or team(item) in teams):
+                    found.append({'id': item['id'], 'title': title(item), 'team': team(item) or ''})
+                    if len(found) >= limit:
+                        break
+            return found
+
+        dataset = self.dataset
+        return self._json({
+            'checks': find(dataset.checks.values(), lambda c: c['name'], lambda c: c.get('owning_team')),
+            'alerts': find(dataset.alerts.values(), lambda a: a['name'], lambda a: a.get('team')),
+            'dashboards': find(dataset.dashboards.values(), lambda d: d['name'], lambda d: d.get('team')),
+            'grafana_dashboards': find((dict(d['dashboard'], team=d.get('team'))
+                                        for d in dataset.grafana_dashboards.values()),
+                                       lambda d: d['title'], lambda d: d.get('team')),
+        })
+
+    # ONETIME TOKENS
+
+    def get_tokens(self, query):
+        return self._json(self.dataset.tokens)
+
+    def post_token(self, data):
+        token = _hex(self._random, 8)
+        self.dataset.tokens.append({'token': token, 'created': self._now_ms(), 'bound_at': None,
+                                    'bound_expires': None, 'bound_ip': None})
+        return self._text(token)
+
+    # GRAFANA
+
+    def get_grafana_dashboard(self, query, name):
+        if name not in self.dataset.grafana_dashboards:
+            return self._error(404, 'Dashboard not found')
+        return self._json(self.dataset.grafana_dashboards[name])
+
+    def post_grafana_dashboard(self, data):
+        dashboard = (data or {}).get('dashboard') or {}
+        if 'id' not in dashboard or 'title' not in dashboard:
+            return self._error(400, 'Grafana dashboard must have "id" and "title"')
+
+        self.dataset.grafana_dashboards[dashboard['id']] = data
+        return self._json(data)
+
+    # DOWNTIMES
+
+    def post_downtime(self, data):
+        if not isinstance(data, dict) or not data.get('entities'):
+            return self._error(400, 'At least one entity ID should be specified')
+
+        downtime = dict(data, id=_hex(self._random, 32))
+        self.dataset.downtimes.append(downtime)
+        return self._json(downtime)
+
+    # GROUPS
+
+    def get_groups(self, query):
+        return self._json(list(self.dataset.groups.values()))
+
+    def _group(self, name):
+        return self.dataset.groups.setdefault(name, {'id': name, 'name': name, 'members': [], 'active': [],
+                                                     'phones': []})
+
+    def clear_active(self, data, name):
+        self._group(name)['active'] = []
+        return self._text('1')
+
+    def set_active(self, data, name, user):
+        self._group(name)['active'] = [user]
+        return self._text('1')
+
+    def add_member(self, data, name, user):
+        members = self._group(name)['members']
+        if user not in members:
+            members.append(user)
+        return self._text('1')
+
+    def remove_member(self, data, name, user):
+        members = self._group(name)['members']
+        if user not in members:
+            return self._text('0')
+        members.remove(user)
+        return self._text('1')
+
+    def add_phone(self, data, name, phone):
+        phones = self._group(name)['phones']
+        if phone not in phones:
+            phones.append(phone)
+        return self._text('1')
+
+    def remove_phone(self, data, name, phone):
+        phones = self._group(name)['phones']
+        if phone not in phones:
+            return self._text('0')
+        phones.remove(phone)
+        return self._text('1')
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    # Headers and body are written separately, avoid delayed ACKs on keep-alive connections
+    disable_nagle_algorithm = True
+
+    def _handle(self):
+        split = urlsplit(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else None
+
+        status, content_type, data = self.server.standin.handle(
+            self.command, split.path, dict(parse_qsl(split.query)), body)
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class StandinServer(ThreadingMixIn, HTTPServer):
+    """Threaded HTTP server of a :class:`Standin`.
+
+    :param address: ``(host, port)`` tuple, port 0 picks a free port.
+    :type address: tuple
+
+    :param standin: Stand-in API.
+    :type standin: Standin
+
+    :param verbose: Log requests to stderr.
+    :type verbose: bool
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, standin, verbose=False):
+        self.standin = standin
+        self.verbose = verbose
+        super().__init__(address, StandinHandler)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+
+class StandinAdapter(BaseAdapter):
+    """Transport adapter answering requests in-process from a :class:`Standin`, without sockets or HTTP parsing.
+
+    :param standin: Stand-in API.
+    :type standin: Standin
+    """
+
+    def __init__(self, standin):
+        super().__init__()
+        self.standin = standin
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        split = urlsplit(request.url)
+
+        body = request.body
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+
+        status, content_type, data = self.standin.handle(request.method, split.path, dict(parse_qsl(split.query)),
+                                                         body)
+
+        resp = build_response(request, status, data, headers={'Content-Type': content_type})
+        resp.connection = self
+
+        return resp
+
+    def close(self):
+        pass
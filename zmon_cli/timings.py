@@ -0,0 +1,265 @@
+"""
+Per-request timing instrumentation of :class:`zmon_cli.client.Zmon` sessions.
+
+Pass a :class:`TimingCollector` to the client to record every request::
+
+    collector = TimingCollector()
+    zmon = Zmon('https://zmon.example.org', token='...', collector=collector)
+    zmon.get_check_definitions()
+
+    collector.records       # one dict per request, see TimingAdapter
+    collector.endpoints()   # latency percentiles per endpoint
+
+Request phases (seconds): ``dns``, ``connect`` and ``tls`` are only recorded if a new connection was established,
+``server`` is the time until response headers arrived, ``download`` the time reading the body and ``decode`` the time
+spent in ``response.json()``.
+"""
+import re
+import socket
+import threading
+import time
+
+from urllib.parse import urlsplit
+
+import urllib3
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+
+PHASES = ('dns', 'connect', 'tls', 'server', 'download', 'decode')
+
+PERCENTILES = (50, 95, 99)
+
+# path segments with digits, except API versions
+id_segment_re = re.compile(r'^(?!v\d+$).*\d')
+
+_local = threading.local()
+
+
+def _add_phase(name, seconds):
+    record = getattr(_local, 'record', None)
+    if record is not None:
+        record['phases'][name] = record['phases'].get(name, 0) + seconds
+
+
+def get_endpoint(method, url):
+    """
+    Return endpoint name of a request, replacing ID-like path segments.
+
+    >>> get_endpoint('GET', 'https://zmon/api/v1/entities/host-1/?query=x')
+    'GET /api/v1/entities/{id}/'
+    """
+    path = '/'.join('{id}' if id_segment_re.match(s) else s for s in urlsplit(url).path.split('/'))
+    return '{} {}'.format(method, path)
+
+
+def percentile(values, p):
+    """
+    Return percentile ``p`` of values using the nearest-rank method.
+
+    >>> percentile([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 95)
+    10
+    >>> percentile([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 50)
+    5
+    """
+    if not values:
+        return None
+
+    ordered = sorted(values)
+    rank = max(int(-(-p * len(ordered) // 100)), 1)
+    return ordered[rank - 1]
+
+
+class TimingCollector:
+    """Thread-safe collector of request timing records."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.records = []
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        with self._lock:
+            self.records.append(record)
+
+    def clear(self):
+        with self._lock:
+            self.records = []
+        self.started = time.perf_counter()
+
+    def before_request(self, request):
+        """Called with each prepared request before it is sent."""
+        pass
+
+    def add_exchange(self, record, request, response):
+        """Called with the timing record, prepared request and response (``None`` on errors) of each request."""
+        self.add(record)
+
+    def new_record(self, request):
+        """Return empty timing record of a request starting now."""
+        return {
+            'method': request.method,
+            'url': request.url,
+            'endpoint': get_endpoint(request.method, request.url),
+            'status': None,
+            'bytes': 0,
+            'error': None,
+            'timestamp': time.time(),
+            'start': time.perf_counter() - self.started,
+            'duration': 0,
+            'phases': {},
+        }
+
+    def endpoints(self):
+        """
+        Return latency statistics per endpoint, in milliseconds.
+
+        :return: Dict of endpoint to ``count``, ``errors``, ``bytes``, ``p50``, ``p95``, ``p99`` and ``max``.
+        :rtype: dict
+        """
+        with self._lock:
+            records = list(self.records)
+
+        grouped = {}
+        for record in records:
+            grouped.setdefault(record['endpoint'], []).append(record)
+
+        stats = {}
+        for endpoint, group in grouped.items():
+            durations = [r['duration'] * 1000 for r in group]
+            stats[endpoint] = {
+                'count': len(group),
+                'errors': sum(1 for r in group if r['error'] or (r['status'] or 0) >= 400),
+                'bytes': sum(r['bytes'] for r in group),
+                'max': max(durations),
+            }
+            for p in PERCENTILES:
+                stats[endpoint]['p{}'.format(p)] = percentile(durations, p)
+
+        return stats
+
+
+class _TimedConnectionMixin:
+
+    def _new_conn(self):
+        start = time.perf_counter()
+
+        host = getattr(self, '_dns_host', None)
+        address = None
+        if host is not None:
+            try:
+                address = socket.getaddrinfo(host, self.port, 0, socket.SOCK_STREAM)[0][4][0]
+            except socket.gaierror:
+                pass  # urllib3 reports the resolution error below
+
+        resolved = time.perf_counter()
+        _add_phase('dns', resolved - start)
+
+        try:
+            if address is None:
+                return super()._new_conn()
+
+            self._dns_host = address
+            try:
+                return super()._new_conn()
+            except urllib3.exceptions.HTTPError:
+                # Connecting to the first address failed, let urllib3 try all addresses
+                self._dns_host = host
+                return super()._new_conn()
+            finally:
+                self._dns_host = host
+        finally:
+            self._connect_seconds = time.perf_counter() - start
+            _add_phase('connect', time.perf_counter() - resolved)
+
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+
+    def connect(self):
+        self._connect_seconds = 0
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            _add_phase('tls', time.perf_counter() - start - self._connect_seconds)
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimingAdapter(HTTPAdapter):
+    """Transport adapter adding a timing record per request to a :class:`TimingCollector`.
+
+    Records are dicts with ``method``, ``url``, ``endpoint``, ``status``, ``bytes``, ``error``, ``timestamp``,
+    ``start`` (seconds since collector start), ``duration`` and ``phases``.
+
+    :param collector: Timing collector.
+    :type collector: TimingCollector
+    """
+
+    def __init__(self, collector, **kwargs):
+        self.collector = collector
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool,
+        }
+
+    def send(self, request, stream=False, **kwargs):
+        record = self.collector.new_record(request)
+        resp = None
+
+        self.collector.before_request(request)
+
+        _local.record = record
+        start = time.perf_counter()
+        try:
+            resp = super().send(request, stream=stream, **kwargs)
+
+            headers = time.perf_counter()
+            connection = sum(record['phases'].get(p, 0) for p in ('dns', 'connect', 'tls'))
+            record['phases']['server'] = headers - start - connection
+            record['status'] = resp.status_code
+
+            if stream:
+                record['bytes'] = int(resp.headers.get('Content-Length') or 0)
+            else:
+                record['bytes'] = len(resp.content)
+                record['phases']['download'] = time.perf_counter() - headers
+
+            resp.json = timed_json(resp.json, record)
+
+            return resp
+        except Exception as e:
+            record['error'] = type(e).__name__
+            raise
+        finally:
+            _local.record = None
+            record['duration'] = time.perf_counter() - start
+            self.collector.add_exchange(record, request, resp)
+
+
+def timed_json(json, record):
+    """Wrap ``response.json`` to add its time to the ``decode`` phase of a timing record."""
+    def timed(**kwargs):
+        start = time.perf_counter()
+        try:
+            return json(**kwargs)
+        finally:
+            record['phases']['decode'] = record['phases'].get('decode', 0) + time.perf_counter() - start
+
+    return timed
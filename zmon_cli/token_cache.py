@@ -0,0 +1,177 @@
+"""
+On-disk cache of OAuth tokens shared by concurrent zmon processes.
+
+Tokens are kept until shortly before they expire. Expiry is taken from zign's ``creation_time`` and ``expires_in``, or
+read from the ``exp`` claim of JWT tokens. Other tokens might be cached by zign already, so they are only assumed to be
+valid for :data:`DEFAULT_LIFETIME` seconds. Refreshing is serialized with an exclusive file lock, so
+parallel invocations fetch a token once; readers never block since the cache file is replaced atomically.
+"""
+import base64
+import json
+import logging
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+
+DEFAULT_LIFETIME = 600
+
+# Refresh tokens expiring within seconds
+DEFAULT_REFRESH_BEFORE = 300
+
+logger = logging.getLogger(__name__)
+
+
+def get_token_expiry(token, default_lifetime=DEFAULT_LIFETIME, now=None):
+    """
+    Return expiry timestamp of a token.
+
+    >>> get_token_expiry('eyJhbGciOiJub25lIn0.eyJleHAiOjE1MDAwMDAwMDB9.', now=0)
+    1500000000
+    >>> get_token_expiry({'access_token': 'opaque-token', 'creation_time': 1000, 'expires_in': 3600}, now=0)
+    4600
+    >>> get_token_expiry('opaque-token', now=0)
+    600
+
+    :param token: JWT or opaque token, or token dict of zign with ``access_token``, ``creation_time`` and
+                  ``expires_in``.
+    :type token: str
+
+    :param default_lifetime: Lifetime in seconds of tokens without ``exp`` claim.
+    :type default_lifetime: int
+
+    :return: Expiry as UNIX timestamp.
+    :rtype: int
+    """
+    now = time.time() if now is None else now
+
+    if isinstance(token, dict):
+        created, expires_in = token.get('creation_time'), token.get('expires_in')
+        if isinstance(created, (int, float)) and isinstance(expires_in, (int, float)):
+            return int(created + expires_in)
+        token = token.get('access_token') or ''
+
+    parts = token.split('.')
+    if len(parts) == 3:
+        try:
+            payload = parts[1] + '=' * (-len(parts[1]) % 4)
+            exp = json.loads(base64.urlsafe_b64decode(payload.encode('ascii')).decode('utf-8'))['exp']
+            return int(exp)
+        except (ValueError, TypeError, KeyError, UnicodeError):
+            pass
+
+    return int(now + default_lifetime)
+
+
+class TokenCache:
+    """Token cache stored in a JSON file.
+
+    :param path: Cache file path. A ``.lock`` file is created next to it.
+    :type path: str
+
+    :param refresh_before: Refresh tokens expiring within seconds.
+    :type refresh_before: int
+
+    :param default_lifetime: Lifetime in seconds of tokens without ``exp`` claim.
+    :type default_lifetime: int
+    """
+
+    def __init__(self, path, refresh_before=DEFAULT_REFRESH_BEFORE, default_lifetime=DEFAULT_LIFETIME):
+        self.path = path
+        self.refresh_before = refresh_before
+        self.default_lifetime = default_lifetime
+
+    def _read(self):
+        try:
+            with open(self.path) as fd:
+                data = json.load(fd)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, data):
+        tmp = '{}.{}.tmp'.format(self.path, os.getpid())
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+
+    def _lock(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open('{}.lock'.format(self.path), os.O_RDWR | os.O_CREAT, 0o600)
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        return fd
+
+    def _unlock(self, fd):
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+    def _fresh(self, entry, now):
+        return entry and entry['expires'] - self.refresh_before > now
+
+    def get(self, name, fetch):
+        """
+        Return cached token, calling ``fetch`` if it is missing or about to expire.
+
+        If refreshing a token which has not expired yet fails, the cached token is returned.
+
+        :param name: Token name, e.g. ``zmon``.
+        :type name: str
+
+        :param fetch: Callable returning a new token, or a token dict of zign, see :func:`get_token_expiry`.
+        :type fetch: callable
+
+        :return: Token.
+        :rtype: str
+        """
+        now = time.time()
+
+        entry = self._read().get(name)
+        if self._fresh(entry, now):
+            return entry['token']
+
+        lock = self._lock()
+        try:
+            # Another process might have refreshed the token while we were waiting for the lock
+            data = self._read()
+            entry = data.get(name)
+            if self._fresh(entry, now):
+                return entry['token']
+
+            try:
+                token = fetch()
+            except Exception:
+                if entry and entry['expires'] > now:
+                    logger.warning('Failed to refresh token %s, using cached token', name, exc_info=True)
+                    return entry['token']
+                raise
+
+            expires = get_token_expiry(token, self.default_lifetime, now=now)
+            if isinstance(token, dict):
+                token = token['access_token']
+
+            data[name] = {'token': token, 'expires': expires}
+            self._write(data)
+
+            return token
+        finally:
+            self._unlock(lock)
+
+    def clear(self, name=None):
+        """Drop a cached token, or all tokens."""
+        lock = self._lock()
+        try:
+            data = self._read()
+            if name is None:
+                data.clear()
+            else:
+                data.pop(name, None)
+            self._write(data)
+        finally:
+            self._unlock(lock)
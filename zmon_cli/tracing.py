@@ -0,0 +1,238 @@
+"""
+Request tracing with flow-ID propagation.
+
+Every :class:`zmon_cli.client.Zmon` client sends a flow ID as ``X-Flow-ID`` header with every request, so requests of
+one CLI invocation can be correlated in ZMON controller logs. A :class:`Tracer` records a span per ZMON request and per
+pipeline stage (``parse``, ``validate``, ``send`` and ``render``), using the flow ID as trace ID. Spans are exported
+as `Zipkin v2 <https://zipkin.io/zipkin-api/>`_ JSON objects, one per line.
+
+Library users pass a tracer as ``collector`` to :class:`zmon_cli.client.Zmon` and wrap their own stages::
+
+    tracer = Tracer()
+    zmon = Zmon('https://zmon.example.org', token='...', collector=tracer)
+
+    with tracer.span('sync-checks'):
+        zmon.get_check_definitions()
+
+    tracer.export('spans.jsonl')
+"""
+import binascii
+import contextlib
+import json
+import os
+import threading
+import time
+
+from zmon_cli.timings import PHASES, TimingCollector
+
+
+FLOW_ID_HEADER = 'X-Flow-ID'
+
+SERVICE_NAME = 'zmon-cli'
+
+_tracer = None
+
+# Flow ID per thread, so concurrent commands (e.g. parallel batch steps) keep their own. Threads without one, e.g.
+# worker threads of a command, use the flow ID set last by the main thread.
+_flow_ids = threading.local()
+_main_flow_id = None
+
+
+def generate_id(size=8):
+    """
+    Return random lowercase hex ID of ``size`` bytes.
+
+    >>> len(generate_id(16))
+    32
+    """
+    return binascii.hexlify(os.urandom(size)).decode('ascii')
+
+
+def get_flow_id():
+    """Return flow ID of the command running in this thread, or ``None``."""
+    return getattr(_flow_ids, 'flow_id', None) or _main_flow_id
+
+
+def set_flow_id(flow_id):
+    """Set flow ID of the command running in this thread and return previous one."""
+    global _main_flow_id
+
+    previous = getattr(_flow_ids, 'flow_id', None)
+    _flow_ids.flow_id = flow_id
+
+    if threading.current_thread() is threading.main_thread():
+        _main_flow_id = flow_id
+
+    return previous
+
+
+def get_tracer():
+    """Return active tracer of the running command, or ``None``."""
+    return _tracer
+
+
+def set_tracer(tracer):
+    """Set active tracer and return previous one."""
+    global _tracer
+
+    previous, _tracer = _tracer, tracer
+    return previous
+
+
+@contextlib.contextmanager
+def stage(name, detail=None, **tags):
+    """
+    Record a span of a pipeline stage with the active tracer. Does nothing if tracing is disabled.
+
+    :param name: Stage name, one of ``parse``, ``validate``, ``send`` and ``render``.
+    :type name: str
+
+    :param detail: Appended to span name, e.g. the client method.
+    :type detail: str
+    """
+    tracer = get_tracer()
+    if tracer is None:
+        yield None
+    else:
+        tags['zmon.stage'] = name
+        with tracer.span('{} {}'.format(name, detail) if detail else name, **tags) as span:
+            yield span
+
+
+class Tracer(TimingCollector):
+    """Timing collector recording spans of requests and stages.
+
+    :param trace_id: Trace ID, default is a random 128 bit ID.
+    :type trace_id: str
+
+    :param service_name: Local service name of spans.
+    :type service_name: str
+    """
+
+    def __init__(self, trace_id=None, service_name=SERVICE_NAME):
+        super().__init__()
+        self.trace_id = trace_id or generate_id(16)
+        self.service_name = service_name
+        self.spans = []
+        self._local = threading.local()
+        self._root = None
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def _parent_id(self):
+        stack = self._stack()
+        if stack:
+            return stack[-1]['id']
+        # Spans of other threads (e.g. concurrent requests) are children of the first span
+        return self._root['id'] if self._root else None
+
+    def start_span(self, name, kind=None, **tags):
+        """
+        Start a span as child of the current span of this thread. Finish it with :func:`Tracer.finish_span`.
+
+        :return: Span dict.
+        :rtype: dict
+        """
+        span = {
+            'traceId': self.trace_id,
+            'id': generate_id(),
+            'name': name,
+            'timestamp': int(time.time() * 1000000),
+            'localEndpoint': {'serviceName': self.service_name},
+            'tags': {k: str(v) for k, v in tags.items()},
+        }
+
+        parent_id = self._parent_id()
+        if parent_id:
+            span['parentId'] = parent_id
+        if kind:
+            span['kind'] = kind
+
+        if self._root is None:
+            self._root = span
+
+        span['_started'] = time.perf_counter()
+        self._stack().append(span)
+
+        return span
+
+    def finish_span(self, span, error=None):
+        span['duration'] = max(int((time.perf_counter() - span.pop('_started')) * 1000000), 1)
+        if error:
+            span['tags']['error'] = str(error)
+
+        stack = self._stack()
+        if span in stack:
+            stack.remove(span)
+
+        with self._lock:
+            self.spans.append(span)
+
+    @contextlib.contextmanager
+    def span(self, name, kind=None, **tags):
+        """Context manager recording a span."""
+        span = self.start_span(name, kind=kind, **tags)
+        try:
+            yield span
+        except Exception as e:
+            self.finish_span(span, error=type(e).__name__)
+            raise
+        else:
+            self.finish_span(span)
+
+    def before_request(self, request):
+        request.headers[FLOW_ID_HEADER] = self.trace_id
+
+    def add(self, record):
+        super().add(record)
+
+        tags = {
+            'http.method': record['method'],
+            'http.path': record['endpoint'].split(' ', 1)[-1],
+            'http.url': record['url'],
+            'http.response.size': record['bytes'],
+        }
+        if record['status']:
+            tags['http.status_code'] = record['status']
+        if record['error'] or (record['status'] or 0) >= 400:
+            tags['error'] = record['error'] or str(record['status'])
+        for phase in PHASES:
+            if phase in record['phases']:
+                tags['zmon.{}_ms'.format(phase)] = '{:.3f}'.format(record['phases'][phase] * 1000)
+
+        span = {
+            'traceId': self.trace_id,
+            'id': generate_id(),
+            'kind': 'CLIENT',
+            'name': record['endpoint'],
+            'timestamp': int(record['timestamp'] * 1000000),
+            'duration': max(int(record['duration'] * 1000000), 1),
+            'localEndpoint': {'serviceName': self.service_name},
+            'remoteEndpoint': {'serviceName': 'zmon'},
+            'tags': {k: str(v) for k, v in tags.items()},
+        }
+
+        parent_id = self._parent_id()
+        if parent_id:
+            span['parentId'] = parent_id
+
+        with self._lock:
+            self.spans.append(span)
+
+    def export(self, path):
+        """Append finished spans to a JSON lines file."""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s['timestamp'])
+
+        if not spans:
+            return
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with open(path, 'a') as fd:
+            fd.write(''.join(json.dumps(span, sort_keys=True) + '\n' for span in spans))